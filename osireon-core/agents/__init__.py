@@ -3,11 +3,14 @@ Inizializzazione del sistema di agenti per Osireon.
 Questo file registra gli agenti nel gestore e fornisce funzioni di utilità.
 """
 import logging
-from typing import Dict, Any
+from typing import Callable, Dict, Any, Optional
 
-from src.agents.base import agent_manager, BaseAgent
+from src.agents.base import agent_manager, BaseAgent, SyncAgent
+from src.agents.features import ProposalFeatures
+from src.agents.llm_agent import LLMAgent, LLMBudget
 from src.agents.analyst_agent import AnalystAgent
 from src.agents.critic_agent import CriticAgent
+from src.utils.detail import DetailSelection
 
 # Configurazione del logging
 logger = logging.getLogger("osireon.agents.init")
@@ -48,5 +51,28 @@ def run_agent_analysis(input_data: Dict[str, Any], module_result: Dict[str, Any]
     # Esegui l'analisi con tutti gli agenti
     return agent_manager.run_agents(input_data, module_result)
 
+# Funzione per eseguire l'analisi con tutti gli agenti da codice asincrono
+async def run_agent_analysis_async(input_data: Dict[str, Any], module_result: Dict[str, Any],
+                                   detail: Optional[DetailSelection] = None,
+                                   publish: Optional[Callable[[Dict[str, Any]], None]] = None) -> Dict[str, Dict[str, Any]]:
+    """
+    Esegue l'analisi con tutti gli agenti registrati senza bloccare il ciclo di eventi.
+    
+    Args:
+        input_data: Dati di input originali della simulazione.
+        module_result: Risultato dell'elaborazione del modulo.
+        detail: Sezioni di dettaglio richieste. Se None, tutte.
+        publish: Funzione che riceve gli eventi dell'analisi (frammenti delle risposte LLM e
+            risultati dei singoli agenti) man mano che avvengono, o None.
+        
+    Returns:
+        Dict[str, Dict[str, Any]]: Risultati dell'analisi di tutti gli agenti.
+    """
+    # Assicurati che gli agenti siano inizializzati
+    if not agent_manager.agents:
+        initialize_agents()
+    
+    return await agent_manager.run_agents_async(input_data, module_result, detail=detail, publish=publish)
+
 # Inizializza gli agenti all'importazione del modulo
 initialize_agents()
@@ -3,103 +3,109 @@ Implementazione dell'AnalystAgent per Osireon.
 Questo agente analizza i risultati della simulazione e fornisce un'analisi dettagliata.
 """
 import logging
-from typing import Dict, Any
+from typing import Dict, Any, Optional
 
-from src.agents.base import BaseAgent
+from src.agents.base import SyncAgent
+from src.agents.features import ProposalFeatures
+from src.utils.detail import DetailSelection, AGENT_DETAILS
 
 # Configurazione del logging
 logger = logging.getLogger("osireon.agents.analyst")
 
-class AnalystAgent(BaseAgent):
+class AnalystAgent(SyncAgent):
     """
     Agente che analizza i risultati della simulazione e fornisce un'analisi dettagliata.
     """
     
+    # L'analisi dipende solo dagli input: può essere memorizzata
+    cacheable = True
+    
+    # Legge le metriche delle proposte dalla vista condivisa
+    uses_features = True
+    
+    # L'analisi dettagliata per proposta viene prodotta solo se richiesta
+    detail_sections = {AGENT_DETAILS: ("detailed_analysis",)}
+    
     def __init__(self):
         """
         Inizializza l'AnalystAgent.
         """
         super().__init__("AnalystAgent")
     
-    def analyze(self, input_data: Dict[str, Any], module_result: Dict[str, Any]) -> Dict[str, Any]:
+    def analyze_sync(self, input_data: Dict[str, Any], module_result: Dict[str, Any],
+                     features: Optional[ProposalFeatures] = None,
+                     detail: Optional[DetailSelection] = None) -> Dict[str, Any]:
         """
         Analizza i dati di input e i risultati del modulo.
         
         Args:
             input_data: Dati di input originali della simulazione.
             module_result: Risultato dell'elaborazione del modulo.
+            features: Vista delle caratteristiche delle proposte. Se None, viene costruita dai risultati.
+            detail: Sezioni di dettaglio richieste. Se None, tutte.
             
         Returns:
             Dict[str, Any]: Risultato dell'analisi dell'agente.
         """
-        logger.info(f"AnalystAgent sta analizzando i risultati del modulo {module_result.get('module', 'sconosciuto')}")
-        
-        # Estrai informazioni rilevanti
-        proposals = input_data.get("proposals", [])
-        constraints = input_data.get("constraints", [])
-        domain = input_data.get("domain", "")
-        country = input_data.get("country", "")
+        features = features or ProposalFeatures.build(input_data, module_result)
+        detailed = detail is None or detail.includes(AGENT_DETAILS)
+        logger.info(f"AnalystAgent sta analizzando i risultati del modulo {features.module}")
         
         # Analisi mock - in una implementazione reale, qui ci sarebbe l'integrazione con LLM
         analysis = {
-            "summary": f"Analisi delle {len(proposals)} proposte nel dominio {domain} per {country}",
+            "summary": f"Analisi delle {len(features)} proposte nel dominio {features.domain} per {features.country}",
             "key_findings": [],
-            "recommendations": [],
-            "detailed_analysis": {}
+            "recommendations": []
         }
+        if detailed:
+            analysis["detailed_analysis"] = {}
         
         # Genera analisi per ogni proposta
-        for i, proposal in enumerate(proposals):
+        for i, proposal in enumerate(features.proposals):
             proposal_key = f"proposal_{i+1}"
-            proposal_result = module_result.get("results", {}).get(proposal_key, {})
-            
-            # Estrai metriche rilevanti dal risultato del modulo
-            impact_score = proposal_result.get("impact_score", proposal_result.get("social_impact_score", 0.5))
-            feasibility = proposal_result.get("feasibility", proposal_result.get("acceptance_rate", 0.5))
-            
-            # Genera analisi per questa proposta
-            proposal_analysis = {
-                "proposal": proposal,
-                "impact_assessment": f"La proposta ha un impatto stimato di {impact_score:.2f} su una scala da 0 a 1",
-                "feasibility_assessment": f"La fattibilità della proposta è valutata a {feasibility:.2f} su una scala da 0 a 1",
-                "constraints_analysis": self._analyze_constraints(proposal_result.get("constraints_check", [])),
-                "recommendation": self._generate_recommendation(impact_score, feasibility)
-            }
+            impact_score = features.impact[i]
+            feasibility = features.feasibility[i]
+            recommendation = self._generate_recommendation(impact_score, feasibility)
             
             # Aggiungi alla lista dei key findings
             if impact_score > 0.7:
                 analysis["key_findings"].append(f"La proposta '{proposal}' ha un impatto potenzialmente elevato")
             
             # Aggiungi alla lista delle raccomandazioni
-            analysis["recommendations"].append(proposal_analysis["recommendation"])
+            analysis["recommendations"].append(recommendation)
             
-            # Aggiungi all'analisi dettagliata
-            analysis["detailed_analysis"][proposal_key] = proposal_analysis
+            # Genera l'analisi dettagliata di questa proposta, se richiesta
+            if detailed:
+                analysis["detailed_analysis"][proposal_key] = {
+                    "proposal": proposal,
+                    "impact_assessment": f"La proposta ha un impatto stimato di {impact_score:.2f} su una scala da 0 a 1",
+                    "feasibility_assessment": f"La fattibilità della proposta è valutata a {feasibility:.2f} su una scala da 0 a 1",
+                    "constraints_analysis": self._analyze_constraints(features.constraints_satisfied[i], features.constraints_total[i]),
+                    "recommendation": recommendation
+                }
         
         # Aggiungi una conclusione generale
-        analysis["conclusion"] = self._generate_conclusion(analysis["key_findings"], module_result)
+        analysis["conclusion"] = self._generate_conclusion(analysis["key_findings"], features.overall_impact)
         
         # Registra il completamento dell'analisi
         self._log_analysis(analysis)
         
         return analysis
     
-    def _analyze_constraints(self, constraints_check: list) -> str:
+    def _analyze_constraints(self, satisfied: int, total: int) -> str:
         """
         Analizza i risultati del controllo dei vincoli.
         
         Args:
-            constraints_check: Lista dei risultati del controllo dei vincoli.
+            satisfied: Numero di vincoli soddisfatti.
+            total: Numero di vincoli verificati.
             
         Returns:
             str: Analisi dei vincoli.
         """
-        if not constraints_check:
+        if not total:
             return "Nessun vincolo specificato per questa proposta."
         
-        satisfied = sum(1 for c in constraints_check if c.get("satisfied", False))
-        total = len(constraints_check)
-        
         if satisfied == total:
             return f"La proposta soddisfa tutti i {total} vincoli specificati."
         elif satisfied == 0:
@@ -127,13 +133,13 @@ class AnalystAgent(BaseAgent):
         else:
             return "Raccomandazione: Riconsiderare la proposta. Basso impatto e bassa fattibilità."
     
-    def _generate_conclusion(self, key_findings: list, module_result: Dict[str, Any]) -> str:
+    def _generate_conclusion(self, key_findings: list, overall_impact: float) -> str:
         """
-        Genera una conclusione basata sui key findings e sul risultato del modulo.
+        Genera una conclusione basata sui key findings e sull'impatto complessivo del modulo.
         
         Args:
             key_findings: Lista dei principali risultati dell'analisi.
-            module_result: Risultato dell'elaborazione del modulo.
+            overall_impact: Impatto complessivo dichiarato dal modulo.
             
         Returns:
             str: Conclusione generata.
@@ -141,8 +147,6 @@ class AnalystAgent(BaseAgent):
         if not key_findings:
             return "Nessuna delle proposte analizzate mostra un impatto significativo."
         
-        overall_impact = module_result.get("overall_impact", module_result.get("overall_social_impact", 0.5))
-        
         if overall_impact > 0.7:
             return f"Le proposte analizzate mostrano complessivamente un alto potenziale di impatto ({overall_impact:.2f}/1.0). Si raccomanda di procedere con le proposte ad alto impatto e alta fattibilità."
         elif overall_impact > 0.4:
@@ -2,9 +2,19 @@
 Base per il sistema di agenti di Osireon.
 Questo file contiene la classe base per gli agenti e l'interfaccia comune.
 """
+import asyncio
+import functools
 import logging
+import os
+import threading
+import time
 from abc import ABC, abstractmethod
-from typing import Dict, Any
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, Any, Optional, Tuple
+
+from src.agents.cache import agent_cache, AgentCache, input_fingerprint
+from src.agents.features import ProposalFeatures
+from src.utils.detail import DetailSelection, OMITTED_KEY, SECTIONS
 
 # Configurazione del logging
 logger = logging.getLogger("osireon.agents")
@@ -12,20 +22,51 @@ logger = logging.getLogger("osireon.agents")
 class BaseAgent(ABC):
     """
     Classe base astratta per tutti gli agenti di Osireon.
+    
+    L'interfaccia è asincrona: gli agenti che attendono servizi esterni (es. LLM) non occupano
+    un thread durante l'attesa e possono essere annullati. Gli agenti con logica solo locale
+    possono estendere SyncAgent e implementare analyze_sync.
+    
+    Gli agenti deterministici dichiarano cacheable = True: le loro analisi vengono riusate per
+    input identici finché non cambia version (o la versione delle risorse restituita da cache_scope,
+    es. il ruleset etico del paese). Gli agenti che dichiarano uses_features = True
+    ricevono dal gestore, come argomento features, la vista ProposalFeatures condivisa.
+    Gli agenti che dichiarano detail_sections ricevono come argomento detail la selezione
+    DetailSelection quando il client non richiede tutte le loro sezioni di dettaglio.
+    Gli agenti che dichiarano streams = True ricevono come argomento publish, quando il chiamante
+    segue l'analisi in tempo reale, una funzione a cui passare i risultati parziali (es. i frammenti
+    delle risposte di un modello di linguaggio).
     """
     
-    def __init__(self, name: str):
+    # Versione della logica dell'agente: va aumentata quando cambia il risultato dell'analisi
+    version = "1.0.0"
+    
+    # Se l'analisi è una funzione deterministica degli input e può essere memorizzata
+    cacheable = False
+    
+    # Se l'agente riceve la vista condivisa delle caratteristiche delle proposte (argomento features)
+    uses_features = False
+    
+    # Sezioni di dettaglio facoltative prodotte dall'agente: sezione -> chiavi del risultato
+    detail_sections: Dict[str, Tuple[str, ...]] = {}
+    
+    # Se l'agente pubblica risultati parziali durante l'analisi (argomento publish)
+    streams = False
+    
+    def __init__(self, name: str, timeout: Optional[float] = None):
         """
         Inizializza un agente.
         
         Args:
             name: Nome dell'agente.
+            timeout: Tempo massimo di analisi in secondi. Se None, vale il limite del gestore.
         """
         self.name = name
+        self.timeout = timeout
         logger.info(f"Agente {name} inizializzato")
     
     @abstractmethod
-    def analyze(self, input_data: Dict[str, Any], module_result: Dict[str, Any]) -> Dict[str, Any]:
+    async def analyze(self, input_data: Dict[str, Any], module_result: Dict[str, Any]) -> Dict[str, Any]:
         """
         Analizza i dati di input e i risultati del modulo.
         
@@ -38,6 +79,21 @@ class BaseAgent(ABC):
         """
         pass
     
+    def cache_scope(self, input_data: Dict[str, Any]) -> str:
+        """
+        Restituisce le versioni delle risorse, esterne agli input, da cui dipende l'analisi.
+        
+        Il valore entra nella chiave della cache: quando una risorsa cambia versione le analisi
+        memorizzate con la versione precedente non vengono più trovate.
+        
+        Args:
+            input_data: Dati di input originali della simulazione.
+            
+        Returns:
+            str: Versioni delle risorse, vuota se l'analisi dipende solo dagli input.
+        """
+        return ""
+    
     def _log_analysis(self, analysis_result: Dict[str, Any]) -> None:
         """
         Registra il risultato dell'analisi nei log.
@@ -47,17 +103,74 @@ class BaseAgent(ABC):
         """
         logger.info(f"Agente {self.name} ha completato l'analisi: {analysis_result}")
 
+class SyncAgent(BaseAgent):
+    """
+    Adattatore per gli agenti con analisi sincrona.
+    
+    Le sottoclassi implementano analyze_sync; analyze la esegue in un thread. Il gestore degli
+    agenti usa direttamente analyze_sync nel proprio pool di thread.
+    """
+    
+    async def analyze(self, input_data: Dict[str, Any], module_result: Dict[str, Any], **kwargs) -> Dict[str, Any]:
+        """
+        Esegue l'analisi sincrona in un thread senza bloccare il ciclo di eventi.
+        
+        Args:
+            input_data: Dati di input originali della simulazione.
+            module_result: Risultato dell'elaborazione del modulo.
+            **kwargs: Argomenti aggiuntivi di analyze_sync (es. features).
+            
+        Returns:
+            Dict[str, Any]: Risultato dell'analisi dell'agente.
+        """
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(None, functools.partial(self.analyze_sync, input_data, module_result, **kwargs))
+    
+    @abstractmethod
+    def analyze_sync(self, input_data: Dict[str, Any], module_result: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Analizza i dati di input e i risultati del modulo in modo sincrono.
+        
+        Args:
+            input_data: Dati di input originali della simulazione.
+            module_result: Risultato dell'elaborazione del modulo.
+            
+        Returns:
+            Dict[str, Any]: Risultato dell'analisi dell'agente.
+        """
+        pass
+
 class AgentManager:
     """
     Gestore degli agenti che coordina l'esecuzione di tutti gli agenti.
+    
+    Gli agenti vengono eseguiti in parallelo: quelli sincroni (SyncAgent) in un pool di thread,
+    gli altri nel ciclo di eventi. Ogni agente ha una scadenza; allo scadere l'analisi
+    asincrona viene annullata, mentre quella sincrona non può essere interrotta e il suo risultato
+    viene scartato. I risultati sono restituiti nell'ordine di registrazione degli agenti.
+    Le analisi degli agenti memorizzabili vengono servite dalla cache quando possibile.
+    La vista ProposalFeatures viene costruita una sola volta per esecuzione e condivisa tra gli agenti.
+    Con una funzione publish, il gestore pubblica un evento "agent" al termine di ogni agente e la
+    passa agli agenti che pubblicano risultati parziali.
     """
     
-    def __init__(self):
+    def __init__(self, max_workers: Optional[int] = None, timeout: Optional[float] = None,
+                 cache: Optional[AgentCache] = None):
         """
         Inizializza il gestore degli agenti.
+        
+        Args:
+            max_workers: Numero massimo di agenti sincroni eseguiti in parallelo.
+            timeout: Tempo massimo di analisi di un agente in secondi, se l'agente non ne dichiara uno.
+            cache: Cache delle analisi. Se None, usa la cache condivisa.
         """
         self.agents = {}
-        logger.info("AgentManager inizializzato")
+        self.cache = cache or agent_cache
+        self.max_workers = max_workers or int(os.getenv("AGENT_WORKERS", "8"))
+        self.timeout = timeout or float(os.getenv("AGENT_TIMEOUT", "30"))
+        self._pool: Optional[ThreadPoolExecutor] = None
+        self._lock = threading.Lock()
+        logger.info(f"AgentManager inizializzato con {self.max_workers} thread e limite di {self.timeout:.1f}s per agente")
     
     def register_agent(self, agent: BaseAgent) -> None:
         """
@@ -67,36 +180,240 @@ class AgentManager:
             agent: Istanza dell'agente da registrare.
         """
         self.agents[agent.name] = agent
+        self.cache.register(agent.name, agent.version)
         logger.info(f"Agente {agent.name} registrato nel gestore")
     
-    def run_agents(self, input_data: Dict[str, Any], module_result: Dict[str, Any]) -> Dict[str, Dict[str, Any]]:
+    def run_agents(self, input_data: Dict[str, Any], module_result: Dict[str, Any],
+                   timeout: Optional[float] = None, detail: Optional[DetailSelection] = None) -> Dict[str, Dict[str, Any]]:
         """
         Esegue tutti gli agenti registrati sui dati di input e i risultati del modulo.
         
         Args:
             input_data: Dati di input originali della simulazione.
             module_result: Risultato dell'elaborazione del modulo.
+            timeout: Tempo massimo di analisi di ciascun agente in secondi (limite aggiuntivo a quello dell'agente).
+            detail: Sezioni di dettaglio richieste. Se None, tutte.
             
         Returns:
-            Dict[str, Dict[str, Any]]: Risultati dell'analisi di tutti gli agenti.
+            Dict[str, Dict[str, Any]]: Risultati dell'analisi di tutti gli agenti, nell'ordine di registrazione.
+        """
+        try:
+            asyncio.get_running_loop()
+        except RuntimeError:
+            return asyncio.run(self.run_agents_async(input_data, module_result, timeout, detail))
+        
+        # Il thread corrente ha già un ciclo di eventi attivo: gli agenti vengono eseguiti in un thread separato
+        with ThreadPoolExecutor(max_workers=1, thread_name_prefix="osireon-agents-loop") as runner:
+            return runner.submit(asyncio.run, self.run_agents_async(input_data, module_result, timeout, detail)).result()
+    
+    async def run_agents_async(self, input_data: Dict[str, Any], module_result: Dict[str, Any],
+                               timeout: Optional[float] = None,
+                               detail: Optional[DetailSelection] = None,
+                               publish: Optional[Callable[[Dict[str, Any]], None]] = None) -> Dict[str, Dict[str, Any]]:
+        """
+        Esegue in parallelo tutti gli agenti registrati, ciascuno con la propria scadenza.
+        
+        Args:
+            input_data: Dati di input originali della simulazione.
+            module_result: Risultato dell'elaborazione del modulo.
+            timeout: Tempo massimo di analisi di ciascun agente in secondi (limite aggiuntivo a quello dell'agente).
+            detail: Sezioni di dettaglio richieste. Se None, tutte.
+            publish: Funzione che riceve gli eventi dell'analisi man mano che avvengono, o None.
+            
+        Returns:
+            Dict[str, Dict[str, Any]]: Risultati dell'analisi di tutti gli agenti, nell'ordine di registrazione.
         """
         logger.info(f"Esecuzione di {len(self.agents)} agenti")
         
-        results = {}
-        for name, agent in self.agents.items():
-            try:
-                logger.info(f"Esecuzione dell'agente {name}")
-                result = agent.analyze(input_data, module_result)
-                results[name] = result
-            except Exception as e:
-                logger.error(f"Errore durante l'esecuzione dell'agente {name}: {str(e)}")
-                results[name] = {
-                    "status": "error",
-                    "message": f"Errore durante l'analisi: {str(e)}",
-                    "analysis": "Non disponibile a causa di un errore"
-                }
-        
-        return results
+        agents = list(self.agents.values())
+        
+        loop = asyncio.get_running_loop()
+        
+        # L'impronta degli input è comune a tutti gli agenti e viene calcolata una sola volta
+        fingerprint = None
+        if self.cache.enabled and any(agent.cacheable for agent in agents):
+            fingerprint = await loop.run_in_executor(self._executor(), input_fingerprint, input_data, module_result)
+        
+        # Anche le caratteristiche delle proposte vengono estratte una sola volta per tutti gli agenti
+        features = None
+        if any(agent.uses_features for agent in agents):
+            features = await loop.run_in_executor(self._executor(), ProposalFeatures.build, input_data, module_result)
+        
+        outcomes = await asyncio.gather(*[
+            self._run_agent(agent, input_data, module_result, timeout, fingerprint, features, detail, publish)
+            for agent in agents
+        ])
+        return {agent.name: outcome for agent, outcome in zip(agents, outcomes)}
+    
+    def trim_analysis(self, agent_name: str, analysis: Dict[str, Any], detail: DetailSelection) -> Dict[str, Any]:
+        """
+        Rimuove da un'analisi già calcolata le sezioni di dettaglio non richieste.
+        
+        Args:
+            agent_name: Nome dell'agente che ha prodotto l'analisi.
+            analysis: Analisi dell'agente.
+            detail: Sezioni di dettaglio richieste.
+        
+        Returns:
+            Dict[str, Any]: Copia superficiale dell'analisi senza le sezioni non richieste.
+        """
+        agent = self.agents.get(agent_name)
+        if agent is None or not isinstance(analysis, dict):
+            return analysis
+        
+        omitted = detail.omitted(agent.detail_sections)
+        if not omitted:
+            return analysis
+        
+        removed = {key for section in omitted for key in agent.detail_sections[section]}
+        trimmed = {k: v for k, v in analysis.items() if k not in removed}
+        omitted_all = set(omitted) | set(analysis.get(OMITTED_KEY, []))
+        trimmed[OMITTED_KEY] = [section for section in SECTIONS if section in omitted_all]
+        return trimmed
+    
+    def shutdown(self) -> None:
+        """
+        Arresta il pool di thread degli agenti sincroni.
+        """
+        if self._pool is not None:
+            self._pool.shutdown(wait=False)
+            self._pool = None
+    
+    def _executor(self) -> ThreadPoolExecutor:
+        """
+        Restituisce il pool di thread degli agenti sincroni, creandolo al primo utilizzo.
+        
+        Returns:
+            ThreadPoolExecutor: Pool di thread.
+        """
+        with self._lock:
+            if self._pool is None:
+                self._pool = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="osireon-agents")
+            return self._pool
+    
+    async def _cache_call(self, method, *args):
+        """
+        Esegue un'operazione sulla cache, in un thread se raggiunge il database.
+        
+        Args:
+            method: Metodo della cache da eseguire.
+            *args: Argomenti del metodo.
+        
+        Returns:
+            Any: Risultato del metodo.
+        """
+        if self.cache.persistent_active():
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(self._executor(), method, *args)
+        return method(*args)
+    
+    async def _run_agent(self, agent: BaseAgent, input_data: Dict[str, Any], module_result: Dict[str, Any],
+                         timeout: Optional[float], fingerprint: Optional[str] = None,
+                         features: Optional[ProposalFeatures] = None,
+                         detail: Optional[DetailSelection] = None,
+                         publish: Optional[Callable[[Dict[str, Any]], None]] = None) -> Dict[str, Any]:
+        """
+        Esegue un singolo agente entro la sua scadenza, riusando l'analisi in cache se disponibile,
+        e pubblica il risultato con publish, se indicata.
+        
+        Args:
+            agent: Agente da eseguire.
+            input_data: Dati di input originali della simulazione.
+            module_result: Risultato dell'elaborazione del modulo.
+            timeout: Limite aggiuntivo alla scadenza dell'agente.
+            fingerprint: Impronta degli input per la cache, o None se la cache non è usata.
+            features: Vista condivisa delle caratteristiche delle proposte, o None.
+            detail: Sezioni di dettaglio richieste, o None per tutte.
+            publish: Funzione che riceve gli eventi dell'analisi, o None.
+        
+        Returns:
+            Dict[str, Any]: Risultato dell'analisi, oppure un risultato di errore o di tempo scaduto.
+        """
+        result = await self._analyze(agent, input_data, module_result, timeout, fingerprint, features, detail, publish)
+        if publish is not None:
+            publish({"type": "agent", "agent": agent.name, "result": result})
+        return result
+    
+    async def _analyze(self, agent: BaseAgent, input_data: Dict[str, Any], module_result: Dict[str, Any],
+                       timeout: Optional[float], fingerprint: Optional[str],
+                       features: Optional[ProposalFeatures], detail: Optional[DetailSelection],
+                       publish: Optional[Callable[[Dict[str, Any]], None]]) -> Dict[str, Any]:
+        """
+        Esegue l'analisi di un singolo agente (vedi _run_agent).
+        
+        Args:
+            agent: Agente da eseguire.
+            input_data: Dati di input originali della simulazione.
+            module_result: Risultato dell'elaborazione del modulo.
+            timeout: Limite aggiuntivo alla scadenza dell'agente.
+            fingerprint: Impronta degli input per la cache, o None se la cache non è usata.
+            features: Vista condivisa delle caratteristiche delle proposte, o None.
+            detail: Sezioni di dettaglio richieste, o None per tutte.
+            publish: Funzione che riceve gli eventi dell'analisi, o None.
+        
+        Returns:
+            Dict[str, Any]: Risultato dell'analisi, oppure un risultato di errore o di tempo scaduto.
+        """
+        # Sezioni di dettaglio dell'agente che il client non ha richiesto
+        omitted = detail.omitted(agent.detail_sections) if detail is not None else []
+        
+        key = None
+        if fingerprint is not None and agent.cacheable:
+            variant = ",".join(omitted)
+            scope = agent.cache_scope(input_data)
+            if scope:
+                variant = f"{variant};{scope}"
+            key = self.cache.key(agent.name, agent.version, fingerprint, variant)
+            cached = await self._cache_call(self.cache.lookup, agent.name, agent.version, key)
+            if cached is not None:
+                logger.info(f"Analisi dell'agente {agent.name} servita dalla cache")
+                return cached
+        
+        limits = [t for t in (getattr(agent, "timeout", None), timeout) if t]
+        deadline = min(limits) if limits else self.timeout
+        started = time.monotonic()
+        logger.info(f"Esecuzione dell'agente {agent.name}")
+        
+        # La vista condivisa è passata solo agli agenti che la dichiarano
+        kwargs = {"features": features} if agent.uses_features and features is not None else {}
+        if omitted:
+            kwargs["detail"] = detail
+        if agent.streams and publish is not None:
+            kwargs["publish"] = publish
+        
+        try:
+            loop = asyncio.get_running_loop()
+            if isinstance(agent, SyncAgent):
+                call = loop.run_in_executor(self._executor(), functools.partial(agent.analyze_sync, input_data, module_result, **kwargs))
+            elif asyncio.iscoroutinefunction(agent.analyze):
+                call = agent.analyze(input_data, module_result, **kwargs)
+            else:
+                # Agenti con analyze sincrono che non estendono SyncAgent
+                call = loop.run_in_executor(self._executor(), functools.partial(agent.analyze, input_data, module_result, **kwargs))
+            result = await asyncio.wait_for(call, deadline)
+        except asyncio.TimeoutError:
+            logger.warning(f"L'agente {agent.name} non ha completato l'analisi entro {deadline:.1f}s")
+            return {
+                "status": "timeout",
+                "message": f"L'agente non ha completato l'analisi entro {deadline:.1f}s",
+                "analysis": "Non disponibile per superamento del tempo massimo"
+            }
+        except Exception as e:
+            logger.error(f"Errore durante l'esecuzione dell'agente {agent.name}: {str(e)}")
+            return {
+                "status": "error",
+                "message": f"Errore durante l'analisi: {str(e)}",
+                "analysis": "Non disponibile a causa di un errore"
+            }
+        
+        logger.info(f"Agente {agent.name} completato in {(time.monotonic() - started) * 1000:.0f}ms")
+        
+        if omitted and isinstance(result, dict):
+            result[OMITTED_KEY] = omitted
+        
+        if key is not None:
+            await self._cache_call(self.cache.store, agent.name, agent.version, key, result)
+        return result
 
 # Istanza singleton del gestore degli agenti
 agent_manager = AgentManager()
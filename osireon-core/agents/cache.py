@@ -0,0 +1,258 @@
+"""
+Cache delle analisi degli agenti per Osireon.
+Questo file contiene la cache a due livelli (memoria e database) dei risultati degli agenti,
+con chiave data da nome e versione dell'agente e impronta canonica dei loro input.
+"""
+import copy
+import hashlib
+import json
+import logging
+import os
+import threading
+from collections import OrderedDict
+from typing import Dict, Any, Optional, Set
+
+from src.db.database import db_manager
+from src.modules.results import storable_result
+
+# Configurazione del logging
+logger = logging.getLogger("osireon.agents.cache")
+
+# Esiti degli agenti che non vengono memorizzati
+UNCACHED_STATUSES = ("error", "timeout", "partial")
+
+# Chiavi del risultato del modulo che descrivono come è stato calcolato, non il suo contenuto
+VOLATILE_KEYS = ("incremental", "dependencies")
+
+def input_fingerprint(input_data: Dict[str, Any], module_result: Dict[str, Any]) -> str:
+    """
+    Calcola l'impronta canonica degli input di un'analisi.
+    
+    Args:
+        input_data: Dati di input originali della simulazione.
+        module_result: Risultato dell'elaborazione del modulo (legacy o colonnare).
+    
+    Returns:
+        str: Hash esadecimale degli input.
+    """
+    result = storable_result(module_result)
+    if isinstance(result, dict):
+        result = {k: v for k, v in result.items() if k not in VOLATILE_KEYS}
+    payload = {"input": input_data, "module_result": result}
+    encoded = json.dumps(payload, sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.sha256(encoded.encode("utf-8")).hexdigest()
+
+class AgentCache:
+    """
+    Cache delle analisi degli agenti deterministici.
+    
+    Il livello in memoria è una LRU limitata; il livello persistente è la tabella agent_cache,
+    usata solo se il database è stato inizializzato. La versione dell'agente fa parte della
+    chiave: dopo un aumento di versione le voci precedenti non vengono più trovate e sono
+    rimosse dalla memoria alla registrazione e dal database al primo accesso.
+    """
+    
+    def __init__(self, size: Optional[int] = None, persistent: Optional[bool] = None):
+        """
+        Inizializza la cache.
+        
+        Args:
+            size: Numero massimo di analisi in memoria (0 disabilita la cache).
+            persistent: Se usare anche il database come livello persistente.
+        """
+        self.size = size if size is not None else int(os.getenv("AGENT_CACHE_SIZE", "512"))
+        if persistent is None:
+            persistent = os.getenv("AGENT_CACHE_PERSISTENT", "true").lower() in ("1", "true", "yes")
+        self.persistent = persistent
+        self._memory: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        self._versions: Dict[str, str] = {}
+        self._purged: Set[str] = set()
+        self._stats: Dict[str, Dict[str, int]] = {}
+        self._lock = threading.Lock()
+        logger.info(f"AgentCache inizializzata con {self.size} analisi in memoria, livello persistente: {self.persistent}")
+    
+    @property
+    def enabled(self) -> bool:
+        """
+        Indica se la cache è attiva.
+        """
+        return self.size > 0
+    
+    def persistent_active(self) -> bool:
+        """
+        Indica se il livello persistente è utilizzabile (database inizializzato).
+        
+        Returns:
+            bool: True se le letture e le scritture raggiungono il database.
+        """
+        return self.persistent and db_manager.initialized
+    
+    def key(self, agent_name: str, agent_version: str, fingerprint: str, variant: str = "") -> str:
+        """
+        Calcola la chiave di un'analisi.
+        
+        Args:
+            agent_name: Nome dell'agente.
+            agent_version: Versione dell'agente.
+            fingerprint: Impronta degli input (input_fingerprint).
+            variant: Variante dell'analisi (es. sezioni di dettaglio omesse); vuota per l'analisi completa.
+        
+        Returns:
+            str: Chiave dell'analisi.
+        """
+        payload = f"{agent_name}\n{agent_version}\n{fingerprint}"
+        if variant:
+            payload += f"\n{variant}"
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+    
+    def register(self, agent_name: str, agent_version: str) -> None:
+        """
+        Registra la versione corrente di un agente, invalidando le voci delle versioni precedenti.
+        
+        Args:
+            agent_name: Nome dell'agente.
+            agent_version: Versione corrente dell'agente.
+        """
+        with self._lock:
+            previous = self._versions.get(agent_name)
+            self._versions[agent_name] = agent_version
+            if previous is not None and previous != agent_version:
+                stale = [k for k, v in self._memory.items() if v["agent"] == agent_name and v["version"] != agent_version]
+                for k in stale:
+                    del self._memory[k]
+                self._purged.discard(agent_name)
+                logger.info(f"Agente {agent_name} aggiornato da {previous} a {agent_version}: {len(stale)} analisi invalidate")
+    
+    def lookup(self, agent_name: str, agent_version: str, key: str) -> Optional[Dict[str, Any]]:
+        """
+        Cerca un'analisi in memoria e, se assente, nel database.
+        
+        Args:
+            agent_name: Nome dell'agente.
+            agent_version: Versione dell'agente.
+            key: Chiave dell'analisi.
+        
+        Returns:
+            Optional[Dict[str, Any]]: Copia dell'analisi memorizzata, o None.
+        """
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is not None:
+                self._memory.move_to_end(key)
+                self._count(agent_name, "memory_hits")
+                return copy.deepcopy(entry["analysis"])
+        
+        if self.persistent_active():
+            self._purge(agent_name, agent_version)
+            analysis = db_manager.get_cached_analysis(key)
+            if analysis is not None:
+                self._remember(agent_name, agent_version, key, analysis)
+                with self._lock:
+                    self._count(agent_name, "persistent_hits")
+                return copy.deepcopy(analysis)
+        
+        with self._lock:
+            self._count(agent_name, "misses")
+        return None
+    
+    def store(self, agent_name: str, agent_version: str, key: str, analysis: Dict[str, Any]) -> bool:
+        """
+        Memorizza un'analisi in memoria e nel database.
+        
+        Args:
+            agent_name: Nome dell'agente.
+            agent_version: Versione dell'agente.
+            key: Chiave dell'analisi.
+            analysis: Analisi da memorizzare.
+        
+        Returns:
+            bool: True se l'analisi è stata memorizzata.
+        """
+        if not isinstance(analysis, dict) or analysis.get("status") in UNCACHED_STATUSES:
+            return False
+        
+        self._remember(agent_name, agent_version, key, analysis)
+        with self._lock:
+            self._count(agent_name, "stores")
+        
+        if self.persistent_active():
+            db_manager.save_cached_analysis(key, agent_name, agent_version, analysis)
+        return True
+    
+    def stats(self) -> Dict[str, Dict[str, Any]]:
+        """
+        Restituisce le metriche della cache per agente.
+        
+        Returns:
+            Dict[str, Dict[str, Any]]: Successi per livello, mancati successi, memorizzazioni e tasso di successo.
+        """
+        with self._lock:
+            report = {}
+            for agent_name, counters in self._stats.items():
+                hits = counters.get("memory_hits", 0) + counters.get("persistent_hits", 0)
+                lookups = hits + counters.get("misses", 0)
+                report[agent_name] = {
+                    "version": self._versions.get(agent_name),
+                    "memory_hits": counters.get("memory_hits", 0),
+                    "persistent_hits": counters.get("persistent_hits", 0),
+                    "misses": counters.get("misses", 0),
+                    "stores": counters.get("stores", 0),
+                    "hit_ratio": round(hits / lookups, 4) if lookups else None
+                }
+            return {"entries": len(self._memory), "size": self.size, "persistent": self.persistent_active(), "agents": report}
+    
+    def clear(self) -> None:
+        """
+        Svuota il livello in memoria e azzera le metriche.
+        """
+        with self._lock:
+            self._memory.clear()
+            self._stats.clear()
+    
+    def _remember(self, agent_name: str, agent_version: str, key: str, analysis: Dict[str, Any]) -> None:
+        """
+        Inserisce un'analisi nel livello in memoria.
+        
+        Args:
+            agent_name: Nome dell'agente.
+            agent_version: Versione dell'agente.
+            key: Chiave dell'analisi.
+            analysis: Analisi da memorizzare.
+        """
+        entry = {"agent": agent_name, "version": agent_version, "analysis": copy.deepcopy(analysis)}
+        with self._lock:
+            self._memory[key] = entry
+            self._memory.move_to_end(key)
+            while len(self._memory) > self.size:
+                self._memory.popitem(last=False)
+    
+    def _purge(self, agent_name: str, agent_version: str) -> None:
+        """
+        Rimuove dal database le analisi delle versioni precedenti di un agente (una volta per versione).
+        
+        Args:
+            agent_name: Nome dell'agente.
+            agent_version: Versione corrente dell'agente.
+        """
+        with self._lock:
+            if agent_name in self._purged:
+                return
+            self._purged.add(agent_name)
+        
+        removed = db_manager.purge_cached_analyses(agent_name, agent_version)
+        if removed:
+            logger.info(f"Rimosse {removed} analisi di versioni precedenti dell'agente {agent_name}")
+    
+    def _count(self, agent_name: str, counter: str) -> None:
+        """
+        Incrementa una metrica di un agente (da chiamare con il lock acquisito).
+        
+        Args:
+            agent_name: Nome dell'agente.
+            counter: Nome della metrica.
+        """
+        counters = self._stats.setdefault(agent_name, {})
+        counters[counter] = counters.get(counter, 0) + 1
+
+# Istanza singleton della cache delle analisi degli agenti
+agent_cache = AgentCache()
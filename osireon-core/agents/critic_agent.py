@@ -3,67 +3,69 @@ Implementazione del CriticAgent per Osireon.
 Questo agente valuta criticamente i risultati della simulazione e fornisce feedback.
 """
 import logging
-from typing import Dict, Any
+from typing import Dict, Any, Optional
 
-from src.agents.base import BaseAgent
+from src.agents.base import SyncAgent
+from src.agents.features import ProposalFeatures
+from src.utils.detail import DetailSelection, AGENT_DETAILS
 
 # Configurazione del logging
 logger = logging.getLogger("osireon.agents.critic")
 
-class CriticAgent(BaseAgent):
+class CriticAgent(SyncAgent):
     """
     Agente che valuta criticamente i risultati della simulazione e fornisce feedback.
     """
     
+    # L'analisi dipende solo dagli input: può essere memorizzata
+    cacheable = True
+    
+    # Legge le metriche delle proposte dalla vista condivisa
+    uses_features = True
+    
+    # La critica dettagliata per proposta viene prodotta solo se richiesta
+    detail_sections = {AGENT_DETAILS: ("detailed_critique",)}
+    
     def __init__(self):
         """
         Inizializza il CriticAgent.
         """
         super().__init__("CriticAgent")
     
-    def analyze(self, input_data: Dict[str, Any], module_result: Dict[str, Any]) -> Dict[str, Any]:
+    def analyze_sync(self, input_data: Dict[str, Any], module_result: Dict[str, Any],
+                     features: Optional[ProposalFeatures] = None,
+                     detail: Optional[DetailSelection] = None) -> Dict[str, Any]:
         """
         Analizza criticamente i dati di input e i risultati del modulo.
         
         Args:
             input_data: Dati di input originali della simulazione.
             module_result: Risultato dell'elaborazione del modulo.
+            features: Vista delle caratteristiche delle proposte. Se None, viene costruita dai risultati.
+            detail: Sezioni di dettaglio richieste. Se None, tutte.
             
         Returns:
             Dict[str, Any]: Risultato dell'analisi critica dell'agente.
         """
-        logger.info(f"CriticAgent sta valutando criticamente i risultati del modulo {module_result.get('module', 'sconosciuto')}")
-        
-        # Estrai informazioni rilevanti
-        proposals = input_data.get("proposals", [])
-        constraints = input_data.get("constraints", [])
-        domain = input_data.get("domain", "")
+        features = features or ProposalFeatures.build(input_data, module_result)
+        detailed = detail is None or detail.includes(AGENT_DETAILS)
+        logger.info(f"CriticAgent sta valutando criticamente i risultati del modulo {features.module}")
         
         # Analisi critica mock - in una implementazione reale, qui ci sarebbe l'integrazione con LLM
         critique = {
-            "summary": f"Valutazione critica delle {len(proposals)} proposte nel dominio {domain}",
+            "summary": f"Valutazione critica delle {len(features)} proposte nel dominio {features.domain}",
             "potential_issues": [],
-            "alternative_perspectives": [],
-            "detailed_critique": {}
+            "alternative_perspectives": []
         }
+        if detailed:
+            critique["detailed_critique"] = {}
         
         # Genera critica per ogni proposta
-        for i, proposal in enumerate(proposals):
+        for i, proposal in enumerate(features.proposals):
             proposal_key = f"proposal_{i+1}"
-            proposal_result = module_result.get("results", {}).get(proposal_key, {})
-            
-            # Estrai metriche rilevanti dal risultato del modulo
-            impact_score = proposal_result.get("impact_score", proposal_result.get("social_impact_score", 0.5))
-            feasibility = proposal_result.get("feasibility", proposal_result.get("acceptance_rate", 0.5))
-            constraints_check = proposal_result.get("constraints_check", [])
-            
-            # Genera critica per questa proposta
-            proposal_critique = {
-                "proposal": proposal,
-                "critique_points": self._generate_critique_points(proposal, impact_score, feasibility),
-                "constraints_critique": self._critique_constraints(constraints_check),
-                "alternative_approach": self._suggest_alternative(proposal, domain)
-            }
+            impact_score = features.impact[i]
+            feasibility = features.feasibility[i]
+            alternative = self._suggest_alternative(proposal, features.domain_key)
             
             # Aggiungi alla lista dei potential issues
             if impact_score < 0.5 or feasibility < 0.5:
@@ -72,13 +74,19 @@ class CriticAgent(BaseAgent):
                 )
             
             # Aggiungi alla lista delle prospettive alternative
-            critique["alternative_perspectives"].append(proposal_critique["alternative_approach"])
+            critique["alternative_perspectives"].append(alternative)
             
-            # Aggiungi alla critica dettagliata
-            critique["detailed_critique"][proposal_key] = proposal_critique
+            # Genera la critica dettagliata di questa proposta, se richiesta
+            if detailed:
+                critique["detailed_critique"][proposal_key] = {
+                    "proposal": proposal,
+                    "critique_points": self._generate_critique_points(proposal, impact_score, feasibility),
+                    "constraints_critique": self._critique_constraints(features.constraints_satisfied[i], features.constraints_total[i]),
+                    "alternative_approach": alternative
+                }
         
         # Aggiungi una valutazione complessiva
-        critique["overall_assessment"] = self._generate_overall_assessment(critique["potential_issues"], module_result)
+        critique["overall_assessment"] = self._generate_overall_assessment(critique["potential_issues"], features)
         
         # Registra il completamento dell'analisi critica
         self._log_analysis(critique)
@@ -120,21 +128,21 @@ class CriticAgent(BaseAgent):
         
         return critique_points
     
-    def _critique_constraints(self, constraints_check: list) -> str:
+    def _critique_constraints(self, satisfied: int, total: int) -> str:
         """
         Critica i risultati del controllo dei vincoli.
         
         Args:
-            constraints_check: Lista dei risultati del controllo dei vincoli.
+            satisfied: Numero di vincoli soddisfatti.
+            total: Numero di vincoli verificati.
             
         Returns:
             str: Critica dei vincoli.
         """
-        if not constraints_check:
+        if not total:
             return "La mancanza di vincoli specificati rende difficile valutare la fattibilità reale della proposta."
         
-        unsatisfied = sum(1 for c in constraints_check if not c.get("satisfied", True))
-        total = len(constraints_check)
+        unsatisfied = total - satisfied
         
         if unsatisfied == 0:
             return "Sebbene la proposta soddisfi formalmente tutti i vincoli, potrebbero esserci vincoli impliciti non considerati."
@@ -149,26 +157,26 @@ class CriticAgent(BaseAgent):
         
         Args:
             proposal: La proposta originale.
-            domain: Il dominio della proposta.
+            domain: Il dominio della proposta (normalizzato).
             
         Returns:
             str: Suggerimento di un approccio alternativo.
         """
         # Suggerimenti mock basati sul dominio
-        if domain.lower() == "economia":
+        if domain == "economia":
             return f"Invece di '{proposal}', si potrebbe considerare un approccio graduale con incentivi fiscali mirati e monitoraggio continuo degli effetti."
-        elif domain.lower() == "sociale":
+        elif domain == "sociale":
             return f"Anziché '{proposal}', si potrebbe esplorare un programma pilota in aree selezionate con forte coinvolgimento della comunità locale."
         else:
             return f"Un'alternativa a '{proposal}' potrebbe essere un approccio più flessibile che permetta adattamenti basati sui feedback durante l'implementazione."
     
-    def _generate_overall_assessment(self, potential_issues: list, module_result: Dict[str, Any]) -> str:
+    def _generate_overall_assessment(self, potential_issues: list, features: ProposalFeatures) -> str:
         """
         Genera una valutazione complessiva basata sui problemi potenziali e sul risultato del modulo.
         
         Args:
             potential_issues: Lista dei problemi potenziali identificati.
-            module_result: Risultato dell'elaborazione del modulo.
+            features: Caratteristiche delle proposte.
             
         Returns:
             str: Valutazione complessiva generata.
@@ -176,9 +184,9 @@ class CriticAgent(BaseAgent):
         if not potential_issues:
             return "Sebbene le proposte non presentino problemi evidenti, è consigliabile considerare prospettive diverse e potenziali effetti a lungo termine non catturati dal modello."
         
-        overall_impact = module_result.get("overall_impact", module_result.get("overall_social_impact", 0.5))
+        overall_impact = features.overall_impact
         
-        if len(potential_issues) > len(module_result.get("results", {})) / 2:
+        if len(potential_issues) > features.result_count / 2:
             return f"La maggior parte delle proposte presenta problemi significativi. Si consiglia una revisione sostanziale dell'approccio complessivo, considerando l'impatto generale limitato ({overall_impact:.2f}/1.0)."
         else:
             return f"Alcune proposte presentano problemi che dovrebbero essere affrontati. Nel complesso, l'impatto previsto ({overall_impact:.2f}/1.0) potrebbe essere migliorato con revisioni mirate e considerando approcci alternativi."
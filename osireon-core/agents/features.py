@@ -0,0 +1,227 @@
+"""
+Vista delle caratteristiche delle proposte per gli agenti di Osireon.
+Questo file contiene la vista tipizzata, basata su array, delle metriche per proposta che il gestore
+degli agenti calcola una sola volta per esecuzione e che tutti gli agenti leggono senza modificarla.
+"""
+import logging
+import math
+from array import array
+from typing import Dict, Any, Optional, Sequence
+
+from src.modules.results import as_result, ColumnarResult
+
+# Configurazione del logging
+logger = logging.getLogger("osireon.agents.features")
+
+# Metriche di impatto e di fattibilità in ordine di preferenza (moduli economici e sociali)
+IMPACT_METRICS = ("impact_score", "social_impact_score")
+FEASIBILITY_METRICS = ("feasibility", "acceptance_rate")
+
+# Metriche complessive del modulo in ordine di preferenza
+OVERALL_IMPACT_METRICS = ("overall_impact", "overall_social_impact")
+
+# Valore usato per le metriche mancanti
+DEFAULT_SCORE = 0.5
+
+def normalize_domain(domain: str) -> str:
+    """
+    Normalizza il nome di un dominio per i confronti (minuscolo, spazi compattati).
+    
+    Args:
+        domain: Nome del dominio.
+    
+    Returns:
+        str: Nome normalizzato.
+    """
+    return " ".join((domain or "").lower().split())
+
+class ProposalFeatures:
+    """
+    Caratteristiche delle proposte di una simulazione, in sola lettura.
+    
+    Ogni metrica è un array tipizzato con un valore per proposta, nell'ordine delle proposte
+    dell'input, esposto come memoryview in sola lettura. Le metriche mancanti valgono DEFAULT_SCORE;
+    le proposte senza risultato non hanno vincoli verificati.
+    """
+    
+    __slots__ = ("proposals", "country", "domain", "domain_key", "module", "overall_impact", "result_count",
+                 "constraints_count", "impact", "feasibility", "constraints_satisfied", "constraints_total")
+    
+    def __init__(self, proposals: Sequence[str], country: str, domain: str, module: str,
+                 overall_impact: float, result_count: int, constraints_count: int,
+                 impact: array, feasibility: array, constraints_satisfied: array, constraints_total: array):
+        """
+        Inizializza la vista (usare build per costruirla da un risultato).
+        
+        Args:
+            proposals: Proposte dell'input.
+            country: Paese della simulazione.
+            domain: Dominio della simulazione, come indicato nell'input.
+            module: Nome del modulo che ha prodotto il risultato.
+            overall_impact: Impatto complessivo dichiarato dal modulo.
+            result_count: Numero di proposte presenti nel risultato del modulo.
+            constraints_count: Numero di vincoli dell'input.
+            impact: Punteggio di impatto per proposta (typecode "d").
+            feasibility: Fattibilità per proposta (typecode "d").
+            constraints_satisfied: Vincoli soddisfatti per proposta (typecode "i").
+            constraints_total: Vincoli verificati per proposta (typecode "i").
+        """
+        self.proposals = tuple(proposals)
+        self.country = country
+        self.domain = domain
+        self.domain_key = normalize_domain(domain)
+        self.module = module
+        self.overall_impact = overall_impact
+        self.result_count = result_count
+        self.constraints_count = constraints_count
+        self.impact = memoryview(impact).toreadonly()
+        self.feasibility = memoryview(feasibility).toreadonly()
+        self.constraints_satisfied = memoryview(constraints_satisfied).toreadonly()
+        self.constraints_total = memoryview(constraints_total).toreadonly()
+    
+    @classmethod
+    def build(cls, input_data: Dict[str, Any], module_result: Dict[str, Any]) -> "ProposalFeatures":
+        """
+        Estrae le caratteristiche delle proposte dal risultato di un modulo.
+        
+        I risultati colonnari vengono letti direttamente dalle colonne, senza espandere le proposte;
+        i risultati nel formato esteso vengono percorsi una sola volta.
+        
+        Args:
+            input_data: Dati di input originali della simulazione.
+            module_result: Risultato dell'elaborazione del modulo (compatto, colonnare o esteso).
+        
+        Returns:
+            ProposalFeatures: Vista delle caratteristiche.
+        """
+        proposals = input_data.get("proposals", [])
+        n = len(proposals)
+        result = as_result(module_result) if isinstance(module_result, dict) else {}
+        
+        impact = array("d", [DEFAULT_SCORE] * n)
+        feasibility = array("d", [DEFAULT_SCORE] * n)
+        satisfied = array("i", [0] * n)
+        total = array("i", [0] * n)
+        
+        if isinstance(result, ColumnarResult):
+            count = result.proposal_count
+            _fill_scores(impact, _columnar_scores(result, IMPACT_METRICS))
+            _fill_scores(feasibility, _columnar_scores(result, FEASIBILITY_METRICS))
+            _columnar_constraints(result, satisfied, total)
+        else:
+            results = result.get("results", {})
+            count = len(results) if isinstance(results, dict) else 0
+            for i in range(n):
+                proposal_result = results.get(f"proposal_{i+1}") if count else None
+                if not isinstance(proposal_result, dict):
+                    continue
+                impact[i] = _score(_first(proposal_result, IMPACT_METRICS))
+                feasibility[i] = _score(_first(proposal_result, FEASIBILITY_METRICS))
+                checks = proposal_result.get("constraints_check", [])
+                total[i] = len(checks)
+                satisfied[i] = sum(1 for c in checks if c.get("satisfied", False))
+        
+        overall = _first(result, OVERALL_IMPACT_METRICS)
+        return cls(
+            proposals=proposals,
+            country=input_data.get("country", ""),
+            domain=input_data.get("domain", ""),
+            module=result.get("module", "sconosciuto"),
+            overall_impact=_score(overall),
+            result_count=count,
+            constraints_count=len(input_data.get("constraints", [])),
+            impact=impact,
+            feasibility=feasibility,
+            constraints_satisfied=satisfied,
+            constraints_total=total
+        )
+    
+    def __len__(self) -> int:
+        return len(self.proposals)
+    
+    def __repr__(self) -> str:
+        return f"ProposalFeatures(module={self.module!r}, dominio={self.domain_key!r}, proposte={len(self.proposals)})"
+
+def _first(values: Dict[str, Any], names: Sequence[str]) -> Any:
+    """
+    Restituisce il valore della prima metrica presente.
+    
+    Args:
+        values: Metriche disponibili.
+        names: Nomi delle metriche in ordine di preferenza.
+    
+    Returns:
+        Any: Valore della metrica, o None se nessuna è presente.
+    """
+    for name in names:
+        if name in values:
+            return values[name]
+    return None
+
+def _score(value: Any) -> float:
+    """
+    Converte una metrica in punteggio, usando DEFAULT_SCORE per i valori mancanti.
+    
+    Args:
+        value: Valore della metrica.
+    
+    Returns:
+        float: Punteggio.
+    """
+    if value is None or isinstance(value, bool):
+        return DEFAULT_SCORE
+    try:
+        value = float(value)
+    except (TypeError, ValueError):
+        return DEFAULT_SCORE
+    return DEFAULT_SCORE if math.isnan(value) else value
+
+def _fill_scores(target: array, values: Optional[Sequence[float]]) -> None:
+    """
+    Copia i punteggi di una colonna nell'array di destinazione.
+    
+    Args:
+        target: Array di destinazione, un valore per proposta.
+        values: Valori della colonna, o None se la colonna non esiste.
+    """
+    if values is None:
+        return
+    for i in range(min(len(target), len(values))):
+        target[i] = _score(values[i])
+
+def _columnar_scores(result: ColumnarResult, names: Sequence[str]) -> Optional[Sequence[float]]:
+    """
+    Restituisce i valori della prima colonna numerica presente.
+    
+    Args:
+        result: Risultato colonnare.
+        names: Nomi delle metriche in ordine di preferenza.
+    
+    Returns:
+        Optional[Sequence[float]]: Valori della colonna, o None se nessuna è presente.
+    """
+    for name in names:
+        column = result.columns.get(name)
+        if column is not None and column["type"] in ("float", "int"):
+            return column["values"]
+    return None
+
+def _columnar_constraints(result: ColumnarResult, satisfied: array, total: array) -> None:
+    """
+    Conta i vincoli verificati e soddisfatti per proposta dalla colonna constraints_check.
+    
+    Args:
+        result: Risultato colonnare.
+        satisfied: Array di destinazione dei vincoli soddisfatti.
+        total: Array di destinazione dei vincoli verificati.
+    """
+    column = result.columns.get("constraints_check")
+    if column is None or column["type"] != "records":
+        return
+    offsets = column["offsets"]
+    flags = column["fields"].get("satisfied", {}).get("values")
+    for i in range(min(len(total), len(offsets) - 1)):
+        start, end = offsets[i], offsets[i + 1]
+        total[i] = end - start
+        if flags is not None:
+            satisfied[i] = sum(1 for k in range(start, end) if flags[k])
@@ -0,0 +1,363 @@
+"""
+Base per gli agenti basati su LLM per Osireon.
+Questo file contiene la classe base degli agenti che interrogano un modello di linguaggio,
+con prompt eseguiti in parallelo, risposte in streaming e budget di token e di tempo per richiesta.
+"""
+import asyncio
+import logging
+import os
+import time
+from abc import abstractmethod
+from typing import Callable, Dict, Any, AsyncIterator, List, Optional
+
+from src.agents.base import BaseAgent
+from src.agents.cache import VOLATILE_KEYS
+from src.ethics.validator import ethics_validator
+from src.llm.connector import llm_connector, LLMConnector, estimate_tokens
+from src.llm.prompts import prompt_builder, token_counter, PromptBuilder, PromptSection
+
+# Configurazione del logging
+logger = logging.getLogger("osireon.agents.llm")
+
+class LLMBudget:
+    """
+    Budget di token e di tempo condiviso dai prompt di una singola analisi.
+    """
+    
+    def __init__(self, tokens: Optional[int], seconds: Optional[float]):
+        """
+        Inizializza il budget.
+        
+        Args:
+            tokens: Token disponibili (prompt e risposte). Se None, nessun limite.
+            seconds: Tempo disponibile in secondi. Se None, nessun limite.
+        """
+        self.tokens = tokens
+        self.deadline = time.monotonic() + seconds if seconds else None
+        self.prompt_tokens = 0
+        self.completion_tokens = 0
+    
+    @property
+    def used(self) -> int:
+        """
+        Token consumati finora.
+        """
+        return self.prompt_tokens + self.completion_tokens
+    
+    @property
+    def remaining_tokens(self) -> Optional[int]:
+        """
+        Token ancora disponibili, o None se il budget di token è illimitato.
+        """
+        return None if self.tokens is None else max(self.tokens - self.used, 0)
+    
+    @property
+    def remaining_time(self) -> Optional[float]:
+        """
+        Secondi ancora disponibili, o None se il budget di tempo è illimitato.
+        """
+        return None if self.deadline is None else max(self.deadline - time.monotonic(), 0.0)
+    
+    @property
+    def exhausted(self) -> bool:
+        """
+        Indica se il budget di token è esaurito.
+        """
+        return self.tokens is not None and self.used >= self.tokens
+    
+    def reserve_prompt(self, prompt: str) -> bool:
+        """
+        Addebita i token di un prompt, se il budget lo consente.
+        
+        Args:
+            prompt: Prompt da inviare.
+        
+        Returns:
+            bool: True se il prompt può essere inviato.
+        """
+        cost = token_counter.count(prompt)
+        if self.tokens is not None and self.used + cost >= self.tokens:
+            return False
+        self.prompt_tokens += cost
+        return True
+
+class LLMAgent(BaseAgent):
+    """
+    Classe base per gli agenti che interrogano un modello di linguaggio.
+    
+    Le sottoclassi implementano build_prompts (uno o più prompt con una chiave) e compose
+    (il risultato dell'analisi a partire dalle risposte); build_prompts può usare prompt per
+    anteporre alla richiesta il contesto comune entro il budget di token del prompt. I prompt vengono inviati in parallelo,
+    fino a max_concurrency alla volta; le risposte arrivano in streaming e consumano un budget
+    di token condiviso. Allo scadere del budget di tempo le chiamate in corso vengono annullate
+    e compose riceve le risposte parziali raccolte fino a quel momento.
+    
+    Durante l'esecuzione dal gestore degli agenti, i frammenti e le risposte complete vengono
+    pubblicati con la funzione publish (vedi BaseAgent.streams).
+    """
+    
+    # I frammenti delle risposte vengono pubblicati man mano che arrivano
+    streams = True
+    
+    def __init__(self, name: str, connector: Optional[LLMConnector] = None, timeout: Optional[float] = None,
+                 token_budget: Optional[int] = None, latency_budget: Optional[float] = None,
+                 max_concurrency: Optional[int] = None, provider: Optional[str] = None,
+                 model: Optional[str] = None, temperature: Optional[float] = None,
+                 priority: Optional[str] = None, builder: Optional[PromptBuilder] = None):
+        """
+        Inizializza l'agente.
+        
+        Args:
+            name: Nome dell'agente.
+            connector: Connettore LLM. Se None, usa il connettore condiviso.
+            timeout: Tempo massimo di analisi imposto dal gestore degli agenti.
+            token_budget: Token disponibili per ogni analisi (prompt e risposte).
+            latency_budget: Secondi disponibili per le chiamate LLM di ogni analisi.
+            max_concurrency: Numero massimo di prompt inviati in parallelo.
+            provider: Provider LLM. Se None, usa il default del connettore.
+            model: Modello LLM. Se None, usa il default del connettore.
+            temperature: Temperatura. Se None, usa il default del connettore.
+            priority: Priorità delle chiamate nella coda dei limiti di frequenza ("interactive" o "batch").
+            builder: Costruttore dei prompt. Se None, usa il costruttore condiviso.
+        """
+        super().__init__(name, timeout)
+        self.connector = connector or llm_connector
+        self.token_budget = token_budget or int(os.getenv("LLM_AGENT_TOKEN_BUDGET", "8000"))
+        self.latency_budget = latency_budget or float(os.getenv("LLM_AGENT_LATENCY_BUDGET", "20"))
+        self.max_concurrency = max_concurrency or int(os.getenv("LLM_AGENT_CONCURRENCY", "4"))
+        self.provider = provider
+        self.model = model
+        self.temperature = temperature
+        self.priority = priority or os.getenv("LLM_AGENT_PRIORITY", "interactive")
+        self.prompt_builder = builder or prompt_builder
+    
+    @property
+    def cacheable(self) -> bool:
+        """
+        Le risposte sono riproducibili, e quindi memorizzabili, solo a temperatura 0.
+        """
+        temperature = self.temperature if self.temperature is not None else self.connector.default_temperature
+        return temperature == 0
+    
+    def cache_scope(self, input_data: Dict[str, Any]) -> str:
+        """
+        I prompt includono i principi etici del paese: la versione del suo ruleset entra nella chiave della cache.
+        
+        Args:
+            input_data: Dati di input originali della simulazione.
+        
+        Returns:
+            str: Chiave della versione attiva del ruleset, vuota se il paese non ne ha uno.
+        """
+        ruleset = ethics_validator.ruleset(input_data.get("country"))
+        return ruleset.key if ruleset is not None else ""
+    
+    def context_sections(self, input_data: Dict[str, Any], module_result: Dict[str, Any]) -> List[PromptSection]:
+        """
+        Restituisce le sezioni di contesto comuni anteposte ai prompt dell'agente.
+        
+        Le sezioni sono ordinate dalla più stabile (principi etici, uguali per ogni simulazione dello
+        stesso paese) alla meno stabile (risultati del modulo), così il prefisso in comune tra agenti e
+        simulazioni è il più lungo possibile. Le sottoclassi che le ridefiniscono escono dal prefisso condiviso con gli altri agenti.
+        
+        Args:
+            input_data: Dati di input originali della simulazione.
+            module_result: Risultato dell'elaborazione del modulo.
+        
+        Returns:
+            List[PromptSection]: Sezioni di contesto.
+        """
+        rules = [{key: rule.get(key) for key in ("id", "name", "description", "severity")}
+                 for rule in ethics_validator.rules(input_data.get("country"))]
+        simulation = {key: input_data.get(key) for key in ("country", "domain", "proposals", "constraints")}
+        # Le statistiche di calcolo (es. incremental) cambiano tra simulazioni identiche e romperebbero il prefisso comune
+        if isinstance(module_result, dict):
+            module_result = {key: value for key, value in module_result.items() if key not in VOLATILE_KEYS}
+        return [
+            PromptSection("Principi etici", rules, priority=1),
+            PromptSection("Simulazione", simulation, priority=2),
+            PromptSection("Risultati del modulo", module_result, priority=0)
+        ]
+    
+    def prompt(self, input_data: Dict[str, Any], module_result: Dict[str, Any], task: str) -> str:
+        """
+        Compone un prompt con il contesto comune seguito dalla richiesta specifica.
+        
+        Il contesto viene ridotto (risultati del modulo per primi) se supera il budget di token del
+        prompt; il prefisso è costruito una sola volta per simulazione e condiviso tra gli agenti.
+        
+        Args:
+            input_data: Dati di input originali della simulazione.
+            module_result: Risultato dell'elaborazione del modulo.
+            task: Richiesta specifica (es. analisi di una proposta).
+        
+        Returns:
+            str: Testo del prompt.
+        """
+        prefix = self.prompt_builder.prefix(self.context_sections(input_data, module_result))
+        return self.prompt_builder.build(prefix, task).text
+    
+    @abstractmethod
+    def build_prompts(self, input_data: Dict[str, Any], module_result: Dict[str, Any]) -> Dict[str, str]:
+        """
+        Costruisce i prompt dell'analisi.
+        
+        Args:
+            input_data: Dati di input originali della simulazione.
+            module_result: Risultato dell'elaborazione del modulo.
+        
+        Returns:
+            Dict[str, str]: Prompt per chiave (es. "proposal_1", "summary").
+        """
+        pass
+    
+    @abstractmethod
+    def compose(self, input_data: Dict[str, Any], module_result: Dict[str, Any],
+                responses: Dict[str, str]) -> Dict[str, Any]:
+        """
+        Compone il risultato dell'analisi a partire dalle risposte del modello.
+        
+        Args:
+            input_data: Dati di input originali della simulazione.
+            module_result: Risultato dell'elaborazione del modulo.
+            responses: Risposte per chiave del prompt (parziali o vuote se il budget è stato superato).
+        
+        Returns:
+            Dict[str, Any]: Risultato dell'analisi dell'agente.
+        """
+        pass
+    
+    async def analyze(self, input_data: Dict[str, Any], module_result: Dict[str, Any],
+                      publish: Optional[Callable[[Dict[str, Any]], None]] = None) -> Dict[str, Any]:
+        """
+        Analizza i dati di input e i risultati del modulo interrogando il modello.
+        
+        Args:
+            input_data: Dati di input originali della simulazione.
+            module_result: Risultato dell'elaborazione del modulo.
+            publish: Funzione che riceve gli eventi "partial" e "completion" dell'analisi, o None.
+        
+        Returns:
+            Dict[str, Any]: Risultato di compose, con l'utilizzo del budget in "llm_usage".
+        """
+        return await self._run(input_data, module_result, publish)
+    
+    async def stream(self, input_data: Dict[str, Any], module_result: Dict[str, Any]) -> AsyncIterator[Dict[str, Any]]:
+        """
+        Esegue l'analisi restituendo i frammenti delle risposte man mano che arrivano.
+        
+        Args:
+            input_data: Dati di input originali della simulazione.
+            module_result: Risultato dell'elaborazione del modulo.
+        
+        Yields:
+            Dict[str, Any]: Eventi {"type": "partial", "prompt", "delta"}, {"type": "completion", ...}
+            per ogni risposta conclusa e, per ultimo, {"type": "result", "result"} con il risultato completo.
+        """
+        events: asyncio.Queue = asyncio.Queue()
+        
+        async def produce() -> Dict[str, Any]:
+            try:
+                return await self._run(input_data, module_result, events.put_nowait)
+            finally:
+                events.put_nowait(None)
+        
+        task = asyncio.ensure_future(produce())
+        try:
+            while True:
+                event = await events.get()
+                if event is None:
+                    break
+                yield event
+            yield {"type": "result", "agent": self.name, "result": await task}
+        finally:
+            if not task.done():
+                task.cancel()
+    
+    async def _run(self, input_data: Dict[str, Any], module_result: Dict[str, Any],
+                   publish: Optional[Callable[[Dict[str, Any]], None]]) -> Dict[str, Any]:
+        """
+        Invia i prompt in parallelo entro il budget e compone il risultato.
+        
+        Args:
+            input_data: Dati di input originali della simulazione.
+            module_result: Risultato dell'elaborazione del modulo.
+            publish: Funzione che riceve i frammenti e le risposte concluse, o None.
+        
+        Returns:
+            Dict[str, Any]: Risultato dell'analisi con l'utilizzo del budget.
+        """
+        started = time.monotonic()
+        prompts = self.build_prompts(input_data, module_result)
+        budget = LLMBudget(self.token_budget, self.latency_budget)
+        semaphore = asyncio.Semaphore(self.max_concurrency)
+        chunks: Dict[str, list] = {key: [] for key in prompts}
+        status: Dict[str, str] = {key: "pending" for key in prompts}
+        
+        async def complete(key: str, prompt: str) -> None:
+            async with semaphore:
+                if not budget.reserve_prompt(prompt):
+                    status[key] = "skipped"
+                    return
+                status[key] = "running"
+                stream = self.connector.stream_llm(prompt, self.provider, self.model, self.temperature,
+                                                   max_tokens=budget.remaining_tokens, priority=self.priority)
+                async for chunk in stream:
+                    chunks[key].append(chunk)
+                    budget.completion_tokens += estimate_tokens(chunk)
+                    if publish is not None:
+                        publish({"type": "partial", "agent": self.name, "prompt": key, "delta": chunk})
+                    if budget.exhausted:
+                        status[key] = "truncated"
+                        await stream.aclose()
+                        return
+                status[key] = "completed"
+        
+        tasks = {asyncio.ensure_future(complete(key, prompt)): key for key, prompt in prompts.items()}
+        try:
+            if tasks:
+                done, pending = await asyncio.wait(tasks, timeout=budget.remaining_time)
+                for task in pending:
+                    task.cancel()
+                    status[tasks[task]] = "timeout"
+                await asyncio.gather(*pending, return_exceptions=True)
+                for task in done:
+                    if task.exception() is not None:
+                        status[tasks[task]] = "error"
+                        logger.error(f"Errore nella chiamata LLM di {self.name} per {tasks[task]}: {task.exception()}")
+        finally:
+            # L'analisi può essere annullata dal gestore degli agenti: annulla anche le chiamate in corso
+            for task in tasks:
+                if not task.done():
+                    task.cancel()
+        
+        responses = {key: "".join(parts) for key, parts in chunks.items()}
+        if publish is not None:
+            # Il testo completo di ogni risposta ricevuta, anche parziale, per il salvataggio nei log LLM
+            for key, prompt in prompts.items():
+                if status[key] == "completed" or responses[key]:
+                    publish({
+                        "type": "completion",
+                        "agent": self.name,
+                        "prompt": key,
+                        "status": status[key],
+                        "provider": self.provider or self.connector.default_provider,
+                        "model": self.model or self.connector.default_model,
+                        "prompt_text": prompt,
+                        "text": responses[key]
+                    })
+        result = self.compose(input_data, module_result, responses)
+        result["llm_usage"] = {
+            "prompt_tokens": budget.prompt_tokens,
+            "completion_tokens": budget.completion_tokens,
+            "token_budget": budget.tokens,
+            "prompts": status,
+            "elapsed_ms": round((time.monotonic() - started) * 1000, 1)
+        }
+        
+        incomplete = [key for key, state in status.items() if state != "completed"]
+        if incomplete:
+            # Le analisi con risposte incomplete non vengono memorizzate nella cache
+            result.setdefault("status", "partial")
+            logger.warning(f"Agente {self.name}: risposte incomplete per {incomplete}")
+        return result
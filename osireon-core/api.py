@@ -4,9 +4,16 @@ Questo file contiene la definizione degli endpoint principali dell'API.
 """
 from fastapi import APIRouter, HTTPException, Depends
 import logging
-from typing import Dict, Any
+from typing import Dict, Any, List
 
-from src.utils.models import SimulationRequest, SimulationResponse, ModuleResult, AgentAnalysis, EthicsCheck
+from src.utils.models import SimulationRequest, SimulationResponse, ModuleResult, AgentAnalysis, EthicsCheck, ConstraintCompileRequest
+from src.modules.loader import module_loader
+from src.modules.constraints import constraint_compiler
+from src.agents.cache import agent_cache
+from src.datasets.catalog import dataset_catalog
+from src.llm.connector import llm_connector
+from src.llm.prompts import prompt_builder
+from src.ethics.registry import ruleset_registry
 
 # Configurazione del logging
 logger = logging.getLogger("osireon.api")
@@ -81,3 +88,133 @@ async def simulate(request: SimulationRequest) -> SimulationResponse:
     except Exception as e:
         logger.error(f"Errore durante la simulazione: {str(e)}")
         raise HTTPException(status_code=500, detail=f"Errore durante la simulazione: {str(e)}")
+
+@router.get("/modules")
+async def list_modules() -> List[Dict[str, Any]]:
+    """
+    Elenca i moduli di simulazione disponibili con versione e capacità dichiarate.
+    
+    Returns:
+        List[Dict[str, Any]]: Descrizione dei moduli indicizzati.
+    """
+    return module_loader.list_modules()
+
+@router.post("/modules/{module_name}/reload")
+async def reload_module(module_name: str) -> Dict[str, Any]:
+    """
+    Ricarica a caldo un modulo di simulazione senza riavviare il server.
+    
+    Args:
+        module_name: Nome del modulo da ricaricare (es. economy_it).
+    
+    Returns:
+        Dict[str, Any]: Descrizione della nuova versione del modulo.
+    
+    Raises:
+        HTTPException: Se il modulo non può essere ricaricato.
+    """
+    logger.info(f"Ricevuta richiesta di ricaricamento del modulo {module_name}")
+    
+    spec = module_loader.registry.reload(module_name)
+    if spec is None:
+        raise HTTPException(status_code=404, detail=f"Impossibile ricaricare il modulo {module_name}")
+    
+    return spec.to_dict()
+
+@router.get("/ethics/rulesets")
+async def list_rulesets() -> Dict[str, Any]:
+    """
+    Elenca i ruleset etici attivi per paese, con le versioni conservate e lo stato del controllo dei file.
+    
+    Returns:
+        Dict[str, Any]: Ruleset attivi e metriche del registro.
+    """
+    return {"rulesets": ruleset_registry.list_rulesets(), **ruleset_registry.stats()}
+
+@router.post("/ethics/rulesets/{country}/reload")
+async def reload_ruleset(country: str) -> Dict[str, Any]:
+    """
+    Ricarica subito il ruleset etico di un paese, senza attendere il controllo periodico dei file.
+    
+    Args:
+        country: Paese del ruleset (es. it).
+    
+    Returns:
+        Dict[str, Any]: Descrizione della versione attiva del ruleset.
+    
+    Raises:
+        HTTPException: Se il ruleset non può essere caricato.
+    """
+    logger.info(f"Ricevuta richiesta di ricaricamento del ruleset {country}")
+    
+    ruleset = ruleset_registry.reload(country)
+    if ruleset is None:
+        raise HTTPException(status_code=404, detail=f"Impossibile ricaricare il ruleset {country}")
+    
+    return ruleset.to_dict()
+
+@router.get("/agents/cache")
+async def agent_cache_stats() -> Dict[str, Any]:
+    """
+    Restituisce le metriche della cache delle analisi degli agenti.
+    
+    Returns:
+        Dict[str, Any]: Occupazione della cache e successi per agente e per livello.
+    """
+    return agent_cache.stats()
+
+@router.get("/llm/stats")
+async def llm_stats() -> Dict[str, Any]:
+    """
+    Restituisce lo stato dei provider LLM reali, del pool di connessioni, della cache, del raggruppamento
+    delle chiamate, dei limiti di frequenza e della resilienza.
+    
+    Returns:
+        Dict[str, Any]: Provider reali con concorrenza e tentativi ripetuti, metriche del pool per host,
+        successi, byte e token risparmiati dalla cache, dimensione dei gruppi di chiamate, per i provider
+        con limiti gettoni disponibili, coda per priorità e tempi di attesa in coda e, per la resilienza,
+        richieste di riserva, spesa extra, latenze p50/p95/p99 e stato degli interruttori; per i prompt,
+        riuso dei prefissi comuni, sezioni ridotte per il budget e cache dei conteggi dei token.
+    """
+    return {
+        "providers": {
+            name: {"base_url": p.base_url, "max_concurrency": p.max_concurrency, "retries": p.retries}
+            for name, p in llm_connector.providers.items()
+        },
+        "connections": llm_connector.http_client.stats(),
+        "cache": llm_connector.cache.stats(),
+        "batching": {"enabled": llm_connector.batching, **llm_connector.batcher.stats()},
+        "rate_limits": llm_connector.scheduler.stats(),
+        "resilience": llm_connector.resilience.stats(),
+        "prompts": prompt_builder.stats()
+    }
+
+@router.get("/datasets")
+async def list_datasets() -> Dict[str, Any]:
+    """
+    Elenca i dataset disponibili e la memoria occupata da quelli già aperti.
+    
+    Returns:
+        Dict[str, Any]: Dataset disponibili con le versioni e memoria mappata/residente per dataset aperto.
+    """
+    return {
+        "datasets": dataset_catalog.list_datasets(),
+        "loaded": dataset_catalog.memory_report()
+    }
+
+@router.post("/constraints/compile")
+async def compile_constraints(request: ConstraintCompileRequest) -> Dict[str, Any]:
+    """
+    Mostra come i vincoli vengono tradotti in predicati sulle metriche dei moduli.
+    
+    I vincoli non interpretabili restano validi: i moduli li valutano con la propria regola simulata.
+    
+    Args:
+        request: Richiesta con i vincoli da compilare.
+        
+    Returns:
+        Dict[str, Any]: Vincoli compilati con i relativi predicati.
+    """
+    return {
+        "constraints": [constraint_compiler.compile(c).to_dict() for c in request.constraints]
+    }
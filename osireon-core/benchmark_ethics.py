@@ -0,0 +1,153 @@
+"""
+Script di benchmark del motore delle regole etiche di Osireon.
+Questo script confronta il RuleMatcher compilato (una scansione per proposta) con il controllo
+di ogni coppia (proposta, regola) su un insieme sintetico di regole e proposte.
+
+Uso (dalla directory che contiene il pacchetto src):
+    python -m src.benchmark_ethics --rules 10000 --proposals 10000
+"""
+import argparse
+import random
+import time
+from typing import Dict, Any, List, Tuple
+
+from src.ethics.matcher import RuleMatcher
+
+# Domini delle proposte sintetiche
+DOMAINS = ["economia", "sociale", "ambiente", "sanità"]
+
+def build_vocabulary(size: int, rng: random.Random) -> List[str]:
+    """
+    Genera un vocabolario di parole sintetiche.
+    
+    Args:
+        size: Numero di parole.
+        rng: Generatore casuale.
+    
+    Returns:
+        List[str]: Parole distinte di 4-10 lettere.
+    """
+    letters = "abcdefghilmnoprstuvz"
+    words = set()
+    while len(words) < size:
+        words.add("".join(rng.choice(letters) for _ in range(rng.randint(4, 10))))
+    return sorted(words)
+
+def build_rules(count: int, vocabulary: List[str], rng: random.Random) -> List[Dict[str, Any]]:
+    """
+    Genera regole sintetiche nel formato di ruleset_it.json.
+    
+    Args:
+        count: Numero di regole.
+        vocabulary: Parole disponibili.
+        rng: Generatore casuale.
+    
+    Returns:
+        List[Dict[str, Any]]: Regole con parole chiave descrittive e condizioni di violazione.
+    """
+    rules = []
+    for index in range(count):
+        violation: Dict[str, Any] = {"keywords": rng.sample(vocabulary, 3), "reason": f"Violazione della regola {index}"}
+        if rng.random() < 0.3:
+            violation["unless"] = rng.sample(vocabulary, 1)
+        if rng.random() < 0.5:
+            violation["domains"] = [rng.choice(DOMAINS)]
+        rules.append({
+            "id": f"rule_{index:05d}",
+            "name": f"Regola {index}",
+            "keywords": rng.sample(vocabulary, 5),
+            "severity": rng.choice(["low", "medium", "high", "critical"]),
+            "violation": violation
+        })
+    return rules
+
+def build_proposals(count: int, vocabulary: List[str], rng: random.Random) -> List[Tuple[str, str]]:
+    """
+    Genera proposte sintetiche di 8-20 parole con il loro dominio.
+    
+    Args:
+        count: Numero di proposte.
+        vocabulary: Parole disponibili.
+        rng: Generatore casuale.
+    
+    Returns:
+        List[Tuple[str, str]]: Proposte e domini.
+    """
+    return [(" ".join(rng.choice(vocabulary) for _ in range(rng.randint(8, 20))), rng.choice(DOMAINS)) for _ in range(count)]
+
+def naive_violations(rules: List[Dict[str, Any]], proposal: str, domain: str) -> List[int]:
+    """
+    Valuta una proposta controllando ogni regola separatamente (un confronto per coppia proposta-regola).
+    
+    Args:
+        rules: Regole.
+        proposal: Proposta.
+        domain: Dominio della proposta.
+    
+    Returns:
+        List[int]: Indici delle regole violate.
+    """
+    violated = []
+    for index, rule in enumerate(rules):
+        proposal_lower = proposal.lower()
+        violation = rule["violation"]
+        domains = violation.get("domains")
+        if domains and domain.lower() not in domains:
+            continue
+        if any(kw in proposal_lower for kw in violation["keywords"]) and not any(kw in proposal_lower for kw in violation.get("unless", [])):
+            violated.append(index)
+    return violated
+
+def run_benchmark(rule_count: int, proposal_count: int, baseline_sample: int, rule_checks: bool, seed: int) -> None:
+    """
+    Esegue il benchmark e stampa i risultati.
+    
+    Args:
+        rule_count: Numero di regole.
+        proposal_count: Numero di proposte.
+        baseline_sample: Proposte valutate anche con il controllo per coppia (il tempo totale viene stimato).
+        rule_checks: Se costruire anche l'esito di ogni regola con il RuleMatcher.
+        seed: Seme del generatore casuale.
+    """
+    rng = random.Random(seed)
+    vocabulary = build_vocabulary(max(rule_count * 2, 1000), rng)
+    rules = build_rules(rule_count, vocabulary, rng)
+    proposals = build_proposals(proposal_count, vocabulary, rng)
+    print(f"Regole: {rule_count}, proposte: {proposal_count}, vocabolario: {len(vocabulary)} parole")
+    
+    started = time.perf_counter()
+    matcher = RuleMatcher(rules)
+    compile_time = time.perf_counter() - started
+    print(f"Compilazione: {compile_time:.2f}s ({matcher.automaton.size} parole chiave)")
+    
+    started = time.perf_counter()
+    violations = 0
+    results = []
+    for proposal, domain in proposals:
+        violated, _ = matcher.evaluate(proposal, domain, rule_checks)
+        violations += len(violated)
+        results.append([index for index, _ in violated])
+    compiled_time = time.perf_counter() - started
+    print(f"RuleMatcher: {compiled_time:.2f}s, {compiled_time / proposal_count * 1e6:.1f}µs per proposta, "
+          f"{violations} violazioni")
+    
+    sample = min(baseline_sample, proposal_count)
+    if sample:
+        started = time.perf_counter()
+        for (proposal, domain), expected in zip(proposals[:sample], results[:sample]):
+            if naive_violations(rules, proposal, domain) != expected:
+                raise AssertionError(f"Risultati diversi per la proposta: {proposal}")
+        naive_time = (time.perf_counter() - started) / sample
+        print(f"Controllo per coppia: {naive_time * 1e3:.1f}ms per proposta (stima su {sample} proposte), "
+              f"totale stimato {naive_time * proposal_count:.0f}s")
+        print(f"Accelerazione: {naive_time * proposal_count / compiled_time:.0f}x, risultati identici sul campione")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark del motore delle regole etiche")
+    parser.add_argument("--rules", type=int, default=10000, help="Numero di regole sintetiche")
+    parser.add_argument("--proposals", type=int, default=10000, help="Numero di proposte sintetiche")
+    parser.add_argument("--baseline-sample", type=int, default=50, help="Proposte valutate anche con il controllo per coppia")
+    parser.add_argument("--rule-checks", action="store_true", help="Costruisce anche l'esito di ogni regola")
+    parser.add_argument("--seed", type=int, default=42, help="Seme del generatore casuale")
+    args = parser.parse_args()
+    run_benchmark(args.rules, args.proposals, args.baseline_sample, args.rule_checks, args.seed)
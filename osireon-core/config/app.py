@@ -45,10 +45,35 @@ def create_app() -> FastAPI:
     async def startup_event():
         logger.info("Avvio dell'applicazione Osireon")
     
+        # Indicizza i moduli di simulazione disponibili (locali e plugin)
+        from src.modules.registry import module_registry
+        module_registry.discover()
+    
+        # Carica i ruleset etici e avvia il controllo delle loro modifiche
+        from src.ethics.registry import ruleset_registry
+        ruleset_registry.discover()
+        ruleset_registry.start_watching()
+    
     @app.on_event("shutdown")
     async def shutdown_event():
         logger.info("Arresto dell'applicazione Osireon")
     
+        # Termina i processi worker dei moduli e i thread del grafo delle dipendenze e degli agenti
+        from src.modules.executor import module_executor
+        from src.modules.graph import module_graph
+        from src.agents.base import agent_manager
+        module_executor.shutdown()
+        module_graph.shutdown()
+        agent_manager.shutdown()
+    
+        # Arresta il controllo dei file dei ruleset etici
+        from src.ethics.registry import ruleset_registry
+        ruleset_registry.stop_watching()
+    
+        # Chiude le connessioni keep-alive verso i provider LLM
+        from src.llm.connector import llm_connector
+        await llm_connector.aclose()
+    
     return app
 
 # Creazione dell'istanza dell'applicazione
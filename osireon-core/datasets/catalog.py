@@ -0,0 +1,421 @@
+"""
+Catalogo dei dataset per Osireon.
+Questo file contiene l'accesso ai dataset colonnari locali (una colonna .npy per file),
+mappati in memoria in modo che tutti i processi worker condividano la stessa copia.
+"""
+import ast
+import json
+import logging
+import mmap
+import os
+import sys
+import threading
+from array import array
+from typing import Dict, Any, List, Optional
+
+# Configurazione del logging
+logger = logging.getLogger("osireon.datasets")
+
+# Formato .npy: magic string seguita da versione e lunghezza dell'header
+NPY_MAGIC = b"\x93NUMPY"
+
+# Tipi .npy supportati e corrispondente formato di memoryview/array
+NPY_FORMATS = {
+    "<f8": "d",
+    "<f4": "f",
+    "<i8": "q",
+    "<i4": "i",
+    "<i2": "h",
+    "|i1": "b",
+    "|u1": "B",
+}
+
+# Directory predefinita con i dataset di esempio per i test
+FIXTURES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures")
+
+class DatasetError(Exception):
+    """
+    Errore sollevato quando un dataset non esiste o non è leggibile.
+    """
+    pass
+
+def _read_npy_header(mm: mmap.mmap, path: str) -> Dict[str, Any]:
+    """
+    Legge l'header di un file .npy.
+    
+    Args:
+        mm: File mappato in memoria.
+        path: Percorso del file (per i messaggi di errore).
+    
+    Returns:
+        Dict[str, Any]: Tipo, forma e offset dei dati.
+    """
+    if mm[:6] != NPY_MAGIC:
+        raise DatasetError(f"{path} non è un file .npy valido")
+    
+    major = mm[6]
+    if major == 1:
+        header_len = int.from_bytes(mm[8:10], "little")
+        offset = 10 + header_len
+    else:
+        header_len = int.from_bytes(mm[8:12], "little")
+        offset = 12 + header_len
+    
+    header = ast.literal_eval(mm[offset - header_len:offset].decode("latin1"))
+    if header.get("fortran_order"):
+        raise DatasetError(f"{path}: l'ordinamento Fortran non è supportato")
+    if len(header["shape"]) != 1:
+        raise DatasetError(f"{path}: sono supportate solo colonne monodimensionali")
+    
+    descr = header["descr"]
+    if descr not in NPY_FORMATS:
+        raise DatasetError(f"{path}: tipo {descr} non supportato")
+    
+    return {"format": NPY_FORMATS[descr], "rows": header["shape"][0], "offset": offset}
+
+def write_npy(path: str, values: array) -> None:
+    """
+    Scrive una colonna in formato .npy (versione 1.0, little-endian).
+    
+    Args:
+        path: Percorso del file da scrivere.
+        values: Valori della colonna.
+    """
+    typecode = values.typecode
+    if typecode == "l":
+        typecode = "q" if values.itemsize == 8 else "i"
+    descr = next((d for d, f in NPY_FORMATS.items() if f == typecode), None)
+    if descr is None:
+        raise DatasetError(f"Tipo array '{values.typecode}' non supportato")
+    header = f"{{'descr': '{descr}', 'fortran_order': False, 'shape': ({len(values)},), }}"
+    
+    # L'header viene allineato a 64 byte, come fa numpy
+    padding = 64 - (10 + len(header) + 1) % 64
+    header = header + " " * padding + "\n"
+    
+    data = array(typecode, values)
+    if sys.byteorder != "little":
+        data.byteswap()
+    
+    with open(path, "wb") as file:
+        file.write(NPY_MAGIC + bytes([1, 0]) + len(header).to_bytes(2, "little") + header.encode("latin1"))
+        file.write(data.tobytes())
+
+def write_table(root: str, name: str, version: str, columns: Dict[str, array],
+                dictionaries: Optional[Dict[str, List[str]]] = None, description: str = "") -> str:
+    """
+    Scrive un dataset nel formato del catalogo: un file .npy per colonna e un manifest.
+    
+    Args:
+        root: Directory radice dei dataset.
+        name: Nome del dataset.
+        version: Versione del dataset.
+        columns: Colonne del dataset, tutte della stessa lunghezza.
+        dictionaries: Valori testuali per le colonne categoriche codificate come interi.
+        description: Descrizione del dataset.
+    
+    Returns:
+        str: Directory della versione scritta.
+    """
+    lengths = {len(values) for values in columns.values()}
+    if len(lengths) > 1:
+        raise DatasetError(f"Le colonne del dataset {name} hanno lunghezze diverse")
+    
+    directory = os.path.join(root, name, version)
+    os.makedirs(directory, exist_ok=True)
+    
+    manifest = {
+        "name": name,
+        "version": version,
+        "description": description,
+        "rows": lengths.pop() if lengths else 0,
+        "columns": {},
+        "dictionaries": dictionaries or {}
+    }
+    for column, values in columns.items():
+        filename = f"{column}.npy"
+        write_npy(os.path.join(directory, filename), values)
+        manifest["columns"][column] = {"file": filename, "format": values.typecode}
+    
+    with open(os.path.join(directory, "manifest.json"), "w") as file:
+        json.dump(manifest, file, indent=2, ensure_ascii=False)
+    
+    return directory
+
+class Table:
+    """
+    Tabella colonnare mappata in memoria. Le colonne vengono mappate solo al primo accesso.
+    """
+    
+    def __init__(self, directory: str, manifest: Dict[str, Any]):
+        """
+        Inizializza la tabella.
+        
+        Args:
+            directory: Directory della versione del dataset.
+            manifest: Contenuto del manifest del dataset.
+        """
+        self.directory = directory
+        self.name = manifest["name"]
+        self.version = str(manifest["version"])
+        self.description = manifest.get("description", "")
+        self.rows = manifest.get("rows", 0)
+        self.column_names = list(manifest.get("columns", {}))
+        self.dictionaries = manifest.get("dictionaries", {})
+        self._files = {column: info["file"] for column, info in manifest.get("columns", {}).items()}
+        self._maps: Dict[str, mmap.mmap] = {}
+        self._views: Dict[str, memoryview] = {}
+        self._lock = threading.Lock()
+    
+    def column(self, name: str) -> memoryview:
+        """
+        Restituisce una colonna come memoryview in sola lettura sul file mappato (nessuna copia).
+        
+        Args:
+            name: Nome della colonna.
+        
+        Returns:
+            memoryview: Valori della colonna.
+        """
+        view = self._views.get(name)
+        if view is not None:
+            return view
+        
+        if name not in self._files:
+            raise DatasetError(f"La colonna {name} non esiste nel dataset {self.name}")
+        
+        with self._lock:
+            view = self._views.get(name)
+            if view is None:
+                path = os.path.join(self.directory, self._files[name])
+                with open(path, "rb") as file:
+                    mm = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+                header = _read_npy_header(mm, path)
+                end = header["offset"] + header["rows"] * array(header["format"]).itemsize
+                view = memoryview(mm)[header["offset"]:end].cast(header["format"])
+                self._maps[name] = mm
+                self._views[name] = view
+        return view
+    
+    def select(self, columns: Optional[List[str]] = None, start: int = 0,
+               stop: Optional[int] = None) -> Dict[str, memoryview]:
+        """
+        Proietta la tabella su un sottoinsieme di colonne e un intervallo di righe (nessuna copia).
+        
+        Args:
+            columns: Colonne da restituire. Se None, tutte.
+            start: Prima riga (inclusa).
+            stop: Ultima riga (esclusa). Se None, fino alla fine.
+        
+        Returns:
+            Dict[str, memoryview]: Colonne selezionate.
+        """
+        names = columns or self.column_names
+        return {name: self.column(name)[start:stop] for name in names}
+    
+    def decode(self, column: str, codes) -> List[str]:
+        """
+        Converte i codici di una colonna categorica nei valori testuali.
+        
+        Args:
+            column: Nome della colonna categorica.
+            codes: Codici da convertire.
+        
+        Returns:
+            List[str]: Valori testuali.
+        """
+        dictionary = self.dictionaries.get(column)
+        if dictionary is None:
+            raise DatasetError(f"La colonna {column} non è categorica")
+        return [dictionary[code] for code in codes]
+    
+    def mapped_bytes(self) -> int:
+        """
+        Calcola i byte delle colonne attualmente mappate.
+        
+        Returns:
+            int: Byte mappati.
+        """
+        return sum(view.nbytes for view in self._views.values())
+    
+    def resident_bytes(self) -> int:
+        """
+        Stima i byte delle colonne effettivamente residenti in memoria.
+        Su Linux legge /proc/self/smaps; altrove restituisce i byte mappati.
+        
+        Returns:
+            int: Byte residenti.
+        """
+        paths = {os.path.realpath(os.path.join(self.directory, self._files[name])) for name in self._views}
+        if not paths:
+            return 0
+        
+        try:
+            resident = 0
+            current = None
+            with open("/proc/self/smaps") as smaps:
+                for line in smaps:
+                    fields = line.split()
+                    if len(fields) >= 6 and "-" in fields[0]:
+                        current = fields[5]
+                    elif fields and fields[0] == "Rss:" and current in paths:
+                        resident += int(fields[1]) * 1024
+            return resident
+        except OSError:
+            return self.mapped_bytes()
+    
+    def to_dict(self) -> Dict[str, Any]:
+        """
+        Converte la descrizione della tabella in un dizionario.
+        
+        Returns:
+            Dict[str, Any]: Descrizione della tabella e memoria utilizzata.
+        """
+        return {
+            "name": self.name,
+            "version": self.version,
+            "description": self.description,
+            "rows": self.rows,
+            "columns": self.column_names,
+            "mapped_columns": sorted(self._views),
+            "mapped_bytes": self.mapped_bytes(),
+            "resident_bytes": self.resident_bytes()
+        }
+
+class DatasetCatalog:
+    """
+    Catalogo dei dataset disponibili nelle directory configurate.
+    Struttura attesa: {radice}/{nome}/{versione}/manifest.json più un file .npy per colonna.
+    """
+    
+    def __init__(self, roots: Optional[List[str]] = None):
+        """
+        Inizializza il catalogo.
+        
+        Args:
+            roots: Directory radice dei dataset. Se None, usa DATASETS_PATH o i dataset di esempio.
+        """
+        if roots is None:
+            env_roots = os.getenv("DATASETS_PATH", "")
+            roots = [root for root in env_roots.split(os.pathsep) if root] or [FIXTURES_DIR]
+        self.roots = roots
+        self._tables: Dict[str, Table] = {}
+        self._lock = threading.Lock()
+        logger.info(f"DatasetCatalog inizializzato con directory: {roots}")
+    
+    def versions(self, name: str) -> List[str]:
+        """
+        Elenca le versioni disponibili di un dataset, dalla più vecchia alla più recente.
+        
+        Args:
+            name: Nome del dataset.
+        
+        Returns:
+            List[str]: Versioni disponibili.
+        """
+        found = set()
+        for root in self.roots:
+            directory = os.path.join(root, name)
+            if os.path.isdir(directory):
+                found.update(v for v in os.listdir(directory)
+                             if os.path.isfile(os.path.join(directory, v, "manifest.json")))
+        return sorted(found, key=lambda v: [int(p) if p.isdigit() else p for p in v.split(".")])
+    
+    def get(self, name: str, version: Optional[str] = None) -> Table:
+        """
+        Restituisce una tabella per nome e versione. Il manifest viene letto al primo accesso.
+        
+        Args:
+            name: Nome del dataset.
+            version: Versione richiesta. Se None, la più recente.
+        
+        Returns:
+            Table: Tabella richiesta.
+        
+        Raises:
+            DatasetError: Se il dataset o la versione non esistono.
+        """
+        if version is None:
+            versions = self.versions(name)
+            if not versions:
+                raise DatasetError(f"Dataset {name} non trovato")
+            version = versions[-1]
+        
+        key = f"{name}@{version}"
+        table = self._tables.get(key)
+        if table is not None:
+            return table
+        
+        with self._lock:
+            table = self._tables.get(key)
+            if table is None:
+                table = self._open(name, version)
+                self._tables[key] = table
+                logger.info(f"Dataset {key} aperto ({table.rows} righe, {len(table.column_names)} colonne)")
+        return table
+    
+    def select(self, name: str, version: Optional[str] = None, columns: Optional[List[str]] = None,
+               start: int = 0, stop: Optional[int] = None) -> Dict[str, memoryview]:
+        """
+        Scorciatoia per la proiezione di colonne e righe di un dataset.
+        
+        Args:
+            name: Nome del dataset.
+            version: Versione richiesta. Se None, la più recente.
+            columns: Colonne da restituire. Se None, tutte.
+            start: Prima riga (inclusa).
+            stop: Ultima riga (esclusa).
+        
+        Returns:
+            Dict[str, memoryview]: Colonne selezionate.
+        """
+        return self.get(name, version).select(columns, start, stop)
+    
+    def list_datasets(self) -> List[Dict[str, Any]]:
+        """
+        Elenca i dataset disponibili con le loro versioni.
+        
+        Returns:
+            List[Dict[str, Any]]: Nome e versioni di ogni dataset.
+        """
+        names = set()
+        for root in self.roots:
+            if os.path.isdir(root):
+                names.update(n for n in os.listdir(root) if os.path.isdir(os.path.join(root, n)))
+        return [{"name": name, "versions": self.versions(name)} for name in sorted(names) if self.versions(name)]
+    
+    def memory_report(self) -> List[Dict[str, Any]]:
+        """
+        Riporta la memoria mappata e residente di ogni dataset aperto.
+        
+        Returns:
+            List[Dict[str, Any]]: Descrizione e memoria di ogni tabella aperta.
+        """
+        tables = dict(self._tables)
+        return [tables[key].to_dict() for key in sorted(tables)]
+    
+    def _open(self, name: str, version: str) -> Table:
+        """
+        Apre una versione di un dataset leggendone il manifest.
+        
+        Args:
+            name: Nome del dataset.
+            version: Versione del dataset.
+        
+        Returns:
+            Table: Tabella aperta.
+        """
+        for root in self.roots:
+            directory = os.path.join(root, name, version)
+            manifest_path = os.path.join(directory, "manifest.json")
+            if os.path.isfile(manifest_path):
+                try:
+                    with open(manifest_path, "r") as file:
+                        manifest = json.load(file)
+                except (OSError, ValueError) as e:
+                    raise DatasetError(f"Manifest del dataset {name}@{version} non leggibile: {str(e)}")
+                return Table(directory, manifest)
+        raise DatasetError(f"Dataset {name}@{version} non trovato")
+
+# Istanza singleton del catalogo dei dataset
+dataset_catalog = DatasetCatalog()
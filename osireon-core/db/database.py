@@ -2,15 +2,17 @@
 Funzioni di accesso al database per Osireon.
 Questo file contiene le funzioni per interagire con il database PostgreSQL.
 """
+import datetime
 import logging
 from typing import Dict, Any, List, Optional, Union
 from sqlalchemy.orm import Session
 from sqlalchemy.exc import SQLAlchemyError
 
 from src.db.models import (
-    Simulation, ModuleResult, AgentAnalysis, EthicsCheck, LLMLog,
+    Simulation, ModuleResult, AgentAnalysis, EthicsCheck, LLMLog, AgentCacheEntry, LLMCacheEntry,
     get_db_session, create_tables
 )
+from src.modules.results import storable_result
 
 # Configurazione del logging
 logger = logging.getLogger("osireon.db")
@@ -121,7 +123,7 @@ class DatabaseManager:
             module_result = ModuleResult(
                 simulation_id=simulation_id,
                 module_name=module_name,
-                result=result
+                result=storable_result(result)
             )
             session.add(module_result)
             session.commit()
@@ -164,14 +166,16 @@ class DatabaseManager:
             logger.error(f"Errore durante il salvataggio dell'analisi dell'agente: {str(e)}")
             return None
     
-    def save_ethics_check(self, simulation_id: int, passed: bool, violations: Optional[List[str]] = None) -> Optional[int]:
+    def save_ethics_check(self, simulation_id: int, passed: Optional[bool], violations: Optional[List[str]] = None,
+                          ruleset: Optional[str] = None) -> Optional[int]:
         """
         Salva il risultato di un controllo etico.
         
         Args:
             simulation_id: ID della simulazione.
-            passed: Indica se il controllo etico è stato superato.
+            passed: Indica se il controllo etico è stato superato (None se le proposte non sono state validate).
             violations: Lista di eventuali violazioni etiche.
+            ruleset: Chiave della versione del ruleset che ha prodotto il risultato.
             
         Returns:
             Optional[int]: ID del controllo etico salvato o None in caso di errore.
@@ -181,7 +185,8 @@ class DatabaseManager:
             ethics_check = EthicsCheck(
                 simulation_id=simulation_id,
                 passed=passed,
-                violations=violations or []
+                violations=violations or [],
+                ruleset=ruleset
             )
             session.add(ethics_check)
             session.commit()
@@ -229,6 +234,155 @@ class DatabaseManager:
             logger.error(f"Errore durante il salvataggio del log LLM: {str(e)}")
             return None
     
+    def get_cached_analysis(self, cache_key: str) -> Optional[Dict[str, Any]]:
+        """
+        Ottiene un'analisi dalla cache persistente degli agenti.
+        
+        Args:
+            cache_key: Chiave dell'analisi.
+            
+        Returns:
+            Optional[Dict[str, Any]]: Analisi memorizzata o None se assente o in caso di errore.
+        """
+        try:
+            session = get_db_session()
+            entry = session.query(AgentCacheEntry).filter(AgentCacheEntry.cache_key == cache_key).first()
+            analysis = entry.analysis if entry else None
+            session.close()
+            return analysis
+        except SQLAlchemyError as e:
+            logger.error(f"Errore durante la lettura della cache degli agenti: {str(e)}")
+            return None
+    
+    def save_cached_analysis(self, cache_key: str, agent_name: str, agent_version: str,
+                             analysis: Dict[str, Any]) -> bool:
+        """
+        Salva un'analisi nella cache persistente degli agenti.
+        
+        Args:
+            cache_key: Chiave dell'analisi.
+            agent_name: Nome dell'agente.
+            agent_version: Versione dell'agente.
+            analysis: Analisi dell'agente.
+            
+        Returns:
+            bool: True se l'analisi è stata salvata, False in caso di errore.
+        """
+        try:
+            session = get_db_session()
+            session.merge(AgentCacheEntry(
+                cache_key=cache_key,
+                agent_name=agent_name,
+                agent_version=agent_version,
+                analysis=analysis
+            ))
+            session.commit()
+            session.close()
+            return True
+        except SQLAlchemyError as e:
+            logger.error(f"Errore durante il salvataggio nella cache degli agenti: {str(e)}")
+            return False
+    
+    def purge_cached_analyses(self, agent_name: str, current_version: str) -> int:
+        """
+        Rimuove dalla cache persistente le analisi delle versioni precedenti di un agente.
+        
+        Args:
+            agent_name: Nome dell'agente.
+            current_version: Versione corrente dell'agente, le cui analisi vengono mantenute.
+            
+        Returns:
+            int: Numero di analisi rimosse.
+        """
+        try:
+            session = get_db_session()
+            removed = session.query(AgentCacheEntry).filter(
+                AgentCacheEntry.agent_name == agent_name,
+                AgentCacheEntry.agent_version != current_version
+            ).delete(synchronize_session=False)
+            session.commit()
+            session.close()
+            return removed
+        except SQLAlchemyError as e:
+            logger.error(f"Errore durante la pulizia della cache degli agenti: {str(e)}")
+            return 0
+    
+    def get_cached_response(self, cache_key: str) -> Optional[Dict[str, Any]]:
+        """
+        Ottiene una risposta non scaduta dalla cache persistente dei modelli di linguaggio.
+        
+        Args:
+            cache_key: Chiave della risposta.
+            
+        Returns:
+            Optional[Dict[str, Any]]: Voce memorizzata o None se assente, scaduta o in caso di errore.
+        """
+        try:
+            session = get_db_session()
+            entry = session.query(LLMCacheEntry).filter(
+                LLMCacheEntry.cache_key == cache_key,
+                (LLMCacheEntry.expires_at.is_(None)) | (LLMCacheEntry.expires_at > datetime.datetime.utcnow())
+            ).first()
+            stored = entry.to_dict() if entry else None
+            session.close()
+            return stored
+        except SQLAlchemyError as e:
+            logger.error(f"Errore durante la lettura della cache LLM: {str(e)}")
+            return None
+    
+    def save_cached_response(self, cache_key: str, provider: str, model: str, prompt: str, response: str,
+                             expires_at: Optional[datetime.datetime] = None) -> bool:
+        """
+        Salva una risposta nella cache persistente dei modelli di linguaggio.
+        
+        Args:
+            cache_key: Chiave della risposta.
+            provider: Provider LLM.
+            model: Modello LLM.
+            prompt: Prompt normalizzato.
+            response: Risposta ricevuta.
+            expires_at: Istante di scadenza (UTC), o None per nessuna scadenza.
+            
+        Returns:
+            bool: True se la risposta è stata salvata, False in caso di errore.
+        """
+        try:
+            session = get_db_session()
+            session.merge(LLMCacheEntry(
+                cache_key=cache_key,
+                provider=provider,
+                model=model,
+                prompt=prompt,
+                response=response,
+                created_at=datetime.datetime.utcnow(),
+                expires_at=expires_at
+            ))
+            session.commit()
+            session.close()
+            return True
+        except SQLAlchemyError as e:
+            logger.error(f"Errore durante il salvataggio nella cache LLM: {str(e)}")
+            return False
+    
+    def purge_expired_responses(self) -> int:
+        """
+        Rimuove dalla cache persistente le risposte scadute.
+        
+        Returns:
+            int: Numero di risposte rimosse.
+        """
+        try:
+            session = get_db_session()
+            removed = session.query(LLMCacheEntry).filter(
+                LLMCacheEntry.expires_at <= datetime.datetime.utcnow()
+            ).delete(synchronize_session=False)
+            session.commit()
+            session.close()
+            return removed
+        except SQLAlchemyError as e:
+            logger.error(f"Errore durante la pulizia della cache LLM: {str(e)}")
+            return 0
+    
     def get_simulation(self, simulation_id: int) -> Optional[Dict[str, Any]]:
         """
         Ottiene i dettagli di una simulazione.
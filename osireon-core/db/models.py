@@ -3,13 +3,19 @@ Modelli del database per Osireon.
 Questo file contiene la definizione dei modelli SQLAlchemy per il database.
 """
 import datetime
-from typing import Dict, Any
-from sqlalchemy import Column, Integer, String, Text, DateTime, Boolean, JSON, ForeignKey, create_engine
+import logging
+from typing import Dict, Any, List
+from sqlalchemy import Column, Integer, String, Text, DateTime, Boolean, JSON, ForeignKey, create_engine, inspect, text
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import relationship, sessionmaker
 import os
 from dotenv import load_dotenv
 
+from src.modules.results import expand_result
+
+# Configurazione del logging
+logger = logging.getLogger("osireon.db")
+
 # Caricamento delle variabili d'ambiente
 load_dotenv()
 
@@ -82,7 +88,7 @@ class ModuleResult(Base):
             "id": self.id,
             "simulation_id": self.simulation_id,
             "module_name": self.module_name,
-            "result": self.result,
+            "result": expand_result(self.result),
             "created_at": self.created_at.isoformat() if self.created_at else None
         }
 
@@ -124,8 +130,10 @@ class EthicsCheck(Base):
     
     id = Column(Integer, primary_key=True)
     simulation_id = Column(Integer, ForeignKey("simulations.id"), nullable=False)
-    passed = Column(Boolean, nullable=False)
+    # NULL se le proposte non sono state validate (nessun ruleset per il paese)
+    passed = Column(Boolean, nullable=True)
     violations = Column(JSON, nullable=True)
+    ruleset = Column(String(100), nullable=True)
     created_at = Column(DateTime, default=datetime.datetime.utcnow)
     
     # Relazioni
@@ -143,6 +151,8 @@ class EthicsCheck(Base):
             "simulation_id": self.simulation_id,
             "passed": self.passed,
             "violations": self.violations,
+            "ruleset": self.ruleset,
+            "status": "validated" if self.passed is not None else "not_validated",
             "created_at": self.created_at.isoformat() if self.created_at else None
         }
 
@@ -180,6 +190,64 @@ class LLMLog(Base):
             "created_at": self.created_at.isoformat() if self.created_at else None
         }
 
+class AgentCacheEntry(Base):
+    """
+    Modello per le analisi memorizzate nella cache degli agenti.
+    """
+    __tablename__ = "agent_cache"
+    
+    cache_key = Column(String(64), primary_key=True)
+    agent_name = Column(String(100), nullable=False, index=True)
+    agent_version = Column(String(50), nullable=False)
+    analysis = Column(JSON, nullable=False)
+    created_at = Column(DateTime, default=datetime.datetime.utcnow)
+    
+    def to_dict(self) -> Dict[str, Any]:
+        """
+        Converte il modello in un dizionario.
+        
+        Returns:
+            Dict[str, Any]: Rappresentazione del modello come dizionario.
+        """
+        return {
+            "cache_key": self.cache_key,
+            "agent_name": self.agent_name,
+            "agent_version": self.agent_version,
+            "analysis": self.analysis,
+            "created_at": self.created_at.isoformat() if self.created_at else None
+        }
+
+class LLMCacheEntry(Base):
+    """
+    Modello per le risposte memorizzate nella cache dei modelli di linguaggio.
+    """
+    __tablename__ = "llm_cache"
+    
+    cache_key = Column(String(64), primary_key=True)
+    provider = Column(String(50), nullable=False)
+    model = Column(String(50), nullable=False)
+    prompt = Column(Text, nullable=False)
+    response = Column(Text, nullable=False)
+    created_at = Column(DateTime, default=datetime.datetime.utcnow)
+    expires_at = Column(DateTime, nullable=True, index=True)
+    
+    def to_dict(self) -> Dict[str, Any]:
+        """
+        Converte il modello in un dizionario.
+        
+        Returns:
+            Dict[str, Any]: Rappresentazione del modello come dizionario.
+        """
+        return {
+            "cache_key": self.cache_key,
+            "provider": self.provider,
+            "model": self.model,
+            "prompt": self.prompt,
+            "response": self.response,
+            "created_at": self.created_at.isoformat() if self.created_at else None,
+            "expires_at": self.expires_at.isoformat() if self.expires_at else None
+        }
+
 # Funzione per creare le tabelle nel database
 def create_tables():
     """
@@ -187,6 +255,60 @@ def create_tables():
     """
     engine = create_engine(DATABASE_URL)
     Base.metadata.create_all(engine)
+    upgrade_schema(engine)
+
+def upgrade_schema(engine) -> List[str]:
+    """
+    Aggiorna le tabelle create da versioni precedenti, che create_all non modifica.
+    Ogni passo viene eseguito solo se lo schema non è già aggiornato, quindi la funzione può
+    essere chiamata a ogni avvio.
+    
+    Args:
+        engine: Engine SQLAlchemy del database.
+    
+    Returns:
+        List[str]: Descrizione dei passi eseguiti (vuota se lo schema era già aggiornato).
+    """
+    applied: List[str] = []
+    table = EthicsCheck.__table__
+    inspector = inspect(engine)
+    if not inspector.has_table(table.name):
+        return applied
+    columns = {column["name"]: column for column in inspector.get_columns(table.name)}
+    
+    with engine.begin() as connection:
+        # Versione del ruleset che ha prodotto il controllo etico
+        if "ruleset" not in columns:
+            connection.execute(text(f"ALTER TABLE {table.name} ADD COLUMN ruleset VARCHAR(100)"))
+            applied.append(f"{table.name}.ruleset aggiunta")
+        
+        # passed è NULL per le proposte non validate (paese senza ruleset)
+        if not columns["passed"]["nullable"]:
+            if engine.dialect.name == "sqlite":
+                _rebuild_sqlite_table(connection, table)
+            else:
+                connection.execute(text(f"ALTER TABLE {table.name} ALTER COLUMN passed DROP NOT NULL"))
+            applied.append(f"{table.name}.passed resa opzionale")
+    
+    for step in applied:
+        logger.info(f"Schema del database aggiornato: {step}")
+    return applied
+
+def _rebuild_sqlite_table(connection, table) -> None:
+    """
+    Ricrea una tabella SQLite con lo schema attuale conservandone i dati
+    (SQLite non permette di modificare i vincoli di una colonna esistente).
+    
+    Args:
+        connection: Connessione con una transazione aperta.
+        table: Tabella SQLAlchemy con lo schema aggiornato.
+    """
+    previous = f"{table.name}_previous"
+    names = ", ".join(column.name for column in table.columns)
+    connection.execute(text(f"ALTER TABLE {table.name} RENAME TO {previous}"))
+    table.create(connection)
+    connection.execute(text(f"INSERT INTO {table.name} ({names}) SELECT {names} FROM {previous}"))
+    connection.execute(text(f"DROP TABLE {previous}"))
 
 # Funzione per ottenere una sessione del database
 def get_db_session():
@@ -0,0 +1,234 @@
+"""
+Motore di confronto delle regole etiche per Osireon.
+Questo file contiene l'automa di Aho-Corasick che cerca tutte le parole chiave delle regole in un'unica
+scansione del testo e la compilazione delle regole (parole chiave, condizioni di violazione, eccezioni e domini).
+"""
+import logging
+from typing import Dict, Any, Iterable, List, Optional, Set, Tuple
+
+# Configurazione del logging
+logger = logging.getLogger("osireon.ethics.matcher")
+
+# Ruoli di una parola chiave in una regola
+KEYWORD = 0  # Parola chiave descrittiva (riportata in matched_keywords)
+TRIGGER = 1  # Condizione di violazione
+EXCEPTION = 2  # Eccezione che annulla la violazione
+
+class KeywordAutomaton:
+    """
+    Automa di Aho-Corasick per la ricerca simultanea di più parole chiave.
+    
+    Il costo di una ricerca dipende dalla lunghezza del testo e dal numero di occorrenze trovate,
+    non dal numero di parole chiave. Le parole chiave sono cercate come sottostringhe, anche
+    sovrapposte (es. "gas" e "gasolio" in "gasolio").
+    """
+    
+    def __init__(self, patterns: Iterable[str]):
+        """
+        Costruisce l'automa.
+        
+        Args:
+            patterns: Parole chiave; l'indice di ciascuna ne è l'identificativo.
+        """
+        self._goto: List[Dict[str, int]] = [{}]
+        self._fail: List[int] = [0]
+        self._out: List[Tuple[int, ...]] = [()]
+        self.size = 0
+        for index, pattern in enumerate(patterns):
+            self._add(pattern, index)
+            self.size += 1
+        self._link()
+    
+    def search(self, text: str) -> Set[int]:
+        """
+        Cerca le parole chiave in un testo.
+        
+        Args:
+            text: Testo (già normalizzato come le parole chiave).
+        
+        Returns:
+            Set[int]: Identificativi delle parole chiave presenti.
+        """
+        goto, fail, out = self._goto, self._fail, self._out
+        root = goto[0]
+        found: Set[int] = set()
+        node = 0
+        for char in text:
+            # Caratteri che non iniziano nessuna parola chiave: ritorno diretto alla radice
+            if node == 0 and char not in root:
+                continue
+            while node and char not in goto[node]:
+                node = fail[node]
+            node = goto[node].get(char, 0)
+            if out[node]:
+                found.update(out[node])
+        return found
+    
+    def _add(self, pattern: str, index: int) -> None:
+        """
+        Inserisce una parola chiave nell'albero dei prefissi.
+        
+        Args:
+            pattern: Parola chiave.
+            index: Identificativo della parola chiave.
+        """
+        if not pattern:
+            return
+        node = 0
+        for char in pattern:
+            child = self._goto[node].get(char)
+            if child is None:
+                child = len(self._goto)
+                self._goto[node][char] = child
+                self._goto.append({})
+                self._fail.append(0)
+                self._out.append(())
+            node = child
+        self._out[node] += (index,)
+    
+    def _link(self) -> None:
+        """
+        Calcola i collegamenti di fallimento in ampiezza e unisce le uscite dei suffissi.
+        """
+        queue = list(self._goto[0].values())
+        head = 0
+        while head < len(queue):
+            node = queue[head]
+            head += 1
+            for char, child in self._goto[node].items():
+                queue.append(child)
+                state = self._fail[node]
+                while state and char not in self._goto[state]:
+                    state = self._fail[state]
+                target = self._goto[state].get(char, 0)
+                self._fail[child] = target if target != child else 0
+                if self._out[self._fail[child]]:
+                    self._out[child] += self._out[self._fail[child]]
+
+class CompiledRule:
+    """
+    Regola etica compilata: dati descrittivi, domini di applicazione e risultato di conformità.
+    """
+    __slots__ = ("rule_id", "name", "severity", "domains", "reason", "passed_reason")
+    
+    def __init__(self, rule: Dict[str, Any]):
+        """
+        Inizializza la regola a partire dalla sua definizione JSON.
+        
+        Args:
+            rule: Definizione della regola (id, name, severity, keywords e violation).
+        """
+        violation = rule.get("violation") or {}
+        self.rule_id = rule.get("id", "unknown")
+        self.name = rule.get("name", "Regola sconosciuta")
+        self.severity = rule.get("severity", "medium")
+        domains = violation.get("domains")
+        self.domains = frozenset(domain.lower() for domain in domains) if domains else None
+        self.reason = violation.get("reason", f"La proposta potrebbe violare la regola '{self.name}'")
+        self.passed_reason = f"La proposta rispetta la regola '{self.name}'"
+    
+    def check(self, passed: bool, matched_keywords: List[str]) -> Dict[str, Any]:
+        """
+        Costruisce il risultato del controllo della regola su una proposta.
+        
+        Args:
+            passed: Se la proposta rispetta la regola.
+            matched_keywords: Parole chiave della regola presenti nella proposta.
+        
+        Returns:
+            Dict[str, Any]: Risultato del controllo della regola.
+        """
+        return {
+            "rule_id": self.rule_id,
+            "rule_name": self.name,
+            "passed": passed,
+            "reason": self.passed_reason if passed else self.reason,
+            "severity": self.severity,
+            "matched_keywords": matched_keywords
+        }
+
+class RuleMatcher:
+    """
+    Insieme di regole etiche compilato in un unico automa.
+    
+    Ogni regola può dichiarare in "violation" le parole chiave che indicano una violazione ("keywords"),
+    quelle che la escludono ("unless") e i domini in cui si applica ("domains", tutti se assente).
+    Tutte le parole chiave di tutte le regole, comprese quelle descrittive ("keywords" della regola),
+    finiscono in un solo automa: ogni proposta viene scansionata una sola volta, qualunque sia il
+    numero di regole, e vengono valutate solo le regole di cui è stata trovata almeno una parola chiave.
+    """
+    
+    def __init__(self, rules: List[Dict[str, Any]]):
+        """
+        Compila le regole.
+        
+        Args:
+            rules: Definizioni delle regole, nell'ordine in cui vanno riportati i controlli.
+        """
+        self.rules = [CompiledRule(rule) for rule in rules]
+        patterns: Dict[str, int] = {}
+        entries: List[List[Tuple[int, int]]] = []
+        self._keywords: List[str] = []
+        
+        def register(keyword: str, rule_index: int, role: int) -> None:
+            normalized = keyword.lower()
+            if not normalized:
+                return
+            index = patterns.get(normalized)
+            if index is None:
+                index = patterns[normalized] = len(entries)
+                entries.append([])
+                self._keywords.append(keyword)
+            entries[index].append((rule_index, role))
+        
+        for rule_index, rule in enumerate(rules):
+            violation = rule.get("violation") or {}
+            for keyword in rule.get("keywords", []):
+                register(keyword, rule_index, KEYWORD)
+            for keyword in violation.get("keywords", []):
+                register(keyword, rule_index, TRIGGER)
+            for keyword in violation.get("unless", []):
+                register(keyword, rule_index, EXCEPTION)
+        
+        # Per ogni parola chiave: regole e ruoli in cui compare
+        self._entries: List[Tuple[Tuple[int, int], ...]] = [tuple(entry) for entry in entries]
+        self.automaton = KeywordAutomaton(patterns)
+        logger.info(f"Compilate {len(self.rules)} regole etiche in un automa di {self.automaton.size} parole chiave")
+    
+    def evaluate(self, proposal: str, domain: str, rule_checks: bool = True) -> Tuple[List[Tuple[int, str]], Optional[List[Dict[str, Any]]]]:
+        """
+        Valuta una proposta rispetto a tutte le regole.
+        
+        Args:
+            proposal: Proposta di policy.
+            domain: Dominio della proposta.
+            rule_checks: Se costruire l'esito di ogni regola.
+        
+        Returns:
+            Tuple[List[Tuple[int, str]], Optional[List[Dict[str, Any]]]]: Regole violate (indice e motivo),
+            nell'ordine delle regole, ed esito di ogni regola (None se rule_checks è False).
+        """
+        domain = domain.lower()
+        triggered: Set[int] = set()
+        excepted: Set[int] = set()
+        matched: Dict[int, List[str]] = {}
+        for index in sorted(self.automaton.search(proposal.lower())):
+            for rule_index, role in self._entries[index]:
+                if role == TRIGGER:
+                    triggered.add(rule_index)
+                elif role == EXCEPTION:
+                    excepted.add(rule_index)
+                elif rule_checks:
+                    matched.setdefault(rule_index, []).append(self._keywords[index])
+        
+        violated = []
+        for rule_index in sorted(triggered - excepted):
+            rule = self.rules[rule_index]
+            if rule.domains is None or domain in rule.domains:
+                violated.append((rule_index, rule.reason))
+        
+        if not rule_checks:
+            return violated, None
+        failed = {rule_index for rule_index, _ in violated}
+        checks = [rule.check(rule_index not in failed, matched.get(rule_index, [])) for rule_index, rule in enumerate(self.rules)]
+        return violated, checks
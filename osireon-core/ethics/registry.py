@@ -0,0 +1,438 @@
+"""
+Registro dei ruleset etici per Osireon.
+Questo file contiene l'indice dei ruleset per paese, compilati una sola volta per versione,
+con controllo periodico dei file e sostituzione atomica della versione attiva.
+"""
+import hashlib
+import json
+import logging
+import os
+import re
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, Any, List, Optional, Tuple
+
+from src.ethics.matcher import RuleMatcher
+
+# Configurazione del logging
+logger = logging.getLogger("osireon.ethics.registry")
+
+# Nomi validi per un file di ruleset: ruleset_{codice paese}.json
+RULESET_FILE_PATTERN = re.compile(r"^ruleset_([a-z]{2})\.json$")
+
+# Firma di un file di ruleset: istante di modifica e dimensione
+Signature = Tuple[int, int]
+
+# Nomi dei paesi accettati oltre ai codici ISO 3166-1 alpha-2 (in italiano, inglese e lingua locale)
+COUNTRY_NAMES = {
+    "italia": "it", "italy": "it",
+    "germania": "de", "germany": "de", "deutschland": "de",
+    "francia": "fr", "france": "fr",
+    "spagna": "es", "spain": "es", "españa": "es",
+    "portogallo": "pt", "portugal": "pt",
+    "austria": "at", "österreich": "at",
+    "svizzera": "ch", "switzerland": "ch", "schweiz": "ch", "suisse": "ch",
+    "belgio": "be", "belgium": "be",
+    "paesi bassi": "nl", "olanda": "nl", "netherlands": "nl", "nederland": "nl",
+    "grecia": "gr", "greece": "gr",
+    "polonia": "pl", "poland": "pl", "polska": "pl",
+    "irlanda": "ie", "ireland": "ie",
+    "regno unito": "gb", "united kingdom": "gb", "uk": "gb",
+    "stati uniti": "us", "united states": "us", "usa": "us"
+}
+
+# Codice paese ISO 3166-1 alpha-2
+COUNTRY_CODE_PATTERN = re.compile(r"^[a-z]{2}$")
+
+def country_code(country: str) -> Optional[str]:
+    """
+    Normalizza un paese nel codice ISO di due lettere usato per i ruleset.
+    
+    Args:
+        country: Codice ISO del paese (es. "it") o un nome presente in COUNTRY_NAMES (es. "Italia").
+    
+    Returns:
+        Optional[str]: Codice paese di due lettere minuscole, o None se il paese non è riconosciuto.
+    """
+    name = " ".join(country.strip().lower().split())
+    code = COUNTRY_NAMES.get(name, name)
+    return code if COUNTRY_CODE_PATTERN.match(code) else None
+
+class CompiledRuleset:
+    """
+    Versione immutabile e compilata del ruleset di un paese.
+    
+    La chiave (es. "it@1.0.0+3fa9c2d1e0b4") identifica il contenuto esatto delle regole: cambia
+    ad ogni modifica del file, anche se la versione dichiarata resta la stessa.
+    """
+    
+    def __init__(self, country: str, rules: List[Dict[str, Any]], version: str, digest: str,
+                 path: Optional[str] = None, signature: Optional[Signature] = None):
+        """
+        Compila un ruleset.
+        
+        Args:
+            country: Codice paese.
+            rules: Regole etiche.
+            version: Versione dichiarata nel file ("0" se assente).
+            digest: Impronta del contenuto del file.
+            path: Percorso del file.
+            signature: Firma del file al momento della lettura.
+        """
+        self.country = country
+        self.rules = rules
+        self.version = version
+        self.digest = digest
+        self.path = path
+        self.signature = signature
+        self.key = f"{country}@{version}+{digest}"
+        self.matcher = RuleMatcher(rules)
+        self.loaded_at = time.time()
+    
+    @classmethod
+    def from_file(cls, country: str, path: str) -> "CompiledRuleset":
+        """
+        Legge e compila il ruleset di un paese.
+        
+        Args:
+            country: Codice paese.
+            path: Percorso del file JSON.
+        
+        Returns:
+            CompiledRuleset: Ruleset compilato.
+        
+        Raises:
+            OSError: Se il file non può essere letto.
+            ValueError: Se il file non è un ruleset valido.
+        """
+        stat = os.stat(path)
+        with open(path, "rb") as file:
+            content = file.read()
+        ruleset = json.loads(content.decode("utf-8"))
+        rules = ruleset.get("rules") if isinstance(ruleset, dict) else None
+        if not isinstance(rules, list):
+            raise ValueError("il file non contiene un elenco di regole")
+        digest = hashlib.blake2b(content, digest_size=6).hexdigest()
+        return cls(country, rules, str(ruleset.get("version", "0")), digest, path, (stat.st_mtime_ns, stat.st_size))
+    
+    def to_dict(self) -> Dict[str, Any]:
+        """
+        Converte il ruleset in un dizionario serializzabile.
+        
+        Returns:
+            Dict[str, Any]: Paese, versione, chiave, numero di regole e origine.
+        """
+        return {
+            "country": self.country,
+            "version": self.version,
+            "key": self.key,
+            "rules": len(self.rules),
+            "keywords": self.matcher.automaton.size,
+            "path": self.path,
+            "loaded_at": self.loaded_at
+        }
+
+class RulesetRegistry:
+    """
+    Indice dei ruleset etici per paese.
+    
+    Come il registro dei moduli, le letture non prendono lock: l'indice viene sostituito per intero
+    (copy-on-write) ad ogni modifica. Una validazione in corso usa il CompiledRuleset che ha già
+    risolto, quindi la sostituzione non la blocca né la altera. Un controllo periodico
+    (RULESET_WATCH_INTERVAL secondi, 0 per disattivarlo) confronta le firme dei file e ricompila,
+    fuori dal lock, solo quelli modificati e non più in scrittura; se un file non è valido resta attiva la versione precedente.
+    Le ultime RULESET_HISTORY versioni di ogni paese restano disponibili per chiave.
+    """
+    
+    def __init__(self, rulesets_dir: Optional[str] = None, default_country: Optional[str] = None,
+                 fallback_country: Optional[str] = None, watch_interval: Optional[float] = None,
+                 history: Optional[int] = None):
+        """
+        Inizializza il registro dei ruleset.
+        
+        Args:
+            rulesets_dir: Directory dei file ruleset_{paese}.json. Se None, usa la directory di questo file.
+            default_country: Paese usato quando il chiamante non ne indica uno.
+            fallback_country: Paese il cui ruleset si applica ai paesi senza ruleset (nessuno se vuoto).
+            watch_interval: Secondi tra due controlli dei file (0 per disattivare il controllo).
+            history: Versioni conservate per paese.
+        """
+        self.rulesets_dir = rulesets_dir or os.getenv("RULESETS_DIR") or os.path.dirname(os.path.abspath(__file__))
+        self.default_country = country_code(default_country or os.getenv("ETHICS_DEFAULT_COUNTRY", "it")) or "it"
+        fallback = fallback_country if fallback_country is not None else os.getenv("ETHICS_FALLBACK_COUNTRY", "")
+        self.fallback_country = country_code(fallback) if fallback else None
+        if fallback and self.fallback_country is None:
+            logger.warning(f"Paese di riserva {fallback} non riconosciuto, nessun ruleset di riserva")
+        self.watch_interval = watch_interval if watch_interval is not None else float(os.getenv("RULESET_WATCH_INTERVAL", "2"))
+        self.history = max(1, history or int(os.getenv("RULESET_HISTORY", "5")))
+        self._rulesets: Dict[str, CompiledRuleset] = {}
+        self._versions: Dict[str, "OrderedDict[str, CompiledRuleset]"] = {}
+        self._failed: Dict[str, Optional[Signature]] = {}
+        self._pending: Dict[str, Signature] = {}
+        self._lock = threading.RLock()
+        self._stop = threading.Event()
+        self._watcher: Optional[threading.Thread] = None
+        self.discovered = False
+        self.reloads = 0
+        self.errors = 0
+        logger.info(f"RulesetRegistry inizializzato con directory: {self.rulesets_dir}")
+    
+    def get(self, country: Optional[str] = None, version: Optional[str] = None) -> Optional[CompiledRuleset]:
+        """
+        Restituisce il ruleset attivo di un paese, o una sua versione precedente.
+        
+        Args:
+            country: Paese. Se None, usa il paese predefinito.
+            version: Chiave di una versione specifica (CompiledRuleset.key). Se None, la versione attiva.
+        
+        Returns:
+            Optional[CompiledRuleset]: Ruleset, o None se il paese (o la versione) non è disponibile.
+        """
+        if not self.discovered:
+            self.discover()
+        code = country_code(country) if country else self.default_country
+        if code is None:
+            logger.warning(f"Paese {country} non riconosciuto: usare un codice ISO di due lettere")
+            return self._rulesets.get(self.fallback_country) if self.fallback_country and version is None else None
+        
+        if version is not None:
+            versions = self._versions.get(code)
+            return versions.get(version) if versions is not None else None
+        
+        ruleset = self._rulesets.get(code)
+        if ruleset is None:
+            # Il file potrebbe essere stato aggiunto dopo l'ultimo controllo
+            ruleset = self.reload(code) if self._changed(code) else None
+        if ruleset is None and self.fallback_country and code != self.fallback_country:
+            ruleset = self._rulesets.get(self.fallback_country)
+        return ruleset
+    
+    def discover(self) -> List[str]:
+        """
+        Carica tutti i ruleset presenti nella directory.
+        
+        Returns:
+            List[str]: Codici dei paesi con un ruleset attivo.
+        """
+        for code in self._file_countries():
+            if code not in self._rulesets:
+                self.reload(code)
+        self.discovered = True
+        countries = sorted(self._rulesets)
+        logger.info(f"Indicizzati {len(countries)} ruleset etici: {countries}")
+        return countries
+    
+    def reload(self, country: str) -> Optional[CompiledRuleset]:
+        """
+        Ricarica il ruleset di un paese e sostituisce atomicamente la versione attiva.
+        
+        Le validazioni già in corso terminano con la versione precedente; quelle successive usano
+        la nuova. Se il file non è valido la versione precedente resta attiva.
+        
+        Args:
+            country: Paese del ruleset.
+        
+        Returns:
+            Optional[CompiledRuleset]: Nuova versione o None se il ricaricamento non è riuscito.
+        """
+        code = country_code(country)
+        if code is None:
+            logger.warning(f"Paese {country} non riconosciuto, impossibile ricaricare il ruleset")
+            return None
+        path = self._path(code)
+        
+        # La compilazione avviene fuori dal lock: le letture e gli altri paesi non attendono
+        try:
+            ruleset = CompiledRuleset.from_file(code, path)
+        except Exception as e:
+            # La firma del file non valido evita di ritentare finché il file non cambia
+            self._failed[code] = self._signature(code)
+            self.errors += 1
+            logger.error(f"Errore durante il caricamento del ruleset {path}: {str(e)}")
+            return None
+        
+        with self._lock:
+            self._failed.pop(code, None)
+            current = self._rulesets.get(code)
+            if current is not None and current.key == ruleset.key:
+                # Contenuto invariato (es. file solo toccato): resta la versione già compilata
+                current.signature = ruleset.signature
+                return current
+            self._swap(ruleset)
+        
+        self.reloads += 1
+        previous = current.key if current is not None else "nessuna"
+        logger.info(f"Ruleset {code} caricato: {previous} -> {ruleset.key} ({len(ruleset.rules)} regole)")
+        return ruleset
+    
+    def check(self) -> List[str]:
+        """
+        Ricarica i ruleset i cui file sono stati modificati o aggiunti.
+        
+        Un file modificato viene ricaricato solo quando la sua firma è uguale a quella del controllo
+        precedente, per non leggere un file mentre viene ancora scritto.
+        
+        Returns:
+            List[str]: Codici dei paesi ricaricati.
+        """
+        reloaded = []
+        for code in self._file_countries():
+            if not self._changed(code):
+                self._pending.pop(code, None)
+                continue
+            signature = self._signature(code)
+            if self._pending.get(code) != signature:
+                self._pending[code] = signature
+                continue
+            del self._pending[code]
+            current = self._rulesets.get(code)
+            ruleset = self.reload(code)
+            if ruleset is not None and ruleset is not current:
+                reloaded.append(code)
+        return reloaded
+    
+    def start_watching(self) -> None:
+        """
+        Avvia il thread che controlla periodicamente i file dei ruleset (se il controllo è attivo).
+        """
+        with self._lock:
+            if self.watch_interval <= 0 or (self._watcher is not None and self._watcher.is_alive()):
+                return
+            self._stop.clear()
+            self._watcher = threading.Thread(target=self._watch, name="osireon-ruleset-watcher", daemon=True)
+            self._watcher.start()
+        logger.info(f"Controllo dei ruleset avviato ogni {self.watch_interval:g}s")
+    
+    def stop_watching(self) -> None:
+        """
+        Arresta il thread di controllo dei file.
+        """
+        self._stop.set()
+        watcher = self._watcher
+        if watcher is not None:
+            watcher.join(timeout=self.watch_interval + 1)
+        self._watcher = None
+    
+    def list_rulesets(self) -> List[Dict[str, Any]]:
+        """
+        Elenca i ruleset attivi con le versioni conservate.
+        
+        Returns:
+            List[Dict[str, Any]]: Descrizione di ogni ruleset attivo.
+        """
+        if not self.discovered:
+            self.discover()
+        rulesets, versions = self._rulesets, self._versions
+        return [
+            {**rulesets[code].to_dict(), "versions": list(versions.get(code, {}))}
+            for code in sorted(rulesets)
+        ]
+    
+    def stats(self) -> Dict[str, Any]:
+        """
+        Restituisce le metriche del registro.
+        
+        Returns:
+            Dict[str, Any]: Versioni attive, ricaricamenti, errori e stato del controllo dei file.
+        """
+        return {
+            "active": {code: ruleset.key for code, ruleset in sorted(self._rulesets.items())},
+            "reloads": self.reloads,
+            "errors": self.errors,
+            "watching": self._watcher is not None and self._watcher.is_alive(),
+            "watch_interval": self.watch_interval
+        }
+    
+    def _swap(self, ruleset: CompiledRuleset) -> None:
+        """
+        Pubblica un ruleset sostituendo l'indice con una nuova copia. Richiede il lock.
+        
+        Args:
+            ruleset: Ruleset da pubblicare.
+        """
+        versions = OrderedDict(self._versions.get(ruleset.country, ()))
+        versions[ruleset.key] = ruleset
+        versions.move_to_end(ruleset.key)
+        while len(versions) > self.history:
+            versions.popitem(last=False)
+        rulesets = dict(self._rulesets)
+        rulesets[ruleset.country] = ruleset
+        all_versions = dict(self._versions)
+        all_versions[ruleset.country] = versions
+        self._versions = all_versions
+        self._rulesets = rulesets
+    
+    def _watch(self) -> None:
+        """
+        Ciclo del thread di controllo dei file.
+        """
+        while not self._stop.wait(self.watch_interval):
+            try:
+                self.check()
+            except Exception as e:
+                logger.error(f"Errore durante il controllo dei ruleset: {str(e)}")
+    
+    def _signature(self, code: str) -> Optional[Signature]:
+        """
+        Legge la firma del file di ruleset di un paese.
+        
+        Args:
+            code: Codice paese.
+        
+        Returns:
+            Optional[Signature]: Firma del file, o None se il file non esiste.
+        """
+        try:
+            stat = os.stat(self._path(code))
+        except OSError:
+            return None
+        return (stat.st_mtime_ns, stat.st_size)
+    
+    def _changed(self, code: str) -> bool:
+        """
+        Indica se il file di ruleset di un paese è diverso sia dalla versione attiva sia
+        dall'ultimo tentativo fallito.
+        
+        Args:
+            code: Codice paese.
+        
+        Returns:
+            bool: True se il file esiste e va (ri)caricato.
+        """
+        signature = self._signature(code)
+        if signature is None:
+            return False
+        current = self._rulesets.get(code)
+        if current is not None and current.signature == signature:
+            return False
+        return self._failed.get(code, -1) != signature
+    
+    def _path(self, code: str) -> str:
+        """
+        Restituisce il percorso del file di ruleset di un paese.
+        
+        Args:
+            code: Codice paese.
+        
+        Returns:
+            str: Percorso del file.
+        """
+        return os.path.join(self.rulesets_dir, f"ruleset_{code}.json")
+    
+    def _file_countries(self) -> List[str]:
+        """
+        Elenca i paesi con un file di ruleset nella directory.
+        
+        Returns:
+            List[str]: Codici paese.
+        """
+        try:
+            filenames = os.listdir(self.rulesets_dir)
+        except OSError as e:
+            logger.error(f"Impossibile leggere la directory dei ruleset {self.rulesets_dir}: {str(e)}")
+            return []
+        return sorted(match.group(1) for match in map(RULESET_FILE_PATTERN.match, filenames) if match)
+
+# Istanza singleton del registro dei ruleset etici
+ruleset_registry = RulesetRegistry()
@@ -2,77 +2,114 @@
 Validatore etico per Osireon.
 Questo file contiene l'implementazione del validatore di conformità etica.
 """
-import json
 import logging
-import os
 from typing import Dict, Any, List, Optional
 
+from src.ethics.registry import ruleset_registry, RulesetRegistry, CompiledRuleset
+
 # Configurazione del logging
 logger = logging.getLogger("osireon.ethics")
 
+# Esito della validazione: regole applicate, oppure nessun ruleset disponibile per il paese
+VALIDATED = "validated"
+NOT_VALIDATED = "not_validated"
+
 class EthicsValidator:
     """
     Validatore di conformità etica per le proposte di policy.
+    
+    Le regole di ogni paese vengono dal registro dei ruleset, che le compila in un RuleMatcher una
+    sola volta per versione: ogni proposta viene scansionata una sola volta per tutte le regole.
+    Ogni validazione usa dall'inizio alla fine la versione risolta alla chiamata, e il risultato
+    riporta la chiave di quella versione (campo "ruleset").
     """
     
-    def __init__(self, ruleset_path: str = "src/ethics/ruleset_it.json"):
+    def __init__(self, registry: Optional[RulesetRegistry] = None):
         """
         Inizializza il validatore etico.
         
         Args:
-            ruleset_path: Percorso del file JSON contenente le regole etiche.
+            registry: Registro dei ruleset. Se None, usa il registro condiviso.
+        """
+        self.registry = registry or ruleset_registry
+        logger.info(f"EthicsValidator inizializzato con i ruleset di {self.registry.rulesets_dir}")
+    
+    def ruleset(self, country: Optional[str] = None, version: Optional[str] = None) -> Optional[CompiledRuleset]:
+        """
+        Restituisce il ruleset attivo di un paese (o una versione specifica).
+        
+        Args:
+            country: Paese. Se None, usa il paese predefinito del registro.
+            version: Chiave della versione richiesta. Se None, la versione attiva.
+            
+        Returns:
+            Optional[CompiledRuleset]: Ruleset o None se non disponibile.
         """
-        self.ruleset_path = ruleset_path
-        self.rules = self._load_rules()
-        logger.info(f"EthicsValidator inizializzato con {len(self.rules)} regole")
+        return self.registry.get(country, version)
     
-    def _load_rules(self) -> List[Dict[str, Any]]:
+    def rules(self, country: Optional[str] = None) -> List[Dict[str, Any]]:
         """
-        Carica le regole etiche dal file JSON.
+        Restituisce le regole etiche attive di un paese.
         
+        Args:
+            country: Paese. Se None, usa il paese predefinito del registro.
+            
         Returns:
-            List[Dict[str, Any]]: Lista delle regole etiche.
+            List[Dict[str, Any]]: Lista delle regole etiche (vuota se il paese non ha un ruleset).
         """
-        try:
-            with open(self.ruleset_path, 'r') as file:
-                ruleset = json.load(file)
-                return ruleset.get("rules", [])
-        except Exception as e:
-            logger.error(f"Errore durante il caricamento delle regole etiche: {str(e)}")
-            return []
+        ruleset = self.ruleset(country)
+        return ruleset.rules if ruleset is not None else []
     
-    def validate(self, proposals: List[str], domain: str) -> Dict[str, Any]:
+    def validate(self, proposals: List[str], domain: str, rule_checks: bool = True,
+                 country: Optional[str] = None, version: Optional[str] = None) -> Dict[str, Any]:
         """
         Valida le proposte di policy rispetto alle regole etiche.
         
         Args:
             proposals: Lista delle proposte di policy da validare.
             domain: Dominio delle proposte (es. economia, sociale).
+            rule_checks: Se includere per ogni proposta l'esito di ogni regola (rule_checks).
+            country: Paese delle proposte. Se None, usa il paese predefinito del registro.
+            version: Chiave della versione del ruleset da usare (es. per ricalcolare un risultato salvato).
+                Se None o non più disponibile, usa la versione attiva.
             
         Returns:
-            Dict[str, Any]: Risultato della validazione etica.
+            Dict[str, Any]: Risultato della validazione etica. Se il paese non ha un ruleset lo stato è
+                NOT_VALIDATED e passed è None.
         """
-        logger.info(f"Validazione etica di {len(proposals)} proposte nel dominio {domain}")
-        
-        if not self.rules:
-            logger.warning("Nessuna regola etica caricata, impossibile eseguire la validazione")
+        logger.info(f"Validazione etica di {len(proposals)} proposte nel dominio {domain} (paese: {country or 'predefinito'})")
+        
+        # La versione risolta qui resta in uso fino alla fine, anche se nel frattempo viene sostituita
+        ruleset = self.ruleset(country, version) if version else None
+        if ruleset is None:
+            if version:
+                logger.warning(f"Versione {version} del ruleset non più disponibile, utilizzo la versione attiva")
+            ruleset = self.ruleset(country)
+        
+        if ruleset is None or not ruleset.rules:
+            # Senza regole le proposte non sono né approvate né respinte: l'esito resta indeterminato
+            logger.warning(f"Nessuna regola etica caricata per il paese {country or 'predefinito'}, proposte non validate")
             return {
-                "passed": False,
-                "message": "Nessuna regola etica disponibile",
-                "violations": ["Impossibile eseguire la validazione etica: regole non disponibili"]
+                "status": NOT_VALIDATED,
+                "passed": None,
+                "message": f"Nessun ruleset etico disponibile per il paese {country or 'predefinito'}: proposte non validate",
+                "violations": [],
+                "ruleset": ruleset.key if ruleset is not None else None
             }
         
         # Risultato complessivo della validazione
         validation_result = {
+            "status": VALIDATED,
             "passed": True,
             "violations": [],
-            "proposal_results": {}
+            "proposal_results": {},
+            "ruleset": ruleset.key
         }
         
         # Valida ogni proposta
         for i, proposal in enumerate(proposals):
             proposal_key = f"proposal_{i+1}"
-            proposal_result = self._validate_proposal(proposal, domain)
+            proposal_result = self._validate_proposal(ruleset, proposal, domain, rule_checks)
             
             # Aggiungi il risultato della proposta
             validation_result["proposal_results"][proposal_key] = proposal_result
@@ -93,13 +130,16 @@ class EthicsValidator:
         logger.info(f"Validazione etica completata: {validation_result['message']}")
         return validation_result
     
-    def _validate_proposal(self, proposal: str, domain: str) -> Dict[str, Any]:
+    def _validate_proposal(self, ruleset: CompiledRuleset, proposal: str, domain: str,
+                           rule_checks: bool = True) -> Dict[str, Any]:
         """
         Valida una singola proposta rispetto alle regole etiche.
         
         Args:
+            ruleset: Ruleset compilato da applicare.
             proposal: Proposta di policy da validare.
             domain: Dominio della proposta.
+            rule_checks: Se includere l'esito di ogni regola.
             
         Returns:
             Dict[str, Any]: Risultato della validazione della proposta.
@@ -108,76 +148,21 @@ class EthicsValidator:
         result = {
             "proposal": proposal,
             "passed": True,
-            "violations": [],
-            "rule_checks": []
+            "violations": []
         }
         
-        # Controlla ogni regola
-        for rule in self.rules:
-            rule_check = self._check_rule(proposal, rule, domain)
-            result["rule_checks"].append(rule_check)
-            
-            # Se la regola è violata, aggiungi alla lista delle violazioni
-            if not rule_check["passed"]:
-                result["passed"] = False
-                violation = f"{rule['id']} - {rule['name']}: {rule_check['reason']}"
-                result["violations"].append(violation)
+        # Tutte le regole vengono valutate con una sola scansione della proposta
+        violated, checks = ruleset.matcher.evaluate(proposal, domain, rule_checks)
+        if rule_checks:
+            result["rule_checks"] = checks
         
-        return result
-    
-    def _check_rule(self, proposal: str, rule: Dict[str, Any], domain: str) -> Dict[str, Any]:
-        """
-        Controlla se una proposta rispetta una regola etica.
-        
-        Args:
-            proposal: Proposta di policy da controllare.
-            rule: Regola etica da verificare.
-            domain: Dominio della proposta.
-            
-        Returns:
-            Dict[str, Any]: Risultato del controllo della regola.
-        """
-        # Implementazione mock - in una versione reale, qui ci sarebbe una logica più sofisticata
-        # che potrebbe utilizzare NLP o LLM per analizzare la proposta
+        # Le regole violate vengono aggiunte alla lista delle violazioni
+        for rule_index, reason in violated:
+            rule = ruleset.matcher.rules[rule_index]
+            result["passed"] = False
+            result["violations"].append(f"{rule.rule_id} - {rule.name}: {reason}")
         
-        rule_id = rule.get("id", "unknown")
-        rule_name = rule.get("name", "Regola sconosciuta")
-        rule_description = rule.get("description", "")
-        rule_keywords = rule.get("keywords", [])
-        rule_severity = rule.get("severity", "medium")
-        
-        # Controlla se la proposta contiene parole chiave negative associate alla regola
-        proposal_lower = proposal.lower()
-        
-        # Simulazione di controllo basato su parole chiave e dominio
-        # In una implementazione reale, questa logica sarebbe molto più sofisticata
-        
-        # Genera un risultato casuale ma deterministico basato sulla proposta e sulla regola
-        # Questo è solo per simulazione, in una implementazione reale ci sarebbe una vera analisi
-        passed = True
-        reason = f"La proposta rispetta la regola '{rule_name}'"
-        
-        # Simulazione di alcune violazioni specifiche
-        if rule_id == "rule_002" and "flat tax" in proposal_lower and domain.lower() == "economia":
-            passed = False
-            reason = "La proposta potrebbe aumentare il deficit pubblico senza adeguate compensazioni"
-        elif rule_id == "rule_003" and any(kw in proposal_lower for kw in ["tassa", "riduzione", "taglio"]) and domain.lower() == "sociale":
-            passed = False
-            reason = "La proposta potrebbe aumentare le disuguaglianze sociali"
-        elif rule_id == "rule_004" and any(kw in proposal_lower for kw in ["carbone", "petrolio", "gas"]) and not "rinnovabile" in proposal_lower:
-            passed = False
-            reason = "La proposta potrebbe avere un impatto negativo sull'ambiente"
-        elif rule_id == "rule_008" and any(kw in proposal_lower for kw in ["dati", "monitoraggio", "sorveglianza"]):
-            passed = False
-            reason = "La proposta potrebbe violare la privacy dei cittadini"
-        
-        return {
-            "rule_id": rule_id,
-            "rule_name": rule_name,
-            "passed": passed,
-            "reason": reason,
-            "severity": rule_severity
-        }
+        return result
 
 # Istanza singleton del validatore etico
 ethics_validator = EthicsValidator()
@@ -0,0 +1,148 @@
+"""
+Raggruppamento delle richieste LLM per Osireon.
+Questo file contiene il micro-batcher che raccoglie le chiamate concorrenti con gli stessi parametri
+per pochi millisecondi, le invia come un'unica richiesta e restituisce a ogni chiamante la sua risposta.
+"""
+import asyncio
+import logging
+import os
+import weakref
+from typing import Awaitable, Callable, Dict, Any, Hashable, List, Optional, Set, Tuple
+
+# Configurazione del logging
+logger = logging.getLogger("osireon.llm.batching")
+
+# Funzione che esegue una richiesta raggruppata: riceve la chiave del gruppo e i prompt,
+# restituisce per ogni prompt il testo e il motivo di fine ("stop", "length" o None)
+BatchDispatch = Callable[[Hashable, List[str]], Awaitable[List[Tuple[str, Optional[str]]]]]
+
+class _Batch:
+    """
+    Gruppo di chiamate in attesa di essere inviate.
+    """
+    
+    def __init__(self):
+        self.prompts: List[str] = []
+        self.futures: List[asyncio.Future] = []
+        self.timer: Optional[asyncio.TimerHandle] = None
+
+class MicroBatcher:
+    """
+    Micro-batcher delle chiamate LLM.
+    
+    Le chiamate con la stessa chiave (provider, modello e parametri di generazione) vengono raccolte
+    per al più window secondi dalla prima, o finché il gruppo raggiunge max_size, e inviate insieme.
+    Una finestra più lunga aumenta la dimensione dei gruppi (throughput) al costo di latenza aggiuntiva
+    per la prima chiamata di ogni gruppo. I gruppi sono separati per ciclo di eventi.
+    """
+    
+    def __init__(self, dispatch: BatchDispatch, window: Optional[float] = None, max_size: Optional[int] = None):
+        """
+        Inizializza il micro-batcher.
+        
+        Args:
+            dispatch: Funzione che esegue una richiesta raggruppata.
+            window: Attesa massima per completare un gruppo in secondi.
+            max_size: Numero massimo di chiamate per gruppo.
+        """
+        self.dispatch = dispatch
+        self.window = window if window is not None else float(os.getenv("LLM_BATCH_WINDOW_MS", "5")) / 1000
+        self.max_size = max_size or int(os.getenv("LLM_BATCH_MAX_SIZE", "16"))
+        self._pending: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, Dict[Hashable, _Batch]]" = weakref.WeakKeyDictionary()
+        self._tasks: Set[asyncio.Task] = set()
+        self._stats: Dict[str, int] = {"requests": 0, "batches": 0, "full_batches": 0, "largest_batch": 0, "errors": 0}
+        logger.info(f"MicroBatcher inizializzato con finestra {self.window * 1000:g}ms e gruppi di al più {self.max_size} chiamate")
+    
+    async def submit(self, key: Hashable, prompt: str) -> Tuple[str, Optional[str]]:
+        """
+        Accoda una chiamata al gruppo della sua chiave e ne attende la risposta.
+        
+        Args:
+            key: Chiave del gruppo (le chiamate con la stessa chiave possono essere inviate insieme).
+            prompt: Prompt della chiamata.
+        
+        Returns:
+            Tuple[str, Optional[str]]: Testo della risposta e motivo di fine.
+        """
+        loop = asyncio.get_running_loop()
+        pending = self._pending.setdefault(loop, {})
+        batch = pending.get(key)
+        if batch is None:
+            batch = pending[key] = _Batch()
+            batch.timer = loop.call_later(self.window, self._flush, loop, key)
+        
+        future = loop.create_future()
+        batch.prompts.append(prompt)
+        batch.futures.append(future)
+        self._stats["requests"] += 1
+        if len(batch.prompts) >= self.max_size:
+            self._stats["full_batches"] += 1
+            self._flush(loop, key)
+        return await future
+    
+    def stats(self) -> Dict[str, Any]:
+        """
+        Restituisce le metriche del micro-batcher.
+        
+        Returns:
+            Dict[str, Any]: Chiamate, gruppi inviati (di cui completi), dimensione media e massima dei gruppi.
+        """
+        batches = self._stats["batches"]
+        return {
+            "window_ms": self.window * 1000,
+            "max_size": self.max_size,
+            **self._stats,
+            "average_batch": round(self._stats["requests"] / batches, 2) if batches else None
+        }
+    
+    def _flush(self, loop: asyncio.AbstractEventLoop, key: Hashable) -> None:
+        """
+        Invia il gruppo in attesa di una chiave.
+        
+        Args:
+            loop: Ciclo di eventi del gruppo.
+            key: Chiave del gruppo.
+        """
+        batch = self._pending.get(loop, {}).pop(key, None)
+        if batch is None:
+            return
+        if batch.timer is not None:
+            batch.timer.cancel()
+        
+        # Le chiamate annullate prima dell'invio non fanno parte della richiesta
+        live = [(prompt, future) for prompt, future in zip(batch.prompts, batch.futures) if not future.done()]
+        if not live:
+            return
+        self._stats["batches"] += 1
+        self._stats["largest_batch"] = max(self._stats["largest_batch"], len(live))
+        task = loop.create_task(self._run(key, live))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+    
+    async def _run(self, key: Hashable, live: List[Tuple[str, asyncio.Future]]) -> None:
+        """
+        Esegue una richiesta raggruppata e distribuisce le risposte ai chiamanti.
+        
+        Args:
+            key: Chiave del gruppo.
+            live: Prompt e future dei chiamanti in attesa.
+        """
+        try:
+            results = await self.dispatch(key, [prompt for prompt, _ in live])
+            if len(results) != len(live):
+                raise ValueError(f"Risposte attese {len(live)}, ricevute {len(results)}")
+        except asyncio.CancelledError:
+            for _, future in live:
+                future.cancel()
+            raise
+        except Exception as e:
+            self._stats["errors"] += 1
+            logger.error(f"Errore nella richiesta raggruppata di {len(live)} chiamate: {str(e)}")
+            for _, future in live:
+                if not future.done():
+                    future.set_exception(e)
+            return
+        
+        for (_, future), result in zip(live, results):
+            if not future.done():
+                future.set_result(result)
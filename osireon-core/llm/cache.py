@@ -0,0 +1,275 @@
+"""
+Cache delle risposte LLM per Osireon.
+Questo file contiene la cache a due livelli (memoria e database) delle risposte dei modelli di linguaggio,
+con chiave data da provider, modello, temperatura e prompt normalizzato, e scadenza configurabile.
+"""
+import datetime
+import hashlib
+import json
+import logging
+import os
+import re
+import threading
+import time
+import unicodedata
+from collections import OrderedDict
+from typing import Dict, Any, Optional
+
+from src.db.database import db_manager
+
+# Configurazione del logging
+logger = logging.getLogger("osireon.llm.cache")
+
+_SPACES = re.compile(r"[ \t\f\v]+")
+_BLANK_LINES = re.compile(r"\n{3,}")
+
+def normalize_prompt(prompt: str) -> str:
+    """
+    Normalizza un prompt per il confronto: forma Unicode NFC, fine riga uniformi, spazi compattati,
+    al più una riga vuota consecutiva e nessuno spazio all'inizio e alla fine.
+    
+    Args:
+        prompt: Prompt da normalizzare.
+    
+    Returns:
+        str: Prompt normalizzato.
+    """
+    text = unicodedata.normalize("NFC", prompt).replace("\r\n", "\n").replace("\r", "\n")
+    text = "\n".join(_SPACES.sub(" ", line).strip() for line in text.split("\n"))
+    return _BLANK_LINES.sub("\n\n", text).strip()
+
+class LLMCache:
+    """
+    Cache delle risposte dei modelli di linguaggio.
+    
+    Il livello in memoria è una LRU limitata; il livello persistente è la tabella llm_cache,
+    usata solo se il database è stato inizializzato, e sopravvive ai riavvii. Vengono memorizzate
+    solo le risposte complete (non troncate da max_tokens) a temperature deterministiche, salvo
+    richiesta esplicita del chiamante. Le voci scadono dopo ttl secondi (0 per nessuna scadenza).
+    """
+    
+    def __init__(self, size: Optional[int] = None, ttl: Optional[float] = None, persistent: Optional[bool] = None,
+                 max_temperature: Optional[float] = None):
+        """
+        Inizializza la cache.
+        
+        Args:
+            size: Numero massimo di risposte in memoria (0 disabilita la cache).
+            ttl: Durata di una risposta memorizzata in secondi (0 per nessuna scadenza).
+            persistent: Se usare anche il database come livello persistente.
+            max_temperature: Temperatura massima considerata deterministica.
+        """
+        self.size = size if size is not None else int(os.getenv("LLM_CACHE_SIZE", "1024"))
+        self.ttl = ttl if ttl is not None else float(os.getenv("LLM_CACHE_TTL", "604800"))
+        if persistent is None:
+            persistent = os.getenv("LLM_CACHE_PERSISTENT", "true").lower() in ("1", "true", "yes")
+        self.persistent = persistent
+        self.max_temperature = max_temperature if max_temperature is not None else float(os.getenv("LLM_CACHE_MAX_TEMPERATURE", "0"))
+        self._memory: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        self._purged = False
+        self._stats: Dict[str, int] = {}
+        self._lock = threading.Lock()
+        logger.info(f"LLMCache inizializzata con {self.size} risposte in memoria, durata {self.ttl}s, livello persistente: {self.persistent}")
+    
+    @property
+    def enabled(self) -> bool:
+        """
+        Indica se la cache è attiva.
+        """
+        return self.size > 0
+    
+    def persistent_active(self) -> bool:
+        """
+        Indica se il livello persistente è utilizzabile (database inizializzato).
+        
+        Returns:
+            bool: True se le letture e le scritture raggiungono il database.
+        """
+        return self.persistent and db_manager.initialized
+    
+    def cacheable(self, temperature: float, override: Optional[bool] = None) -> bool:
+        """
+        Indica se le risposte di una chiamata possono essere memorizzate e riusate.
+        
+        Args:
+            temperature: Temperatura della chiamata.
+            override: True o False per forzare la scelta; None per decidere in base alla temperatura.
+        
+        Returns:
+            bool: True se la chiamata usa la cache.
+        """
+        if not self.enabled or override is False:
+            return False
+        if override is None and temperature > self.max_temperature:
+            with self._lock:
+                self._count("bypassed")
+            return False
+        return True
+    
+    def key(self, provider: str, model: str, temperature: float, prompt: str) -> str:
+        """
+        Calcola la chiave di una risposta.
+        
+        Args:
+            provider: Provider LLM.
+            model: Modello LLM.
+            temperature: Temperatura.
+            prompt: Prompt (viene normalizzato).
+        
+        Returns:
+            str: Chiave della risposta.
+        """
+        payload = json.dumps([provider.lower(), model, float(temperature), normalize_prompt(prompt)], ensure_ascii=False)
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+    
+    def lookup(self, key: str) -> Optional[str]:
+        """
+        Cerca una risposta in memoria e, se assente, nel database.
+        
+        Args:
+            key: Chiave della risposta.
+        
+        Returns:
+            Optional[str]: Risposta memorizzata e non scaduta, o None.
+        """
+        now = time.time()
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is not None:
+                if entry["expires_at"] is None or entry["expires_at"] > now:
+                    self._memory.move_to_end(key)
+                    self._hit("memory_hits", entry["response"])
+                    return entry["response"]
+                del self._memory[key]
+        
+        if self.persistent_active():
+            self._purge()
+            stored = db_manager.get_cached_response(key)
+            if stored is not None:
+                expires_at = stored["expires_at"]
+                if expires_at is not None:
+                    expires_at = datetime.datetime.fromisoformat(expires_at).replace(tzinfo=datetime.timezone.utc).timestamp()
+                self._remember(key, stored["response"], expires_at)
+                with self._lock:
+                    self._hit("persistent_hits", stored["response"])
+                return stored["response"]
+        
+        with self._lock:
+            self._count("misses")
+        return None
+    
+    def store(self, key: str, provider: str, model: str, prompt: str, response: str) -> bool:
+        """
+        Memorizza una risposta completa in memoria e nel database.
+        
+        Args:
+            key: Chiave della risposta.
+            provider: Provider LLM.
+            model: Modello LLM.
+            prompt: Prompt inviato.
+            response: Risposta ricevuta.
+        
+        Returns:
+            bool: True se la risposta è stata memorizzata.
+        """
+        if not response:
+            return False
+        
+        expires_at = time.time() + self.ttl if self.ttl > 0 else None
+        self._remember(key, response, expires_at)
+        with self._lock:
+            self._count("stores")
+        
+        if self.persistent_active():
+            expires = None
+            if expires_at is not None:
+                expires = datetime.datetime.utcfromtimestamp(expires_at)
+            db_manager.save_cached_response(key, provider.lower(), model, normalize_prompt(prompt), response, expires)
+        return True
+    
+    def stats(self) -> Dict[str, Any]:
+        """
+        Restituisce le metriche della cache.
+        
+        Returns:
+            Dict[str, Any]: Successi per livello, mancati successi, chiamate escluse, byte e token risparmiati.
+        """
+        with self._lock:
+            hits = self._stats.get("memory_hits", 0) + self._stats.get("persistent_hits", 0)
+            lookups = hits + self._stats.get("misses", 0)
+            return {
+                "entries": len(self._memory),
+                "size": self.size,
+                "ttl": self.ttl,
+                "persistent": self.persistent_active(),
+                "memory_hits": self._stats.get("memory_hits", 0),
+                "persistent_hits": self._stats.get("persistent_hits", 0),
+                "misses": self._stats.get("misses", 0),
+                "bypassed": self._stats.get("bypassed", 0),
+                "stores": self._stats.get("stores", 0),
+                "bytes_saved": self._stats.get("bytes_saved", 0),
+                "tokens_saved": self._stats.get("tokens_saved", 0),
+                "hit_ratio": round(hits / lookups, 4) if lookups else None
+            }
+    
+    def clear(self) -> None:
+        """
+        Svuota il livello in memoria e azzera le metriche.
+        """
+        with self._lock:
+            self._memory.clear()
+            self._stats.clear()
+    
+    def _remember(self, key: str, response: str, expires_at: Optional[float]) -> None:
+        """
+        Inserisce una risposta nel livello in memoria.
+        
+        Args:
+            key: Chiave della risposta.
+            response: Risposta da memorizzare.
+            expires_at: Istante di scadenza (secondi dall'epoca), o None.
+        """
+        with self._lock:
+            self._memory[key] = {"response": response, "expires_at": expires_at}
+            self._memory.move_to_end(key)
+            while len(self._memory) > self.size:
+                self._memory.popitem(last=False)
+    
+    def _purge(self) -> None:
+        """
+        Rimuove dal database le risposte scadute (una volta per processo).
+        """
+        with self._lock:
+            if self._purged:
+                return
+            self._purged = True
+        
+        removed = db_manager.purge_expired_responses()
+        if removed:
+            logger.info(f"Rimosse {removed} risposte LLM scadute dalla cache persistente")
+    
+    def _hit(self, counter: str, response: str) -> None:
+        """
+        Registra un successo e il risparmio corrispondente (da chiamare con il lock acquisito).
+        
+        Args:
+            counter: Nome della metrica del livello.
+            response: Risposta restituita dalla cache.
+        """
+        self._count(counter)
+        self._count("bytes_saved", len(response.encode("utf-8")))
+        # Stima coerente con estimate_tokens del connettore (circa 4 caratteri per token)
+        self._count("tokens_saved", (len(response) + 3) // 4)
+    
+    def _count(self, counter: str, amount: int = 1) -> None:
+        """
+        Incrementa una metrica (da chiamare con il lock acquisito).
+        
+        Args:
+            counter: Nome della metrica.
+            amount: Incremento.
+        """
+        self._stats[counter] = self._stats.get(counter, 0) + amount
+
+# Istanza singleton della cache delle risposte LLM
+llm_cache = LLMCache()
@@ -2,17 +2,60 @@
 Connettore LLM per Osireon.
 Questo file contiene l'implementazione del connettore per i modelli di linguaggio.
 """
+import asyncio
 import logging
 import os
-from typing import Dict, Any, Optional
+import threading
+import time
+from typing import Dict, Any, AsyncIterator, List, Optional, Tuple
 from dotenv import load_dotenv
 
+from src.llm.batching import MicroBatcher
+from src.llm.cache import llm_cache
+from src.llm.providers import build_providers, OpenAICompatibleProvider
+from src.llm.resilience import llm_resilience, CircuitOpenError, Target
+from src.llm.scheduler import llm_scheduler, RateLimiter
+from src.llm.transport import http_client
+
 # Caricamento delle variabili d'ambiente
 load_dotenv()
 
 # Configurazione del logging
 logger = logging.getLogger("osireon.llm")
 
+def estimate_tokens(text: str) -> int:
+    """
+    Stima il numero di token di un testo (circa 4 caratteri per token).
+    
+    Args:
+        text: Testo da stimare.
+        
+    Returns:
+        int: Numero stimato di token.
+    """
+    return (len(text) + 3) // 4
+
+def split_chunks(text: str, max_tokens: Optional[int] = None) -> Tuple[List[str], bool]:
+    """
+    Divide un testo in frammenti di una parola, fermandosi prima di superare max_tokens.
+    
+    Args:
+        text: Testo da dividere.
+        max_tokens: Numero massimo di token stimati. Se None, nessun limite.
+        
+    Returns:
+        Tuple[List[str], bool]: Frammenti e se il testo è stato troncato.
+    """
+    chunks = []
+    emitted = 0
+    for k, word in enumerate(text.split(" ")):
+        chunk = word if k == 0 else " " + word
+        if max_tokens is not None and emitted + estimate_tokens(chunk) > max_tokens:
+            return chunks, True
+        emitted += estimate_tokens(chunk)
+        chunks.append(chunk)
+    return chunks, False
+
 class LLMConnector:
     """
     Connettore per i modelli di linguaggio (LLM).
@@ -33,10 +76,49 @@ class LLMConnector:
             "deepseek": os.getenv("DEEPSEEK_API_KEY", "")
         }
         
-        logger.info(f"LLMConnector inizializzato con provider predefinito: {self.default_provider}")
+        # Latenza simulata di una risposta completa in secondi (solo per l'implementazione mock)
+        self.mock_latency = float(os.getenv("LLM_MOCK_LATENCY", "0"))
+        
+        # Provider reali (con chiave API o URL di base configurati); gli altri restano simulati
+        self.http_client = http_client
+        self.providers = build_providers(self.http_client)
+        
+        # Cache delle risposte (memoria e database)
+        self.cache = llm_cache
+        
+        # Limiti di frequenza per provider e coda con priorità
+        self.scheduler = llm_scheduler
+        
+        # Interruttori automatici, failover e richieste di riserva (hedging) tra provider
+        self.resilience = llm_resilience
+        
+        # Raggruppamento facoltativo delle chiamate concorrenti, per i backend che lo supportano
+        self.batching = os.getenv("LLM_BATCH_ENABLED", "false").lower() in ("1", "true", "yes")
+        self.batcher = MicroBatcher(self._dispatch_batch)
+        
+        # Ciclo di eventi in background condiviso dalle chiamate sincrone (creato al primo uso)
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._loop_lock = threading.Lock()
+        
+        logger.info(f"LLMConnector inizializzato con provider predefinito: {self.default_provider}, "
+                    f"provider reali: {', '.join(self.providers) or 'nessuno'}")
+    
+    def get_provider(self, provider: str) -> Optional[OpenAICompatibleProvider]:
+        """
+        Restituisce il provider reale configurato con il nome indicato.
+        
+        Args:
+            provider: Nome del provider.
+            
+        Returns:
+            Optional[OpenAICompatibleProvider]: Provider reale, o None se il provider è simulato.
+        """
+        return self.providers.get(provider.lower())
     
     def call_llm(self, prompt: str, provider: Optional[str] = None, 
-                model: Optional[str] = None, temperature: Optional[float] = None) -> str:
+                model: Optional[str] = None, temperature: Optional[float] = None,
+                cache: Optional[bool] = None, priority: str = "interactive",
+                hedge: Optional[bool] = None) -> str:
         """
         Chiama un modello di linguaggio con il prompt specificato.
         
@@ -45,6 +127,9 @@ class LLMConnector:
             provider: Il provider da utilizzare (openai, deepseek). Se None, usa il default.
             model: Il modello specifico da utilizzare. Se None, usa il default.
             temperature: La temperatura da utilizzare. Se None, usa il default.
+            cache: True o False per forzare l'uso della cache; se None, solo a temperature deterministiche.
+            priority: Priorità nella coda dei limiti di frequenza ("interactive" o "batch").
+            hedge: True o False per forzare le richieste di riserva; se None, secondo LLM_HEDGE_ENABLED.
             
         Returns:
             str: La risposta generata dal modello.
@@ -57,10 +142,24 @@ class LLMConnector:
         logger.info(f"Chiamata a LLM con provider: {provider}, modello: {model}, temperatura: {temperature}")
         logger.info(f"Prompt: {prompt[:100]}...")
         
-        # Implementazione mock - in una versione reale, qui ci sarebbe la chiamata effettiva all'API
         try:
-            # Simula una risposta basata sul provider e sul prompt
-            response = self._mock_response(provider, prompt)
+            key = self._cache_key(provider, model, temperature, prompt, cache)
+            cached = self.cache.lookup(key) if key else None
+            if cached is not None:
+                logger.info(f"Risposta LLM dalla cache: {cached[:100]}...")
+                return cached
+            
+            targets = self.resilience.route(provider, model)
+            if self._direct(targets):
+                # Implementazione mock: risposta simulata basata sul provider e sul prompt
+                response, finish_reason, target = self._mock_response(provider, prompt), None, targets[0]
+            else:
+                response, finish_reason, target = self._run_sync(
+                    self._complete(targets, prompt, temperature, None, priority, hedge)
+                )
+            
+            if key and finish_reason != "length":
+                self.cache.store(self.cache.key(*target, temperature, prompt), target[0], target[1], prompt, response)
             
             logger.info(f"Risposta LLM ricevuta: {response[:100]}...")
             return response
@@ -69,6 +168,442 @@ class LLMConnector:
             logger.error(f"Errore durante la chiamata a LLM: {str(e)}")
             return f"Errore: {str(e)}"
     
+    async def stream_llm(self, prompt: str, provider: Optional[str] = None, model: Optional[str] = None,
+                         temperature: Optional[float] = None, max_tokens: Optional[int] = None,
+                         cache: Optional[bool] = None, priority: str = "interactive") -> AsyncIterator[str]:
+        """
+        Chiama un modello di linguaggio restituendo la risposta a frammenti, man mano che viene generata.
+        
+        Una risposta presente nella cache viene restituita subito, a parole, troncata a max_tokens;
+        vengono memorizzate solo le risposte ricevute per intero e non troncate da max_tokens.
+        
+        Args:
+            prompt: Il prompt da inviare al modello.
+            provider: Il provider da utilizzare (openai, deepseek). Se None, usa il default.
+            model: Il modello specifico da utilizzare. Se None, usa il default.
+            temperature: La temperatura da utilizzare. Se None, usa il default.
+            max_tokens: Numero massimo di token della risposta. Se None, nessun limite.
+            cache: True o False per forzare l'uso della cache; se None, solo a temperature deterministiche.
+            priority: Priorità nella coda dei limiti di frequenza ("interactive" o "batch").
+            
+        Yields:
+            str: Frammenti successivi della risposta.
+        """
+        provider = provider or self.default_provider
+        model = model or self.default_model
+        temperature = temperature if temperature is not None else self.default_temperature
+        
+        logger.info(f"Chiamata in streaming a LLM con provider: {provider}, modello: {model}, temperatura: {temperature}")
+        
+        key = self._cache_key(provider, model, temperature, prompt, cache)
+        cached = await self._cache_call(self.cache.lookup, key) if key else None
+        if cached is not None:
+            for chunk in split_chunks(cached, max_tokens)[0]:
+                # Cede il controllo tra i frammenti, così la chiamata resta annullabile
+                await asyncio.sleep(0)
+                yield chunk
+            return
+        
+        # Se un provider fallisce prima del primo frammento, la chiamata passa alla destinazione successiva
+        targets = self.resilience.route(provider, model)
+        received: List[str] = []
+        truncated = False
+        for index, target in enumerate(targets):
+            breaker = self.resilience.breaker(target[0])
+            if not breaker.allow():
+                # Interruttore aperto, o prova a mezzo aperto già in corso: destinazione saltata
+                if index == len(targets) - 1:
+                    raise CircuitOpenError(f"Interruttore del provider {target[0]} aperto")
+                logger.warning(f"Interruttore di {target[0]} aperto: passaggio a {targets[index + 1][0]}")
+                continue
+            try:
+                admission = await self._admit(target[0], prompt, max_tokens, priority)
+            except BaseException:
+                breaker.release()
+                raise
+            try:
+                adapter = self.get_provider(target[0])
+                if adapter is not None:
+                    # Il flusso del provider viene chiuso esplicitamente, così un consumatore che si ferma
+                    # prima della fine restituisce subito la connessione e il posto di concorrenza
+                    outcome: Dict[str, Any] = {}
+                    stream = adapter.stream(prompt, target[1], temperature, max_tokens, outcome=outcome)
+                    try:
+                        async for chunk in stream:
+                            received.append(chunk)
+                            yield chunk
+                    finally:
+                        await stream.aclose()
+                    truncated = outcome.get("finish_reason") == "length"
+                else:
+                    # Implementazione mock: la risposta simulata viene restituita una parola alla volta
+                    response = self._mock_response(target[0], prompt)
+                    chunks, truncated = split_chunks(response, max_tokens)
+                    delay = self.mock_latency / len(response.split(" "))
+                    for chunk in chunks:
+                        # Cede il controllo anche senza latenza simulata, così la chiamata resta annullabile
+                        await asyncio.sleep(delay)
+                        received.append(chunk)
+                        yield chunk
+            except Exception as e:
+                breaker.record_failure()
+                if received or index == len(targets) - 1:
+                    raise
+                logger.warning(f"Streaming da {target[0]} fallito ({str(e)}): passaggio a {targets[index + 1][0]}")
+                continue
+            except BaseException:
+                breaker.release()
+                raise
+            finally:
+                # Anche una risposta interrotta consuma i token ricevuti fin qui
+                self._settle(admission, prompt, "".join(received))
+            breaker.record_success()
+            break
+        
+        if key and not truncated:
+            await self._cache_call(self.cache.store, self.cache.key(*target, temperature, prompt),
+                                   target[0], target[1], prompt, "".join(received))
+    
+    async def call_llm_async(self, prompt: str, provider: Optional[str] = None, model: Optional[str] = None,
+                             temperature: Optional[float] = None, max_tokens: Optional[int] = None,
+                             cache: Optional[bool] = None, priority: str = "interactive",
+                             hedge: Optional[bool] = None) -> str:
+        """
+        Chiama un modello di linguaggio senza bloccare il ciclo di eventi.
+        
+        A differenza di call_llm, gli errori vengono propagati al chiamante. Con il raggruppamento
+        attivo, le chiamate concorrenti con gli stessi parametri vengono inviate insieme. Con le
+        destinazioni di riserva configurate, una chiamata lenta può essere duplicata (hedging) e una
+        fallita ripetuta su un altro provider o modello.
+        
+        Args:
+            prompt: Il prompt da inviare al modello.
+            provider: Il provider da utilizzare (openai, deepseek). Se None, usa il default.
+            model: Il modello specifico da utilizzare. Se None, usa il default.
+            temperature: La temperatura da utilizzare. Se None, usa il default.
+            max_tokens: Numero massimo di token della risposta. Se None, nessun limite.
+            cache: True o False per forzare l'uso della cache; se None, solo a temperature deterministiche.
+            priority: Priorità nella coda dei limiti di frequenza ("interactive" o "batch").
+            hedge: True o False per forzare le richieste di riserva; se None, secondo LLM_HEDGE_ENABLED.
+            
+        Returns:
+            str: La risposta generata dal modello.
+        """
+        provider = provider or self.default_provider
+        model = model or self.default_model
+        temperature = temperature if temperature is not None else self.default_temperature
+        if self._direct([(provider.lower(), model)]) and not self.resilience.fallbacks:
+            chunks = []
+            async for chunk in self.stream_llm(prompt, provider, model, temperature, max_tokens, cache, priority):
+                chunks.append(chunk)
+            return "".join(chunks)
+        
+        key = self._cache_key(provider, model, temperature, prompt, cache)
+        cached = await self._cache_call(self.cache.lookup, key) if key else None
+        if cached is not None:
+            return "".join(split_chunks(cached, max_tokens)[0])
+        
+        targets = self.resilience.route(provider, model)
+        response, finish_reason, target = await self._complete(targets, prompt, temperature, max_tokens, priority, hedge)
+        if key and finish_reason != "length":
+            await self._cache_call(self.cache.store, self.cache.key(*target, temperature, prompt),
+                                   target[0], target[1], prompt, response)
+        return response
+    
+    async def _complete(self, targets: List[Target], prompt: str, temperature: float, max_tokens: Optional[int],
+                        priority: str, hedge: Optional[bool]) -> Tuple[str, Optional[str], Target]:
+        """
+        Completa una chiamata sulle destinazioni indicate.
+        
+        La chiamata parte sulla prima destinazione; se fallisce, passa alla successiva. Con l'hedging
+        attivo, se la prima destinazione non risponde entro la soglia di latenza, viene inviata una
+        richiesta di riserva alla seconda: si usa la prima risposta e l'altra richiesta viene annullata.
+        
+        Args:
+            targets: Destinazioni (provider, modello) in ordine di preferenza.
+            prompt: Il prompt da inviare al modello.
+            temperature: La temperatura da utilizzare.
+            max_tokens: Numero massimo di token della risposta, o None.
+            priority: Priorità nella coda dei limiti di frequenza.
+            hedge: True o False per forzare le richieste di riserva; se None, secondo la configurazione.
+            
+        Returns:
+            Tuple[str, Optional[str], Target]: Risposta, motivo di fine e destinazione che ha risposto.
+        """
+        hedge = self.resilience.hedging if hedge is None else hedge
+        started = time.monotonic()
+        primary, remaining = targets[0], list(targets[1:])
+        attempts: Dict[asyncio.Future, Target] = {}
+        attempts[asyncio.ensure_future(self._attempt(primary, prompt, temperature, max_tokens, priority))] = primary
+        hedged = False
+        errors: List[Exception] = []
+        try:
+            while attempts:
+                timeout = None
+                if hedge and not hedged and remaining:
+                    timeout = max(0.0, self.resilience.hedge_delay(primary[0]) - (time.monotonic() - started))
+                done, _ = await asyncio.wait(attempts, timeout=timeout, return_when=asyncio.FIRST_COMPLETED)
+                if not done:
+                    # La destinazione principale ha superato la soglia: richiesta di riserva
+                    hedged = True
+                    target = remaining.pop(0)
+                    logger.info(f"Nessuna risposta da {primary[0]} dopo {(time.monotonic() - started) * 1000:.0f}ms: "
+                                f"richiesta di riserva a {target[0]} ({target[1]})")
+                    attempts[asyncio.ensure_future(self._attempt(target, prompt, temperature, max_tokens, priority))] = target
+                    continue
+                
+                for task in done:
+                    target = attempts.pop(task)
+                    if task.exception() is None:
+                        response, finish_reason = task.result()
+                        # La richiesta aggiuntiva costa almeno i token del prompt, anche se annullata
+                        self.resilience.record_call(time.monotonic() - started, hedged=hedged,
+                                                    hedge_won=hedged and target != primary, failover=bool(errors),
+                                                    extra_tokens=estimate_tokens(prompt) if hedged else 0)
+                        return response, finish_reason, target
+                    errors.append(task.exception())
+                    logger.warning(f"Chiamata a {target[0]} ({target[1]}) fallita: {str(task.exception())}")
+                
+                if not attempts and remaining:
+                    target = remaining.pop(0)
+                    logger.info(f"Failover della chiamata a {target[0]} ({target[1]})")
+                    attempts[asyncio.ensure_future(self._attempt(target, prompt, temperature, max_tokens, priority))] = target
+            raise errors[-1]
+        finally:
+            for task in attempts:
+                task.cancel()
+    
+    async def _attempt(self, target: Target, prompt: str, temperature: float, max_tokens: Optional[int],
+                       priority: str) -> Tuple[str, Optional[str]]:
+        """
+        Esegue una chiamata su una destinazione, registrandone latenza ed esito per gli interruttori.
+        
+        Args:
+            target: Provider e modello.
+            prompt: Il prompt da inviare al modello.
+            temperature: La temperatura da utilizzare.
+            max_tokens: Numero massimo di token della risposta, o None.
+            priority: Priorità nella coda dei limiti di frequenza.
+            
+        Returns:
+            Tuple[str, Optional[str]]: Risposta e motivo di fine.
+        """
+        provider, model = target
+        adapter = self.get_provider(provider)
+        breaker = self.resilience.breaker(provider)
+        if not breaker.allow():
+            # Interruttore aperto, o prova a mezzo aperto già in corso: si passa alla destinazione successiva
+            raise CircuitOpenError(f"Interruttore del provider {provider} aperto")
+        try:
+            admission = await self._admit(provider, prompt, max_tokens, priority)
+        except BaseException:
+            breaker.release()
+            raise
+        started = time.monotonic()
+        outcome: Dict[str, Any] = {}
+        try:
+            if self._batchable(adapter):
+                response, finish_reason = await self.batcher.submit((provider, model, temperature, max_tokens), prompt)
+            elif adapter is not None:
+                response = await adapter.complete(prompt, model, temperature, max_tokens, outcome=outcome)
+                finish_reason = outcome.get("finish_reason")
+            else:
+                # Implementazione mock: risposta simulata dopo la latenza configurata
+                await asyncio.sleep(self.mock_latency)
+                chunks, truncated = split_chunks(self._mock_response(provider, prompt), max_tokens)
+                response, finish_reason = "".join(chunks), "length" if truncated else "stop"
+        except asyncio.CancelledError:
+            # Richiesta superata da un'altra: la latenza osservata è un limite inferiore
+            self.resilience.record_latency(provider, time.monotonic() - started)
+            breaker.release()
+            self._settle(admission, prompt, "")
+            raise
+        except Exception:
+            breaker.record_failure()
+            self._settle(admission, prompt, "")
+            raise
+        
+        self.resilience.record_latency(provider, time.monotonic() - started)
+        breaker.record_success()
+        self._settle(admission, prompt, response, outcome.get("usage"))
+        return response, finish_reason
+    
+    async def _admit(self, provider: str, prompt: str, max_tokens: Optional[int],
+                     priority: str) -> Optional[Tuple[RateLimiter, int]]:
+        """
+        Attende che i limiti di frequenza del provider consentano la chiamata.
+        
+        Args:
+            provider: Provider LLM.
+            prompt: Prompt da inviare.
+            max_tokens: Numero massimo di token della risposta, o None.
+            priority: Priorità della chiamata.
+            
+        Returns:
+            Optional[Tuple[RateLimiter, int]]: Limitatore e costo stimato prelevato, o None se il provider non ha limiti.
+        """
+        limiter = self.scheduler.limiter(provider)
+        if limiter is None:
+            return None
+        estimated = self.scheduler.estimate(estimate_tokens(prompt), max_tokens)
+        waited = await limiter.acquire(estimated, priority)
+        if waited >= 0.001:
+            logger.info(f"Chiamata a {provider} ({priority}) rimasta in coda per {waited * 1000:.0f}ms")
+        return limiter, estimated
+    
+    def _settle(self, admission: Optional[Tuple[RateLimiter, int]], prompt: str, response: str,
+                usage: Optional[Dict[str, Any]] = None) -> None:
+        """
+        Comunica al limitatore il consumo effettivo di una chiamata ammessa.
+        
+        Args:
+            admission: Risultato di _admit, o None.
+            prompt: Prompt inviato.
+            response: Risposta ricevuta (anche parziale).
+            usage: Utilizzo dichiarato dal provider, se disponibile.
+        """
+        if admission is None:
+            return
+        limiter, estimated = admission
+        actual = (usage or {}).get("total_tokens") or estimate_tokens(prompt) + estimate_tokens(response)
+        limiter.settle(estimated, actual)
+    
+    def _cache_key(self, provider: str, model: str, temperature: float, prompt: str,
+                   cache: Optional[bool]) -> Optional[str]:
+        """
+        Calcola la chiave di cache di una chiamata, se la chiamata usa la cache.
+        
+        Args:
+            provider: Provider LLM.
+            model: Modello LLM.
+            temperature: Temperatura.
+            prompt: Prompt da inviare.
+            cache: Scelta esplicita del chiamante, o None.
+            
+        Returns:
+            Optional[str]: Chiave della risposta, o None se la chiamata non usa la cache.
+        """
+        if not self.cache.cacheable(temperature, cache):
+            return None
+        return self.cache.key(provider, model, temperature, prompt)
+    
+    async def _cache_call(self, method, *args):
+        """
+        Esegue un'operazione sulla cache, in un thread se raggiunge il database.
+        
+        Args:
+            method: Metodo della cache da eseguire.
+            *args: Argomenti del metodo.
+            
+        Returns:
+            Any: Risultato del metodo.
+        """
+        if self.cache.persistent_active():
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(None, method, *args)
+        return method(*args)
+    
+    async def aclose(self) -> None:
+        """
+        Chiude le connessioni inattive verso i provider e il ciclo di eventi delle chiamate sincrone.
+        """
+        await self.http_client.aclose()
+        with self._loop_lock:
+            loop, self._loop = self._loop, None
+        if loop is not None:
+            await asyncio.wrap_future(asyncio.run_coroutine_threadsafe(self.http_client.aclose(), loop))
+            loop.call_soon_threadsafe(loop.stop)
+    
+    def _direct(self, targets: List[Target]) -> bool:
+        """
+        Indica se una chiamata può usare direttamente l'implementazione mock, senza ciclo di eventi.
+        
+        Args:
+            targets: Destinazioni della chiamata.
+            
+        Returns:
+            bool: True per una sola destinazione simulata, senza raggruppamento né limiti di frequenza.
+        """
+        provider = targets[0][0]
+        return (len(targets) == 1 and self.get_provider(provider) is None and not self.batching
+                and self.scheduler.limiter(provider) is None)
+    
+    def _batchable(self, adapter: Optional[OpenAICompatibleProvider]) -> bool:
+        """
+        Indica se le chiamate verso un backend vengono raggruppate.
+        
+        Args:
+            adapter: Provider reale, o None per l'implementazione mock.
+            
+        Returns:
+            bool: True se il raggruppamento è attivo e il backend accetta richieste raggruppate.
+        """
+        return self.batching and (adapter is None or adapter.supports_batch)
+    
+    async def _dispatch_batch(self, key: Tuple[str, str, float, Optional[int]],
+                              prompts: List[str]) -> List[Tuple[str, Optional[str]]]:
+        """
+        Esegue una richiesta raggruppata per il micro-batcher.
+        
+        Args:
+            key: Provider, modello, temperatura e numero massimo di token comuni al gruppo.
+            prompts: Prompt del gruppo.
+            
+        Returns:
+            List[Tuple[str, Optional[str]]]: Testo e motivo di fine di ogni risposta.
+        """
+        provider, model, temperature, max_tokens = key
+        logger.info(f"Chiamata raggruppata a LLM con provider: {provider}, modello: {model}, prompt: {len(prompts)}")
+        
+        adapter = self.get_provider(provider)
+        if adapter is not None:
+            return await adapter.complete_batch(prompts, model, temperature, max_tokens)
+        
+        # Implementazione mock: una sola latenza simulata per l'intero gruppo
+        await asyncio.sleep(self.mock_latency)
+        results = []
+        for prompt in prompts:
+            chunks, truncated = split_chunks(self._mock_response(provider, prompt), max_tokens)
+            results.append(("".join(chunks), "length" if truncated else "stop"))
+        return results
+    
+    def _run_sync(self, coroutine) -> Any:
+        """
+        Esegue una coroutine da codice sincrono nel ciclo di eventi in background del connettore.
+        
+        Il ciclo condiviso permette alle chiamate sincrone di riusare le connessioni e di essere
+        raggruppate con quelle di altri thread.
+        
+        Args:
+            coroutine: Coroutine da eseguire.
+            
+        Returns:
+            Any: Risultato della coroutine.
+        """
+        loop = self._background_loop()
+        try:
+            running = asyncio.get_running_loop()
+        except RuntimeError:
+            running = None
+        if running is loop:
+            coroutine.close()
+            raise RuntimeError("Chiamata sincrona dal ciclo di eventi del connettore")
+        return asyncio.run_coroutine_threadsafe(coroutine, loop).result()
+    
+    def _background_loop(self) -> asyncio.AbstractEventLoop:
+        """
+        Restituisce il ciclo di eventi in background, avviandolo se necessario.
+        
+        Returns:
+            asyncio.AbstractEventLoop: Ciclo di eventi delle chiamate sincrone.
+        """
+        with self._loop_lock:
+            if self._loop is None:
+                loop = asyncio.new_event_loop()
+                threading.Thread(target=loop.run_forever, name="osireon-llm-loop", daemon=True).start()
+                self._loop = loop
+            return self._loop
+    
     def _mock_response(self, provider: str, prompt: str) -> str:
         """
         Genera una risposta mock basata sul provider e sul prompt.
@@ -0,0 +1,415 @@
+"""
+Costruzione dei prompt LLM per Osireon.
+Questo file contiene il conteggio locale dei token (con cache), la riduzione dei contenuti che superano
+il budget di token e il costruttore dei prompt con un prefisso comune riusabile tra gli agenti.
+"""
+import hashlib
+import json
+import logging
+import math
+import os
+import re
+import threading
+from collections import OrderedDict
+from collections.abc import Mapping
+from typing import Dict, Any, List, Optional, Tuple
+
+# Configurazione del logging
+logger = logging.getLogger("osireon.llm.prompts")
+
+# Pre-tokenizzazione simile a quella dei tokenizer BPE dei provider: parole con lo spazio iniziale,
+# gruppi di al più tre cifre, punteggiatura (compreso il trattino basso) e spazi
+_PIECES = re.compile(r"'(?:[sdmtSDMT]|ll|ve|re)| ?[^\W\d_]+| ?\d{1,3}| ?(?:[^\s\w]|_)+|\s+(?!\S)|\s+")
+
+# Istruzioni di sistema comuni a tutti gli agenti: restano all'inizio del prompt, identiche tra le chiamate
+SYSTEM_PROMPT = (
+    "Sei un analista di policy pubbliche di Osireon. Rispondi in italiano, in modo conciso e basato sui dati "
+    "forniti; non inventare valori assenti e segnala le sezioni indicate come ridotte."
+)
+
+# Segnaposto dei contenuti rimossi per rispettare il budget
+_TRUNCATED = "[... {0} token omessi per il budget del prompt]"
+
+def _piece_tokens(piece: str) -> int:
+    """
+    Stima i token di un frammento della pre-tokenizzazione.
+    
+    Args:
+        piece: Frammento (parola, numero, punteggiatura o spazi).
+    
+    Returns:
+        int: Numero stimato di token.
+    """
+    core = piece.strip()
+    if not core:
+        return 1
+    if core[0].isalpha():
+        # Le parole comuni sono un token; quelle lunghe vengono divise in sottoparole di circa 4 caratteri
+        return max(1, math.ceil((len(core) - 2) / 4))
+    return max(1, math.ceil(len(core) / 2)) if not core[0].isdigit() else 1
+
+class TokenCounter:
+    """
+    Contatore locale dei token con cache.
+    
+    Il conteggio è un'approssimazione del tokenizer dei provider, senza dipendenze esterne: più
+    accurato della stima a caratteri su testi con numeri e punteggiatura (es. risultati JSON).
+    I conteggi dei testi ripetuti (prefissi comuni, sezioni condivise tra gli agenti) vengono
+    serviti da una cache LRU indicizzata dall'impronta del testo.
+    """
+    
+    def __init__(self, cache_size: Optional[int] = None):
+        """
+        Inizializza il contatore.
+        
+        Args:
+            cache_size: Numero massimo di conteggi memorizzati (0 disabilita la cache).
+        """
+        self.cache_size = cache_size if cache_size is not None else int(os.getenv("LLM_TOKEN_CACHE_SIZE", "4096"))
+        self._cache: "OrderedDict[bytes, int]" = OrderedDict()
+        self._stats: Dict[str, int] = {"hits": 0, "misses": 0}
+        self._lock = threading.Lock()
+    
+    def pieces(self, text: str) -> List[Tuple[str, int]]:
+        """
+        Divide un testo in frammenti con il relativo numero di token.
+        
+        Args:
+            text: Testo da dividere.
+        
+        Returns:
+            List[Tuple[str, int]]: Frammenti (la cui concatenazione è il testo) e token stimati.
+        """
+        return [(piece, _piece_tokens(piece)) for piece in _PIECES.findall(text)]
+    
+    def count(self, text: str) -> int:
+        """
+        Conta i token di un testo.
+        
+        Args:
+            text: Testo da contare.
+        
+        Returns:
+            int: Numero stimato di token.
+        """
+        if not text:
+            return 0
+        if self.cache_size <= 0:
+            return sum(tokens for _, tokens in self.pieces(text))
+        
+        key = hashlib.blake2b(text.encode("utf-8"), digest_size=16).digest()
+        with self._lock:
+            cached = self._cache.get(key)
+            if cached is not None:
+                self._cache.move_to_end(key)
+                self._stats["hits"] += 1
+                return cached
+        
+        tokens = sum(tokens for _, tokens in self.pieces(text))
+        with self._lock:
+            self._stats["misses"] += 1
+            self._cache[key] = tokens
+            while len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+        return tokens
+    
+    def truncate(self, text: str, max_tokens: int) -> Tuple[str, int]:
+        """
+        Tronca un testo a un numero massimo di token, su un confine tra frammenti.
+        
+        Args:
+            text: Testo da troncare.
+            max_tokens: Token disponibili, compreso il segnaposto dei contenuti omessi.
+        
+        Returns:
+            Tuple[str, int]: Testo (troncato con segnaposto, se necessario) e token omessi.
+        """
+        total = self.count(text)
+        if total <= max_tokens:
+            return text, 0
+        
+        marker_tokens = self.count(_TRUNCATED.format(total))
+        kept, used = [], 0
+        for piece, tokens in self.pieces(text):
+            if used + tokens > max_tokens - marker_tokens - 1:
+                break
+            kept.append(piece)
+            used += tokens
+        return "".join(kept).rstrip() + "\n" + _TRUNCATED.format(total - used), total - used
+    
+    def stats(self) -> Dict[str, Any]:
+        """
+        Restituisce le metriche della cache dei conteggi.
+        
+        Returns:
+            Dict[str, Any]: Voci, successi, mancati successi e rapporto di successo.
+        """
+        with self._lock:
+            lookups = self._stats["hits"] + self._stats["misses"]
+            return {
+                "entries": len(self._cache),
+                "size": self.cache_size,
+                **self._stats,
+                "hit_ratio": round(self._stats["hits"] / lookups, 4) if lookups else None
+            }
+
+def _compact(value: Any, max_items: Optional[int], max_depth: Optional[int], digits: Optional[int], depth: int = 0) -> Any:
+    """
+    Riduce una struttura dati: decimali arrotondati, liste accorciate e livelli profondi riassunti.
+    Le mappe diverse da dict (es. la vista ProposalResults dei risultati colonnari) diventano dizionari.
+    
+    Args:
+        value: Struttura da ridurre.
+        max_items: Elementi mantenuti per lista, o None.
+        max_depth: Profondità oltre la quale dizionari e liste vengono riassunti, o None.
+        digits: Cifre decimali dei numeri, o None.
+        depth: Profondità corrente.
+    
+    Returns:
+        Any: Struttura ridotta.
+    """
+    if isinstance(value, float) and digits is not None:
+        return round(value, digits)
+    if isinstance(value, Mapping):
+        if max_depth is not None and depth >= max_depth:
+            return f"{{{len(value)} chiavi omesse}}"
+        return {str(k): _compact(v, max_items, max_depth, digits, depth + 1) for k, v in value.items()}
+    if isinstance(value, (list, tuple)):
+        if max_depth is not None and depth >= max_depth:
+            return f"[{len(value)} elementi omessi]"
+        items = [_compact(v, max_items, max_depth, digits, depth + 1) for v in value[:max_items]]
+        if max_items is not None and len(value) > max_items:
+            items.append(f"... altri {len(value) - max_items} elementi")
+        return items
+    return value
+
+class PromptSection:
+    """
+    Sezione di un prompt: un titolo e un contenuto testuale o strutturato (serializzato in JSON).
+    """
+    __slots__ = ("title", "content", "priority", "reducible")
+    
+    def __init__(self, title: str, content: Any, priority: int = 0, reducible: bool = True):
+        """
+        Inizializza la sezione.
+        
+        Args:
+            title: Titolo della sezione.
+            content: Testo o struttura dati.
+            priority: Priorità: le sezioni con priorità più bassa vengono ridotte per prime.
+            reducible: Se la sezione può essere ridotta per rispettare il budget.
+        """
+        self.title = title
+        self.content = content
+        self.priority = priority
+        self.reducible = reducible
+
+class Prompt:
+    """
+    Prompt costruito, con il conteggio dei token e le sezioni ridotte.
+    """
+    __slots__ = ("text", "tokens", "prefix_tokens", "reduced", "dropped_tokens")
+    
+    def __init__(self, text: str, tokens: int, prefix_tokens: int, reduced: Optional[Dict[str, str]] = None,
+                 dropped_tokens: int = 0):
+        """
+        Inizializza il prompt.
+        
+        Args:
+            text: Testo del prompt.
+            tokens: Token stimati del prompt.
+            prefix_tokens: Token del prefisso comune.
+            reduced: Sezioni ridotte per il budget, con il tipo di riduzione ("summarized" o "truncated").
+            dropped_tokens: Token omessi dalle riduzioni.
+        """
+        self.text = text
+        self.tokens = tokens
+        self.prefix_tokens = prefix_tokens
+        self.reduced = reduced or {}
+        self.dropped_tokens = dropped_tokens
+
+class PromptBuilder:
+    """
+    Costruttore dei prompt con budget di token.
+    
+    Un prompt è composto da un prefisso comune (istruzioni di sistema e sezioni di contesto condivise,
+    es. dati della simulazione e risultati del modulo) seguito dalla parte specifica di un agente.
+    Il prefisso viene ridotto solo in base al proprio budget (budget del prompt meno la riserva per la
+    parte specifica) e serializzato in modo deterministico, così è identico byte per byte tra gli agenti
+    e tra le chiamate: può essere servito dalla cache dei prompt dei provider, che riconosce i prefissi
+    ripetuti. I prefissi costruiti vengono memorizzati e riusati.
+    
+    Le sezioni strutturate oltre il budget vengono riassunte per passi (decimali arrotondati, liste
+    accorciate, livelli profondi omessi) e, se non basta, troncate con un segnaposto.
+    """
+    
+    def __init__(self, counter: Optional[TokenCounter] = None, budget: Optional[int] = None,
+                 task_reserve: Optional[int] = None, prefix_cache_size: Optional[int] = None):
+        """
+        Inizializza il costruttore.
+        
+        Args:
+            counter: Contatore dei token. Se None, usa il contatore condiviso.
+            budget: Token massimi di un prompt.
+            task_reserve: Token riservati alla parte specifica dell'agente.
+            prefix_cache_size: Numero massimo di prefissi memorizzati.
+        """
+        self.counter = counter or token_counter
+        self.budget = budget or int(os.getenv("LLM_PROMPT_BUDGET", "3000"))
+        self.task_reserve = task_reserve if task_reserve is not None else int(os.getenv("LLM_PROMPT_TASK_RESERVE", "500"))
+        self.prefix_cache_size = prefix_cache_size if prefix_cache_size is not None else int(os.getenv("LLM_PROMPT_PREFIX_CACHE", "64"))
+        self._prefixes: "OrderedDict[str, Prompt]" = OrderedDict()
+        self._stats: Dict[str, int] = {"prompts": 0, "prefix_hits": 0, "prefix_builds": 0, "reduced_sections": 0,
+                                       "dropped_tokens": 0, "truncated_tasks": 0}
+        self._lock = threading.Lock()
+    
+    def prefix(self, sections: List[PromptSection], system: str = SYSTEM_PROMPT) -> Prompt:
+        """
+        Costruisce (o riusa) il prefisso comune di una serie di prompt.
+        
+        Args:
+            sections: Sezioni di contesto condivise, nell'ordine in cui compaiono.
+            system: Istruzioni di sistema.
+        
+        Returns:
+            Prompt: Prefisso con i token e le sezioni ridotte.
+        """
+        rendered = [(section, self._render(section.content)) for section in sections]
+        key = hashlib.sha256(json.dumps(
+            [system, self.budget, self.task_reserve] + [[s.title, s.priority, s.reducible, text] for s, text in rendered],
+            ensure_ascii=False
+        ).encode("utf-8")).hexdigest()
+        with self._lock:
+            cached = self._prefixes.get(key)
+            if cached is not None:
+                self._prefixes.move_to_end(key)
+                self._stats["prefix_hits"] += 1
+                return cached
+        
+        prefix = self._fit(system, rendered, max(self.budget - self.task_reserve, 0))
+        with self._lock:
+            self._stats["prefix_builds"] += 1
+            self._stats["reduced_sections"] += len(prefix.reduced)
+            self._stats["dropped_tokens"] += prefix.dropped_tokens
+            self._prefixes[key] = prefix
+            while len(self._prefixes) > self.prefix_cache_size:
+                self._prefixes.popitem(last=False)
+        return prefix
+    
+    def build(self, prefix: Prompt, task: str) -> Prompt:
+        """
+        Completa un prefisso con la parte specifica di un agente, troncandola al budget residuo.
+        
+        Args:
+            prefix: Prefisso comune (da prefix).
+            task: Richiesta specifica dell'agente.
+        
+        Returns:
+            Prompt: Prompt completo.
+        """
+        heading = "\n\n## Richiesta\n"
+        available = max(self.budget - prefix.tokens - self.counter.count(heading), 0)
+        task, dropped = self.counter.truncate(task.strip(), available)
+        text = f"{prefix.text}{heading}{task}"
+        with self._lock:
+            self._stats["prompts"] += 1
+            if dropped:
+                self._stats["truncated_tasks"] += 1
+                self._stats["dropped_tokens"] += dropped
+        return Prompt(text=text, tokens=prefix.tokens + self.counter.count(heading) + self.counter.count(task),
+                      prefix_tokens=prefix.tokens, reduced=dict(prefix.reduced),
+                      dropped_tokens=prefix.dropped_tokens + dropped)
+    
+    def stats(self) -> Dict[str, Any]:
+        """
+        Restituisce le metriche del costruttore e del contatore dei token.
+        
+        Returns:
+            Dict[str, Any]: Prompt costruiti, riuso dei prefissi, sezioni ridotte, token omessi e cache dei conteggi.
+        """
+        with self._lock:
+            return {
+                "budget": self.budget,
+                "task_reserve": self.task_reserve,
+                **self._stats,
+                "token_counts": self.counter.stats()
+            }
+    
+    def _render(self, content: Any, **reduction) -> str:
+        """
+        Serializza il contenuto di una sezione in modo deterministico.
+        
+        Args:
+            content: Testo o struttura dati.
+            **reduction: Parametri di _compact per le strutture dati.
+        
+        Returns:
+            str: Testo della sezione.
+        """
+        if isinstance(content, str):
+            return content.strip()
+        # Anche senza riduzione le viste dei risultati colonnari vanno espanse, non convertite in stringa
+        content = _compact(content, **reduction) if reduction else _compact(content, None, None, None)
+        return json.dumps(content, ensure_ascii=False, sort_keys=True, separators=(",", ":"), default=str)
+    
+    def _fit(self, system: str, rendered: List[Tuple[PromptSection, str]], budget: int) -> Prompt:
+        """
+        Compone il prefisso riducendo le sezioni, dalla priorità più bassa, finché rientra nel budget.
+        
+        Args:
+            system: Istruzioni di sistema.
+            rendered: Sezioni con il testo serializzato.
+            budget: Token disponibili per il prefisso.
+        
+        Returns:
+            Prompt: Prefisso composto.
+        """
+        texts = {index: text for index, (_, text) in enumerate(rendered)}
+        reduced: Dict[str, str] = {}
+        dropped = 0
+        
+        def assemble() -> str:
+            parts = [system] + [f"## {rendered[i][0].title}\n{texts[i]}" for i in range(len(rendered))]
+            return "\n\n".join(parts)
+        
+        # Passi di riassunto delle sezioni strutturate, dal più leggero al più drastico
+        steps = [
+            {"max_items": None, "max_depth": None, "digits": 3},
+            {"max_items": 10, "max_depth": None, "digits": 3},
+            {"max_items": 5, "max_depth": 4, "digits": 2},
+            {"max_items": 3, "max_depth": 3, "digits": 2}
+        ]
+        order = sorted((i for i, (section, _) in enumerate(rendered) if section.reducible),
+                       key=lambda i: (rendered[i][0].priority, -i))
+        for index in order:
+            total = self.counter.count(assemble())
+            if total <= budget:
+                break
+            section = rendered[index][0]
+            original = self.counter.count(texts[index])
+            if not isinstance(section.content, str):
+                for step in steps:
+                    texts[index] = self._render(section.content, **step)
+                    reduced[section.title] = "summarized"
+                    if self.counter.count(assemble()) <= budget:
+                        break
+            
+            excess = self.counter.count(assemble()) - budget
+            if excess > 0:
+                # Troncamento della sezione: resta almeno il titolo con il segnaposto
+                current = self.counter.count(texts[index])
+                texts[index], _ = self.counter.truncate(texts[index], max(current - excess, 0))
+                reduced[section.title] = "truncated"
+            dropped += max(original - self.counter.count(texts[index]), 0)
+        
+        text = assemble()
+        tokens = self.counter.count(text)
+        if reduced:
+            logger.info(f"Prefisso del prompt ridotto a {tokens} token (budget {budget}): {reduced}")
+        return Prompt(text=text, tokens=tokens, prefix_tokens=tokens, reduced=reduced, dropped_tokens=dropped)
+
+# Istanza singleton del contatore dei token
+token_counter = TokenCounter()
+
+# Istanza singleton del costruttore dei prompt
+prompt_builder = PromptBuilder()
@@ -0,0 +1,278 @@
+"""
+Provider LLM per Osireon.
+Questo file contiene gli adattatori per le API compatibili con OpenAI (OpenAI, DeepSeek e il server
+sostitutivo locale), costruiti sul client HTTP condiviso, con concorrenza limitata per provider
+e ripetizione delle richieste fallite con attesa esponenziale casuale.
+"""
+import asyncio
+import json
+import logging
+import os
+import random
+import weakref
+from typing import Dict, Any, AsyncIterator, List, Optional, Tuple
+
+from src.llm.transport import AsyncHTTPClient, HTTPError, http_client
+
+# Configurazione del logging
+logger = logging.getLogger("osireon.llm.providers")
+
+# URL predefiniti delle API compatibili con OpenAI
+PROVIDER_URLS = {
+    "openai": "https://api.openai.com/v1",
+    "deepseek": "https://api.deepseek.com/v1"
+}
+
+class OpenAICompatibleProvider:
+    """
+    Adattatore per un'API chat completions compatibile con OpenAI.
+    
+    Al più max_concurrency richieste sono in corso contemporaneamente verso il provider; le altre
+    attendono. Le richieste fallite per errori temporanei (connessione, 429, 5xx) vengono ripetute
+    fino a max_retries volte con attesa esponenziale casuale ("full jitter"), rispettando Retry-After.
+    Una risposta in streaming viene ripetuta solo se non ha ancora prodotto frammenti.
+    """
+    
+    def __init__(self, name: str, base_url: str, api_key: str = "", client: Optional[AsyncHTTPClient] = None,
+                 max_concurrency: Optional[int] = None, max_retries: Optional[int] = None,
+                 backoff_base: Optional[float] = None, backoff_max: Optional[float] = None,
+                 timeout: Optional[float] = None, supports_batch: Optional[bool] = None):
+        """
+        Inizializza il provider.
+        
+        Args:
+            name: Nome del provider.
+            base_url: URL di base dell'API (es. https://api.openai.com/v1).
+            api_key: Chiave API. Se vuota, la richiesta non viene autenticata (es. server locale).
+            client: Client HTTP. Se None, usa il client condiviso.
+            max_concurrency: Numero massimo di richieste contemporanee verso il provider.
+            max_retries: Numero massimo di ripetizioni di una richiesta fallita.
+            backoff_base: Attesa di base prima della prima ripetizione in secondi.
+            backoff_max: Attesa massima tra due tentativi in secondi.
+            timeout: Tempo massimo di una richiesta in secondi.
+            supports_batch: Se il provider accetta più prompt in una richiesta (complete_batch).
+        """
+        self.name = name
+        self.base_url = base_url.rstrip("/")
+        self.api_key = api_key
+        self.client = client or http_client
+        self.max_concurrency = max_concurrency or int(os.getenv("LLM_PROVIDER_CONCURRENCY", "8"))
+        self.max_retries = max_retries if max_retries is not None else int(os.getenv("LLM_MAX_RETRIES", "3"))
+        self.backoff_base = backoff_base or float(os.getenv("LLM_BACKOFF_BASE", "0.5"))
+        self.backoff_max = backoff_max or float(os.getenv("LLM_BACKOFF_MAX", "8"))
+        self.timeout = timeout or float(os.getenv("LLM_REQUEST_TIMEOUT", "60"))
+        if supports_batch is None:
+            supports_batch = os.getenv(f"{name.upper()}_BATCH", "false").lower() in ("1", "true", "yes")
+        self.supports_batch = supports_batch
+        self._semaphores: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, asyncio.Semaphore]" = weakref.WeakKeyDictionary()
+        self.retries = 0
+        logger.info(f"Provider {name} configurato su {self.base_url} con {self.max_concurrency} richieste contemporanee")
+    
+    async def complete(self, prompt: str, model: str, temperature: float, max_tokens: Optional[int] = None,
+                       outcome: Optional[Dict[str, Any]] = None) -> str:
+        """
+        Richiede una risposta completa.
+        
+        Args:
+            prompt: Prompt da inviare.
+            model: Modello da utilizzare.
+            temperature: Temperatura.
+            max_tokens: Numero massimo di token della risposta. Se None, il limite del provider.
+            outcome: Se indicato, riceve il motivo di fine ("finish_reason") e l'utilizzo ("usage").
+        
+        Returns:
+            str: Testo della risposta.
+        """
+        payload = self._payload(prompt, model, temperature, max_tokens, stream=False)
+        document = await self._post("chat/completions", payload)
+        choice = document["choices"][0]
+        if outcome is not None:
+            outcome["finish_reason"] = choice.get("finish_reason")
+            outcome["usage"] = document.get("usage")
+        return choice["message"].get("content") or ""
+    
+    async def complete_batch(self, prompts: List[str], model: str, temperature: float,
+                             max_tokens: Optional[int] = None) -> List[Tuple[str, Optional[str]]]:
+        """
+        Richiede le risposte di più prompt con un'unica richiesta all'endpoint completions.
+        
+        L'endpoint completions accetta una lista di prompt e restituisce una scelta per prompt
+        (indicata da "index"); è supportato dai server di inferenza locali compatibili con OpenAI.
+        
+        Args:
+            prompts: Prompt da inviare.
+            model: Modello da utilizzare.
+            temperature: Temperatura.
+            max_tokens: Numero massimo di token di ogni risposta. Se None, il limite del provider.
+        
+        Returns:
+            List[Tuple[str, Optional[str]]]: Testo e motivo di fine di ogni risposta, nell'ordine dei prompt.
+        """
+        payload = {"model": model, "prompt": prompts, "temperature": temperature}
+        if max_tokens is not None:
+            payload["max_tokens"] = max_tokens
+        document = await self._post("completions", payload)
+        results: List[Tuple[str, Optional[str]]] = [("", None)] * len(prompts)
+        for position, choice in enumerate(document["choices"]):
+            results[choice.get("index", position)] = (choice.get("text") or "", choice.get("finish_reason"))
+        return results
+    
+    async def stream(self, prompt: str, model: str, temperature: float, max_tokens: Optional[int] = None,
+                     outcome: Optional[Dict[str, Any]] = None) -> AsyncIterator[str]:
+        """
+        Richiede una risposta in streaming (eventi server-sent).
+        
+        Args:
+            prompt: Prompt da inviare.
+            model: Modello da utilizzare.
+            temperature: Temperatura.
+            max_tokens: Numero massimo di token della risposta. Se None, il limite del provider.
+            outcome: Se indicato, riceve il motivo di fine ("finish_reason") al termine della risposta.
+        
+        Yields:
+            str: Frammenti successivi della risposta.
+        """
+        payload = self._payload(prompt, model, temperature, max_tokens, stream=True)
+        async with self._semaphore():
+            attempt = 0
+            emitted = False
+            while True:
+                try:
+                    async with self.client.stream("POST", f"{self.base_url}/chat/completions",
+                                                  self._headers(), payload, self.timeout) as response:
+                        if response.status >= 400:
+                            raise response.error(await response.read())
+                        finished = False
+                        async for line in response.iter_lines():
+                            # Dopo [DONE] il corpo viene solo consumato, per riusare la connessione
+                            if finished or not line.startswith("data:"):
+                                continue
+                            data = line[len("data:"):].strip()
+                            if data == "[DONE]":
+                                finished = True
+                                continue
+                            choices = json.loads(data).get("choices") or [{}]
+                            if outcome is not None and choices[0].get("finish_reason"):
+                                outcome["finish_reason"] = choices[0]["finish_reason"]
+                            chunk = (choices[0].get("delta") or {}).get("content")
+                            if chunk:
+                                emitted = True
+                                yield chunk
+                    return
+                except HTTPError as e:
+                    if emitted or not e.retryable or attempt >= self.max_retries:
+                        raise
+                    await self._backoff(attempt, e)
+                    attempt += 1
+    
+    async def _post(self, path: str, payload: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Invia una richiesta non in streaming, ripetendola in caso di errori temporanei.
+        
+        Args:
+            path: Percorso dell'endpoint relativo all'URL di base.
+            payload: Corpo della richiesta.
+        
+        Returns:
+            Dict[str, Any]: Documento JSON della risposta.
+        """
+        async with self._semaphore():
+            attempt = 0
+            while True:
+                try:
+                    response, body = await self.client.request("POST", f"{self.base_url}/{path}",
+                                                               self._headers(), payload, self.timeout)
+                    if response.status >= 400:
+                        raise response.error(body)
+                    return json.loads(body)
+                except HTTPError as e:
+                    if not e.retryable or attempt >= self.max_retries:
+                        raise
+                    await self._backoff(attempt, e)
+                    attempt += 1
+    
+    def _payload(self, prompt: str, model: str, temperature: float, max_tokens: Optional[int],
+                 stream: bool) -> Dict[str, Any]:
+        """
+        Costruisce il corpo della richiesta chat completions.
+        
+        Args:
+            prompt: Prompt da inviare.
+            model: Modello da utilizzare.
+            temperature: Temperatura.
+            max_tokens: Numero massimo di token della risposta, o None.
+            stream: Se richiedere la risposta in streaming.
+        
+        Returns:
+            Dict[str, Any]: Corpo della richiesta.
+        """
+        payload = {
+            "model": model,
+            "messages": [{"role": "user", "content": prompt}],
+            "temperature": temperature,
+            "stream": stream
+        }
+        if max_tokens is not None:
+            payload["max_tokens"] = max_tokens
+        return payload
+    
+    def _headers(self) -> Dict[str, str]:
+        """
+        Restituisce le intestazioni della richiesta.
+        
+        Returns:
+            Dict[str, str]: Intestazioni, con l'autenticazione se la chiave API è presente.
+        """
+        headers = {"Accept": "application/json, text/event-stream"}
+        if self.api_key:
+            headers["Authorization"] = f"Bearer {self.api_key}"
+        return headers
+    
+    def _semaphore(self) -> asyncio.Semaphore:
+        """
+        Restituisce il semaforo di concorrenza del ciclo di eventi corrente.
+        
+        Returns:
+            asyncio.Semaphore: Semaforo del provider.
+        """
+        loop = asyncio.get_running_loop()
+        if loop not in self._semaphores:
+            self._semaphores[loop] = asyncio.Semaphore(self.max_concurrency)
+        return self._semaphores[loop]
+    
+    async def _backoff(self, attempt: int, error: HTTPError) -> None:
+        """
+        Attende prima di ripetere una richiesta fallita.
+        
+        Args:
+            attempt: Numero di ripetizioni già eseguite.
+            error: Errore della richiesta.
+        """
+        delay = random.uniform(0, min(self.backoff_max, self.backoff_base * 2 ** attempt))
+        if error.retry_after is not None:
+            delay = max(delay, min(error.retry_after, self.backoff_max))
+        self.retries += 1
+        logger.warning(f"Provider {self.name}: {str(error)}. Nuovo tentativo tra {delay:.2f}s ({attempt + 1}/{self.max_retries})")
+        await asyncio.sleep(delay)
+
+def build_providers(client: Optional[AsyncHTTPClient] = None) -> Dict[str, OpenAICompatibleProvider]:
+    """
+    Configura i provider dalle variabili d'ambiente.
+    
+    Un provider è attivo se ha una chiave API (<PROVIDER>_API_KEY) o un URL di base esplicito
+    (<PROVIDER>_BASE_URL, es. il server sostitutivo locale); i provider non attivi restano simulati.
+    <PROVIDER>_BATCH=true indica che il provider accetta richieste raggruppate.
+    
+    Args:
+        client: Client HTTP condiviso. Se None, usa il client predefinito.
+    
+    Returns:
+        Dict[str, OpenAICompatibleProvider]: Provider attivi per nome.
+    """
+    providers = {}
+    for name, default_url in PROVIDER_URLS.items():
+        api_key = os.getenv(f"{name.upper()}_API_KEY", "")
+        base_url = os.getenv(f"{name.upper()}_BASE_URL", "")
+        if api_key or base_url:
+            providers[name] = OpenAICompatibleProvider(name, base_url or default_url, api_key, client)
+    return providers
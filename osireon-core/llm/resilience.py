@@ -0,0 +1,335 @@
+"""
+Resilienza delle chiamate LLM per Osireon.
+Questo file contiene gli interruttori automatici per provider, la misura delle latenze e la configurazione
+delle richieste di riserva (hedging) e del passaggio a un altro provider o modello (failover).
+"""
+import logging
+import os
+import threading
+import time
+from collections import deque
+from typing import Dict, Any, List, Optional, Sequence, Tuple
+
+# Configurazione del logging
+logger = logging.getLogger("osireon.llm.resilience")
+
+# Destinazione di una chiamata: provider e modello
+Target = Tuple[str, str]
+
+# Stati di un interruttore automatico
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+# Numero di latenze recenti conservate per provider e per le chiamate
+_LATENCY_SAMPLES = 1000
+
+class CircuitOpenError(Exception):
+    """
+    Errore sollevato quando l'interruttore di un provider non consente la chiamata.
+    """
+    pass
+
+def percentile(values: Sequence[float], q: float) -> Optional[float]:
+    """
+    Calcola un percentile (metodo del rango più vicino).
+    
+    Args:
+        values: Valori, anche non ordinati.
+        q: Percentile tra 0 e 100.
+    
+    Returns:
+        Optional[float]: Percentile, o None se non ci sono valori.
+    """
+    if not values:
+        return None
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, int(round(q / 100 * len(ordered) + 0.5)) - 1))
+    return ordered[index]
+
+def _summary(values: Sequence[float]) -> Dict[str, Optional[float]]:
+    """
+    Riassume una serie di latenze in millisecondi.
+    
+    Args:
+        values: Latenze in secondi.
+    
+    Returns:
+        Dict[str, Optional[float]]: Numero di campioni, p50, p95 e p99 in millisecondi.
+    """
+    summary: Dict[str, Optional[float]] = {"samples": len(values)}
+    for q in (50, 95, 99):
+        value = percentile(values, q)
+        summary[f"p{q}"] = round(value * 1000, 1) if value is not None else None
+    return summary
+
+class CircuitBreaker:
+    """
+    Interruttore automatico di un provider.
+    
+    Dopo failure_threshold errori consecutivi l'interruttore si apre e il provider viene escluso
+    per cooldown secondi; poi una sola chiamata di prova (mezzo aperto) decide se richiuderlo
+    o riaprirlo. Ogni chiamata va prenotata con allow(): a mezzo aperto solo la prima la ottiene,
+    e va liberata con release() se viene annullata prima dell'esito.
+    """
+    
+    def __init__(self, provider: str, failure_threshold: Optional[int] = None, cooldown: Optional[float] = None):
+        """
+        Inizializza l'interruttore chiuso.
+        
+        Args:
+            provider: Nome del provider.
+            failure_threshold: Errori consecutivi che aprono l'interruttore.
+            cooldown: Secondi di esclusione prima della chiamata di prova.
+        """
+        self.provider = provider
+        self.failure_threshold = failure_threshold or int(os.getenv("LLM_BREAKER_FAILURES", "5"))
+        self.cooldown = cooldown if cooldown is not None else float(os.getenv("LLM_BREAKER_COOLDOWN", "30"))
+        self.state = CLOSED
+        self.failures = 0
+        self.opened_at = 0.0
+        self.trips = 0
+        self._trial = False
+        self._lock = threading.Lock()
+    
+    def allow(self) -> bool:
+        """
+        Indica se una chiamata può essere inviata al provider (e, a mezzo aperto, la prenota come prova).
+        
+        Returns:
+            bool: True se la chiamata è consentita.
+        """
+        with self._lock:
+            if self.state == CLOSED:
+                return True
+            if self.state == OPEN and time.monotonic() - self.opened_at >= self.cooldown:
+                self.state = HALF_OPEN
+                self._trial = False
+            if self.state == HALF_OPEN and not self._trial:
+                self._trial = True
+                return True
+            return False
+    
+    def available(self) -> bool:
+        """
+        Indica se il provider accetterebbe una chiamata, senza prenotare la prova.
+        
+        Returns:
+            bool: True se l'interruttore è chiuso o pronto per la prova.
+        """
+        with self._lock:
+            if self.state == CLOSED:
+                return True
+            if self.state == OPEN:
+                return time.monotonic() - self.opened_at >= self.cooldown
+            return not self._trial
+    
+    def record_success(self) -> None:
+        """
+        Registra una chiamata riuscita e chiude l'interruttore.
+        """
+        with self._lock:
+            if self.state != CLOSED:
+                logger.info(f"Interruttore del provider {self.provider} richiuso")
+            self.state = CLOSED
+            self.failures = 0
+            self._trial = False
+    
+    def record_failure(self) -> None:
+        """
+        Registra una chiamata fallita, aprendo l'interruttore se necessario.
+        """
+        with self._lock:
+            self.failures += 1
+            if self.state == HALF_OPEN or (self.state == CLOSED and self.failures >= self.failure_threshold):
+                self.state = OPEN
+                self.opened_at = time.monotonic()
+                self.trips += 1
+                self._trial = False
+                logger.warning(f"Interruttore del provider {self.provider} aperto dopo {self.failures} errori consecutivi")
+    
+    def release(self) -> None:
+        """
+        Libera la prova a mezzo aperto di una chiamata annullata prima dell'esito.
+        """
+        with self._lock:
+            self._trial = False
+    
+    def to_dict(self) -> Dict[str, Any]:
+        """
+        Converte lo stato dell'interruttore in un dizionario.
+        
+        Returns:
+            Dict[str, Any]: Stato, errori consecutivi e aperture.
+        """
+        with self._lock:
+            return {"state": self.state, "consecutive_failures": self.failures, "trips": self.trips}
+
+class ResilienceManager:
+    """
+    Gestore della resilienza delle chiamate LLM.
+    
+    Le destinazioni di riserva (LLM_FAILOVER, es. "deepseek,openai:gpt-4o-mini") vengono usate, nell'ordine,
+    quando il provider principale ha l'interruttore aperto o fallisce. Con l'hedging attivo, se la
+    destinazione principale non risponde entro il percentile LLM_HEDGE_PERCENTILE delle sue latenze
+    recenti, viene inviata una richiesta alla prima destinazione di riserva disponibile e si usa la
+    prima risposta.
+    """
+    
+    def __init__(self):
+        """
+        Inizializza il gestore dalla configurazione d'ambiente.
+        """
+        self.fallbacks = self.parse_targets(os.getenv("LLM_FAILOVER", ""))
+        self.hedging = os.getenv("LLM_HEDGE_ENABLED", "false").lower() in ("1", "true", "yes")
+        self.hedge_percentile = float(os.getenv("LLM_HEDGE_PERCENTILE", "95"))
+        self.hedge_min_delay = float(os.getenv("LLM_HEDGE_MIN_DELAY_MS", "50")) / 1000
+        self.hedge_default_delay = float(os.getenv("LLM_HEDGE_DEFAULT_DELAY_MS", "2000")) / 1000
+        self.hedge_min_samples = int(os.getenv("LLM_HEDGE_MIN_SAMPLES", "20"))
+        self._breakers: Dict[str, CircuitBreaker] = {}
+        self._latencies: Dict[str, "deque[float]"] = {}
+        self._calls: "deque[float]" = deque(maxlen=_LATENCY_SAMPLES)
+        self._stats: Dict[str, int] = {"calls": 0, "hedges": 0, "hedge_wins": 0, "failovers": 0,
+                                       "extra_requests": 0, "extra_tokens": 0}
+        self._lock = threading.Lock()
+        logger.info(f"ResilienceManager inizializzato con riserve {self.fallbacks or 'nessuna'}, hedging: {self.hedging}")
+    
+    @staticmethod
+    def parse_targets(spec: str) -> List[Tuple[str, Optional[str]]]:
+        """
+        Interpreta un elenco di destinazioni "provider[:modello]" separate da virgole.
+        
+        Args:
+            spec: Elenco di destinazioni.
+        
+        Returns:
+            List[Tuple[str, Optional[str]]]: Provider e modello (None per il modello della chiamata).
+        """
+        targets = []
+        for item in spec.split(","):
+            provider, _, model = item.strip().partition(":")
+            if provider:
+                targets.append((provider.lower(), model.strip() or None))
+        return targets
+    
+    def breaker(self, provider: str) -> CircuitBreaker:
+        """
+        Restituisce l'interruttore di un provider, creandolo al primo uso.
+        
+        Args:
+            provider: Nome del provider.
+        
+        Returns:
+            CircuitBreaker: Interruttore del provider.
+        """
+        name = provider.lower()
+        with self._lock:
+            if name not in self._breakers:
+                self._breakers[name] = CircuitBreaker(name)
+            return self._breakers[name]
+    
+    def route(self, provider: str, model: str) -> List[Target]:
+        """
+        Restituisce le destinazioni di una chiamata in ordine di preferenza, escludendo quelle con
+        l'interruttore aperto. Se tutte sono escluse, resta la destinazione principale.
+        
+        Args:
+            provider: Provider richiesto.
+            model: Modello richiesto.
+        
+        Returns:
+            List[Target]: Destinazioni (provider, modello).
+        """
+        primary = (provider.lower(), model)
+        targets = [primary]
+        for fallback_provider, fallback_model in self.fallbacks:
+            target = (fallback_provider, fallback_model or model)
+            if target not in targets:
+                targets.append(target)
+        healthy = [target for target in targets if self.breaker(target[0]).available()]
+        if healthy and healthy[0] != primary:
+            logger.info(f"Provider {provider} escluso dall'interruttore: chiamata inviata a {healthy[0][0]}")
+        return healthy or [primary]
+    
+    def hedge_delay(self, provider: str) -> float:
+        """
+        Restituisce l'attesa prima della richiesta di riserva: il percentile configurato delle latenze
+        recenti del provider, o l'attesa predefinita finché i campioni sono pochi.
+        
+        Args:
+            provider: Provider principale.
+        
+        Returns:
+            float: Attesa in secondi.
+        """
+        with self._lock:
+            samples = list(self._latencies.get(provider.lower(), ()))
+        if len(samples) < self.hedge_min_samples:
+            return self.hedge_default_delay
+        return max(self.hedge_min_delay, percentile(samples, self.hedge_percentile))
+    
+    def record_latency(self, provider: str, latency: float) -> None:
+        """
+        Registra la latenza di una chiamata a un provider (anche solo un minimo, se la chiamata è stata annullata).
+        
+        Args:
+            provider: Nome del provider.
+            latency: Latenza in secondi.
+        """
+        with self._lock:
+            self._latencies.setdefault(provider.lower(), deque(maxlen=_LATENCY_SAMPLES)).append(latency)
+    
+    def record_call(self, latency: float, hedged: bool = False, hedge_won: bool = False, failover: bool = False,
+                    extra_tokens: int = 0) -> None:
+        """
+        Registra l'esito complessivo di una chiamata.
+        
+        Args:
+            latency: Latenza vista dal chiamante in secondi.
+            hedged: Se è stata inviata una richiesta di riserva.
+            hedge_won: Se la richiesta di riserva ha risposto per prima.
+            failover: Se la risposta è arrivata da una destinazione di riserva dopo un errore.
+            extra_tokens: Token stimati delle richieste aggiuntive (spesa extra).
+        """
+        with self._lock:
+            self._calls.append(latency)
+            self._stats["calls"] += 1
+            if hedged:
+                self._stats["hedges"] += 1
+                self._stats["extra_requests"] += 1
+                self._stats["extra_tokens"] += extra_tokens
+            if hedge_won:
+                self._stats["hedge_wins"] += 1
+            if failover:
+                self._stats["failovers"] += 1
+    
+    def stats(self) -> Dict[str, Any]:
+        """
+        Restituisce le metriche di resilienza.
+        
+        La latenza delle chiamate (con hedging e failover) va confrontata con quella dei provider: le
+        richieste principali annullate contano con il tempo trascorso fino all'annullamento, quindi le
+        code dei provider sono stime per difetto e il miglioramento mostrato è prudente.
+        
+        Returns:
+            Dict[str, Any]: Configurazione, contatori, spesa extra, latenze e stato degli interruttori.
+        """
+        with self._lock:
+            calls = list(self._calls)
+            providers = {name: list(values) for name, values in self._latencies.items()}
+            stats = dict(self._stats)
+            breakers = dict(self._breakers)
+        return {
+            "fallbacks": [f"{provider}:{model}" if model else provider for provider, model in self.fallbacks],
+            "hedging": self.hedging,
+            "hedge_percentile": self.hedge_percentile,
+            **stats,
+            "latency_ms": {
+                "calls": _summary(calls),
+                "providers": {name: _summary(values) for name, values in providers.items()}
+            },
+            "breakers": {name: breaker.to_dict() for name, breaker in breakers.items()}
+        }
+
+# Istanza singleton del gestore della resilienza delle chiamate LLM
+llm_resilience = ResilienceManager()
@@ -0,0 +1,342 @@
+"""
+Pianificatore delle chiamate LLM per Osireon.
+Questo file contiene i limiti di frequenza per provider (richieste e token al minuto, a secchiello di gettoni)
+e la coda con priorità che decide quale chiamata inviare quando i limiti lo consentono.
+"""
+import asyncio
+import heapq
+import itertools
+import logging
+import os
+import threading
+import time
+from collections import deque
+from typing import Dict, Any, List, Optional
+
+# Configurazione del logging
+logger = logging.getLogger("osireon.llm.scheduler")
+
+# Priorità delle chiamate: le interattive precedono sempre quelle in blocco
+PRIORITIES = {"interactive": 0, "batch": 1}
+
+# Numero di attese recenti conservate per i percentili
+_WAIT_SAMPLES = 1000
+
+class TokenBucket:
+    """
+    Secchiello di gettoni: si riempie a velocità costante fino alla capacità e ogni consumo ne preleva.
+    """
+    
+    def __init__(self, per_minute: float, capacity: Optional[float] = None):
+        """
+        Inizializza il secchiello pieno.
+        
+        Args:
+            per_minute: Gettoni aggiunti al minuto.
+            capacity: Gettoni massimi accumulabili. Se None, quelli di un minuto.
+        """
+        self.rate = per_minute / 60.0
+        self.capacity = capacity or per_minute
+        self.level = self.capacity
+        self.updated = time.monotonic()
+    
+    def delay(self, amount: float, now: float) -> float:
+        """
+        Calcola l'attesa necessaria perché siano disponibili i gettoni richiesti.
+        
+        Args:
+            amount: Gettoni richiesti (limitati alla capacità).
+            now: Istante corrente (time.monotonic).
+        
+        Returns:
+            float: Attesa in secondi (0 se i gettoni sono già disponibili).
+        """
+        self._refill(now)
+        amount = min(amount, self.capacity)
+        return 0.0 if self.level >= amount else (amount - self.level) / self.rate
+    
+    def consume(self, amount: float, now: float) -> None:
+        """
+        Preleva i gettoni richiesti (limitati alla capacità).
+        
+        Args:
+            amount: Gettoni da prelevare.
+            now: Istante corrente (time.monotonic).
+        """
+        self._refill(now)
+        self.level -= min(amount, self.capacity)
+    
+    def adjust(self, amount: float) -> None:
+        """
+        Corregge il livello dopo un consumo stimato: positivo per addebitare, negativo per restituire.
+        
+        Args:
+            amount: Differenza tra consumo effettivo e stimato.
+        """
+        self.level = min(self.capacity, self.level - amount)
+    
+    def available(self, now: float) -> float:
+        """
+        Restituisce i gettoni disponibili senza modificare il secchiello.
+        
+        Args:
+            now: Istante corrente (time.monotonic).
+        
+        Returns:
+            float: Gettoni disponibili (negativi se il consumo effettivo ha superato la stima).
+        """
+        return min(self.capacity, self.level + (now - self.updated) * self.rate)
+    
+    def _refill(self, now: float) -> None:
+        self.level = min(self.capacity, self.level + (now - self.updated) * self.rate)
+        self.updated = now
+
+class _Ticket:
+    """
+    Chiamata in attesa di essere ammessa.
+    """
+    
+    __slots__ = ("priority", "sequence", "tokens", "loop", "future", "enqueued")
+    
+    def __init__(self, priority: int, sequence: int, tokens: int, loop: asyncio.AbstractEventLoop,
+                 future: asyncio.Future):
+        self.priority = priority
+        self.sequence = sequence
+        self.tokens = tokens
+        self.loop = loop
+        self.future = future
+        self.enqueued = time.monotonic()
+    
+    def __lt__(self, other: "_Ticket") -> bool:
+        return (self.priority, self.sequence) < (other.priority, other.sequence)
+
+class RateLimiter:
+    """
+    Limiti di frequenza di un provider con coda di attesa ordinata per priorità.
+    
+    Una chiamata viene ammessa quando il secchiello delle richieste e quello dei token hanno
+    abbastanza gettoni per il suo costo stimato; finché la prima chiamata in coda attende, quelle
+    successive (anche di priorità più bassa) attendono dietro di lei. Le chiamate possono arrivare
+    da cicli di eventi diversi: la coda è protetta da un lock e le chiamate ammesse vengono risvegliate
+    nel proprio ciclo.
+    """
+    
+    def __init__(self, provider: str, requests_per_minute: float = 0, tokens_per_minute: float = 0):
+        """
+        Inizializza il limitatore.
+        
+        Args:
+            provider: Nome del provider.
+            requests_per_minute: Richieste al minuto (0 per nessun limite).
+            tokens_per_minute: Token al minuto (0 per nessun limite).
+        """
+        self.provider = provider
+        self.requests = TokenBucket(requests_per_minute) if requests_per_minute > 0 else None
+        self.tokens = TokenBucket(tokens_per_minute) if tokens_per_minute > 0 else None
+        self._queue: List[_Ticket] = []
+        self._sequence = itertools.count()
+        self._lock = threading.Lock()
+        self._timer_due: Optional[float] = None
+        self._waits: "deque[float]" = deque(maxlen=_WAIT_SAMPLES)
+        self._stats: Dict[str, Any] = {"admitted": 0, "total_wait": 0.0, "max_wait": 0.0, "estimated_tokens": 0, "actual_tokens": 0}
+    
+    async def acquire(self, tokens: int, priority: str = "interactive") -> float:
+        """
+        Attende che la chiamata possa essere inviata e ne preleva il costo stimato.
+        
+        Args:
+            tokens: Costo stimato della chiamata in token (prompt e risposta).
+            priority: Priorità della chiamata ("interactive" o "batch").
+        
+        Returns:
+            float: Attesa in coda in secondi.
+        """
+        loop = asyncio.get_running_loop()
+        ticket = _Ticket(PRIORITIES.get(priority, PRIORITIES["batch"]), next(self._sequence), tokens, loop, loop.create_future())
+        with self._lock:
+            heapq.heappush(self._queue, ticket)
+        self._pump()
+        try:
+            await ticket.future
+        except asyncio.CancelledError:
+            # Se la chiamata annullata era in testa, le successive possono essere ammesse
+            self._pump()
+            raise
+        return time.monotonic() - ticket.enqueued
+    
+    def settle(self, estimated: int, actual: int) -> None:
+        """
+        Corregge il secchiello dei token con il consumo effettivo di una chiamata.
+        
+        Args:
+            estimated: Costo stimato prelevato all'ammissione.
+            actual: Costo effettivo della chiamata.
+        """
+        with self._lock:
+            self._stats["estimated_tokens"] += estimated
+            self._stats["actual_tokens"] += actual
+            if self.tokens is not None:
+                self.tokens.adjust(actual - estimated)
+        if actual < estimated:
+            self._pump()
+    
+    def stats(self) -> Dict[str, Any]:
+        """
+        Restituisce le metriche del limitatore.
+        
+        Returns:
+            Dict[str, Any]: Limiti, gettoni disponibili, coda per priorità e attese in coda (media, p50, p95, massima).
+        """
+        with self._lock:
+            now = time.monotonic()
+            waits = sorted(self._waits)
+            admitted = self._stats["admitted"]
+            queued = {name: 0 for name in PRIORITIES}
+            for ticket in self._queue:
+                if not ticket.future.done():
+                    for name, value in PRIORITIES.items():
+                        if value == ticket.priority:
+                            queued[name] += 1
+            return {
+                "requests_per_minute": self.requests.rate * 60 if self.requests else None,
+                "tokens_per_minute": self.tokens.rate * 60 if self.tokens else None,
+                "available_requests": round(self.requests.available(now), 2) if self.requests else None,
+                "available_tokens": round(self.tokens.available(now), 2) if self.tokens else None,
+                "queued": queued,
+                "admitted": admitted,
+                "wait_ms": {
+                    "mean": round(self._stats["total_wait"] / admitted * 1000, 2) if admitted else None,
+                    "p50": round(waits[len(waits) // 2] * 1000, 2) if waits else None,
+                    "p95": round(waits[min(len(waits) - 1, int(len(waits) * 0.95))] * 1000, 2) if waits else None,
+                    "max": round(self._stats["max_wait"] * 1000, 2)
+                },
+                "estimated_tokens": self._stats["estimated_tokens"],
+                "actual_tokens": self._stats["actual_tokens"]
+            }
+    
+    def _pump(self) -> None:
+        """
+        Ammette le chiamate in testa alla coda finché i limiti lo consentono e, se la prima deve
+        attendere, programma un nuovo tentativo allo scadere dell'attesa.
+        """
+        with self._lock:
+            now = time.monotonic()
+            while self._queue:
+                head = self._queue[0]
+                if head.future.done():
+                    heapq.heappop(self._queue)
+                    continue
+                delay = max(self.requests.delay(1, now) if self.requests else 0.0,
+                            self.tokens.delay(head.tokens, now) if self.tokens else 0.0)
+                if delay > 0:
+                    due = now + delay
+                    if self._timer_due is None or due < self._timer_due or self._timer_due <= now:
+                        self._timer_due = due
+                        head.loop.call_soon_threadsafe(self._schedule, head.loop, delay)
+                    return
+                heapq.heappop(self._queue)
+                if self.requests:
+                    self.requests.consume(1, now)
+                if self.tokens:
+                    self.tokens.consume(head.tokens, now)
+                waited = now - head.enqueued
+                self._waits.append(waited)
+                self._stats["admitted"] += 1
+                self._stats["total_wait"] += waited
+                self._stats["max_wait"] = max(self._stats["max_wait"], waited)
+                head.loop.call_soon_threadsafe(_admit, head.future)
+    
+    def _schedule(self, loop: asyncio.AbstractEventLoop, delay: float) -> None:
+        loop.call_later(delay, self._pump)
+
+def _admit(future: asyncio.Future) -> None:
+    """
+    Risveglia una chiamata ammessa, se nel frattempo non è stata annullata.
+    """
+    if not future.done():
+        future.set_result(None)
+
+class LLMScheduler:
+    """
+    Pianificatore delle chiamate LLM: un limitatore per provider, configurato da
+    <PROVIDER>_RPM e <PROVIDER>_TPM (richieste e token al minuto). I provider senza limiti
+    configurati non hanno coda.
+    """
+    
+    def __init__(self, completion_estimate: Optional[int] = None):
+        """
+        Inizializza il pianificatore.
+        
+        Args:
+            completion_estimate: Token stimati per una risposta quando max_tokens non è indicato.
+        """
+        self.completion_estimate = completion_estimate or int(os.getenv("LLM_SCHEDULER_COMPLETION_ESTIMATE", "512"))
+        self._limiters: Dict[str, Optional[RateLimiter]] = {}
+        self._lock = threading.Lock()
+        logger.info(f"LLMScheduler inizializzato con stima di {self.completion_estimate} token per risposta")
+    
+    def limiter(self, provider: str) -> Optional[RateLimiter]:
+        """
+        Restituisce il limitatore di un provider, creandolo dalla configurazione al primo uso.
+        
+        Args:
+            provider: Nome del provider.
+        
+        Returns:
+            Optional[RateLimiter]: Limitatore, o None se il provider non ha limiti.
+        """
+        name = provider.lower()
+        with self._lock:
+            if name not in self._limiters:
+                rpm = float(os.getenv(f"{name.upper()}_RPM", "0"))
+                tpm = float(os.getenv(f"{name.upper()}_TPM", "0"))
+                self._limiters[name] = RateLimiter(name, rpm, tpm) if rpm > 0 or tpm > 0 else None
+                if self._limiters[name] is not None:
+                    logger.info(f"Limiti per il provider {name}: {rpm or 'illimitate'} richieste e {tpm or 'illimitati'} token al minuto")
+            return self._limiters[name]
+    
+    def configure(self, provider: str, requests_per_minute: float = 0, tokens_per_minute: float = 0) -> Optional[RateLimiter]:
+        """
+        Imposta i limiti di un provider, sostituendo quelli correnti.
+        
+        Args:
+            provider: Nome del provider.
+            requests_per_minute: Richieste al minuto (0 per nessun limite).
+            tokens_per_minute: Token al minuto (0 per nessun limite).
+        
+        Returns:
+            Optional[RateLimiter]: Nuovo limitatore, o None se il provider non ha limiti.
+        """
+        limiter = None
+        if requests_per_minute > 0 or tokens_per_minute > 0:
+            limiter = RateLimiter(provider.lower(), requests_per_minute, tokens_per_minute)
+        with self._lock:
+            self._limiters[provider.lower()] = limiter
+        return limiter
+    
+    def estimate(self, prompt_tokens: int, max_tokens: Optional[int]) -> int:
+        """
+        Stima il costo di una chiamata in token.
+        
+        Args:
+            prompt_tokens: Token stimati del prompt.
+            max_tokens: Numero massimo di token della risposta, o None.
+        
+        Returns:
+            int: Costo stimato (prompt e risposta).
+        """
+        return prompt_tokens + (max_tokens if max_tokens is not None else self.completion_estimate)
+    
+    def stats(self) -> Dict[str, Dict[str, Any]]:
+        """
+        Restituisce le metriche dei provider con limiti.
+        
+        Returns:
+            Dict[str, Dict[str, Any]]: Metriche per provider.
+        """
+        with self._lock:
+            limiters = {name: limiter for name, limiter in self._limiters.items() if limiter is not None}
+        return {name: limiter.stats() for name, limiter in limiters.items()}
+
+# Istanza singleton del pianificatore delle chiamate LLM
+llm_scheduler = LLMScheduler()
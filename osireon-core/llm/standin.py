@@ -0,0 +1,309 @@
+"""
+Server LLM sostitutivo per Osireon.
+Questo file contiene un server locale compatibile con l'API chat completions di OpenAI, con latenza
+e guasti configurabili, per provare il client HTTP e i provider senza chiamare servizi esterni.
+"""
+import asyncio
+import json
+import logging
+import os
+import threading
+import time
+import uuid
+from typing import Dict, Any, AsyncIterator, List, Optional, Tuple, Union
+
+from fastapi import FastAPI
+from fastapi.responses import JSONResponse, StreamingResponse
+from pydantic import BaseModel
+import uvicorn
+
+from src.llm.connector import estimate_tokens, llm_connector, split_chunks
+
+# Configurazione del logging
+logger = logging.getLogger("osireon.llm.standin")
+
+class ChatMessage(BaseModel):
+    """
+    Messaggio di una conversazione.
+    """
+    role: str
+    content: str
+
+class ChatCompletionRequest(BaseModel):
+    """
+    Richiesta chat completions (sottoinsieme dei campi dell'API OpenAI).
+    """
+    model: str = "gpt-4"
+    messages: List[ChatMessage]
+    temperature: float = 0.7
+    max_tokens: Optional[int] = None
+    stream: bool = False
+
+class CompletionRequest(BaseModel):
+    """
+    Richiesta completions con uno o più prompt (sottoinsieme dei campi dell'API OpenAI).
+    """
+    model: str = "gpt-4"
+    prompt: Union[str, List[str]]
+    temperature: float = 0.7
+    max_tokens: Optional[int] = None
+
+def _completion(provider: str, prompt: str, max_tokens: Optional[int]) -> Tuple[List[str], str]:
+    """
+    Genera la risposta deterministica a un prompt, divisa in frammenti.
+    
+    La risposta è quella dell'implementazione mock del connettore, troncata a max_tokens con la stessa
+    regola (split_chunks): un provider che punta al server sostitutivo restituisce lo stesso testo del mock.
+    
+    Args:
+        provider: Provider simulato (determina lo stile della risposta).
+        prompt: Prompt ricevuto.
+        max_tokens: Numero massimo di token della risposta, o None.
+    
+    Returns:
+        Tuple[List[str], str]: Frammenti della risposta e motivo di fine ("stop" o "length").
+    """
+    chunks, truncated = split_chunks(llm_connector._mock_response(provider, prompt), max_tokens)
+    return chunks, "length" if truncated else "stop"
+
+def create_standin_app(latency: Optional[float] = None, token_latency: Optional[float] = None,
+                       fail_every: Optional[int] = None, provider: Optional[str] = None,
+                       retry_after: Optional[float] = None) -> FastAPI:
+    """
+    Crea l'applicazione del server sostitutivo.
+    
+    Args:
+        latency: Attesa prima del primo frammento in secondi.
+        token_latency: Attesa tra due frammenti in secondi.
+        fail_every: Se maggiore di 0, ogni fail_every-esima richiesta riceve 503.
+        provider: Provider simulato (openai o deepseek).
+        retry_after: Valore di Retry-After delle risposte 503 in secondi.
+    
+    Returns:
+        FastAPI: Applicazione del server sostitutivo.
+    """
+    latency = latency if latency is not None else float(os.getenv("LLM_STANDIN_LATENCY", "0.05"))
+    token_latency = token_latency if token_latency is not None else float(os.getenv("LLM_STANDIN_TOKEN_LATENCY", "0.005"))
+    fail_every = fail_every if fail_every is not None else int(os.getenv("LLM_STANDIN_FAIL_EVERY", "0"))
+    provider = provider or os.getenv("LLM_STANDIN_PROVIDER", "openai")
+    retry_after = retry_after if retry_after is not None else float(os.getenv("LLM_STANDIN_RETRY_AFTER", "0"))
+    
+    app = FastAPI(title="Osireon LLM stand-in", description="Server sostitutivo compatibile con OpenAI")
+    stats = {"requests": 0, "streams": 0, "batches": 0, "batched_prompts": 0, "failures": 0, "active": 0,
+             "max_active": 0, "completion_tokens": 0}
+    
+    def failure() -> Optional[JSONResponse]:
+        stats["requests"] += 1
+        if fail_every > 0 and stats["requests"] % fail_every == 0:
+            stats["failures"] += 1
+            return JSONResponse(
+                status_code=503,
+                content={"error": {"message": "Servizio temporaneamente non disponibile", "type": "server_error"}},
+                headers={"Retry-After": f"{retry_after:g}"}
+            )
+        return None
+    
+    def enter() -> None:
+        stats["active"] += 1
+        stats["max_active"] = max(stats["max_active"], stats["active"])
+    
+    def leave(chunks: List[str]) -> None:
+        stats["active"] -= 1
+        stats["completion_tokens"] += sum(estimate_tokens(chunk) for chunk in chunks)
+    
+    @app.post("/v1/chat/completions")
+    async def chat_completions(request: ChatCompletionRequest):
+        """
+        Genera una risposta completa o in streaming (eventi server-sent).
+        """
+        error = failure()
+        if error is not None:
+            return error
+        
+        prompt = "\n".join(message.content for message in request.messages)
+        chunks, finish_reason = _completion(provider, prompt, request.max_tokens)
+        completion_id = f"chatcmpl-{uuid.uuid4().hex[:24]}"
+        created = int(time.time())
+        
+        if not request.stream:
+            enter()
+            try:
+                await asyncio.sleep(latency + token_latency * len(chunks))
+            finally:
+                leave(chunks)
+            prompt_tokens = estimate_tokens(prompt)
+            completion_tokens = sum(estimate_tokens(chunk) for chunk in chunks)
+            return {
+                "id": completion_id,
+                "object": "chat.completion",
+                "created": created,
+                "model": request.model,
+                "choices": [{
+                    "index": 0,
+                    "message": {"role": "assistant", "content": "".join(chunks)},
+                    "finish_reason": finish_reason
+                }],
+                "usage": {
+                    "prompt_tokens": prompt_tokens,
+                    "completion_tokens": completion_tokens,
+                    "total_tokens": prompt_tokens + completion_tokens
+                }
+            }
+        
+        def event(delta: Dict[str, Any], finish: Optional[str] = None) -> str:
+            payload = {
+                "id": completion_id,
+                "object": "chat.completion.chunk",
+                "created": created,
+                "model": request.model,
+                "choices": [{"index": 0, "delta": delta, "finish_reason": finish}]
+            }
+            return f"data: {json.dumps(payload, ensure_ascii=False)}\n\n"
+        
+        async def events() -> AsyncIterator[str]:
+            stats["streams"] += 1
+            enter()
+            try:
+                await asyncio.sleep(latency)
+                yield event({"role": "assistant"})
+                for k, chunk in enumerate(chunks):
+                    if k:
+                        await asyncio.sleep(token_latency)
+                    yield event({"content": chunk})
+                yield event({}, finish_reason)
+                yield "data: [DONE]\n\n"
+            finally:
+                leave(chunks)
+        
+        return StreamingResponse(events(), media_type="text/event-stream")
+    
+    @app.post("/v1/completions")
+    async def completions(request: CompletionRequest):
+        """
+        Genera le risposte di uno o più prompt con un'unica richiesta.
+        
+        I prompt di una richiesta vengono elaborati insieme: la latenza è quella della risposta più lunga.
+        """
+        error = failure()
+        if error is not None:
+            return error
+        
+        prompts = [request.prompt] if isinstance(request.prompt, str) else request.prompt
+        stats["batches"] += 1
+        stats["batched_prompts"] += len(prompts)
+        completions = [_completion(provider, prompt, request.max_tokens) for prompt in prompts]
+        every_chunk = [chunk for chunks, _ in completions for chunk in chunks]
+        enter()
+        try:
+            await asyncio.sleep(latency + token_latency * max((len(chunks) for chunks, _ in completions), default=0))
+        finally:
+            leave(every_chunk)
+        
+        prompt_tokens = sum(estimate_tokens(prompt) for prompt in prompts)
+        completion_tokens = sum(estimate_tokens(chunk) for chunk in every_chunk)
+        return {
+            "id": f"cmpl-{uuid.uuid4().hex[:24]}",
+            "object": "text_completion",
+            "created": int(time.time()),
+            "model": request.model,
+            "choices": [
+                {"index": k, "text": "".join(chunks), "finish_reason": finish_reason}
+                for k, (chunks, finish_reason) in enumerate(completions)
+            ],
+            "usage": {
+                "prompt_tokens": prompt_tokens,
+                "completion_tokens": completion_tokens,
+                "total_tokens": prompt_tokens + completion_tokens
+            }
+        }
+    
+    @app.get("/v1/models")
+    async def list_models() -> Dict[str, Any]:
+        """
+        Elenca i modelli disponibili (accetta comunque qualsiasi nome di modello).
+        """
+        return {"object": "list", "data": [{"id": llm_connector.default_model, "object": "model", "owned_by": "osireon"}]}
+    
+    @app.get("/stats")
+    async def standin_stats() -> Dict[str, Any]:
+        """
+        Restituisce le richieste ricevute, i guasti simulati e la concorrenza massima osservata.
+        """
+        return dict(stats)
+    
+    logger.info(f"Server sostitutivo configurato: latenza {latency}s, latenza per frammento {token_latency}s, "
+                f"guasto ogni {fail_every or 'mai'} richieste")
+    return app
+
+class StandinServer:
+    """
+    Server sostitutivo eseguito in un thread in background (es. per prove e benchmark).
+    """
+    
+    def __init__(self, app: Optional[FastAPI] = None, host: str = "127.0.0.1", port: int = 0):
+        """
+        Inizializza il server.
+        
+        Args:
+            app: Applicazione da servire. Se None, create_standin_app() con la configurazione d'ambiente.
+            host: Indirizzo di ascolto.
+            port: Porta di ascolto (0 sceglie una porta libera).
+        """
+        config = uvicorn.Config(app or create_standin_app(), host=host, port=port, log_level="warning",
+                                timeout_keep_alive=int(os.getenv("LLM_STANDIN_KEEPALIVE", "75")))
+        self.host = host
+        self.server = uvicorn.Server(config)
+        self._thread = threading.Thread(target=self.server.run, name="osireon-llm-standin", daemon=True)
+    
+    @property
+    def port(self) -> int:
+        """
+        Porta effettiva di ascolto.
+        """
+        return self.server.servers[0].sockets[0].getsockname()[1]
+    
+    @property
+    def base_url(self) -> str:
+        """
+        URL di base da usare come <PROVIDER>_BASE_URL.
+        """
+        return f"http://{self.host}:{self.port}/v1"
+    
+    def start(self, timeout: float = 10.0) -> "StandinServer":
+        """
+        Avvia il server e attende che sia in ascolto.
+        
+        Args:
+            timeout: Tempo massimo di avvio in secondi.
+        
+        Returns:
+            StandinServer: Il server stesso.
+        """
+        self._thread.start()
+        deadline = time.monotonic() + timeout
+        while not self.server.started:
+            if not self._thread.is_alive() or time.monotonic() > deadline:
+                raise RuntimeError("Avvio del server sostitutivo non riuscito")
+            time.sleep(0.01)
+        logger.info(f"Server sostitutivo in ascolto su {self.base_url}")
+        return self
+    
+    def stop(self) -> None:
+        """
+        Arresta il server e attende la fine del thread.
+        """
+        self.server.should_exit = True
+        self._thread.join()
+    
+    def __enter__(self) -> "StandinServer":
+        return self.start()
+    
+    def __exit__(self, *exc_info) -> None:
+        self.stop()
+
+# Punto di ingresso per l'esecuzione diretta
+if __name__ == "__main__":
+    host = os.getenv("LLM_STANDIN_HOST", "127.0.0.1")
+    port = int(os.getenv("LLM_STANDIN_PORT", "8400"))
+    uvicorn.run(create_standin_app(), host=host, port=port,
+                timeout_keep_alive=int(os.getenv("LLM_STANDIN_KEEPALIVE", "75")))
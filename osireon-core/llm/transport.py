@@ -0,0 +1,533 @@
+"""
+Client HTTP asincrono per Osireon.
+Questo file contiene il client HTTP/1.1 condiviso dai provider LLM, con un pool di connessioni
+keep-alive per host, risposte in streaming e un tempo massimo per richiesta.
+"""
+import asyncio
+import json
+import logging
+import os
+import ssl
+import time
+import weakref
+from contextlib import asynccontextmanager
+from typing import Dict, Any, AsyncIterator, List, Optional, Tuple
+from urllib.parse import urlsplit
+
+# Configurazione del logging
+logger = logging.getLogger("osireon.llm.transport")
+
+# Stati HTTP per cui una richiesta può essere ripetuta
+RETRYABLE_STATUSES = (408, 409, 425, 429, 500, 502, 503, 504)
+
+# Dimensione massima della riga di stato e di ogni intestazione
+_MAX_LINE = 65536
+
+class HTTPError(Exception):
+    """
+    Errore di una richiesta HTTP (stato di errore, connessione interrotta o tempo scaduto).
+    """
+    
+    def __init__(self, message: str, status: Optional[int] = None, body: bytes = b"",
+                 retry_after: Optional[float] = None):
+        """
+        Inizializza l'errore.
+        
+        Args:
+            message: Descrizione dell'errore.
+            status: Stato HTTP, o None per gli errori di connessione.
+            body: Corpo della risposta di errore.
+            retry_after: Attesa suggerita dal server (intestazione Retry-After) in secondi.
+        """
+        super().__init__(message)
+        self.status = status
+        self.body = body
+        self.retry_after = retry_after
+    
+    @property
+    def retryable(self) -> bool:
+        """
+        Indica se la richiesta può essere ripetuta (errori di connessione, 429 e errori temporanei del server).
+        """
+        return self.status is None or self.status in RETRYABLE_STATUSES
+
+class HTTPResponse:
+    """
+    Risposta HTTP il cui corpo viene letto dalla connessione man mano che serve.
+    """
+    
+    def __init__(self, status: int, reason: str, headers: Dict[str, str], body: "_BodyReader"):
+        """
+        Inizializza la risposta.
+        
+        Args:
+            status: Stato HTTP.
+            reason: Descrizione dello stato.
+            headers: Intestazioni con nomi in minuscolo.
+            body: Lettore del corpo.
+        """
+        self.status = status
+        self.reason = reason
+        self.headers = headers
+        self._body = body
+        self._content: Optional[bytes] = None
+    
+    @property
+    def retry_after(self) -> Optional[float]:
+        """
+        Attesa suggerita dal server in secondi, se indicata in secondi.
+        """
+        try:
+            return float(self.headers["retry-after"])
+        except (KeyError, ValueError):
+            return None
+    
+    async def read(self) -> bytes:
+        """
+        Legge l'intero corpo della risposta.
+        
+        Returns:
+            bytes: Corpo della risposta.
+        """
+        if self._content is None:
+            self._content = b"".join([chunk async for chunk in self._body.chunks()])
+        return self._content
+    
+    async def json(self) -> Any:
+        """
+        Legge il corpo della risposta come JSON.
+        
+        Returns:
+            Any: Documento JSON.
+        """
+        return json.loads(await self.read())
+    
+    async def iter_lines(self) -> AsyncIterator[str]:
+        """
+        Restituisce le righe del corpo man mano che arrivano (es. eventi server-sent).
+        
+        Yields:
+            str: Righe del corpo senza terminatore.
+        """
+        pending = b""
+        async for chunk in self._body.chunks():
+            pending += chunk
+            lines = pending.split(b"\n")
+            pending = lines.pop()
+            for line in lines:
+                yield line.rstrip(b"\r").decode("utf-8")
+        if pending:
+            yield pending.rstrip(b"\r").decode("utf-8")
+    
+    def error(self, body: bytes = b"") -> HTTPError:
+        """
+        Costruisce l'errore corrispondente a uno stato di errore.
+        
+        Args:
+            body: Corpo della risposta già letto.
+        
+        Returns:
+            HTTPError: Errore con stato, corpo e attesa suggerita.
+        """
+        return HTTPError(f"HTTP {self.status} {self.reason}: {body[:200].decode('utf-8', 'replace')}",
+                         self.status, body, self.retry_after)
+
+class _Connection:
+    """
+    Connessione TCP (eventualmente TLS) verso un host.
+    """
+    
+    def __init__(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        self.reader = reader
+        self.writer = writer
+        self.last_used = time.monotonic()
+        self.requests = 0
+    
+    @property
+    def closed(self) -> bool:
+        """
+        Indica se la connessione è stata chiusa da una delle due parti.
+        """
+        return self.writer.is_closing() or self.reader.at_eof()
+    
+    def close(self) -> None:
+        """
+        Chiude la connessione.
+        """
+        self.writer.close()
+
+class _BodyReader:
+    """
+    Lettore del corpo di una risposta (lunghezza nota, chunked o fino alla chiusura).
+    """
+    
+    def __init__(self, connection: _Connection, headers: Dict[str, str], has_body: bool, deadline: Optional[float]):
+        self.connection = connection
+        self.deadline = deadline
+        self.done = not has_body
+        self.chunked = has_body and "chunked" in headers.get("transfer-encoding", "").lower()
+        self.length = None if not has_body or self.chunked or "content-length" not in headers else int(headers["content-length"])
+        # Senza lunghezza né chunked il corpo termina con la chiusura della connessione
+        self.until_close = has_body and not self.chunked and self.length is None
+    
+    async def chunks(self) -> AsyncIterator[bytes]:
+        """
+        Restituisce i frammenti del corpo man mano che arrivano.
+        
+        Yields:
+            bytes: Frammenti del corpo.
+        """
+        reader = self.connection.reader
+        if self.done:
+            return
+        if self.chunked:
+            while True:
+                size_line = await _wait(reader.readline(), self.deadline)
+                size = int(size_line.split(b";")[0].strip() or b"0", 16)
+                if size == 0:
+                    # Intestazioni finali facoltative fino alla riga vuota
+                    while (await _wait(reader.readline(), self.deadline)).strip():
+                        pass
+                    break
+                data = await _wait(reader.readexactly(size), self.deadline)
+                await _wait(reader.readexactly(2), self.deadline)
+                yield data
+        elif self.length is not None:
+            remaining = self.length
+            while remaining > 0:
+                data = await _wait(reader.read(min(remaining, 65536)), self.deadline)
+                if not data:
+                    raise HTTPError("Connessione chiusa prima della fine della risposta")
+                remaining -= len(data)
+                yield data
+        else:
+            while True:
+                data = await _wait(reader.read(65536), self.deadline)
+                if not data:
+                    break
+                yield data
+        self.done = True
+
+class _Pool:
+    """
+    Connessioni keep-alive verso un host, con un numero massimo di connessioni contemporanee.
+    """
+    
+    def __init__(self, host: str, port: int, ssl_context: Optional[ssl.SSLContext], max_connections: int,
+                 idle_timeout: float):
+        self.host = host
+        self.port = port
+        self.ssl_context = ssl_context
+        self.idle_timeout = idle_timeout
+        self.max_connections = max_connections
+        self._idle: List[_Connection] = []
+        self._slots = asyncio.Semaphore(max_connections)
+        self.created = 0
+        self.reused = 0
+        self.in_use = 0
+    
+    async def acquire(self, connect_timeout: float, fresh: bool = False) -> Tuple[_Connection, bool]:
+        """
+        Ottiene una connessione, riusandone una inattiva se possibile.
+        
+        Args:
+            connect_timeout: Tempo massimo di apertura di una nuova connessione.
+            fresh: Se True, apre sempre una nuova connessione.
+        
+        Returns:
+            Tuple[_Connection, bool]: Connessione e se è stata riusata.
+        """
+        await self._slots.acquire()
+        try:
+            now = time.monotonic()
+            while self._idle and not fresh:
+                connection = self._idle.pop()
+                if connection.closed or now - connection.last_used > self.idle_timeout:
+                    connection.close()
+                    continue
+                self.reused += 1
+                self.in_use += 1
+                return connection, True
+            
+            reader, writer = await asyncio.wait_for(
+                asyncio.open_connection(self.host, self.port, ssl=self.ssl_context,
+                                        server_hostname=self.host if self.ssl_context else None),
+                connect_timeout
+            )
+            self.created += 1
+            self.in_use += 1
+            return _Connection(reader, writer), False
+        except BaseException:
+            self._slots.release()
+            raise
+    
+    def release(self, connection: _Connection, reusable: bool) -> None:
+        """
+        Restituisce una connessione al pool, o la chiude se non è riusabile.
+        
+        Args:
+            connection: Connessione da restituire.
+            reusable: Se la connessione può servire altre richieste.
+        """
+        self.in_use -= 1
+        if reusable and not connection.closed:
+            connection.last_used = time.monotonic()
+            self._idle.append(connection)
+        else:
+            connection.close()
+        self._slots.release()
+    
+    def close(self) -> None:
+        """
+        Chiude le connessioni inattive.
+        """
+        for connection in self._idle:
+            connection.close()
+        self._idle.clear()
+    
+    def stats(self) -> Dict[str, int]:
+        """
+        Restituisce le metriche del pool.
+        
+        Returns:
+            Dict[str, int]: Connessioni create, riusi, connessioni in uso e inattive.
+        """
+        return {"created": self.created, "reused": self.reused, "in_use": self.in_use, "idle": len(self._idle)}
+
+class AsyncHTTPClient:
+    """
+    Client HTTP/1.1 asincrono condiviso, con connessioni keep-alive riusate tra le richieste.
+    
+    Le connessioni asyncio appartengono al ciclo di eventi che le ha aperte: il client mantiene
+    un pool per ciclo di eventi e per host, rimosso automaticamente quando il ciclo viene distrutto.
+    Ogni pool limita il numero di connessioni contemporanee verso l'host; le richieste in eccesso
+    attendono che una connessione si liberi.
+    """
+    
+    def __init__(self, max_connections: Optional[int] = None, connect_timeout: Optional[float] = None,
+                 idle_timeout: Optional[float] = None):
+        """
+        Inizializza il client.
+        
+        Args:
+            max_connections: Numero massimo di connessioni contemporanee per host.
+            connect_timeout: Tempo massimo di apertura di una connessione in secondi.
+            idle_timeout: Tempo massimo di inattività di una connessione keep-alive in secondi.
+        """
+        self.max_connections = max_connections or int(os.getenv("LLM_HTTP_POOL_SIZE", "16"))
+        self.connect_timeout = connect_timeout or float(os.getenv("LLM_HTTP_CONNECT_TIMEOUT", "10"))
+        self.idle_timeout = idle_timeout or float(os.getenv("LLM_HTTP_KEEPALIVE", "30"))
+        self._pools: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, Dict[tuple, _Pool]]" = weakref.WeakKeyDictionary()
+        self._ssl_context: Optional[ssl.SSLContext] = None
+        logger.info(f"AsyncHTTPClient inizializzato con {self.max_connections} connessioni per host")
+    
+    async def request(self, method: str, url: str, headers: Optional[Dict[str, str]] = None,
+                      json_body: Any = None, timeout: Optional[float] = None) -> Tuple[HTTPResponse, bytes]:
+        """
+        Esegue una richiesta e ne legge l'intero corpo.
+        
+        Args:
+            method: Metodo HTTP.
+            url: URL completo.
+            headers: Intestazioni aggiuntive.
+            json_body: Corpo da inviare come JSON, o None.
+            timeout: Tempo massimo della richiesta in secondi.
+        
+        Returns:
+            Tuple[HTTPResponse, bytes]: Risposta e corpo.
+        """
+        async with self.stream(method, url, headers, json_body, timeout) as response:
+            return response, await response.read()
+    
+    @asynccontextmanager
+    async def stream(self, method: str, url: str, headers: Optional[Dict[str, str]] = None,
+                     json_body: Any = None, timeout: Optional[float] = None) -> AsyncIterator[HTTPResponse]:
+        """
+        Esegue una richiesta restituendo la risposta prima di averne letto il corpo.
+        
+        La connessione torna nel pool solo se il corpo è stato letto per intero (anche se il chiamante
+        solleva un'eccezione); altrimenti viene chiusa.
+        
+        Args:
+            method: Metodo HTTP.
+            url: URL completo.
+            headers: Intestazioni aggiuntive.
+            json_body: Corpo da inviare come JSON, o None.
+            timeout: Tempo massimo della richiesta (compresa la lettura del corpo) in secondi.
+        
+        Yields:
+            HTTPResponse: Risposta con il corpo da leggere.
+        """
+        parts = urlsplit(url)
+        if parts.scheme not in ("http", "https") or not parts.hostname:
+            raise ValueError(f"URL non supportato: {url}")
+        secure = parts.scheme == "https"
+        port = parts.port or (443 if secure else 80)
+        pool = self._pool(parts.hostname, port, secure)
+        deadline = time.monotonic() + timeout if timeout else None
+        
+        path = parts.path or "/"
+        if parts.query:
+            path += "?" + parts.query
+        body = b"" if json_body is None else json.dumps(json_body, ensure_ascii=False).encode("utf-8")
+        request = self._encode_request(method, path, parts.netloc, headers or {}, body, json_body is not None)
+        
+        # Una connessione riusata può essere stata chiusa dal server mentre era inattiva:
+        # in quel caso la richiesta viene ripetuta una volta su una nuova connessione
+        fresh = False
+        while True:
+            connection, reused = await pool.acquire(self.connect_timeout, fresh)
+            try:
+                connection.writer.write(request)
+                await _wait(connection.writer.drain(), deadline)
+                status, reason, response_headers = await self._read_head(connection, deadline)
+                break
+            except (ConnectionError, asyncio.IncompleteReadError, HTTPError) as e:
+                pool.release(connection, False)
+                if reused and not fresh and not isinstance(e, HTTPError):
+                    fresh = True
+                    continue
+                if isinstance(e, HTTPError):
+                    raise
+                raise HTTPError(f"Connessione interrotta verso {parts.hostname}: {str(e)}") from e
+            except BaseException:
+                pool.release(connection, False)
+                raise
+        
+        has_body = method != "HEAD" and status not in (204, 304) and not 100 <= status < 200
+        reader = _BodyReader(connection, response_headers, has_body, deadline)
+        response = HTTPResponse(status, reason, response_headers, reader)
+        connection.requests += 1
+        
+        try:
+            yield response
+        finally:
+            keep_alive = response_headers.get("connection", "").lower() != "close"
+            pool.release(connection, reader.done and keep_alive and not reader.until_close)
+    
+    async def aclose(self) -> None:
+        """
+        Chiude le connessioni inattive del ciclo di eventi corrente.
+        """
+        pools = self._pools.pop(asyncio.get_running_loop(), {})
+        for pool in pools.values():
+            pool.close()
+    
+    def stats(self) -> Dict[str, Dict[str, int]]:
+        """
+        Restituisce le metriche dei pool del ciclo di eventi corrente, per host.
+        
+        Returns:
+            Dict[str, Dict[str, int]]: Metriche per "host:porta".
+        """
+        try:
+            pools = self._pools.get(asyncio.get_running_loop(), {})
+        except RuntimeError:
+            pools = {}
+        return {f"{host}:{port}": pool.stats() for (host, port, _), pool in pools.items()}
+    
+    def _pool(self, host: str, port: int, secure: bool) -> _Pool:
+        """
+        Restituisce il pool di un host per il ciclo di eventi corrente, creandolo se necessario.
+        
+        Args:
+            host: Nome dell'host.
+            port: Porta.
+            secure: Se la connessione usa TLS.
+        
+        Returns:
+            _Pool: Pool di connessioni.
+        """
+        pools = self._pools.setdefault(asyncio.get_running_loop(), {})
+        key = (host, port, secure)
+        if key not in pools:
+            if secure and self._ssl_context is None:
+                self._ssl_context = ssl.create_default_context()
+            pools[key] = _Pool(host, port, self._ssl_context if secure else None, self.max_connections, self.idle_timeout)
+        return pools[key]
+    
+    def _encode_request(self, method: str, path: str, host: str, headers: Dict[str, str], body: bytes,
+                        is_json: bool) -> bytes:
+        """
+        Codifica la riga di richiesta, le intestazioni e il corpo.
+        
+        Args:
+            method: Metodo HTTP.
+            path: Percorso con eventuale query.
+            host: Valore dell'intestazione Host.
+            headers: Intestazioni aggiuntive.
+            body: Corpo della richiesta.
+            is_json: Se il corpo è JSON.
+        
+        Returns:
+            bytes: Richiesta pronta da inviare.
+        """
+        lines = [f"{method} {path} HTTP/1.1", f"Host: {host}", "Connection: keep-alive",
+                 "Accept-Encoding: identity", "User-Agent: osireon"]
+        if body or method in ("POST", "PUT", "PATCH"):
+            lines.append(f"Content-Length: {len(body)}")
+        if is_json:
+            lines.append("Content-Type: application/json")
+        lines.extend(f"{name}: {value}" for name, value in headers.items())
+        return ("\r\n".join(lines) + "\r\n\r\n").encode("latin-1") + body
+    
+    async def _read_head(self, connection: _Connection, deadline: Optional[float]) -> Tuple[int, str, Dict[str, str]]:
+        """
+        Legge la riga di stato e le intestazioni di una risposta.
+        
+        Args:
+            connection: Connessione da cui leggere.
+            deadline: Istante (time.monotonic) entro cui completare la lettura.
+        
+        Returns:
+            Tuple[int, str, Dict[str, str]]: Stato, descrizione e intestazioni con nomi in minuscolo.
+        """
+        reader = connection.reader
+        while True:
+            line = await _wait(reader.readline(), deadline)
+            if not line:
+                raise asyncio.IncompleteReadError(b"", None)
+            if len(line) > _MAX_LINE:
+                raise HTTPError("Riga di stato troppo lunga")
+            version, _, rest = line.decode("latin-1").rstrip("\r\n").partition(" ")
+            status_text, _, reason = rest.partition(" ")
+            status = int(status_text)
+            
+            headers: Dict[str, str] = {}
+            while True:
+                header = await _wait(reader.readline(), deadline)
+                if len(header) > _MAX_LINE:
+                    raise HTTPError("Intestazione troppo lunga")
+                header = header.decode("latin-1").rstrip("\r\n")
+                if not header:
+                    break
+                name, _, value = header.partition(":")
+                headers[name.strip().lower()] = value.strip()
+            
+            # Le risposte informative (es. 100 Continue) precedono quella finale
+            if status >= 200 or status == 101:
+                if version == "HTTP/1.0" and headers.get("connection", "").lower() != "keep-alive":
+                    headers["connection"] = "close"
+                return status, reason, headers
+
+async def _wait(awaitable, deadline: Optional[float]):
+    """
+    Attende un'operazione entro una scadenza.
+    
+    Args:
+        awaitable: Operazione da attendere.
+        deadline: Istante (time.monotonic) di scadenza, o None.
+    
+    Returns:
+        Any: Risultato dell'operazione.
+    """
+    if deadline is None:
+        return await awaitable
+    remaining = deadline - time.monotonic()
+    try:
+        return await asyncio.wait_for(awaitable, max(remaining, 0))
+    except asyncio.TimeoutError:
+        raise HTTPError("Tempo massimo della richiesta superato")
+
+# Istanza singleton del client HTTP condiviso
+http_client = AsyncHTTPClient()
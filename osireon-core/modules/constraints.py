@@ -0,0 +1,473 @@
+"""
+Compilazione dei vincoli per Osireon.
+Questo file contiene il compilatore che traduce i vincoli in testo libero in predicati tipizzati
+sulle metriche dei moduli e li valuta su tutte le proposte in un'unica passata per colonna.
+"""
+import logging
+import os
+import re
+import threading
+import unicodedata
+from collections import OrderedDict
+from typing import Dict, Any, Callable, List, Optional, Sequence, Tuple
+
+# Configurazione del logging
+logger = logging.getLogger("osireon.modules.constraints")
+
+# Parole chiave delle metriche: espressione -> colonne candidate, nell'ordine di preferenza.
+# Le espressioni più specifiche precedono quelle generiche ("impatto sociale" prima di "impatto").
+METRIC_KEYWORDS: List[Tuple[str, Tuple[str, ...]]] = [
+    (r"impatto sociale|social impact", ("social_impact_score",)),
+    (r"fattibilita economica|economic feasibility", ("economic_feasibility", "feasibility")),
+    (r"impatto|impact", ("impact_score", "social_impact_score")),
+    (r"fattibilita|feasibility", ("feasibility",)),
+    (r"accettazione|consenso|acceptance", ("acceptance_rate",)),
+    (r"difficolta|difficulty", ("implementation_difficulty",)),
+    (r"platea|beneficiari|reach", ("estimated_reach",)),
+    (r"cost[oi]|spesa|oneri|budget|cost", ("cost_estimate",))
+]
+
+# Metriche per cui una negazione senza "aumento" ("senza oneri", "nessun costo") è un limite a zero
+_COST_METRICS = ("cost_estimate",)
+
+# Operatori in forma testuale, dai più lunghi ai più corti ("non superiore a" prima di "superiore a")
+OPERATOR_PHRASES: List[Tuple[str, str]] = [
+    ("non inferiore a", ">="), ("non meno di", ">="), ("almeno", ">="), ("minimo", ">="), ("minima", ">="),
+    ("at least", ">="),
+    ("non superiore a", "<="), ("non oltre", "<="), ("non piu di", "<="), ("al massimo", "<="), ("massimo", "<="),
+    ("massima", "<="), ("fino a", "<="), ("entro", "<="), ("at most", "<="),
+    ("inferiore a", "<"), ("minore di", "<"), ("meno di", "<"), ("sotto", "<"), ("below", "<"), ("less than", "<"),
+    ("superiore a", ">"), ("maggiore di", ">"), ("piu di", ">"), ("oltre", ">"), ("sopra", ">"), ("above", ">"),
+    ("more than", ">"),
+    ("diverso da", "!="), ("pari a", "=="), ("uguale a", "==")
+]
+
+# Moltiplicatori delle unità di misura
+UNIT_MULTIPLIERS = {
+    "%": 0.01,
+    "k": 1e3, "mila": 1e3,
+    "mln": 1e6, "milione": 1e6, "milioni": 1e6, "m": 1e6,
+    "mld": 1e9, "miliardo": 1e9, "miliardi": 1e9
+}
+
+_SYMBOLIC_OPERATOR = re.compile(r"(<=|>=|!=|==|≤|≥|<|>|=)")
+_IDENTIFIER = re.compile(r"\b([a-z]+(?:_[a-z]+)+)\b")
+_NUMBER = re.compile(
+    r"(-?\d{1,3}(?:\.\d{3})+(?:,\d+)?|-?\d+(?:[.,]\d+)?(?:e[+-]?\d+)?)\s*(miliardi|miliardo|milioni|milione|mila|mld|mln|k|m)?\b"
+)
+_NEGATION = re.compile(
+    r"^(?:nessun[oa']?|senza|zero|no)\s+(?:(aumento|incremento|nuov[oaie]|ulterior[ei])\s+)?"
+    r"(?:(?:dell'|dello|della|delle|degli|dei|del|di|d'|of|in)\s*)?"
+)
+_CLAUSE_SEPARATOR = re.compile(r"\s*(?:;|,(?=\s)|\be\b|\band\b)\s*")
+
+# Tolleranza per i confronti di uguaglianza
+_EQUALITY_TOLERANCE = 1e-9
+
+def normalize_constraint(text: str) -> str:
+    """
+    Normalizza il testo di un vincolo (minuscole, senza accenti, spazi compattati).
+    
+    Args:
+        text: Testo del vincolo.
+    
+    Returns:
+        str: Testo normalizzato.
+    """
+    decomposed = unicodedata.normalize("NFKD", text.lower())
+    stripped = "".join(ch for ch in decomposed if not unicodedata.combining(ch))
+    return " ".join(stripped.replace("’", "'").split())
+
+class Predicate:
+    """
+    Confronto tipizzato tra una metrica di proposta e una soglia.
+    """
+    __slots__ = ("metrics", "operator", "threshold")
+    
+    def __init__(self, metrics: Tuple[str, ...], operator: str, threshold: float):
+        """
+        Inizializza il predicato.
+        
+        Args:
+            metrics: Colonne candidate della metrica, nell'ordine di preferenza.
+            operator: Operatore di confronto (<=, <, >=, >, ==, !=).
+            threshold: Soglia del confronto.
+        """
+        self.metrics = metrics
+        self.operator = operator
+        self.threshold = threshold
+    
+    def resolve(self, columns: Dict[str, Sequence[float]]) -> Optional[str]:
+        """
+        Sceglie la prima colonna candidata presente tra le metriche del modulo.
+        
+        Args:
+            columns: Colonne delle metriche del modulo.
+        
+        Returns:
+            Optional[str]: Nome della colonna, o None se il modulo non produce la metrica.
+        """
+        return next((name for name in self.metrics if name in columns), None)
+    
+    def evaluate(self, values: Sequence[float]) -> Tuple[List[bool], List[float]]:
+        """
+        Valuta il predicato su una colonna di valori.
+        
+        Args:
+            values: Valori della metrica, uno per proposta.
+        
+        Returns:
+            Tuple[List[bool], List[float]]: Esito e margine per proposta (negativo se violato).
+        """
+        t = self.threshold
+        op = self.operator
+        if op in (">=", ">"):
+            margin = [float(v) - t for v in values]
+        elif op in ("<=", "<"):
+            margin = [t - float(v) for v in values]
+        elif op == "==":
+            margin = [-abs(float(v) - t) for v in values]
+        else:
+            margin = [abs(float(v) - t) for v in values]
+        
+        if op in (">", "<", "!="):
+            satisfied = [m > 0 for m in margin]
+        elif op == "==":
+            satisfied = [m >= -_EQUALITY_TOLERANCE for m in margin]
+        else:
+            satisfied = [m >= 0 for m in margin]
+        return satisfied, margin
+    
+    def to_dict(self) -> Dict[str, Any]:
+        """
+        Converte il predicato in un dizionario.
+        
+        Returns:
+            Dict[str, Any]: Metriche candidate, operatore e soglia.
+        """
+        return {"metric": self.metrics[0], "candidates": list(self.metrics), "operator": self.operator, "threshold": self.threshold}
+
+class CompiledConstraint:
+    """
+    Vincolo compilato: congiunzione di predicati, vuota se il testo non è interpretabile.
+    """
+    __slots__ = ("text", "predicates")
+    
+    def __init__(self, text: str, predicates: List[Predicate]):
+        """
+        Inizializza il vincolo compilato.
+        
+        Args:
+            text: Testo originale del vincolo.
+            predicates: Predicati che devono essere tutti soddisfatti.
+        """
+        self.text = text
+        self.predicates = predicates
+    
+    @property
+    def compiled(self) -> bool:
+        """
+        Indica se il vincolo è stato tradotto in predicati.
+        """
+        return bool(self.predicates)
+    
+    def to_dict(self) -> Dict[str, Any]:
+        """
+        Converte il vincolo compilato in un dizionario.
+        
+        Returns:
+            Dict[str, Any]: Testo, esito della compilazione e predicati.
+        """
+        return {
+            "constraint": self.text,
+            "compiled": self.compiled,
+            "predicates": [p.to_dict() for p in self.predicates]
+        }
+
+class ConstraintMatrix:
+    """
+    Esito della valutazione dei vincoli: matrici proposte x vincoli memorizzate per righe in liste piatte.
+    
+    La cella (i, j) si trova all'indice i * len(constraints) + j, lo stesso ordine dei record
+    di constraints_check. Il margine è None per i vincoli valutati con la regola di ripiego del modulo.
+    """
+    
+    def __init__(self, constraints: List[CompiledConstraint], n: int, satisfied: List[bool],
+                 margin: List[Optional[float]], evaluated: List[bool]):
+        """
+        Inizializza la matrice.
+        
+        Args:
+            constraints: Vincoli compilati, uno per colonna.
+            n: Numero di proposte.
+            satisfied: Esiti per cella.
+            margin: Margini per cella (negativi se il vincolo è violato).
+            evaluated: Per ogni vincolo, se è stato valutato come predicato sulle metriche.
+        """
+        self.constraints = constraints
+        self.n = n
+        self.satisfied = satisfied
+        self.margin = margin
+        self.evaluated = evaluated
+    
+    def row(self, index: int) -> List[bool]:
+        """
+        Restituisce gli esiti di una proposta.
+        
+        Args:
+            index: Indice della proposta.
+        
+        Returns:
+            List[bool]: Esito per vincolo.
+        """
+        m = len(self.constraints)
+        return self.satisfied[index * m:(index + 1) * m]
+    
+    def counts(self) -> List[int]:
+        """
+        Conta i vincoli soddisfatti da ogni proposta.
+        
+        Returns:
+            List[int]: Numero di vincoli soddisfatti per proposta.
+        """
+        return [sum(self.row(i)) for i in range(self.n)]
+    
+    def to_dict(self) -> Dict[str, Any]:
+        """
+        Converte la matrice in un dizionario con righe annidate per proposta.
+        
+        Returns:
+            Dict[str, Any]: Vincoli compilati, matrice di soddisfazione e matrice dei margini.
+        """
+        m = len(self.constraints)
+        return {
+            "constraints": [
+                {**c.to_dict(), "evaluated": evaluated} for c, evaluated in zip(self.constraints, self.evaluated)
+            ],
+            "satisfied": [self.satisfied[i * m:(i + 1) * m] for i in range(self.n)],
+            "margin": [self.margin[i * m:(i + 1) * m] for i in range(self.n)]
+        }
+
+class ConstraintCompiler:
+    """
+    Compilatore dei vincoli in testo libero.
+    
+    Riconosce confronti come "costo massimo 5 milioni", "fattibilità almeno 0,6",
+    "accettazione sopra il 60%", "cost_estimate <= 3e6" e negazioni come "nessun aumento della spesa"
+    (metrica <= 0); più confronti possono essere uniti da "e", virgola o punto e virgola. I vincoli su
+    grandezze che nessuna metrica rappresenta (es. "nessun aumento del debito") restano alla regola del
+    modulo. I vincoli compilati sono memorizzati per testo in una cache LRU condivisa.
+    """
+    
+    def __init__(self, cache_size: Optional[int] = None):
+        """
+        Inizializza il compilatore.
+        
+        Args:
+            cache_size: Numero massimo di vincoli compilati memorizzati.
+        """
+        self.cache_size = cache_size or int(os.getenv("CONSTRAINT_CACHE_SIZE", "4096"))
+        self._cache: "OrderedDict[str, CompiledConstraint]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        logger.info(f"ConstraintCompiler inizializzato con cache di {self.cache_size} vincoli")
+    
+    def compile(self, text: str) -> CompiledConstraint:
+        """
+        Compila un vincolo, riusando il risultato in cache per lo stesso testo.
+        
+        Args:
+            text: Testo del vincolo.
+        
+        Returns:
+            CompiledConstraint: Vincolo compilato (senza predicati se non interpretabile).
+        """
+        with self._lock:
+            compiled = self._cache.get(text)
+            if compiled is not None:
+                self._cache.move_to_end(text)
+                self.hits += 1
+                return compiled
+            self.misses += 1
+        
+        compiled = CompiledConstraint(text, self._parse(normalize_constraint(text)))
+        if not compiled.compiled:
+            logger.debug(f"Vincolo non interpretabile, si usa la regola del modulo: {text}")
+        
+        with self._lock:
+            self._cache[text] = compiled
+            while len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+        return compiled
+    
+    def evaluate(self, constraints: List[str], columns: Dict[str, Sequence[float]], n: int,
+                 fallback: Optional[Callable[[int, int], bool]] = None) -> ConstraintMatrix:
+        """
+        Valuta tutti i vincoli su tutte le proposte, un predicato per volta sull'intera colonna.
+        
+        Args:
+            constraints: Testi dei vincoli.
+            columns: Colonne delle metriche del modulo, un valore per proposta.
+            n: Numero di proposte.
+            fallback: Esito per la cella (proposta, vincolo) dei vincoli non compilati o su metriche
+                che il modulo non produce. Se None, questi vincoli risultano soddisfatti.
+        
+        Returns:
+            ConstraintMatrix: Matrici di soddisfazione e dei margini.
+        """
+        m = len(constraints)
+        compiled = [self.compile(c) for c in constraints]
+        satisfied: List[bool] = [True] * (n * m)
+        margin: List[Optional[float]] = [None] * (n * m)
+        evaluated: List[bool] = []
+        
+        for j, constraint in enumerate(compiled):
+            names = [p.resolve(columns) for p in constraint.predicates]
+            if not constraint.compiled or None in names:
+                evaluated.append(False)
+                if fallback is not None:
+                    satisfied[j::m] = [bool(fallback(i, j)) for i in range(n)]
+                continue
+            
+            # Congiunzione: soddisfatto se lo sono tutti i predicati, margine del predicato più stringente
+            column_satisfied, column_margin = constraint.predicates[0].evaluate(columns[names[0]])
+            for predicate, name in zip(constraint.predicates[1:], names[1:]):
+                other_satisfied, other_margin = predicate.evaluate(columns[name])
+                column_satisfied = [a and b for a, b in zip(column_satisfied, other_satisfied)]
+                column_margin = [min(a, b) for a, b in zip(column_margin, other_margin)]
+            
+            satisfied[j::m] = column_satisfied
+            margin[j::m] = column_margin
+            evaluated.append(True)
+        
+        return ConstraintMatrix(compiled, n, satisfied, margin, evaluated)
+    
+    def clear(self) -> None:
+        """
+        Svuota la cache dei vincoli compilati.
+        """
+        with self._lock:
+            self._cache.clear()
+    
+    def _parse(self, text: str) -> List[Predicate]:
+        """
+        Traduce un vincolo normalizzato in predicati.
+        
+        Args:
+            text: Testo normalizzato del vincolo.
+        
+        Returns:
+            List[Predicate]: Predicati del vincolo, vuota se il testo non è interpretabile.
+        """
+        # Congiunzione di confronti: ogni parte deve essere interpretabile
+        clauses = [c for c in _CLAUSE_SEPARATOR.split(text) if c]
+        if len(clauses) > 1:
+            predicates = [self._parse_clause(c) for c in clauses]
+            if all(p is not None for p in predicates):
+                return predicates
+            if any(p is not None for p in predicates):
+                # Una parte non interpretabile non va scartata in silenzio: il vincolo resta al modulo
+                return []
+        
+        # Nessuna parte interpretabile da sola: il separatore non divideva confronti (es. "tra 1 e 3")
+        predicate = self._parse_clause(text)
+        return [predicate] if predicate is not None else []
+    
+    def _parse_clause(self, text: str) -> Optional[Predicate]:
+        """
+        Traduce un singolo confronto in un predicato.
+        
+        Args:
+            text: Testo normalizzato del confronto.
+        
+        Returns:
+            Optional[Predicate]: Predicato, o None se il testo non è interpretabile.
+        """
+        metrics = self._metric(text)
+        if metrics is None:
+            return None
+        
+        operator, rest = self._operator(text)
+        threshold = self._number(rest if operator else text)
+        
+        if operator and threshold is not None:
+            return Predicate(metrics, operator, threshold)
+        
+        # "Nessun aumento della spesa", "senza oneri": la metrica non deve essere positiva
+        negation = _NEGATION.match(text)
+        if operator is None and threshold is None and negation:
+            negated = self._metric(text[negation.end():], anchored=True)
+            if negated is not None and (negation.group(1) or negated == _COST_METRICS):
+                return Predicate(negated, "<=", 0.0)
+        return None
+    
+    def _metric(self, text: str, anchored: bool = False) -> Optional[Tuple[str, ...]]:
+        """
+        Individua la metrica a cui si riferisce un confronto.
+        
+        Args:
+            text: Testo normalizzato del confronto.
+            anchored: Se True, la metrica deve trovarsi all'inizio del testo.
+        
+        Returns:
+            Optional[Tuple[str, ...]]: Colonne candidate della metrica, o None.
+        """
+        find = re.match if anchored else re.search
+        identifier = find(_IDENTIFIER, text)
+        if identifier:
+            return (identifier.group(1),)
+        for pattern, metrics in METRIC_KEYWORDS:
+            if find(rf"\b(?:{pattern})", text):
+                return metrics
+        return None
+    
+    def _operator(self, text: str) -> Tuple[Optional[str], str]:
+        """
+        Individua l'operatore di confronto.
+        
+        Args:
+            text: Testo normalizzato del confronto.
+        
+        Returns:
+            Tuple[Optional[str], str]: Operatore (o None) e testo che lo segue.
+        """
+        symbol = _SYMBOLIC_OPERATOR.search(text)
+        if symbol:
+            operator = {"≤": "<=", "≥": ">=", "=": "=="}.get(symbol.group(1), symbol.group(1))
+            return operator, text[symbol.end():]
+        
+        for phrase, operator in OPERATOR_PHRASES:
+            match = re.search(rf"\b{phrase}\b", text)
+            if match:
+                return operator, text[match.end():]
+        return None, text
+    
+    def _number(self, text: str) -> Optional[float]:
+        """
+        Estrae la soglia numerica, con separatori italiani e unità di misura.
+        
+        Args:
+            text: Testo che segue l'operatore.
+        
+        Returns:
+            Optional[float]: Soglia, o None se assente.
+        """
+        match = _NUMBER.search(text)
+        if match is None or match.group(1) is None:
+            return None
+        
+        literal = match.group(1)
+        if re.fullmatch(r"-?\d{1,3}(?:\.\d{3})+(?:,\d+)?", literal):
+            literal = literal.replace(".", "").replace(",", ".")
+        else:
+            literal = literal.replace(",", ".")
+        
+        value = float(literal)
+        unit = match.group(2)
+        if unit is None and text[match.end(1):].lstrip().startswith("%"):
+            unit = "%"
+        return value * UNIT_MULTIPLIERS.get(unit, 1.0)
+
+# Istanza singleton del compilatore dei vincoli
+constraint_compiler = ConstraintCompiler()
@@ -0,0 +1,540 @@
+"""
+Esecuzione isolata dei moduli di simulazione per Osireon.
+Questo file contiene il pool di processi che esegue i moduli con limiti di tempo, CPU e memoria.
+"""
+import importlib
+import logging
+import multiprocessing
+import os
+import pickle
+import signal
+import threading
+import time
+from array import array
+from multiprocessing import resource_tracker
+from multiprocessing.shared_memory import SharedMemory
+from typing import Dict, Any, Callable, List, Optional
+
+try:
+    import resource
+except ImportError:  # Piattaforme senza setrlimit (es. Windows)
+    resource = None
+
+# Configurazione del logging
+logger = logging.getLogger("osireon.modules.executor")
+
+# Connessione verso il processo padre del task in esecuzione (solo nei worker)
+_current_conn = None
+
+# Limiti di CPU e memoria del worker prima del primo task (ripristinati per i task senza limite)
+_initial_limits: Dict[int, Any] = {}
+
+class ModuleExecutionError(Exception):
+    """
+    Errore sollevato quando un modulo fallisce all'interno di un worker.
+    """
+    pass
+
+class SharedArray:
+    """
+    Riferimento a un array.array copiato in memoria condivisa.
+    Viene trasferito tra processi al posto dei dati, che non passano dalla pipe.
+    """
+    
+    def __init__(self, name: str, typecode: str, length: int):
+        """
+        Inizializza il riferimento.
+        
+        Args:
+            name: Nome del segmento di memoria condivisa.
+            typecode: Typecode dell'array originale.
+            length: Numero di elementi dell'array.
+        """
+        self.name = name
+        self.typecode = typecode
+        self.length = length
+
+def pack_arrays(obj: Any, threshold: int, segments: list) -> Any:
+    """
+    Sostituisce gli array di grandi dimensioni con riferimenti in memoria condivisa.
+    
+    Args:
+        obj: Argomento o risultato da trasferire.
+        threshold: Dimensione minima in byte oltre la quale usare la memoria condivisa.
+        segments: Lista in cui raccogliere i segmenti creati (il chiamante li chiude).
+    
+    Returns:
+        Any: Oggetto con gli array grandi sostituiti da SharedArray.
+    """
+    if isinstance(obj, array):
+        nbytes = obj.itemsize * len(obj)
+        if nbytes < threshold:
+            return obj
+        shm = SharedMemory(create=True, size=nbytes)
+        shm.buf[:nbytes] = memoryview(obj).cast("B")
+        segments.append(shm)
+        return SharedArray(shm.name, obj.typecode, len(obj))
+    if isinstance(obj, dict):
+        return {key: pack_arrays(value, threshold, segments) for key, value in obj.items()}
+    if isinstance(obj, list):
+        return [pack_arrays(value, threshold, segments) for value in obj]
+    return obj
+
+def unpack_arrays(obj: Any, unlink: bool = False) -> Any:
+    """
+    Ricostruisce gli array referenziati in memoria condivisa.
+    
+    Args:
+        obj: Oggetto ricevuto dall'altro processo.
+        unlink: Se True, rimuove i segmenti dopo la lettura (lato proprietario finale).
+    
+    Returns:
+        Any: Oggetto con gli array ricostruiti.
+    """
+    if isinstance(obj, SharedArray):
+        shm = SharedMemory(name=obj.name)
+        try:
+            result = array(obj.typecode)
+            result.frombytes(shm.buf[:obj.length * result.itemsize])
+        finally:
+            shm.close()
+            if unlink:
+                shm.unlink()
+        return result
+    if isinstance(obj, dict):
+        return {key: unpack_arrays(value, unlink) for key, value in obj.items()}
+    if isinstance(obj, list):
+        return [unpack_arrays(value, unlink) for value in obj]
+    return obj
+
+def report_partial(partial_result: Dict[str, Any]) -> None:
+    """
+    Comunica un risultato parziale al processo padre.
+    I moduli possono chiamarla periodicamente: in caso di timeout viene restituito l'ultimo parziale.
+    
+    Args:
+        partial_result: Risultato parziale del modulo (stessa forma del risultato finale).
+    """
+    if _current_conn is not None:
+        _current_conn.send(("partial", partial_result))
+
+def _apply_limits(cpu_time: Optional[float], memory_mb: Optional[int]) -> None:
+    """
+    Applica i limiti di risorse al processo worker per il task corrente.
+    
+    Args:
+        cpu_time: Secondi di CPU concessi al task.
+        memory_mb: Memoria massima dello spazio di indirizzamento in MB.
+    """
+    if resource is None:
+        return
+    
+    # I limiti restano attivi nel processo: quelli originali vengono salvati prima di modificarli
+    for limit in (resource.RLIMIT_CPU, resource.RLIMIT_AS):
+        if limit not in _initial_limits:
+            _initial_limits[limit] = resource.getrlimit(limit)
+    
+    if cpu_time:
+        # RLIMIT_CPU è cumulativo: il limite è il consumo attuale più il budget del task
+        usage = resource.getrusage(resource.RUSAGE_SELF)
+        used = int(usage.ru_utime + usage.ru_stime)
+        _, hard = resource.getrlimit(resource.RLIMIT_CPU)
+        soft = used + int(max(1, cpu_time))
+        if hard != resource.RLIM_INFINITY:
+            soft = min(soft, hard)
+        resource.setrlimit(resource.RLIMIT_CPU, (soft, hard))
+    else:
+        # Task senza limite di CPU: non eredita il limite del task precedente
+        resource.setrlimit(resource.RLIMIT_CPU, _initial_limits[resource.RLIMIT_CPU])
+    
+    if memory_mb:
+        _, hard = resource.getrlimit(resource.RLIMIT_AS)
+        soft = int(memory_mb) * 1024 * 1024
+        if hard != resource.RLIM_INFINITY:
+            soft = min(soft, hard)
+        resource.setrlimit(resource.RLIMIT_AS, (soft, hard))
+    else:
+        # Task senza limite di memoria: non eredita il limite del task precedente
+        resource.setrlimit(resource.RLIMIT_AS, _initial_limits[resource.RLIMIT_AS])
+
+def _resolve_function(task: Dict[str, Any], loaded: Dict[str, Any]) -> Callable:
+    """
+    Risolve la funzione run del modulo all'interno del worker.
+    
+    Args:
+        task: Descrizione del task ricevuta dal processo padre.
+        loaded: Moduli già importati dal worker, per nome del modulo Python.
+    
+    Returns:
+        Callable: Funzione run da eseguire.
+    """
+    if task.get("function") is not None:
+        return pickle.loads(task["function"])
+    
+    entry = task.get("entry") or "run"
+    module_path = task["module_path"]
+    module = loaded.get(module_path)
+    if module is None:
+        module = importlib.import_module(module_path)
+    
+    # Allinea il worker alla versione pubblicata nel registro dopo un ricaricamento a caldo
+    info = getattr(module, "MODULE_INFO", {}) or {}
+    if task.get("version") and str(info.get("version", task["version"])) != task["version"]:
+        module = importlib.reload(module)
+    
+    loaded[module_path] = module
+    return getattr(module, entry)
+
+def _worker_main(conn, max_tasks: int, shm_threshold: int) -> None:
+    """
+    Ciclo principale di un processo worker.
+    
+    Args:
+        conn: Estremità della pipe verso il processo padre.
+        max_tasks: Numero di task dopo cui il worker termina per essere sostituito.
+        shm_threshold: Soglia in byte per il trasferimento in memoria condivisa.
+    """
+    global _current_conn
+    loaded: Dict[str, Any] = {}
+    
+    for _ in range(max_tasks):
+        try:
+            task = conn.recv()
+        except EOFError:
+            break
+        if task is None:
+            break
+        
+        _current_conn = conn
+        segments: list = []
+        recycle = False
+        try:
+            _apply_limits(task.get("cpu_time"), task.get("memory_mb"))
+            func = _resolve_function(task, loaded)
+            input_data = unpack_arrays(task["input_data"])
+            result = func(input_data)
+            conn.send(("done", pack_arrays(result, shm_threshold, segments)))
+        except MemoryError:
+            conn.send(("error", "Limite di memoria superato"))
+            recycle = True
+        except Exception as e:
+            conn.send(("error", f"{type(e).__name__}: {str(e)}"))
+        finally:
+            _current_conn = None
+            for shm in segments:
+                # Il padre rimuove il segmento dopo averlo letto
+                shm.close()
+        
+        if recycle:
+            break
+    
+    conn.close()
+
+class _Worker:
+    """
+    Processo worker gestito dal pool.
+    """
+    
+    def __init__(self, context, max_tasks: int, shm_threshold: int):
+        """
+        Avvia un nuovo processo worker.
+        
+        Args:
+            context: Contesto multiprocessing da utilizzare.
+            max_tasks: Numero di task dopo cui il worker viene riciclato.
+            shm_threshold: Soglia in byte per il trasferimento in memoria condivisa.
+        """
+        # Il resource tracker deve essere condiviso con il padre, altrimenti i segmenti
+        # creati dal worker verrebbero rimossi alla sua uscita prima di essere letti
+        resource_tracker.ensure_running()
+        
+        self.conn, child_conn = context.Pipe()
+        self.process = context.Process(
+            target=_worker_main,
+            args=(child_conn, max_tasks, shm_threshold),
+            daemon=True
+        )
+        self.process.start()
+        child_conn.close()
+        self.max_tasks = max_tasks
+        self.tasks_done = 0
+    
+    @property
+    def exhausted(self) -> bool:
+        """
+        Indica se il worker ha raggiunto il numero massimo di task o è terminato.
+        """
+        return self.tasks_done >= self.max_tasks or not self.process.is_alive()
+    
+    def kill(self) -> None:
+        """
+        Termina immediatamente il processo worker.
+        """
+        if self.process.is_alive():
+            self.process.kill()
+        self.process.join(timeout=5)
+        self.conn.close()
+    
+    def stop(self) -> None:
+        """
+        Chiede al worker di terminare al termine del task corrente.
+        """
+        try:
+            if self.process.is_alive():
+                self.conn.send(None)
+            self.process.join(timeout=5)
+        except (OSError, ValueError):
+            pass
+        self.kill()
+
+class ModuleExecutor:
+    """
+    Pool di processi per l'esecuzione isolata dei moduli di simulazione.
+    
+    Ogni worker esegue un task alla volta con limiti di CPU e memoria, viene riciclato dopo
+    un numero fisso di task e viene terminato (e sostituito) se supera il timeout. Quando il pool
+    è pieno i task attendono, al più per il loro timeout, che un worker torni inattivo o che un
+    posto venga liberato da un worker riciclato o terminato.
+    """
+    
+    def __init__(self, max_workers: Optional[int] = None, max_tasks_per_worker: Optional[int] = None,
+                 default_timeout: Optional[float] = None, default_cpu_time: Optional[float] = None,
+                 default_memory_mb: Optional[int] = None, shm_threshold: Optional[int] = None,
+                 start_method: Optional[str] = None):
+        """
+        Inizializza il pool. I processi vengono avviati solo al primo utilizzo.
+        
+        Args:
+            max_workers: Numero massimo di processi worker.
+            max_tasks_per_worker: Numero di task dopo cui un worker viene riciclato.
+            default_timeout: Timeout predefinito in secondi per l'esecuzione di un modulo.
+            default_cpu_time: Secondi di CPU predefiniti concessi a un modulo.
+            default_memory_mb: Memoria predefinita concessa a un modulo in MB (0 = nessun limite).
+            shm_threshold: Dimensione in byte oltre la quale gli array passano in memoria condivisa.
+            start_method: Metodo di avvio dei processi (spawn, fork, forkserver).
+        """
+        self.max_workers = max_workers or int(os.getenv("MODULE_WORKERS", str(os.cpu_count() or 2)))
+        self.max_tasks_per_worker = max_tasks_per_worker or int(os.getenv("MODULE_WORKER_MAX_TASKS", "100"))
+        self.default_timeout = default_timeout or float(os.getenv("MODULE_TIMEOUT", "30"))
+        self.default_cpu_time = default_cpu_time if default_cpu_time is not None else float(os.getenv("MODULE_CPU_LIMIT", "60"))
+        self.default_memory_mb = default_memory_mb if default_memory_mb is not None else int(os.getenv("MODULE_MEMORY_LIMIT_MB", "0"))
+        self.shm_threshold = shm_threshold or int(os.getenv("MODULE_SHM_THRESHOLD", str(1024 * 1024)))
+        self.context = multiprocessing.get_context(start_method or os.getenv("MODULE_START_METHOD", "spawn"))
+        
+        self._idle: List[_Worker] = []
+        self._workers = 0
+        self._lock = threading.Lock()
+        self._available = threading.Condition(self._lock)
+        self._closed = False
+        logger.info(f"ModuleExecutor inizializzato con {self.max_workers} worker, riciclo ogni {self.max_tasks_per_worker} task")
+    
+    def run(self, spec, input_data: Dict[str, Any], timeout: Optional[float] = None,
+            entry: str = "run") -> Dict[str, Any]:
+        """
+        Esegue un modulo in un processo worker.
+        
+        Args:
+            spec: Specifica del modulo (ModuleSpec) da eseguire.
+            input_data: Dati di input per la simulazione.
+            timeout: Timeout in secondi. Se None, usa il limite del modulo o quello predefinito.
+            entry: Funzione del modulo da eseguire (es. run, run_batch).
+        
+        Returns:
+            Dict[str, Any]: Risultato del modulo, oppure un risultato parziale o di timeout strutturato.
+        
+        Raises:
+            ModuleExecutionError: Se il modulo solleva un'eccezione o il worker termina in modo anomalo.
+        """
+        limits = getattr(spec, "limits", {}) or {}
+        timeout = timeout or limits.get("timeout") or self.default_timeout
+        
+        task = {
+            "module_path": spec.module.__name__ if spec.module is not None else None,
+            "function": None,
+            "entry": entry,
+            "version": spec.version,
+            "cpu_time": limits.get("cpu_time", self.default_cpu_time),
+            "memory_mb": limits.get("memory_mb", self.default_memory_mb),
+            "input_data": None
+        }
+        
+        worker = self._acquire(timeout)
+        if worker is None:
+            logger.warning(f"Nessun worker disponibile entro {timeout:.1f}s per il modulo {spec.name}")
+            return self._timeout_result(spec.name, timeout, None)
+        
+        segments: list = []
+        started = time.monotonic()
+        partial = None
+        try:
+            if spec.module is None:
+                # Moduli registrati a runtime: la funzione viene trasferita per riferimento
+                try:
+                    task["function"] = pickle.dumps(spec.run)
+                except Exception as e:
+                    raise ModuleExecutionError(f"Il modulo {spec.name} non può essere eseguito in un processo separato: {str(e)}")
+            task["input_data"] = pack_arrays(input_data, self.shm_threshold, segments)
+            worker.conn.send(task)
+            worker.tasks_done += 1
+            
+            while True:
+                remaining = timeout - (time.monotonic() - started)
+                if remaining <= 0 or not worker.conn.poll(remaining):
+                    # Timeout: il worker viene terminato e sostituito
+                    logger.warning(f"Timeout di {timeout:.1f}s superato dal modulo {spec.name}, worker terminato")
+                    self._discard(worker)
+                    worker = None
+                    return self._timeout_result(spec.name, timeout, partial)
+                
+                try:
+                    kind, payload = worker.conn.recv()
+                except EOFError:
+                    exitcode = self._discard(worker)
+                    worker = None
+                    raise ModuleExecutionError(self._crash_message(exitcode))
+                
+                if kind == "partial":
+                    partial = payload
+                elif kind == "done":
+                    return unpack_arrays(payload, unlink=True)
+                else:
+                    raise ModuleExecutionError(payload)
+        finally:
+            for shm in segments:
+                shm.close()
+                shm.unlink()
+            if worker is not None:
+                self._release(worker)
+    
+    def shutdown(self) -> None:
+        """
+        Termina tutti i worker inattivi e impedisce l'avvio di nuovi worker.
+        """
+        with self._available:
+            self._closed = True
+            idle, self._idle = self._idle, []
+            self._workers -= len(idle)
+            # I task in attesa di un worker vengono svegliati e falliscono
+            self._available.notify_all()
+        for worker in idle:
+            worker.stop()
+        logger.info("ModuleExecutor arrestato")
+    
+    def _acquire(self, timeout: float) -> Optional[_Worker]:
+        """
+        Ottiene un worker inattivo, avviandone uno nuovo se il pool non è pieno.
+        
+        Con il pool pieno attende che un worker torni inattivo o che un posto si liberi (worker
+        riciclato o terminato); in quel caso avvia un worker sostitutivo.
+        
+        Args:
+            timeout: Attesa massima in secondi.
+        
+        Returns:
+            Optional[_Worker]: Worker riservato per il task, o None se l'attesa è scaduta.
+        
+        Raises:
+            ModuleExecutionError: Se il pool è stato arrestato.
+        """
+        deadline = time.monotonic() + timeout
+        with self._available:
+            while True:
+                if self._closed:
+                    raise ModuleExecutionError("Il pool di esecuzione dei moduli è stato arrestato")
+                if self._idle:
+                    return self._idle.pop()
+                if self._workers < self.max_workers:
+                    self._workers += 1
+                    break
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return None
+                self._available.wait(remaining)
+        
+        # L'avvio del processo avviene fuori dal lock
+        try:
+            return _Worker(self.context, self.max_tasks_per_worker, self.shm_threshold)
+        except Exception:
+            self._free_slot()
+            raise
+    
+    def _release(self, worker: _Worker) -> None:
+        """
+        Restituisce un worker al pool, riciclandolo se ha esaurito i task.
+        
+        Args:
+            worker: Worker da restituire.
+        """
+        if not worker.exhausted:
+            with self._available:
+                if not self._closed:
+                    self._idle.append(worker)
+                    self._available.notify()
+                    return
+        worker.stop()
+        self._free_slot()
+    
+    def _discard(self, worker: _Worker) -> Optional[int]:
+        """
+        Termina un worker in stato non affidabile e libera il suo posto nel pool.
+        
+        Args:
+            worker: Worker da terminare.
+        
+        Returns:
+            Optional[int]: Codice di uscita del processo.
+        """
+        worker.kill()
+        self._free_slot()
+        return worker.process.exitcode
+    
+    def _free_slot(self) -> None:
+        """
+        Libera il posto di un worker terminato e sveglia un task in attesa, che avvierà un sostituto.
+        """
+        with self._available:
+            self._workers -= 1
+            self._available.notify()
+    
+    def _crash_message(self, exitcode: Optional[int]) -> str:
+        """
+        Descrive la terminazione anomala di un worker.
+        
+        Args:
+            exitcode: Codice di uscita del processo worker.
+        
+        Returns:
+            str: Messaggio di errore.
+        """
+        if exitcode == -getattr(signal, "SIGXCPU", 0):
+            return "Limite di tempo CPU superato"
+        if exitcode == -signal.SIGKILL:
+            return "Processo del modulo terminato (memoria esaurita o segnale esterno)"
+        return f"Processo del modulo terminato in modo anomalo (codice {exitcode})"
+    
+    def _timeout_result(self, module_name: str, timeout: float, partial: Optional[Dict[str, Any]]) -> Dict[str, Any]:
+        """
+        Costruisce il risultato strutturato restituito in caso di timeout.
+        
+        Args:
+            module_name: Nome del modulo.
+            timeout: Timeout superato in secondi.
+            partial: Ultimo risultato parziale comunicato dal modulo, se presente.
+        
+        Returns:
+            Dict[str, Any]: Risultato parziale o di errore.
+        """
+        message = f"Timeout di {timeout:.1f}s superato durante l'esecuzione del modulo {module_name}"
+        if partial is not None:
+            result = dict(partial)
+            result["status"] = "partial"
+            result["message"] = message
+            return result
+        return {
+            "status": "error",
+            "message": message,
+            "result": {"mocked": True, "timeout": True}
+        }
+
+# Istanza singleton del pool di esecuzione dei moduli
+module_executor = ModuleExecutor()
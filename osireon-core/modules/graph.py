@@ -0,0 +1,302 @@
+"""
+Grafo delle dipendenze tra moduli per Osireon.
+Questo file contiene l'esecutore che compone i moduli secondo le dipendenze dichiarate,
+eseguendo in parallelo i nodi indipendenti e memorizzando i risultati per hash dell'input.
+"""
+import copy
+import hashlib
+import json
+import logging
+import os
+import threading
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Dict, Any, Callable, List, Optional
+
+from src.modules.registry import module_registry, ModuleRegistry, ModuleSpec
+
+# Configurazione del logging
+logger = logging.getLogger("osireon.modules.graph")
+
+# Chiavi dell'input che non influenzano il risultato di un nodo (il modulo è già nella chiave)
+_UNHASHED_KEYS = ("domain", "dependencies")
+
+def input_hash(input_data: Dict[str, Any]) -> str:
+    """
+    Calcola l'hash dell'input di una simulazione, escluse le chiavi che dipendono dal nodo.
+    
+    Args:
+        input_data: Dati di input della simulazione.
+    
+    Returns:
+        str: Hash esadecimale dell'input.
+    """
+    payload = {k: v for k, v in input_data.items() if k not in _UNHASHED_KEYS}
+    encoded = json.dumps(payload, sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.sha256(encoded.encode("utf-8")).hexdigest()
+
+class DependencyError(Exception):
+    """
+    Errore sollevato quando le dipendenze di un modulo non sono risolvibili o una dipendenza fallisce.
+    """
+    pass
+
+class ModuleGraph:
+    """
+    Esecutore dei moduli con dipendenze.
+    
+    Un modulo dichiara le dipendenze in MODULE_INFO["depends_on"] e riceve i risultati dei moduli
+    da cui dipende in input_data["dependencies"][nome]. I nodi dello stesso livello del grafo
+    vengono eseguiti in parallelo; i risultati sono memorizzati in una cache LRU condivisa tra
+    richieste, con chiave (modulo, versione, hash dell'input, chiavi delle dipendenze). Un nodo già
+    in esecuzione per un'altra richiesta viene atteso invece di essere ricalcolato.
+    """
+    
+    def __init__(self, registry: Optional[ModuleRegistry] = None, max_workers: Optional[int] = None,
+                 cache_size: Optional[int] = None):
+        """
+        Inizializza l'esecutore.
+        
+        Args:
+            registry: Registro da cui risolvere le dipendenze. Se None, usa il registro condiviso.
+            max_workers: Numero massimo di nodi eseguiti in parallelo.
+            cache_size: Numero massimo di risultati memorizzati (0 disabilita la cache).
+        """
+        self.registry = registry or module_registry
+        self.max_workers = max_workers or int(os.getenv("MODULE_GRAPH_WORKERS", "8"))
+        self.cache_size = cache_size if cache_size is not None else int(os.getenv("MODULE_GRAPH_CACHE_SIZE", "1024"))
+        self._cache: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        self._inflight: Dict[str, Future] = {}
+        self._lock = threading.Lock()
+        self._pool: Optional[ThreadPoolExecutor] = None
+        self.hits = 0
+        self.misses = 0
+        logger.info(f"ModuleGraph inizializzato con {self.max_workers} nodi paralleli e cache di {self.cache_size} risultati")
+    
+    def plan(self, spec: ModuleSpec) -> List[List[ModuleSpec]]:
+        """
+        Costruisce il grafo delle dipendenze di un modulo, organizzato per livelli.
+        
+        Args:
+            spec: Specifica del modulo richiesto.
+        
+        Returns:
+            List[List[ModuleSpec]]: Livelli del grafo; ogni nodo dipende solo da nodi dei livelli precedenti.
+        
+        Raises:
+            DependencyError: Se una dipendenza non esiste o il grafo contiene un ciclo.
+        """
+        levels: Dict[str, int] = {}
+        specs: Dict[str, ModuleSpec] = {}
+        
+        def visit(node: ModuleSpec, path: List[str]) -> int:
+            if node.name in path:
+                raise DependencyError(f"Dipendenza circolare: {' -> '.join(path + [node.name])}")
+            if node.name in levels:
+                return levels[node.name]
+            
+            level = 0
+            for name in node.depends_on:
+                dependency = self.registry.resolve(name)
+                if dependency is None:
+                    raise DependencyError(f"Il modulo {node.name} dipende da {name}, che non è disponibile")
+                level = max(level, visit(dependency, path + [node.name]) + 1)
+            
+            levels[node.name] = level
+            specs[node.name] = node
+            return level
+        
+        visit(spec, [])
+        
+        plan: List[List[ModuleSpec]] = [[] for _ in range(max(levels.values()) + 1)]
+        for name, level in levels.items():
+            plan[level].append(specs[name])
+        return plan
+    
+    def run(self, spec: ModuleSpec, input_data: Dict[str, Any],
+            execute: Callable[[ModuleSpec, Dict[str, Any]], Dict[str, Any]]) -> Dict[str, Any]:
+        """
+        Esegue un modulo e, prima di esso, tutti i moduli da cui dipende.
+        
+        Args:
+            spec: Specifica del modulo richiesto.
+            input_data: Dati di input della simulazione.
+            execute: Funzione che esegue un singolo modulo (nel pool di processi o nel thread corrente).
+        
+        Returns:
+            Dict[str, Any]: Risultato del modulo richiesto (una copia, la cache non viene modificata).
+        """
+        if not spec.depends_on:
+            result, _ = self._run_node(spec, input_data, {}, execute)
+            return result
+        
+        plan = self.plan(spec)
+        base_hash = input_hash(input_data)
+        keys: Dict[str, str] = {}
+        results: Dict[str, Dict[str, Any]] = {}
+        cached: List[str] = []
+        
+        for level in plan:
+            # I nodi di un livello dipendono solo dai livelli precedenti: possono procedere in parallelo
+            for node in level:
+                keys[node.name] = self._key(node, base_hash, {name: keys[name] for name in node.depends_on})
+            
+            if len(level) == 1:
+                outcomes = [self._run_level_node(level[0], input_data, keys, results, execute)]
+            else:
+                pool = self._executor()
+                futures = [pool.submit(self._run_level_node, node, input_data, keys, results, execute) for node in level]
+                outcomes = [future.result() for future in futures]
+            
+            for node, (result, hit) in zip(level, outcomes):
+                results[node.name] = result
+                if hit:
+                    cached.append(node.name)
+        
+        result = results[spec.name]
+        if isinstance(result, dict):
+            # Il modulo richiesto è l'unico nodo dell'ultimo livello
+            result["dependencies"] = {
+                node.name: {"version": node.version, "cached": node.name in cached}
+                for level in plan[:-1] for node in level
+            }
+        logger.info(f"Grafo di {spec.name} eseguito: {len(keys)} nodi, {len(cached)} dalla cache")
+        return result
+    
+    def clear(self) -> None:
+        """
+        Svuota la cache dei risultati.
+        """
+        with self._lock:
+            self._cache.clear()
+    
+    def shutdown(self) -> None:
+        """
+        Arresta il pool di thread usato per i nodi paralleli.
+        """
+        if self._pool is not None:
+            self._pool.shutdown(wait=False)
+            self._pool = None
+    
+    def _executor(self) -> ThreadPoolExecutor:
+        """
+        Restituisce il pool di thread per i nodi paralleli, creandolo al primo utilizzo.
+        
+        Returns:
+            ThreadPoolExecutor: Pool di thread.
+        """
+        with self._lock:
+            if self._pool is None:
+                self._pool = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="osireon-graph")
+            return self._pool
+    
+    def _key(self, spec: ModuleSpec, base_hash: str, dependency_keys: Dict[str, str]) -> str:
+        """
+        Calcola la chiave di cache di un nodo.
+        
+        Args:
+            spec: Specifica del modulo del nodo.
+            base_hash: Hash dell'input della simulazione.
+            dependency_keys: Chiavi dei nodi da cui il nodo dipende.
+        
+        Returns:
+            str: Chiave del nodo.
+        """
+        encoded = json.dumps({
+            "module": spec.name,
+            "version": spec.version,
+            "input": base_hash,
+            "dependencies": dependency_keys
+        }, sort_keys=True)
+        return hashlib.sha256(encoded.encode("utf-8")).hexdigest()
+    
+    def _run_level_node(self, spec: ModuleSpec, input_data: Dict[str, Any], keys: Dict[str, str],
+                        results: Dict[str, Dict[str, Any]], execute: Callable):
+        """
+        Esegue un nodo del grafo dopo aver verificato l'esito delle sue dipendenze.
+        
+        Args:
+            spec: Specifica del modulo del nodo.
+            input_data: Dati di input della simulazione.
+            keys: Chiavi dei nodi del grafo.
+            results: Risultati dei livelli precedenti.
+            execute: Funzione che esegue un singolo modulo.
+        
+        Returns:
+            Tuple[Dict[str, Any], bool]: Risultato del nodo e se proviene dalla cache.
+        """
+        dependencies = {}
+        for name in spec.depends_on:
+            result = results[name]
+            if not isinstance(result, dict) or result.get("status") in ("error", "partial"):
+                message = result.get("message", "esecuzione non riuscita") if isinstance(result, dict) else "risultato non valido"
+                raise DependencyError(f"Dipendenza {name} di {spec.name} non riuscita: {message}")
+            dependencies[name] = result
+        
+        node_input = dict(input_data)
+        node_input["dependencies"] = dependencies
+        if spec.domain:
+            node_input["domain"] = spec.domain
+        
+        return self._run_node(spec, node_input, keys, execute)
+    
+    def _run_node(self, spec: ModuleSpec, node_input: Dict[str, Any], keys: Dict[str, str],
+                  execute: Callable):
+        """
+        Esegue un singolo nodo, riusando il risultato in cache o quello di un'esecuzione in corso.
+        
+        Args:
+            spec: Specifica del modulo del nodo.
+            node_input: Input del nodo, comprensivo dei risultati delle dipendenze.
+            keys: Chiavi dei nodi del grafo (vuoto per un modulo senza dipendenze).
+            execute: Funzione che esegue un singolo modulo.
+        
+        Returns:
+            Tuple[Dict[str, Any], bool]: Risultato del nodo e se proviene dalla cache.
+        """
+        if self.cache_size <= 0:
+            return execute(spec, node_input), False
+        
+        key = keys.get(spec.name) or self._key(spec, input_hash(node_input), {})
+        
+        with self._lock:
+            result = self._cache.get(key)
+            if result is not None:
+                self._cache.move_to_end(key)
+                self.hits += 1
+                return copy.deepcopy(result), True
+            
+            pending = self._inflight.get(key)
+            if pending is None:
+                pending = Future()
+                self._inflight[key] = pending
+                owner = True
+                self.misses += 1
+            else:
+                owner = False
+                self.hits += 1
+        
+        # Lo stesso nodo è già in esecuzione per un'altra richiesta: ne attende il risultato
+        if not owner:
+            return copy.deepcopy(pending.result()), True
+        
+        try:
+            result = execute(spec, node_input)
+        except BaseException as e:
+            with self._lock:
+                self._inflight.pop(key, None)
+            pending.set_exception(e)
+            raise
+        
+        # I risultati parziali o di errore non vengono memorizzati
+        with self._lock:
+            self._inflight.pop(key, None)
+            if isinstance(result, dict) and result.get("status") not in ("error", "partial"):
+                self._cache[key] = copy.deepcopy(result)
+                while len(self._cache) > self.cache_size:
+                    self._cache.popitem(last=False)
+        pending.set_result(result)
+        return copy.deepcopy(result), False
+
+# Istanza singleton dell'esecutore del grafo dei moduli
+module_graph = ModuleGraph()
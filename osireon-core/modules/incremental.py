@@ -0,0 +1,396 @@
+"""
+Calcolo incrementale per proposta per Osireon.
+Questo file contiene la cache dei risultati indirizzata per contenuto (una riga per proposta e una
+cella per coppia proposta/vincolo) e il valutatore che ricalcola solo le celle mancanti.
+"""
+import hashlib
+import json
+import logging
+import os
+import threading
+from collections import OrderedDict
+from typing import Dict, Any, Callable, List, Optional, Tuple
+
+from src.modules.registry import module_registry
+from src.modules.results import as_result, compact_result
+
+# Configurazione del logging
+logger = logging.getLogger("osireon.modules.incremental")
+
+# Colonna dei risultati che contiene una cella per vincolo
+CONSTRAINTS_COLUMN = "constraints_check"
+
+# Chiavi dell'input che non fanno parte del contesto comune alle proposte
+_NON_CONTEXT_KEYS = ("proposals", "constraints", "domain", "dependencies")
+
+def proposal_id(proposal: str) -> str:
+    """
+    Calcola l'identificativo di una proposta a partire dal suo contenuto.
+    
+    Args:
+        proposal: Testo della proposta.
+    
+    Returns:
+        str: Identificativo esadecimale della proposta.
+    """
+    return hashlib.sha256(proposal.encode("utf-8")).hexdigest()[:16]
+
+def content_score(text: str, salt: str = "") -> float:
+    """
+    Calcola un valore deterministico in [0, 1) dal contenuto di un testo.
+    Usato dai moduli mock al posto di valori che dipendono dalla posizione della proposta.
+    
+    Args:
+        text: Testo da cui derivare il valore.
+        salt: Discriminante per ottenere valori diversi dallo stesso testo.
+    
+    Returns:
+        float: Valore in [0, 1).
+    """
+    digest = hashlib.sha256(f"{salt}\x00{text}".encode("utf-8")).digest()
+    return int.from_bytes(digest[:8], "big") / 2 ** 64
+
+def apply_delta(proposals: List[str], constraints: List[str], delta: Dict[str, Any]) -> Tuple[List[str], List[str]]:
+    """
+    Applica una modifica (proposte e vincoli aggiunti, rimossi o modificati) agli input di una simulazione.
+    
+    Args:
+        proposals: Proposte della simulazione precedente.
+        constraints: Vincoli della simulazione precedente.
+        delta: Modifica con added_proposals, removed_proposals, edited_proposals (vecchio -> nuovo),
+            added_constraints e removed_constraints.
+    
+    Returns:
+        Tuple[List[str], List[str]]: Proposte e vincoli aggiornati.
+    """
+    removed = set(delta.get("removed_proposals") or [])
+    edited = delta.get("edited_proposals") or {}
+    new_proposals = [edited.get(p, p) for p in proposals if p not in removed]
+    new_proposals += [p for p in delta.get("added_proposals") or [] if p not in new_proposals]
+    
+    removed_constraints = set(delta.get("removed_constraints") or [])
+    new_constraints = [c for c in constraints if c not in removed_constraints]
+    new_constraints += [c for c in delta.get("added_constraints") or [] if c not in new_constraints]
+    
+    return new_proposals, new_constraints
+
+class IncrementalEvaluator:
+    """
+    Valutatore incrementale dei moduli con risultati indipendenti per proposta.
+    
+    Un modulo partecipa dichiarando MODULE_INFO["incremental"] = True: i valori di una proposta devono
+    dipendere solo dal suo testo, dal contesto (paese, versioni delle dipendenze) e, per le celle di
+    constraints_check, dal vincolo. Righe e celle sono memorizzate in una cache LRU condivisa tra
+    richieste; il modulo viene eseguito solo sulle proposte e sui vincoli mancanti. Un modulo può
+    definire summarize(result, input_data) per ricalcolare le metriche complessive.
+    """
+    
+    def __init__(self, cache_size: Optional[int] = None):
+        """
+        Inizializza il valutatore.
+        
+        Args:
+            cache_size: Numero massimo di righe e celle memorizzate.
+        """
+        self.cache_size = cache_size or int(os.getenv("INCREMENTAL_CACHE_SIZE", "200000"))
+        self._cache: "OrderedDict[tuple, Dict[str, Any]]" = OrderedDict()
+        self._metadata: Dict[str, Dict[str, Any]] = {}
+        self._lock = threading.Lock()
+        logger.info(f"IncrementalEvaluator inizializzato con cache di {self.cache_size} elementi")
+    
+    def supports(self, spec) -> bool:
+        """
+        Verifica se un modulo dichiara risultati indipendenti per proposta.
+        
+        Args:
+            spec: Specifica del modulo (ModuleSpec).
+        
+        Returns:
+            bool: True se il modulo può essere valutato in modo incrementale.
+        """
+        info = getattr(spec.module, "MODULE_INFO", {}) or {}
+        return bool(info.get("incremental"))
+    
+    def evaluate(self, spec, input_data: Dict[str, Any],
+                 execute: Callable[[Any, Dict[str, Any]], Dict[str, Any]]) -> Dict[str, Any]:
+        """
+        Valuta un modulo ricalcolando solo le righe e le celle non presenti in cache.
+        
+        Args:
+            spec: Specifica del modulo (ModuleSpec).
+            input_data: Dati di input della simulazione.
+            execute: Funzione che esegue il modulo su un sottoinsieme di proposte e vincoli.
+        
+        Returns:
+            Dict[str, Any]: Risultato del modulo per tutte le proposte, con le statistiche in "incremental".
+        """
+        proposals = input_data.get("proposals", [])
+        constraints = input_data.get("constraints", [])
+        if not proposals:
+            return execute(spec, input_data)
+        
+        context = self._context(spec, input_data)
+        ids = [proposal_id(p) for p in proposals]
+        first_index = {}
+        for i, pid in enumerate(ids):
+            first_index.setdefault(pid, i)
+        
+        rows: Dict[str, Dict[str, Any]] = {}
+        cells: Dict[Tuple[str, str], Dict[str, Any]] = {}
+        missing_cells: Dict[str, List[str]] = {}
+        with self._lock:
+            for pid in first_index:
+                row = self._get((context, pid))
+                if row is None:
+                    continue
+                rows[pid] = row
+                if CONSTRAINTS_COLUMN in row:
+                    for constraint in constraints:
+                        cell = self._get((context, pid, constraint))
+                        if cell is None:
+                            missing_cells.setdefault(pid, []).append(constraint)
+                        else:
+                            cells[(pid, constraint)] = cell
+        
+        # Proposte nuove: tutte le metriche e tutti i vincoli
+        batches: List[Tuple[List[int], List[str]]] = []
+        new_rows = [i for pid, i in first_index.items() if pid not in rows]
+        if new_rows:
+            batches.append((new_rows, constraints))
+        
+        # Proposte note con vincoli nuovi: solo le celle mancanti, raggruppate per insieme di vincoli
+        groups: Dict[Tuple[str, ...], List[int]] = {}
+        for pid, missing in missing_cells.items():
+            groups.setdefault(tuple(missing), []).append(first_index[pid])
+        batches.extend((indices, list(missing)) for missing, indices in groups.items())
+        
+        computed_cells = 0
+        metadata = None
+        for indices, batch_constraints in batches:
+            result = as_result(execute(spec, self._subset(input_data, indices, batch_constraints)))
+            if not isinstance(result, dict) or result.get("status") in ("error", "partial"):
+                return result
+            
+            fresh_rows, fresh_cells = self._split(result, [ids[i] for i in indices])
+            computed_cells += len(fresh_cells)
+            metadata = {k: v for k, v in result.items() if k != "results"}
+            with self._lock:
+                for pid, row in fresh_rows.items():
+                    if pid not in rows:
+                        rows[pid] = row
+                        self._put((context, pid), row)
+                for (pid, constraint), cell in fresh_cells.items():
+                    cells[(pid, constraint)] = cell
+                    self._put((context, pid, constraint), cell)
+                self._metadata[context] = metadata
+        
+        if metadata is None:
+            metadata = dict(self._metadata.get(context, {"module": spec.name, "status": "completed"}))
+        
+        result = self._assemble(metadata, proposals, constraints, ids, rows, cells)
+        summarize = getattr(spec.module, "summarize", None)
+        if callable(summarize):
+            result.update(summarize(result, input_data))
+        
+        total_cells = len(first_index) * len(constraints)
+        result["incremental"] = {
+            "computed_proposals": len(new_rows),
+            "reused_proposals": len(first_index) - len(new_rows),
+            "computed_cells": computed_cells,
+            "reused_cells": total_cells - computed_cells
+        }
+        logger.info(f"Valutazione incrementale di {spec.name}: {len(new_rows)}/{len(first_index)} proposte "
+                    f"e {computed_cells}/{total_cells} celle ricalcolate")
+        return result
+    
+    def seed(self, spec, input_data: Dict[str, Any], prior_result: Dict[str, Any]) -> int:
+        """
+        Popola la cache con un risultato precedente (es. salvato nel database).
+        
+        Args:
+            spec: Specifica del modulo che ha prodotto il risultato.
+            input_data: Dati di input con cui il risultato è stato prodotto.
+            prior_result: Risultato precedente, in formato esteso o colonnare.
+        
+        Returns:
+            int: Numero di proposte inserite in cache (0 se il risultato non è compatibile).
+        """
+        prior = as_result(prior_result)
+        if not isinstance(prior, dict) or prior.get("status") in ("error", "partial"):
+            return 0
+        
+        # Il risultato è riusabile solo se prodotto dalle stesse versioni del modulo e delle dipendenze
+        if prior.get("module_version", spec.version) != spec.version:
+            logger.info(f"Risultato precedente di {spec.name} ignorato: versione {prior.get('module_version')} diversa da {spec.version}")
+            return 0
+        for name, dependency in (prior.get("dependencies") or {}).items():
+            current = module_registry.resolve(name)
+            if current is None or dependency.get("version") != current.version:
+                logger.info(f"Risultato precedente di {spec.name} ignorato: versione di {name} cambiata")
+                return 0
+        
+        proposals = input_data.get("proposals", [])
+        results = prior.get("results", {})
+        if len(results) != len(proposals):
+            return 0
+        
+        context = self._context(spec, input_data)
+        ids = [proposal_id(p) for p in proposals]
+        rows, cells = self._split(prior, ids)
+        with self._lock:
+            for pid, row in rows.items():
+                self._put((context, pid), row)
+            for (pid, constraint), cell in cells.items():
+                self._put((context, pid, constraint), cell)
+            self._metadata.setdefault(context, {k: v for k, v in prior.items() if k not in ("results", "incremental")})
+        
+        logger.info(f"Cache incrementale di {spec.name} popolata con {len(rows)} proposte e {len(cells)} celle")
+        return len(rows)
+    
+    def clear(self) -> None:
+        """
+        Svuota la cache.
+        """
+        with self._lock:
+            self._cache.clear()
+            self._metadata.clear()
+    
+    def _context(self, spec, input_data: Dict[str, Any]) -> str:
+        """
+        Calcola la chiave del contesto comune alle proposte: modulo, versioni e input non per proposta.
+        
+        Args:
+            spec: Specifica del modulo.
+            input_data: Dati di input della simulazione.
+        
+        Returns:
+            str: Chiave del contesto.
+        """
+        dependencies = {}
+        for name in getattr(spec, "depends_on", []):
+            dependency = module_registry.resolve(name)
+            dependencies[name] = dependency.version if dependency is not None else None
+        
+        encoded = json.dumps({
+            "module": spec.name,
+            "version": spec.version,
+            "dependencies": dependencies,
+            "input": {k: v for k, v in input_data.items() if k not in _NON_CONTEXT_KEYS}
+        }, sort_keys=True, ensure_ascii=False, default=str)
+        return hashlib.sha256(encoded.encode("utf-8")).hexdigest()
+    
+    def _subset(self, input_data: Dict[str, Any], indices: List[int], constraints: List[str]) -> Dict[str, Any]:
+        """
+        Costruisce l'input del modulo per un sottoinsieme di proposte e vincoli.
+        
+        Args:
+            input_data: Dati di input completi.
+            indices: Indici delle proposte da valutare.
+            constraints: Vincoli da verificare.
+        
+        Returns:
+            Dict[str, Any]: Input ridotto, con i risultati delle dipendenze allineati alle proposte scelte.
+        """
+        subset = dict(input_data)
+        subset["proposals"] = [input_data["proposals"][i] for i in indices]
+        subset["constraints"] = constraints
+        
+        dependencies = input_data.get("dependencies")
+        if dependencies:
+            subset["dependencies"] = {}
+            for name, dependency in dependencies.items():
+                results = dependency.get("results", {})
+                sliced = {k: v for k, v in dependency.items() if k != "results"}
+                sliced["results"] = {
+                    f"proposal_{k+1}": results.get(f"proposal_{i+1}", {}) for k, i in enumerate(indices)
+                }
+                subset["dependencies"][name] = sliced
+        return subset
+    
+    def _split(self, result: Dict[str, Any], ids: List[str]):
+        """
+        Separa un risultato in righe per proposta e celle per coppia proposta/vincolo.
+        
+        Args:
+            result: Risultato del modulo sulle proposte indicate.
+            ids: Identificativi delle proposte, nell'ordine del risultato.
+        
+        Returns:
+            Tuple[Dict, Dict]: Righe per proposta e celle per (proposta, vincolo).
+        """
+        results = result.get("results", {})
+        rows = {}
+        cells = {}
+        for k, pid in enumerate(ids):
+            row = dict(results.get(f"proposal_{k+1}", {}))
+            if CONSTRAINTS_COLUMN in row:
+                for cell in row[CONSTRAINTS_COLUMN] or []:
+                    cells[(pid, cell.get("constraint"))] = cell
+                # Segnaposto: mantiene la posizione della colonna nella riga
+                row[CONSTRAINTS_COLUMN] = None
+            rows[pid] = row
+        return rows, cells
+    
+    def _assemble(self, metadata: Dict[str, Any], proposals: List[str], constraints: List[str], ids: List[str],
+                  rows: Dict[str, Dict[str, Any]], cells: Dict[Tuple[str, str], Dict[str, Any]]) -> Dict[str, Any]:
+        """
+        Ricompone il risultato nell'ordine delle proposte richieste.
+        
+        Args:
+            metadata: Metadati complessivi del modulo.
+            proposals: Proposte richieste.
+            constraints: Vincoli richiesti.
+            ids: Identificativi delle proposte.
+            rows: Righe per proposta.
+            cells: Celle per (proposta, vincolo).
+        
+        Returns:
+            Dict[str, Any]: Risultato completo (colonnare se le metriche hanno tipi uniformi).
+        """
+        results = {}
+        for i, pid in enumerate(ids):
+            row = dict(rows[pid])
+            if CONSTRAINTS_COLUMN in row:
+                row[CONSTRAINTS_COLUMN] = [cells[(pid, constraint)] for constraint in constraints]
+            results[f"proposal_{i+1}"] = row
+        
+        legacy = {k: v for k, v in metadata.items() if k != "incremental"}
+        if "proposals_analyzed" in legacy:
+            legacy["proposals_analyzed"] = len(proposals)
+        if "constraints_checked" in legacy:
+            legacy["constraints_checked"] = len(constraints)
+        legacy["results"] = results
+        
+        compact = compact_result(legacy)
+        return as_result(compact) if compact is not None else legacy
+    
+    def _get(self, key: tuple) -> Optional[Dict[str, Any]]:
+        """
+        Legge un elemento dalla cache aggiornandone la posizione LRU. Richiede il lock.
+        
+        Args:
+            key: Chiave dell'elemento.
+        
+        Returns:
+            Optional[Dict[str, Any]]: Elemento o None se assente.
+        """
+        value = self._cache.get(key)
+        if value is not None:
+            self._cache.move_to_end(key)
+        return value
+    
+    def _put(self, key: tuple, value: Dict[str, Any]) -> None:
+        """
+        Inserisce un elemento nella cache liberando i meno recenti oltre il limite. Richiede il lock.
+        
+        Args:
+            key: Chiave dell'elemento.
+            value: Elemento da memorizzare.
+        """
+        self._cache[key] = value
+        self._cache.move_to_end(key)
+        while len(self._cache) > self.cache_size:
+            self._cache.popitem(last=False)
+
+# Istanza singleton del valutatore incrementale
+incremental_evaluator = IncrementalEvaluator()
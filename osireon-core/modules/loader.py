@@ -2,10 +2,19 @@
 Sistema di caricamento dinamico dei moduli per Osireon.
 Questo file contiene le funzioni per caricare dinamicamente i moduli di simulazione.
 """
-import importlib
+import asyncio
 import logging
 import os
-from typing import Dict, Any, Callable, Optional
+from typing import Dict, Any, Callable, List, Optional
+
+from src.modules.registry import module_registry, ModuleRegistry, ModuleSpec
+from src.modules.executor import module_executor, ModuleExecutor
+from src.modules.graph import module_graph, ModuleGraph
+from src.modules.incremental import incremental_evaluator, apply_delta
+from src.modules.results import as_result
+from src.modules.timeline import timeline_engine
+from src.modules.sweep import parameter_sweep, columns_from_results
+from src.modules.portfolio import portfolio_optimizer
 
 # Configurazione del logging
 logger = logging.getLogger("osireon.modules")
@@ -15,16 +24,25 @@ class ModuleLoader:
     Classe per il caricamento dinamico dei moduli di simulazione.
     """
     
-    def __init__(self, modules_dir: str = "src/modules"):
+    def __init__(self, modules_dir: str = "src/modules", registry: Optional[ModuleRegistry] = None,
+                 executor: Optional[ModuleExecutor] = None, execution_mode: Optional[str] = None,
+                 graph: Optional[ModuleGraph] = None):
         """
         Inizializza il loader dei moduli.
         
         Args:
             modules_dir: Directory contenente i moduli di simulazione.
+            registry: Registro dei moduli da utilizzare. Se None, usa il registro condiviso.
+            executor: Pool di processi per l'esecuzione isolata. Se None, usa il pool condiviso.
+            execution_mode: "process" per eseguire i moduli nel pool, "inline" per eseguirli nel thread chiamante.
+            graph: Esecutore delle dipendenze tra moduli. Se None, usa quello condiviso.
         """
         self.modules_dir = modules_dir
-        self.modules_cache: Dict[str, Callable] = {}
-        logger.info(f"ModuleLoader inizializzato con directory: {modules_dir}")
+        self.registry = registry or module_registry
+        self.executor = executor or module_executor
+        self.execution_mode = execution_mode or os.getenv("MODULE_EXECUTION_MODE", "process")
+        self.graph = graph or module_graph
+        logger.info(f"ModuleLoader inizializzato con directory: {modules_dir} (esecuzione: {self.execution_mode})")
     
     def get_module_path(self, country: str, domain: str) -> str:
         """
@@ -46,6 +64,25 @@ class ModuleLoader:
         
         return module_name
     
+    def get_module_spec(self, country: str, domain: str) -> Optional[ModuleSpec]:
+        """
+        Risolve la specifica (versione e capacità) del modulo per paese e dominio.
+        
+        Args:
+            country: Paese per cui risolvere il modulo.
+            domain: Dominio di policy per cui risolvere il modulo.
+        
+        Returns:
+            Optional[ModuleSpec]: Specifica del modulo o None se il modulo non esiste.
+        """
+        module_name = self.get_module_path(country, domain)
+        
+        # Indicizza i moduli al primo utilizzo se l'avvio non l'ha già fatto
+        if not self.registry.discovered:
+            self.registry.discover()
+        
+        return self.registry.resolve(module_name)
+    
     def load_module(self, country: str, domain: str) -> Optional[Callable]:
         """
         Carica dinamicamente un modulo di simulazione basato su paese e dominio.
@@ -57,37 +94,19 @@ class ModuleLoader:
         Returns:
             Callable: Funzione run del modulo caricato o None se il modulo non esiste.
         """
-        module_name = self.get_module_path(country, domain)
+        spec = self.get_module_spec(country, domain)
+        return spec.run if spec is not None else None
         
-        # Controlla se il modulo è già in cache
-        if module_name in self.modules_cache:
-            logger.info(f"Modulo {module_name} trovato in cache")
-            return self.modules_cache[module_name]
+    def list_modules(self) -> List[Dict[str, Any]]:
+        """
+        Elenca i moduli disponibili con versione e capacità dichiarate.
         
-        try:
-            # Costruisci il percorso completo del modulo
-            module_path = f"src.modules.{module_name}"
-            
-            # Importa il modulo dinamicamente
-            module = importlib.import_module(module_path)
-            
-            # Verifica che il modulo abbia una funzione run
-            if not hasattr(module, "run"):
-                logger.error(f"Il modulo {module_name} non ha una funzione run")
-                return None
-            
-            # Memorizza la funzione run nella cache
-            self.modules_cache[module_name] = module.run
-            
-            logger.info(f"Modulo {module_name} caricato con successo")
-            return module.run
-            
-        except ImportError as e:
-            logger.error(f"Impossibile importare il modulo {module_name}: {str(e)}")
-            return None
-        except Exception as e:
-            logger.error(f"Errore durante il caricamento del modulo {module_name}: {str(e)}")
-            return None
+        Returns:
+            List[Dict[str, Any]]: Descrizione dei moduli indicizzati.
+        """
+        if not self.registry.discovered:
+            self.registry.discover()
+        return self.registry.list_modules()
     
     def run_module(self, country: str, domain: str, input_data: Dict[str, Any]) -> Dict[str, Any]:
         """
@@ -101,9 +120,9 @@ class ModuleLoader:
         Returns:
             Dict[str, Any]: Risultato della simulazione o un risultato di errore.
         """
-        module_func = self.load_module(country, domain)
+        spec = self.get_module_spec(country, domain)
         
-        if module_func is None:
+        if spec is None:
             logger.warning(f"Modulo per {domain} in {country} non trovato, utilizzo mock")
             return {
                 "status": "error",
@@ -112,8 +131,13 @@ class ModuleLoader:
             }
         
         try:
-            # Esegui la funzione run del modulo
-            result = module_func(input_data)
+            # Esegui il modulo e le sue dipendenze, riusando i risultati già calcolati
+            result = self.graph.run(spec, input_data, self.execute)
+            
+            # Annota la versione del modulo che ha prodotto il risultato
+            if isinstance(result, dict):
+                result.setdefault("module_version", spec.version)
+            
             logger.info(f"Modulo eseguito con successo: {result}")
             return result
         except Exception as e:
@@ -123,6 +147,257 @@ class ModuleLoader:
                 "message": f"Errore durante l'esecuzione: {str(e)}",
                 "result": {"mocked": True, "error": True}
             }
+    
+    def execute(self, spec: ModuleSpec, input_data: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Esegue un singolo modulo. I moduli con risultati indipendenti per proposta vengono
+        eseguiti solo sulle proposte e sui vincoli non ancora presenti nella cache incrementale.
+        
+        Args:
+            spec: Specifica del modulo da eseguire.
+            input_data: Dati di input per il modulo.
+            
+        Returns:
+            Dict[str, Any]: Risultato del modulo (ColumnarResult se il modulo usa il formato colonnare).
+        """
+        if incremental_evaluator.supports(spec):
+            return incremental_evaluator.evaluate(spec, input_data, self._execute_once)
+        return self._execute_once(spec, input_data)
+    
+    def _execute_once(self, spec: ModuleSpec, input_data: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Esegue la funzione run di un modulo, isolata nel pool di processi se abilitato.
+        
+        Args:
+            spec: Specifica del modulo da eseguire.
+            input_data: Dati di input per il modulo.
+            
+        Returns:
+            Dict[str, Any]: Risultato del modulo.
+        """
+        if self.execution_mode == "process":
+            return as_result(self.executor.run(spec, input_data))
+        return as_result(spec.run(input_data))
+    
+    async def run_module_async(self, country: str, domain: str, input_data: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Esegue un modulo di simulazione senza bloccare l'event loop.
+        
+        Args:
+            country: Paese per cui eseguire la simulazione.
+            domain: Dominio di policy per cui eseguire la simulazione.
+            input_data: Dati di input per la simulazione.
+            
+        Returns:
+            Dict[str, Any]: Risultato della simulazione o un risultato di errore.
+        """
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(None, self.run_module, country, domain, input_data)
+    
+    def run_incremental(self, country: str, domain: str, proposals: List[str], constraints: List[str],
+                        delta: Dict[str, Any], prior_result: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        """
+        Riesegue una simulazione dopo una modifica di proposte o vincoli, ricalcolando solo le celle cambiate.
+        
+        Args:
+            country: Paese per cui eseguire la simulazione.
+            domain: Dominio di policy per cui eseguire la simulazione.
+            proposals: Proposte della simulazione precedente.
+            constraints: Vincoli della simulazione precedente.
+            delta: Proposte e vincoli aggiunti, rimossi o modificati.
+            prior_result: Risultato della simulazione precedente, usato per popolare la cache.
+            
+        Returns:
+            Dict[str, Any]: Proposte e vincoli aggiornati e risultato del modulo, o un risultato di errore.
+        """
+        spec = self.get_module_spec(country, domain)
+        
+        if spec is None:
+            logger.warning(f"Modulo per {domain} in {country} non trovato")
+            return {
+                "status": "error",
+                "message": f"Modulo per {domain} in {country} non trovato"
+            }
+        
+        if not incremental_evaluator.supports(spec):
+            logger.info(f"Il modulo {spec.name} non supporta il calcolo incrementale, esecuzione completa")
+        elif prior_result:
+            prior_input = {"country": country, "proposals": proposals, "constraints": constraints}
+            incremental_evaluator.seed(spec, prior_input, prior_result)
+        
+        new_proposals, new_constraints = apply_delta(proposals, constraints, delta)
+        input_data = {
+            "country": country,
+            "domain": domain,
+            "proposals": new_proposals,
+            "constraints": new_constraints
+        }
+        
+        return {
+            "module_name": spec.name,
+            "proposals": new_proposals,
+            "constraints": new_constraints,
+            "result": self.run_module(country, domain, input_data)
+        }
+    
+    def run_timeline(self, country: str, domain: str, input_data: Dict[str, Any], horizon_years: int,
+                     steps_per_year: int = 1, params: Optional[Dict[str, float]] = None,
+                     parent_id: Optional[str] = None, branch_year: Optional[float] = None) -> Dict[str, Any]:
+        """
+        Esegue una simulazione temporale su più anni con il motore a passi temporali.
+        
+        Args:
+            country: Paese per cui eseguire la simulazione.
+            domain: Dominio di policy per cui eseguire la simulazione.
+            input_data: Dati di input per la simulazione.
+            horizon_years: Orizzonte della simulazione in anni.
+            steps_per_year: Numero di passi per anno.
+            params: Parametri della dinamica del modulo.
+            parent_id: Scenario da cui diramare.
+            branch_year: Anno da cui la simulazione diverge dallo scenario padre.
+            
+        Returns:
+            Dict[str, Any]: Risultato della simulazione temporale o un risultato di errore.
+        """
+        spec = self.get_module_spec(country, domain)
+        
+        if spec is None:
+            logger.warning(f"Modulo per {domain} in {country} non trovato")
+            return {
+                "status": "error",
+                "message": f"Modulo per {domain} in {country} non trovato"
+            }
+        
+        try:
+            return timeline_engine.simulate(spec, input_data, horizon_years, steps_per_year,
+                                            params=params, parent_id=parent_id, branch_year=branch_year)
+        except Exception as e:
+            logger.error(f"Errore durante la simulazione temporale: {str(e)}")
+            return {
+                "status": "error",
+                "message": f"Errore durante la simulazione temporale: {str(e)}"
+            }
+    
+    def run_sweep(self, country: str, domain: str, templates: List[str], parameters: Dict[str, Dict[str, Any]],
+                  constraints: List[str]) -> Dict[str, Any]:
+        """
+        Esplora una griglia di varianti di proposte parametriche con un'unica esecuzione batch del modulo.
+        
+        Args:
+            country: Paese per cui eseguire la simulazione.
+            domain: Dominio di policy per cui eseguire la simulazione.
+            templates: Proposte parametriche, es. "Flat tax al {rate}%".
+            parameters: Valori o intervalli di ogni parametro.
+            constraints: Lista di vincoli comuni a tutte le varianti.
+            
+        Returns:
+            Dict[str, Any]: Tabella dei risultati per punto della griglia o un risultato di errore.
+        """
+        spec = self.get_module_spec(country, domain)
+        
+        if spec is None:
+            logger.warning(f"Modulo per {domain} in {country} non trovato")
+            return {
+                "status": "error",
+                "message": f"Modulo per {domain} in {country} non trovato"
+            }
+        
+        # I moduli senza run_batch vengono valutati con una singola esecuzione di run su tutte le varianti
+        batch = spec.module is not None and callable(getattr(spec.module, "run_batch", None))
+        
+        def evaluate(batch_input: Dict[str, Any]) -> Dict[str, Any]:
+            if self.execution_mode == "process":
+                result = self.executor.run(spec, batch_input, entry="run_batch" if batch else "run")
+            else:
+                result = spec.module.run_batch(batch_input) if batch else spec.run(batch_input)
+            if result.get("status") in ("error", "partial"):
+                raise RuntimeError(result.get("message", "Esecuzione del modulo non riuscita"))
+            return result if batch else columns_from_results(as_result(result), len(batch_input["proposals"]))
+        
+        input_data = {
+            "country": country,
+            "domain": domain,
+            "constraints": constraints
+        }
+        
+        try:
+            return parameter_sweep.run(spec, evaluate, input_data, templates, parameters)
+        except ValueError as e:
+            return {
+                "status": "error",
+                "message": str(e)
+            }
+        except Exception as e:
+            logger.error(f"Errore durante l'esplorazione parametrica: {str(e)}")
+            return {
+                "status": "error",
+                "message": f"Errore durante l'esplorazione parametrica: {str(e)}"
+            }
+
+    def run_portfolio(self, country: str, domain: str, proposals: List[str], constraints: List[str],
+                      budget: float, options: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        """
+        Calcola la frontiera di Pareto costo/impatto dei portafogli di proposte entro un budget.
+        
+        Args:
+            country: Paese per cui eseguire la simulazione.
+            domain: Dominio di policy per cui eseguire la simulazione.
+            proposals: Proposte candidate.
+            constraints: Lista di vincoli comuni a tutte le proposte.
+            budget: Costo totale massimo di un portafoglio.
+            options: Vincoli aggiuntivi dell'ottimizzatore (max_proposals, min_feasibility,
+                required, excluded, require_constraints, max_points).
+            
+        Returns:
+            Dict[str, Any]: Frontiera dei portafogli e metriche dei candidati o un risultato di errore.
+        """
+        spec = self.get_module_spec(country, domain)
+        
+        if spec is None:
+            logger.warning(f"Modulo per {domain} in {country} non trovato")
+            return {
+                "status": "error",
+                "message": f"Modulo per {domain} in {country} non trovato"
+            }
+        
+        # Tutti i candidati vengono valutati in un'unica esecuzione del modulo (con cache incrementale)
+        input_data = {
+            "country": country,
+            "domain": domain,
+            "proposals": proposals,
+            "constraints": constraints
+        }
+        module_result = self.run_module(country, domain, input_data)
+        if not isinstance(module_result, dict) or module_result.get("status") in ("error", "partial"):
+            return {
+                "status": "error",
+                "message": module_result.get("message", "Esecuzione del modulo non riuscita")
+                if isinstance(module_result, dict) else "Risultato del modulo non valido"
+            }
+        
+        metrics = columns_from_results(as_result(module_result), len(proposals))
+        
+        try:
+            result = portfolio_optimizer.optimize(
+                proposals,
+                metrics,
+                budget,
+                constraints_count=len(constraints),
+                **(options or {})
+            )
+        except Exception as e:
+            logger.error(f"Errore durante l'ottimizzazione del portafoglio: {str(e)}")
+            return {
+                "status": "error",
+                "message": f"Errore durante l'ottimizzazione del portafoglio: {str(e)}"
+            }
+        
+        if result.get("status") == "error":
+            return result
+        
+        result["module_name"] = spec.name
+        result["module_version"] = spec.version
+        return result
 
 # Istanza singleton del loader dei moduli
 module_loader = ModuleLoader()
@@ -0,0 +1,279 @@
+"""
+Ottimizzazione dei portafogli di proposte per Osireon.
+Questo file contiene la ricerca della frontiera di Pareto costo/impatto dei portafogli di proposte
+con vincolo di budget, tramite branch-and-bound con potatura invece dell'enumerazione.
+"""
+import logging
+import os
+import time
+from typing import Dict, Any, List, Optional, Tuple
+
+# Configurazione del logging
+logger = logging.getLogger("osireon.modules.portfolio")
+
+# Tolleranza relativa per i confronti tra costi e valori
+_EPSILON = 1e-9
+
+# Riduzione relativa del limite di costo tra due punti della frontiera (molto maggiore della tolleranza)
+_COST_STEP = 1e-6
+
+class PortfolioOptimizer:
+    """
+    Ottimizzatore dei portafogli di proposte.
+    
+    Il valore di una proposta è l'impatto atteso (impact_score * feasibility). La frontiera viene
+    costruita con il metodo epsilon-vincolo: si cerca il portafoglio di valore massimo entro il budget,
+    poi si abbassa il limite di costo appena sotto il costo trovato e si ripete. Ogni passo è un problema
+    di zaino risolto con branch-and-bound; il limite superiore di un nodo è il minimo tra il rilassamento
+    continuo dello zaino e la somma dei migliori valori residui ammessi dal limite di cardinalità.
+    """
+    
+    def __init__(self, time_limit: Optional[float] = None, max_points: Optional[int] = None):
+        """
+        Inizializza l'ottimizzatore.
+        
+        Args:
+            time_limit: Tempo massimo di ricerca in secondi (la frontiera restituita può essere parziale).
+            max_points: Numero massimo di punti della frontiera.
+        """
+        self.time_limit = time_limit or float(os.getenv("PORTFOLIO_TIME_LIMIT", "5"))
+        self.max_points = max_points or int(os.getenv("PORTFOLIO_MAX_POINTS", "100"))
+        logger.info(f"PortfolioOptimizer inizializzato con limite di {self.time_limit:.1f}s e {self.max_points} punti")
+    
+    def optimize(self, proposals: List[str], metrics: Dict[str, List[float]], budget: float,
+                 max_proposals: Optional[int] = None, min_feasibility: float = 0.0,
+                 required: Optional[List[str]] = None, excluded: Optional[List[str]] = None,
+                 constraints_count: int = 0, require_constraints: bool = False,
+                 max_points: Optional[int] = None) -> Dict[str, Any]:
+        """
+        Calcola la frontiera di Pareto dei portafogli ammissibili.
+        
+        Args:
+            proposals: Proposte candidate.
+            metrics: Colonne impact_score, feasibility, cost_estimate e constraints_satisfied per proposta.
+            budget: Costo totale massimo di un portafoglio.
+            max_proposals: Numero massimo di proposte in un portafoglio.
+            min_feasibility: Fattibilità minima di una proposta per essere ammessa.
+            required: Proposte che devono far parte di ogni portafoglio.
+            excluded: Proposte da escludere.
+            constraints_count: Numero di vincoli verificati dal modulo.
+            require_constraints: Se True, ammette solo le proposte che soddisfano tutti i vincoli.
+            max_points: Numero massimo di punti della frontiera.
+        
+        Returns:
+            Dict[str, Any]: Candidati con le loro metriche, frontiera ordinata per costo e statistiche della ricerca.
+        """
+        started = time.monotonic()
+        deadline = started + self.time_limit
+        max_points = max_points or self.max_points
+        required_set = set(required or [])
+        excluded_set = set(excluded or [])
+        
+        candidates = []
+        for i, proposal in enumerate(proposals):
+            impact = float(metrics["impact_score"][i])
+            feasibility = float(metrics["feasibility"][i])
+            cost = max(float(metrics["cost_estimate"][i]), 0.0)
+            satisfied = metrics.get("constraints_satisfied", [constraints_count] * len(proposals))[i]
+            
+            reason = None
+            if proposal in excluded_set:
+                reason = "esclusa"
+            elif feasibility < min_feasibility and proposal not in required_set:
+                reason = "fattibilità insufficiente"
+            elif require_constraints and satisfied < constraints_count and proposal not in required_set:
+                reason = "vincoli non soddisfatti"
+            
+            candidates.append({
+                "proposal": proposal,
+                "impact_score": impact,
+                "feasibility": feasibility,
+                "cost_estimate": cost,
+                "expected_impact": impact * feasibility,
+                "eligible": reason is None,
+                "reason": reason
+            })
+        
+        # Le proposte obbligatorie riducono budget e cardinalità disponibili
+        forced = [i for i, c in enumerate(candidates) if c["proposal"] in required_set and c["eligible"]]
+        forced_cost = sum(candidates[i]["cost_estimate"] for i in forced)
+        forced_value = sum(candidates[i]["expected_impact"] for i in forced)
+        limit = None if max_proposals is None else max_proposals - len(forced)
+        
+        if forced_cost > budget * (1 + _EPSILON) or (limit is not None and limit < 0):
+            return {
+                "status": "error",
+                "message": "Le proposte obbligatorie superano il budget o il numero massimo di proposte"
+            }
+        
+        # Solo le proposte con valore positivo possono migliorare un portafoglio
+        free = [i for i, c in enumerate(candidates)
+                if c["eligible"] and i not in forced and c["expected_impact"] > 0]
+        
+        search = _KnapsackSearch(
+            [candidates[i]["cost_estimate"] for i in free],
+            [candidates[i]["expected_impact"] for i in free],
+            limit,
+            deadline
+        )
+        
+        frontier: List[Tuple[float, float, List[int]]] = []
+        capacity = budget - forced_cost
+        complete = True
+        while len(frontier) < max_points:
+            solution = search.solve(capacity)
+            if solution is None:
+                complete = not search.timed_out
+                break
+            value, cost, chosen = solution
+            frontier.append((cost + forced_cost, value + forced_value, sorted(forced + [free[k] for k in chosen])))
+            if not chosen:
+                break
+            # Il punto successivo deve costare strettamente meno
+            capacity = cost - _COST_STEP * max(1.0, cost)
+        else:
+            complete = False
+        
+        points = _non_dominated(frontier)
+        elapsed = time.monotonic() - started
+        logger.info(f"Frontiera di {len(points)} portafogli su {len(free)} candidati liberi: "
+                    f"{search.nodes} nodi esplorati in {elapsed * 1000:.0f}ms")
+        
+        return {
+            "candidates": candidates,
+            "frontier": [
+                {
+                    "proposals": [candidates[i]["proposal"] for i in indices],
+                    "indices": indices,
+                    "count": len(indices),
+                    "cost": cost,
+                    "expected_impact": value,
+                    "impact": sum(candidates[i]["impact_score"] for i in indices)
+                }
+                for cost, value, indices in points
+            ],
+            "budget": budget,
+            "nodes_explored": search.nodes,
+            "complete": complete,
+            "elapsed_ms": round(elapsed * 1000, 1)
+        }
+
+class _KnapsackSearch:
+    """
+    Branch-and-bound per lo zaino 0/1 con limite di cardinalità opzionale.
+    """
+    
+    def __init__(self, costs: List[float], values: List[float], limit: Optional[int], deadline: float):
+        """
+        Inizializza la ricerca.
+        
+        Args:
+            costs: Costo di ogni elemento.
+            values: Valore (positivo) di ogni elemento.
+            limit: Numero massimo di elementi scelti, o None.
+            deadline: Istante (time.monotonic) oltre il quale la ricerca si interrompe.
+        """
+        # Elementi ordinati per rapporto valore/costo decrescente (quelli gratuiti per primi)
+        self.order = sorted(range(len(costs)), key=lambda k: -(values[k] / costs[k]) if costs[k] > 0 else -float("inf"))
+        self.costs = [costs[k] for k in self.order]
+        self.values = [values[k] for k in self.order]
+        self.limit = len(costs) if limit is None else min(limit, len(costs))
+        self.deadline = deadline
+        self.nodes = 0
+        self.timed_out = False
+        
+        # Valori in ordine decrescente dal livello k in poi, per il limite di cardinalità
+        self._top_values = [sorted(self.values[k:], reverse=True) for k in range(len(self.values) + 1)]
+    
+    def solve(self, capacity: float) -> Optional[Tuple[float, float, List[int]]]:
+        """
+        Trova il sottoinsieme di valore massimo (a parità di valore, di costo minimo) entro la capacità.
+        
+        Args:
+            capacity: Costo massimo.
+        
+        Returns:
+            Optional[Tuple[float, float, List[int]]]: Valore, costo e indici originali scelti,
+            oppure None se la capacità è negativa o la ricerca è stata interrotta.
+        """
+        if capacity < 0 or self.timed_out:
+            return None
+        
+        n = len(self.values)
+        self._best = (0.0, 0.0, [])
+        chosen: List[int] = []
+        
+        def visit(k: int, value: float, cost: float, count: int) -> None:
+            self.nodes += 1
+            if self.nodes % 4096 == 0 and time.monotonic() > self.deadline:
+                self.timed_out = True
+            if self.timed_out:
+                return
+            
+            best_value, best_cost, _ = self._best
+            if value > best_value * (1 + _EPSILON) or (value >= best_value * (1 - _EPSILON) and cost < best_cost):
+                self._best = (value, cost, list(chosen))
+                best_value = value
+            
+            if k == n or count == self.limit:
+                return
+            if value + self._bound(k, capacity - cost, self.limit - count) <= best_value * (1 + _EPSILON):
+                return
+            
+            # Prima il ramo che include l'elemento (guidato dall'ordinamento per rapporto)
+            if cost + self.costs[k] <= capacity * (1 + _EPSILON):
+                chosen.append(k)
+                visit(k + 1, value + self.values[k], cost + self.costs[k], count + 1)
+                chosen.pop()
+            visit(k + 1, value, cost, count)
+        
+        visit(0, 0.0, 0.0, 0)
+        if self.timed_out:
+            return None
+        
+        value, cost, items = self._best
+        return value, cost, sorted(self.order[k] for k in items)
+    
+    def _bound(self, k: int, capacity: float, slots: int) -> float:
+        """
+        Limite superiore del valore ottenibile dagli elementi da k in poi.
+        
+        Args:
+            k: Primo elemento non ancora deciso.
+            capacity: Capacità residua.
+            slots: Numero di elementi ancora selezionabili.
+        
+        Returns:
+            float: Limite superiore del valore aggiuntivo.
+        """
+        # Rilassamento continuo dello zaino (ordinamento per rapporto valore/costo)
+        relaxed = 0.0
+        for j in range(k, len(self.values)):
+            if self.costs[j] <= capacity:
+                capacity -= self.costs[j]
+                relaxed += self.values[j]
+            else:
+                relaxed += self.values[j] * capacity / self.costs[j]
+                break
+        
+        # Limite di cardinalità: somma dei migliori valori residui
+        return min(relaxed, sum(self._top_values[k][:slots]))
+
+def _non_dominated(points: List[Tuple[float, float, List[int]]]) -> List[Tuple[float, float, List[int]]]:
+    """
+    Rimuove i punti dominati (costo non inferiore e valore non superiore a un altro punto).
+    
+    Args:
+        points: Punti (costo, valore, indici).
+    
+    Returns:
+        List[Tuple[float, float, List[int]]]: Punti non dominati ordinati per costo crescente.
+    """
+    result: List[Tuple[float, float, List[int]]] = []
+    for point in sorted(points, key=lambda p: (p[0], -p[1])):
+        if not result or point[1] > result[-1][1] * (1 + _EPSILON):
+            result.append(point)
+    return result
+
+# Istanza singleton dell'ottimizzatore dei portafogli
+portfolio_optimizer = PortfolioOptimizer()
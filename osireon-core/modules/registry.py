@@ -0,0 +1,367 @@
+"""
+Registro dei moduli di simulazione per Osireon.
+Questo file contiene l'indice dei moduli disponibili, con versioni, schemi di capacità,
+cache delle ricerche fallite e ricaricamento a caldo.
+"""
+import importlib
+import logging
+import os
+import re
+import threading
+import time
+from types import ModuleType
+from importlib.metadata import entry_points
+from typing import Dict, Any, Callable, List, Optional
+
+# Configurazione del logging
+logger = logging.getLogger("osireon.modules.registry")
+
+# Gruppo degli entry point usato dai plugin esterni per esporre moduli
+ENTRY_POINT_GROUP = "osireon.modules"
+
+# Pacchetto che contiene i moduli locali (es. src.modules)
+MODULES_PACKAGE = __name__.rsplit(".", 1)[0]
+
+# Nomi validi per un modulo di simulazione: {dominio}_{codice paese}
+MODULE_NAME_PATTERN = re.compile(r"^[a-z][a-z0-9_]*_[a-z]{2}$")
+
+class ModuleSpec:
+    """
+    Descrizione immutabile di una versione di un modulo di simulazione.
+    """
+    
+    def __init__(self, name: str, run: Callable, version: str = "0.0.0",
+                 capabilities: Optional[Dict[str, Any]] = None, source: str = "local",
+                 module: Optional[ModuleType] = None, limits: Optional[Dict[str, Any]] = None,
+                 depends_on: Optional[List[str]] = None, domain: Optional[str] = None):
+        """
+        Inizializza la specifica di un modulo.
+        
+        Args:
+            name: Nome del modulo (es. economy_it).
+            run: Funzione run del modulo.
+            version: Versione del modulo.
+            capabilities: Schema delle capacità dichiarate (input e metriche prodotte).
+            source: Origine del modulo ("local", "entry_point" o "runtime").
+            module: Oggetto modulo Python, se disponibile (necessario per il ricaricamento).
+            limits: Limiti di esecuzione dichiarati (timeout, cpu_time in secondi, memory_mb).
+            depends_on: Nomi dei moduli i cui risultati sono richiesti in input.
+            domain: Dominio di policy del modulo.
+        """
+        self.name = name
+        self.run = run
+        self.version = version
+        self.capabilities = capabilities or {}
+        self.source = source
+        self.module = module
+        self.limits = limits or {}
+        self.depends_on = list(depends_on or [])
+        self.domain = domain
+        self.loaded_at = time.time()
+    
+    @classmethod
+    def from_module(cls, name: str, module: ModuleType, source: str = "local",
+                    default_version: str = "0.0.0") -> Optional["ModuleSpec"]:
+        """
+        Costruisce la specifica a partire da un modulo Python con funzione run e MODULE_INFO.
+        
+        Args:
+            name: Nome con cui registrare il modulo.
+            module: Modulo Python importato.
+            source: Origine del modulo.
+            default_version: Versione da usare se il modulo non ne dichiara una.
+        
+        Returns:
+            Optional[ModuleSpec]: Specifica del modulo o None se il modulo non ha una funzione run.
+        """
+        run = getattr(module, "run", None)
+        if not callable(run):
+            return None
+        
+        info = getattr(module, "MODULE_INFO", {}) or {}
+        return cls(
+            name=name,
+            run=run,
+            version=str(info.get("version", default_version)),
+            capabilities=info.get("capabilities", {}),
+            source=source,
+            module=module,
+            limits=info.get("limits", {}),
+            depends_on=info.get("depends_on", []),
+            domain=info.get("domain")
+        )
+    
+    def to_dict(self) -> Dict[str, Any]:
+        """
+        Converte la specifica in un dizionario serializzabile.
+        
+        Returns:
+            Dict[str, Any]: Rappresentazione della specifica come dizionario.
+        """
+        return {
+            "name": self.name,
+            "version": self.version,
+            "source": self.source,
+            "capabilities": self.capabilities,
+            "limits": self.limits,
+            "depends_on": self.depends_on,
+            "loaded_at": self.loaded_at
+        }
+
+class ModuleRegistry:
+    """
+    Indice dei moduli di simulazione disponibili.
+    
+    Le letture non prendono lock: l'indice è un dizionario che viene sostituito per intero
+    (copy-on-write) ad ogni modifica, quindi una richiesta in corso vede sempre una versione
+    coerente e continua ad usare la funzione run che ha già risolto.
+    """
+    
+    def __init__(self, modules_dir: Optional[str] = None, package: str = MODULES_PACKAGE,
+                 negative_ttl: Optional[float] = None):
+        """
+        Inizializza il registro dei moduli.
+        
+        Args:
+            modules_dir: Directory contenente i moduli locali. Se None, usa la directory di questo file.
+            package: Pacchetto Python da cui importare i moduli locali.
+            negative_ttl: Durata in secondi della cache delle ricerche fallite.
+        """
+        self.modules_dir = modules_dir or os.path.dirname(os.path.abspath(__file__))
+        self.package = package
+        self.negative_ttl = negative_ttl if negative_ttl is not None else float(os.getenv("MODULE_NEGATIVE_TTL", "300"))
+        self._specs: Dict[str, ModuleSpec] = {}
+        self._missing: Dict[str, float] = {}
+        self._lock = threading.RLock()
+        self.discovered = False
+        logger.info(f"ModuleRegistry inizializzato con directory: {self.modules_dir}")
+    
+    def discover(self) -> List[str]:
+        """
+        Indicizza tutti i moduli locali e quelli installati tramite entry point.
+        
+        Returns:
+            List[str]: Nomi dei moduli indicizzati.
+        """
+        specs: Dict[str, ModuleSpec] = {}
+        
+        # Moduli locali nella directory dei moduli
+        for name in self._local_module_names():
+            spec = self._import_local(name)
+            if spec is not None:
+                specs[spec.name] = spec
+        
+        # Plugin installati come pacchetti (i moduli locali hanno la precedenza)
+        for spec in self._entry_point_specs():
+            if spec.name in specs:
+                logger.warning(f"Plugin {spec.name} ignorato: esiste già un modulo locale con lo stesso nome")
+                continue
+            specs[spec.name] = spec
+        
+        with self._lock:
+            # I moduli registrati a runtime sopravvivono alla riscoperta
+            for name, spec in self._specs.items():
+                if spec.source == "runtime" and name not in specs:
+                    specs[name] = spec
+            self._specs = specs
+            self._missing = {}
+            self.discovered = True
+        
+        logger.info(f"Indicizzati {len(specs)} moduli: {sorted(specs)}")
+        return sorted(specs)
+    
+    def resolve(self, module_name: str) -> Optional[ModuleSpec]:
+        """
+        Risolve un modulo per nome.
+        
+        Args:
+            module_name: Nome del modulo (es. economy_it).
+        
+        Returns:
+            Optional[ModuleSpec]: Specifica del modulo o None se non disponibile.
+        """
+        spec = self._specs.get(module_name)
+        if spec is not None:
+            return spec
+        
+        # Ricerca fallita di recente: non ritentare l'import
+        missing_since = self._missing.get(module_name)
+        if missing_since is not None and time.time() - missing_since < self.negative_ttl:
+            return None
+        
+        # Il modulo potrebbe essere stato aggiunto dopo la scoperta iniziale
+        spec = self._import_local(module_name) if MODULE_NAME_PATTERN.match(module_name) else None
+        
+        with self._lock:
+            if spec is None:
+                self._missing[module_name] = time.time()
+                logger.info(f"Modulo {module_name} non disponibile, ricerca memorizzata per {self.negative_ttl:.0f}s")
+                return None
+            self._swap(spec)
+        return spec
+    
+    def register(self, run: Callable, name: str, version: str = "0.0.0",
+                 capabilities: Optional[Dict[str, Any]] = None,
+                 depends_on: Optional[List[str]] = None) -> ModuleSpec:
+        """
+        Registra (o sostituisce) un modulo a runtime.
+        
+        Args:
+            run: Funzione run del modulo.
+            name: Nome del modulo.
+            version: Versione del modulo.
+            capabilities: Schema delle capacità dichiarate.
+            depends_on: Nomi dei moduli i cui risultati sono richiesti in input.
+        
+        Returns:
+            ModuleSpec: Specifica registrata.
+        """
+        spec = ModuleSpec(name, run, version=version, capabilities=capabilities, source="runtime",
+                          depends_on=depends_on)
+        with self._lock:
+            self._swap(spec)
+        return spec
+    
+    def reload(self, module_name: str) -> Optional[ModuleSpec]:
+        """
+        Ricarica a caldo un modulo e sostituisce atomicamente la versione registrata.
+        
+        Le richieste già in corso terminano con la versione precedente; quelle successive
+        usano la nuova. Se il ricaricamento fallisce la versione precedente resta attiva.
+        
+        Args:
+            module_name: Nome del modulo da ricaricare.
+        
+        Returns:
+            Optional[ModuleSpec]: Nuova specifica o None se il ricaricamento non è riuscito.
+        """
+        with self._lock:
+            current = self._specs.get(module_name)
+            
+            try:
+                if current is not None and current.module is not None:
+                    module = importlib.reload(current.module)
+                    spec = ModuleSpec.from_module(module_name, module, source=current.source,
+                                                  default_version=current.version)
+                else:
+                    self._missing.pop(module_name, None)
+                    spec = self._import_local(module_name)
+            except Exception as e:
+                logger.error(f"Errore durante il ricaricamento del modulo {module_name}: {str(e)}")
+                return None
+            
+            if spec is None:
+                logger.error(f"Ricaricamento del modulo {module_name} non riuscito: modulo non disponibile")
+                return None
+            
+            self._swap(spec)
+        
+        previous = current.version if current is not None else "nessuna"
+        logger.info(f"Modulo {module_name} ricaricato: versione {previous} -> {spec.version}")
+        return spec
+    
+    def list_modules(self) -> List[Dict[str, Any]]:
+        """
+        Elenca i moduli indicizzati.
+        
+        Returns:
+            List[Dict[str, Any]]: Descrizione di ogni modulo registrato.
+        """
+        specs = self._specs
+        return [specs[name].to_dict() for name in sorted(specs)]
+    
+    def _swap(self, spec: ModuleSpec) -> None:
+        """
+        Pubblica una specifica sostituendo l'indice con una nuova copia. Richiede il lock.
+        
+        Args:
+            spec: Specifica da pubblicare.
+        """
+        specs = dict(self._specs)
+        specs[spec.name] = spec
+        self._specs = specs
+        self._missing.pop(spec.name, None)
+    
+    def _local_module_names(self) -> List[str]:
+        """
+        Elenca i nomi dei moduli candidati nella directory dei moduli.
+        
+        Returns:
+            List[str]: Nomi dei file Python che rispettano la convenzione {dominio}_{paese}.
+        """
+        try:
+            filenames = os.listdir(self.modules_dir)
+        except OSError as e:
+            logger.error(f"Impossibile leggere la directory dei moduli {self.modules_dir}: {str(e)}")
+            return []
+        
+        names = []
+        for filename in sorted(filenames):
+            name, ext = os.path.splitext(filename)
+            if ext == ".py" and MODULE_NAME_PATTERN.match(name):
+                names.append(name)
+        return names
+    
+    def _import_local(self, module_name: str) -> Optional[ModuleSpec]:
+        """
+        Importa un modulo locale e ne costruisce la specifica.
+        
+        Args:
+            module_name: Nome del modulo.
+        
+        Returns:
+            Optional[ModuleSpec]: Specifica del modulo o None se non importabile.
+        """
+        try:
+            module = importlib.import_module(f"{self.package}.{module_name}")
+        except ImportError as e:
+            logger.error(f"Impossibile importare il modulo {module_name}: {str(e)}")
+            return None
+        except Exception as e:
+            logger.error(f"Errore durante il caricamento del modulo {module_name}: {str(e)}")
+            return None
+        
+        spec = ModuleSpec.from_module(module_name, module)
+        if spec is None:
+            logger.error(f"Il modulo {module_name} non ha una funzione run")
+        return spec
+    
+    def _entry_point_specs(self) -> List[ModuleSpec]:
+        """
+        Carica i moduli esposti dai pacchetti installati tramite entry point.
+        
+        Returns:
+            List[ModuleSpec]: Specifiche dei plugin caricati correttamente.
+        """
+        try:
+            eps = entry_points(group=ENTRY_POINT_GROUP)
+        except Exception as e:
+            logger.error(f"Errore durante la lettura degli entry point: {str(e)}")
+            return []
+        
+        specs = []
+        for ep in eps:
+            dist = getattr(ep, "dist", None)
+            dist_version = getattr(dist, "version", None) or "0.0.0"
+            try:
+                target = ep.load()
+            except Exception as e:
+                logger.error(f"Impossibile caricare il plugin {ep.name}: {str(e)}")
+                continue
+            
+            # L'entry point può puntare a un modulo con run/MODULE_INFO o direttamente a una funzione
+            if isinstance(target, ModuleType):
+                spec = ModuleSpec.from_module(ep.name, target, source="entry_point", default_version=dist_version)
+            elif callable(target):
+                spec = ModuleSpec(ep.name, target, version=dist_version, source="entry_point")
+            else:
+                spec = None
+            
+            if spec is None:
+                logger.error(f"Il plugin {ep.name} non espone una funzione run")
+                continue
+            specs.append(spec)
+        return specs
+
+# Istanza singleton del registro dei moduli
+module_registry = ModuleRegistry()
@@ -0,0 +1,498 @@
+"""
+Formato colonnare dei risultati dei moduli per Osireon.
+Questo file contiene la rappresentazione compatta dei risultati per proposta (un array tipizzato
+per metrica e una tabella di stringhe condivisa) e la vista che la espande nel formato a dizionari
+"proposal_1..N" solo quando viene letta.
+"""
+import copy
+import logging
+import math
+from array import array
+from collections.abc import Mapping
+from typing import Dict, Any, Iterable, Iterator, List, Optional
+
+# Configurazione del logging
+logger = logging.getLogger("osireon.modules.results")
+
+# Identificativo del formato colonnare nei risultati serializzati
+COLUMNAR_FORMAT = "columnar"
+
+# Chiavi del risultato compatto che non sono metadati complessivi del modulo
+_PAYLOAD_KEYS = ("format", "proposal_count", "strings", "columns")
+
+# Typecode degli array per ogni tipo di colonna scalare
+_TYPECODES = {"float": "d", "int": "q", "bool": "b", "str": "i"}
+
+class ResultBuilder:
+    """
+    Costruttore del risultato colonnare di un modulo.
+    
+    Le stringhe (vincoli, note, settori) vengono memorizzate una sola volta nella tabella
+    delle stringhe e referenziate per indice; le liste per proposta usano un array di offset.
+    """
+    
+    def __init__(self, proposal_count: int, **metadata):
+        """
+        Inizializza il costruttore.
+        
+        Args:
+            proposal_count: Numero di proposte del risultato.
+            **metadata: Metadati complessivi del modulo (module, status, metriche complessive).
+        """
+        self.proposal_count = proposal_count
+        self.metadata = dict(metadata)
+        self.strings: List[str] = []
+        self.columns: Dict[str, Dict[str, Any]] = {}
+        self._string_ids: Dict[str, int] = {}
+    
+    def intern(self, value: str) -> int:
+        """
+        Restituisce l'indice di una stringa nella tabella, aggiungendola se necessario.
+        
+        Args:
+            value: Stringa da memorizzare.
+        
+        Returns:
+            int: Indice della stringa.
+        """
+        index = self._string_ids.get(value)
+        if index is None:
+            index = len(self.strings)
+            self.strings.append(value)
+            self._string_ids[value] = index
+        return index
+    
+    def column(self, name: str, column_type: str, values: Iterable) -> "ResultBuilder":
+        """
+        Aggiunge una colonna scalare con un valore per proposta.
+        
+        Args:
+            name: Nome della metrica.
+            column_type: Tipo della colonna ("float", "int", "bool" o "str").
+            values: Valori della colonna.
+        
+        Returns:
+            ResultBuilder: Il costruttore stesso, per concatenare le chiamate.
+        """
+        self.columns[name] = self._scalar(column_type, values)
+        self._check_length(name, len(self.columns[name]["values"]))
+        return self
+    
+    def list_column(self, name: str, rows: Iterable[List[str]]) -> "ResultBuilder":
+        """
+        Aggiunge una colonna con una lista di stringhe per proposta.
+        
+        Args:
+            name: Nome della metrica.
+            rows: Lista di stringhe per ogni proposta.
+        
+        Returns:
+            ResultBuilder: Il costruttore stesso.
+        """
+        offsets = array("i", [0])
+        values = array("i")
+        for row in rows:
+            values.extend(self.intern(value) for value in row)
+            offsets.append(len(values))
+        self._check_length(name, len(offsets) - 1)
+        self.columns[name] = {"type": "list[str]", "offsets": offsets, "values": values}
+        return self
+    
+    def records_column(self, name: str, counts: Iterable[int], fields: Dict[str, tuple]) -> "ResultBuilder":
+        """
+        Aggiunge una colonna con una lista di record per proposta (es. constraints_check).
+        
+        Args:
+            name: Nome della metrica.
+            counts: Numero di record per ogni proposta.
+            fields: Campi dei record: nome -> (tipo, valori di tutti i record in sequenza).
+        
+        Returns:
+            ResultBuilder: Il costruttore stesso.
+        """
+        offsets = array("i", [0])
+        for count in counts:
+            offsets.append(offsets[-1] + count)
+        self._check_length(name, len(offsets) - 1)
+        
+        columns = {field: self._scalar(field_type, values) for field, (field_type, values) in fields.items()}
+        for field, column in columns.items():
+            if len(column["values"]) != offsets[-1]:
+                raise ValueError(f"Il campo {field} di {name} ha {len(column['values'])} valori invece di {offsets[-1]}")
+        
+        self.columns[name] = {"type": "records", "offsets": offsets, "fields": columns}
+        return self
+    
+    def build(self) -> Dict[str, Any]:
+        """
+        Restituisce il risultato compatto, trasferibile tra processi come dizionario semplice.
+        
+        Returns:
+            Dict[str, Any]: Metadati del modulo più tabella delle stringhe e colonne.
+        """
+        result = dict(self.metadata)
+        result.update({
+            "format": COLUMNAR_FORMAT,
+            "proposal_count": self.proposal_count,
+            "strings": self.strings,
+            "columns": self.columns
+        })
+        return result
+    
+    def _scalar(self, column_type: str, values: Iterable) -> Dict[str, Any]:
+        """
+        Converte una sequenza di valori in una colonna scalare tipizzata.
+        
+        Args:
+            column_type: Tipo della colonna.
+            values: Valori della colonna.
+        
+        Returns:
+            Dict[str, Any]: Colonna con tipo e array dei valori.
+        """
+        if column_type not in _TYPECODES:
+            raise ValueError(f"Tipo di colonna {column_type} non supportato")
+        if column_type == "str":
+            values = (self.intern(value) for value in values)
+        elif column_type == "float":
+            values = (math.nan if value is None else value for value in values)
+        return {"type": column_type, "values": array(_TYPECODES[column_type], values)}
+    
+    def _check_length(self, name: str, length: int) -> None:
+        """
+        Verifica che una colonna abbia un valore per proposta.
+        
+        Args:
+            name: Nome della colonna.
+            length: Numero di righe della colonna.
+        """
+        if length != self.proposal_count:
+            raise ValueError(f"La colonna {name} ha {length} righe invece di {self.proposal_count}")
+
+class ProposalResults(Mapping):
+    """
+    Vista in sola lettura dei risultati per proposta nel formato "proposal_1..N".
+    Ogni proposta viene espansa in un dizionario solo quando viene letta.
+    """
+    
+    def __init__(self, result: "ColumnarResult"):
+        """
+        Inizializza la vista.
+        
+        Args:
+            result: Risultato colonnare da esporre.
+        """
+        self._result = result
+    
+    def __getitem__(self, key: str) -> Dict[str, Any]:
+        if not isinstance(key, str) or not key.startswith("proposal_"):
+            raise KeyError(key)
+        try:
+            index = int(key[len("proposal_"):]) - 1
+        except ValueError:
+            raise KeyError(key)
+        if not 0 <= index < self._result.proposal_count:
+            raise KeyError(key)
+        return self._result.row(index)
+    
+    def __iter__(self) -> Iterator[str]:
+        return (f"proposal_{i+1}" for i in range(self._result.proposal_count))
+    
+    def __len__(self) -> int:
+        return self._result.proposal_count
+    
+    def __repr__(self) -> str:
+        return f"ProposalResults({self._result.proposal_count} proposte)"
+
+class ColumnarResult(dict):
+    """
+    Risultato di un modulo in formato colonnare.
+    
+    Si comporta come il dizionario del formato esteso: le chiavi sono i metadati del modulo e
+    "results" è una vista pigra sulle proposte. Le colonne tipizzate sono accessibili con column().
+    """
+    
+    def __init__(self, payload: Dict[str, Any]):
+        """
+        Inizializza il risultato.
+        
+        Args:
+            payload: Risultato compatto (da ResultBuilder.build o deserializzato da JSON).
+        """
+        super().__init__((k, v) for k, v in payload.items() if k not in _PAYLOAD_KEYS)
+        self.proposal_count = payload.get("proposal_count", 0)
+        self.strings = payload.get("strings", [])
+        self.columns = payload.get("columns", {})
+        self["results"] = ProposalResults(self)
+    
+    def column(self, name: str, default: Any = None) -> List[Any]:
+        """
+        Restituisce i valori di una metrica per tutte le proposte.
+        
+        Args:
+            name: Nome della metrica.
+            default: Valore da usare per ogni proposta se la metrica non esiste.
+        
+        Returns:
+            List[Any]: Un valore per proposta.
+        """
+        column = self.columns.get(name)
+        if column is None:
+            return [default] * self.proposal_count
+        return [self._value(column, i) for i in range(self.proposal_count)]
+    
+    def row(self, index: int) -> Dict[str, Any]:
+        """
+        Espande una proposta nel formato a dizionario.
+        
+        Args:
+            index: Indice della proposta (da 0).
+        
+        Returns:
+            Dict[str, Any]: Metriche della proposta.
+        """
+        return {name: self._value(column, index) for name, column in self.columns.items()}
+    
+    def to_compact(self) -> Dict[str, Any]:
+        """
+        Restituisce il risultato compatto, con eventuali metadati aggiunti dopo l'esecuzione.
+        
+        Returns:
+            Dict[str, Any]: Risultato compatto.
+        """
+        result = {k: v for k, v in self.items() if k != "results"}
+        result.update({
+            "format": COLUMNAR_FORMAT,
+            "proposal_count": self.proposal_count,
+            "strings": self.strings,
+            "columns": self.columns
+        })
+        return result
+    
+    def to_json(self) -> Dict[str, Any]:
+        """
+        Restituisce il risultato compatto con gli array convertiti in liste (serializzabile in JSON).
+        
+        Returns:
+            Dict[str, Any]: Risultato compatto serializzabile.
+        """
+        return _jsonable(self.to_compact())
+    
+    def to_legacy(self) -> Dict[str, Any]:
+        """
+        Espande l'intero risultato nel formato a dizionari "proposal_1..N".
+        
+        Returns:
+            Dict[str, Any]: Risultato nel formato esteso.
+        """
+        result = {k: v for k, v in self.items() if k != "results"}
+        result["results"] = {f"proposal_{i+1}": self.row(i) for i in range(self.proposal_count)}
+        return result
+    
+    def _value(self, column: Dict[str, Any], index: int) -> Any:
+        """
+        Legge il valore di una colonna per una proposta (o per un record).
+        
+        Args:
+            column: Colonna da leggere.
+            index: Indice della riga.
+        
+        Returns:
+            Any: Valore nel tipo del formato esteso.
+        """
+        column_type = column["type"]
+        if column_type == "list[str]":
+            offsets, values = column["offsets"], column["values"]
+            return [self.strings[values[k]] for k in range(offsets[index], offsets[index + 1])]
+        if column_type == "records":
+            offsets, fields = column["offsets"], column["fields"]
+            return [
+                {field: self._value(values, k) for field, values in fields.items()}
+                for k in range(offsets[index], offsets[index + 1])
+            ]
+        
+        value = column["values"][index]
+        if column_type == "str":
+            return self.strings[value]
+        if column_type == "bool":
+            return bool(value)
+        if column_type == "float":
+            # Nel JSON salvato i NaN diventano null: entrambi indicano un valore mancante
+            return None if value is None or math.isnan(value) else value
+        return value
+    
+    def __deepcopy__(self, memo) -> "ColumnarResult":
+        return ColumnarResult(copy.deepcopy(self.to_compact(), memo))
+    
+    def __reduce__(self):
+        return (ColumnarResult, (self.to_compact(),))
+    
+    def __repr__(self) -> str:
+        return (f"ColumnarResult(module={self.get('module')!r}, status={self.get('status')!r}, "
+                f"proposte={self.proposal_count}, metriche={list(self.columns)})")
+
+def _jsonable(obj: Any) -> Any:
+    """
+    Converte ricorsivamente gli array in liste.
+    
+    Args:
+        obj: Oggetto da convertire.
+    
+    Returns:
+        Any: Oggetto serializzabile in JSON.
+    """
+    if isinstance(obj, array):
+        if obj.typecode == "d":
+            return [None if math.isnan(v) else v for v in obj]
+        return obj.tolist()
+    if isinstance(obj, dict):
+        return {key: _jsonable(value) for key, value in obj.items()}
+    if isinstance(obj, list):
+        return [_jsonable(value) for value in obj]
+    return obj
+
+def is_columnar(result: Any) -> bool:
+    """
+    Verifica se un risultato è in formato colonnare compatto.
+    
+    Args:
+        result: Risultato di un modulo.
+    
+    Returns:
+        bool: True se il risultato è nel formato colonnare.
+    """
+    return isinstance(result, dict) and result.get("format") == COLUMNAR_FORMAT
+
+def as_result(result: Any) -> Any:
+    """
+    Avvolge un risultato compatto in ColumnarResult; gli altri risultati restano invariati.
+    
+    Args:
+        result: Risultato restituito da un modulo.
+    
+    Returns:
+        Any: ColumnarResult o il risultato originale.
+    """
+    if isinstance(result, ColumnarResult) or not is_columnar(result):
+        return result
+    return ColumnarResult(result)
+
+def expand_result(result: Any) -> Any:
+    """
+    Converte un risultato (compatto, colonnare o esteso) nel formato a dizionari esteso.
+    
+    Args:
+        result: Risultato di un modulo.
+    
+    Returns:
+        Any: Risultato nel formato esteso.
+    """
+    result = as_result(result)
+    return result.to_legacy() if isinstance(result, ColumnarResult) else result
+
+def storable_result(result: Any) -> Any:
+    """
+    Prepara un risultato per il salvataggio in una colonna JSON, nel formato compatto se disponibile.
+    
+    Args:
+        result: Risultato di un modulo.
+    
+    Returns:
+        Any: Risultato serializzabile in JSON.
+    """
+    if isinstance(result, ColumnarResult):
+        return result.to_json()
+    if is_columnar(result):
+        return _jsonable(result)
+    return result
+
+def drop_metrics(result: Any, names: Iterable[str]) -> Any:
+    """
+    Restituisce una copia superficiale del risultato senza alcune metriche per proposta.
+    
+    Args:
+        result: Risultato di un modulo (compatto, colonnare o esteso).
+        names: Metriche da rimuovere (es. constraints_check).
+    
+    Returns:
+        Any: Risultato senza le metriche indicate, nello stesso formato.
+    """
+    names = set(names)
+    result = as_result(result)
+    if isinstance(result, ColumnarResult):
+        payload = result.to_compact()
+        payload["columns"] = {name: column for name, column in result.columns.items() if name not in names}
+        return ColumnarResult(payload)
+    if isinstance(result, dict) and isinstance(result.get("results"), dict):
+        trimmed = dict(result)
+        trimmed["results"] = {
+            key: {k: v for k, v in row.items() if k not in names} if isinstance(row, dict) else row
+            for key, row in result["results"].items()
+        }
+        return trimmed
+    return result
+
+def compact_result(result: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+    """
+    Converte un risultato nel formato esteso nel formato compatto (es. per i plugin esterni).
+    
+    Args:
+        result: Risultato nel formato esteso "proposal_1..N".
+    
+    Returns:
+        Optional[Dict[str, Any]]: Risultato compatto, o None se le metriche non hanno tipi uniformi.
+    """
+    results = result.get("results", {})
+    rows = [results.get(f"proposal_{i+1}") for i in range(len(results))]
+    if any(not isinstance(row, dict) for row in rows):
+        return None
+    
+    metadata = {k: v for k, v in result.items() if k != "results"}
+    builder = ResultBuilder(len(rows), **metadata)
+    names = list(rows[0]) if rows else []
+    if any(list(row) != names for row in rows):
+        return None
+    
+    for name in names:
+        values = [row[name] for row in rows]
+        column_type = _infer_type(values)
+        if column_type in _TYPECODES:
+            builder.column(name, column_type, values)
+        elif column_type == "list[str]":
+            builder.list_column(name, values)
+        elif column_type == "records":
+            records = [record for value in values for record in value]
+            fields = list(records[0]) if records else []
+            field_types = {field: _infer_type([r.get(field) for r in records]) for field in fields}
+            if any(list(r) != fields for r in records) or any(t not in _TYPECODES for t in field_types.values()):
+                return None
+            builder.records_column(name, [len(value) for value in values], {
+                field: (field_types[field], [r[field] for r in records]) for field in fields
+            })
+        else:
+            return None
+    return builder.build()
+
+def _infer_type(values: List[Any]) -> Optional[str]:
+    """
+    Deduce il tipo di colonna di una sequenza di valori.
+    
+    Args:
+        values: Valori della colonna.
+    
+    Returns:
+        Optional[str]: Tipo della colonna o None se non rappresentabile.
+    """
+    if all(isinstance(v, bool) for v in values):
+        return "bool"
+    if all(isinstance(v, int) and not isinstance(v, bool) for v in values):
+        return "int"
+    if all(v is None or (isinstance(v, (int, float)) and not isinstance(v, bool)) for v in values):
+        return "float"
+    if all(isinstance(v, str) for v in values):
+        return "str"
+    if all(isinstance(v, list) and all(isinstance(x, str) for x in v) for v in values):
+        return "list[str]"
+    if all(isinstance(v, list) and all(isinstance(x, dict) for x in v) for v in values):
+        return "records"
+    return None
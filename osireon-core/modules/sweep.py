@@ -0,0 +1,286 @@
+"""
+Esplorazione parametrica delle proposte per Osireon.
+Questo file contiene la generazione delle varianti da proposte parametriche e la loro
+valutazione in un'unica esecuzione batch del modulo, con cache dei risultati per variante.
+"""
+import hashlib
+import itertools
+import json
+import logging
+import math
+import os
+import threading
+from array import array
+from collections import OrderedDict
+from typing import Dict, Any, Callable, List, Optional, Tuple
+
+# Configurazione del logging
+logger = logging.getLogger("osireon.modules.sweep")
+
+# Metriche restituite per ogni variante, nell'ordine delle colonne della tabella
+SWEEP_METRICS = ["impact_score", "feasibility", "cost_estimate", "constraints_satisfied"]
+
+def _parameter_range(spec: Dict[str, Any]) -> Tuple[float, float, int]:
+    """
+    Interpreta la specifica di un intervallo senza generarne i valori.
+    
+    Args:
+        spec: {"start": a, "stop": b, "step": s} (estremo superiore incluso).
+    
+    Returns:
+        Tuple[float, float, int]: Inizio, passo e numero di valori.
+    
+    Raises:
+        ValueError: Se gli estremi o il passo non sono validi.
+    """
+    start, stop, step = float(spec["start"]), float(spec["stop"]), float(spec.get("step") or 1.0)
+    if not all(math.isfinite(x) for x in (start, stop, step)):
+        raise ValueError("Gli estremi e il passo di un intervallo devono essere finiti")
+    if step <= 0:
+        raise ValueError("Il passo di un intervallo deve essere positivo")
+    return start, step, max(math.floor((stop - start) / step + 1e-9) + 1, 0)
+
+def parameter_count(spec: Dict[str, Any]) -> int:
+    """
+    Calcola il numero di valori di un parametro senza generarli.
+    
+    Args:
+        spec: {"values": [...]} oppure {"start": a, "stop": b, "step": s} (estremo superiore incluso).
+    
+    Returns:
+        int: Numero di valori del parametro.
+    """
+    if spec.get("values") is not None:
+        return len(spec["values"])
+    return _parameter_range(spec)[2]
+
+def parameter_values(spec: Dict[str, Any]) -> List[float]:
+    """
+    Espande la specifica di un parametro nella lista dei suoi valori.
+    
+    Args:
+        spec: {"values": [...]} oppure {"start": a, "stop": b, "step": s} (estremo superiore incluso).
+    
+    Returns:
+        List[float]: Valori del parametro.
+    """
+    if spec.get("values") is not None:
+        return [float(v) for v in spec["values"]]
+    
+    # Calcolo per indice per evitare l'accumulo di errori di arrotondamento
+    start, step, count = _parameter_range(spec)
+    return [round(start + k * step, 10) for k in range(count)]
+
+def format_value(value: float) -> str:
+    """
+    Formatta un valore numerico per l'inserimento nel testo della proposta (20.0 -> "20").
+    
+    Args:
+        value: Valore da formattare.
+    
+    Returns:
+        str: Valore formattato.
+    """
+    return f"{value:g}"
+
+def parameter_intensity(parameters: Dict[str, array], n: int, scale: float = 10.0) -> List[float]:
+    """
+    Calcola l'intensità di ogni variante come media dei parametri saturati in [0, 1).
+    Dipende solo dai valori della variante, così il risultato può essere riusato tra griglie diverse.
+    
+    Args:
+        parameters: Colonne dei parametri, un valore per variante.
+        n: Numero di varianti.
+        scale: Valore del parametro a cui l'intensità vale 0.5.
+    
+    Returns:
+        List[float]: Intensità per variante.
+    """
+    if not parameters:
+        return [0.5] * n
+    
+    total = [0.0] * n
+    for values in parameters.values():
+        total = [t + abs(v) / (abs(v) + scale) for t, v in zip(total, values)]
+    count = len(parameters)
+    return [t / count for t in total]
+
+class ParameterSweep:
+    """
+    Generatore e valutatore di griglie di varianti di proposte parametriche.
+    
+    Le varianti vengono valutate con un'unica chiamata alla funzione run_batch del modulo,
+    che riceve i parametri come colonne array('d'). I risultati per variante sono memorizzati
+    in una cache LRU condivisa tra richieste, quindi griglie sovrapposte non ricalcolano i punti comuni.
+    """
+    
+    def __init__(self, max_points: Optional[int] = None, cache_size: Optional[int] = None):
+        """
+        Inizializza il generatore.
+        
+        Args:
+            max_points: Numero massimo di punti per griglia.
+            cache_size: Numero massimo di varianti memorizzate nella cache.
+        """
+        self.max_points = max_points or int(os.getenv("SWEEP_MAX_POINTS", "100000"))
+        self.cache_size = cache_size or int(os.getenv("SWEEP_CACHE_SIZE", "200000"))
+        self._cache: "OrderedDict[Tuple[str, str, Tuple[float, ...]], Tuple[float, ...]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        logger.info(f"ParameterSweep inizializzato con limite di {self.max_points} punti")
+    
+    def expand(self, templates: List[str], parameters: Dict[str, Dict[str, Any]]) -> Dict[str, Any]:
+        """
+        Genera tutte le varianti come prodotto cartesiano dei valori dei parametri.
+        
+        Args:
+            templates: Proposte parametriche, es. "Flat tax al {rate}%".
+            parameters: Specifica dei valori di ogni parametro.
+        
+        Returns:
+            Dict[str, Any]: Testi delle varianti, indice del template e colonne dei parametri.
+        
+        Raises:
+            ValueError: Se la griglia supera il numero massimo di punti o un template è incompleto.
+        """
+        names = sorted(parameters)
+        
+        # La dimensione della griglia viene verificata prima di generare i valori dei parametri
+        points = len(templates)
+        for name in names:
+            points *= parameter_count(parameters[name])
+        if points > self.max_points:
+            raise ValueError(f"La griglia contiene {points} punti, oltre il limite di {self.max_points}")
+        values = [parameter_values(parameters[name]) for name in names]
+        
+        proposals: List[str] = []
+        template_index = array("l")
+        columns = {name: array("d") for name in names}
+        
+        for t, template in enumerate(templates):
+            for combo in itertools.product(*values):
+                try:
+                    text = template.format(**{name: format_value(v) for name, v in zip(names, combo)})
+                except KeyError as e:
+                    raise ValueError(f"Parametro {e} non definito per il template '{template}'")
+                proposals.append(text)
+                template_index.append(t)
+                for name, v in zip(names, combo):
+                    columns[name].append(v)
+        
+        return {"proposals": proposals, "template_index": template_index, "parameters": columns}
+    
+    def run(self, spec, evaluate: Callable[[Dict[str, Any]], Dict[str, Any]], input_data: Dict[str, Any],
+            templates: List[str], parameters: Dict[str, Dict[str, Any]]) -> Dict[str, Any]:
+        """
+        Valuta tutte le varianti della griglia con una sola esecuzione batch del modulo.
+        
+        Args:
+            spec: Specifica del modulo (ModuleSpec).
+            evaluate: Funzione che esegue run_batch del modulo sui dati forniti e ne restituisce le colonne.
+            input_data: Dati di input comuni (paese, dominio, vincoli).
+            templates: Proposte parametriche.
+            parameters: Specifica dei valori di ogni parametro.
+        
+        Returns:
+            Dict[str, Any]: Tabella compatta con una riga per punto della griglia.
+        """
+        grid = self.expand(templates, parameters)
+        proposals = grid["proposals"]
+        names = sorted(grid["parameters"])
+        
+        # Le varianti condividono paese e vincoli: fanno parte della chiave di cache
+        context = hashlib.sha256(json.dumps({
+            "module": spec.name,
+            "version": spec.version,
+            "country": input_data.get("country", ""),
+            "constraints": input_data.get("constraints", []),
+            "parameters": names
+        }, sort_keys=True, ensure_ascii=False).encode("utf-8")).hexdigest()
+        
+        # Ogni variante è identificata dal testo e dai valori dei parametri
+        keys = [
+            (context, text, tuple(grid["parameters"][name][i] for name in names))
+            for i, text in enumerate(proposals)
+        ]
+        
+        rows: List[Optional[Tuple[float, ...]]] = [None] * len(proposals)
+        missing: List[int] = []
+        with self._lock:
+            for i, key in enumerate(keys):
+                row = self._cache.get(key)
+                if row is None:
+                    missing.append(i)
+                else:
+                    self._cache.move_to_end(key)
+                    rows[i] = row
+            self.hits += len(proposals) - len(missing)
+            self.misses += len(missing)
+        
+        # Una sola esecuzione del modulo per tutte le varianti non in cache (duplicati valutati una volta)
+        unique: Dict[Tuple[str, str, Tuple[float, ...]], int] = {}
+        for i in missing:
+            unique.setdefault(keys[i], i)
+        if unique:
+            batch_indices = list(unique.values())
+            batch_input = dict(input_data)
+            batch_input["proposals"] = [proposals[i] for i in batch_indices]
+            batch_input["parameters"] = {
+                name: array("d", (grid["parameters"][name][i] for i in batch_indices)) for name in names
+            }
+            columns = evaluate(batch_input)
+            
+            computed = {
+                keys[i]: tuple(float(columns[metric][k]) for metric in SWEEP_METRICS)
+                for k, i in enumerate(batch_indices)
+            }
+            for i in missing:
+                rows[i] = computed[keys[i]]
+            
+            with self._lock:
+                for key, row in computed.items():
+                    self._cache[key] = row
+                while len(self._cache) > self.cache_size:
+                    self._cache.popitem(last=False)
+        
+        logger.info(f"Esplorazione di {len(proposals)} varianti: {len(unique)} valutate, {len(proposals) - len(missing)} dalla cache")
+        
+        return {
+            "module": spec.name,
+            "module_version": spec.version,
+            "points": len(proposals),
+            "evaluated_points": len(unique),
+            "cached_points": len(proposals) - len(missing),
+            "templates": templates,
+            "columns": ["template"] + names + SWEEP_METRICS,
+            "rows": [
+                [grid["template_index"][i]] + [grid["parameters"][name][i] for name in names] + list(rows[i])
+                for i in range(len(proposals))
+            ]
+        }
+
+def columns_from_results(module_result: Dict[str, Any], n: int) -> Dict[str, List[float]]:
+    """
+    Estrae le colonne delle metriche dal risultato di run, per i moduli senza run_batch.
+    
+    Args:
+        module_result: Risultato di run sulle varianti.
+        n: Numero di varianti.
+    
+    Returns:
+        Dict[str, List[float]]: Colonne delle metriche per variante.
+    """
+    results = module_result.get("results", {})
+    proposal_results = [results.get(f"proposal_{i+1}", {}) for i in range(n)]
+    return {
+        "impact_score": [r.get("impact_score", r.get("social_impact_score", 0.5)) for r in proposal_results],
+        "feasibility": [r.get("feasibility", r.get("acceptance_rate", 0.5)) for r in proposal_results],
+        "cost_estimate": [float(r.get("cost_estimate", 0)) for r in proposal_results],
+        "constraints_satisfied": [
+            float(sum(1 for c in r.get("constraints_check", []) if c.get("satisfied", False))) for r in proposal_results
+        ]
+    }
+
+# Istanza singleton del generatore di varianti
+parameter_sweep = ParameterSweep()
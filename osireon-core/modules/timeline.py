@@ -0,0 +1,315 @@
+"""
+Motore di simulazione a passi temporali per Osireon.
+Questo file contiene il motore che fa evolvere lo stato dei moduli anno per anno (o trimestre
+per trimestre) con checkpoint che permettono di riprendere o diramare uno scenario.
+"""
+import hashlib
+import json
+import logging
+import os
+import threading
+from array import array
+from collections import OrderedDict
+from typing import Dict, Any, List, Optional, Tuple
+
+from src.modules.results import as_result
+
+# Configurazione del logging
+logger = logging.getLogger("osireon.modules.timeline")
+
+# Stato di uno scenario: una colonna array('d') per variabile, un elemento per proposta
+State = Dict[str, array]
+
+def to_state(columns: Dict[str, Any]) -> State:
+    """
+    Converte le colonne restituite da un modulo in uno stato array-backed.
+    
+    Args:
+        columns: Dizionario variabile -> sequenza di valori per proposta.
+    
+    Returns:
+        State: Stato con una colonna array('d') per variabile.
+    """
+    return {name: values if isinstance(values, array) and values.typecode == "d" else array("d", values)
+            for name, values in columns.items()}
+
+def state_nbytes(state: State) -> int:
+    """
+    Calcola la memoria occupata dalle colonne di uno stato.
+    
+    Args:
+        state: Stato da misurare.
+    
+    Returns:
+        int: Dimensione in byte.
+    """
+    return sum(values.itemsize * len(values) for values in state.values())
+
+class Scenario:
+    """
+    Descrizione di uno scenario: modulo, input, parametri ed eventuale scenario padre.
+    """
+    
+    def __init__(self, scenario_id: str, module_name: str, steps_per_year: int, params: Dict[str, float],
+                 inputs: str, parent: Optional["Scenario"] = None, branch_step: int = 0):
+        """
+        Inizializza lo scenario.
+        
+        Args:
+            scenario_id: Identificativo deterministico dello scenario.
+            module_name: Nome del modulo che definisce la dinamica.
+            steps_per_year: Numero di passi per anno (1 annuale, 4 trimestrale).
+            params: Parametri della dinamica.
+            inputs: Impronta di modulo, proposte, vincoli e paese dello scenario.
+            parent: Scenario da cui questo è stato diramato.
+            branch_step: Passo a partire dal quale lo scenario diverge dal padre.
+        """
+        self.id = scenario_id
+        self.module_name = module_name
+        self.steps_per_year = steps_per_year
+        self.params = params
+        self.inputs = inputs
+        # Riferimento diretto al padre: i rami restano validi anche se il padre esce dal registro
+        self.parent = parent
+        self.parent_id = parent.id if parent is not None else None
+        self.branch_step = branch_step
+
+class TimeSteppedEngine:
+    """
+    Motore che fa avanzare lo stato dei moduli lungo un orizzonte temporale.
+    
+    Un modulo partecipa esponendo due funzioni oltre a run:
+      - init_state(input_data, module_result) -> Dict[str, sequenza]: stato al passo 0;
+      - step(state, t, dt, params) -> Dict[str, sequenza]: variabili aggiornate al passo successivo.
+    step non deve modificare le colonne ricevute: i checkpoint condividono le colonne invariate.
+    I parametri predefiniti sono dichiarati in MODULE_INFO["dynamics"]["params"].
+    """
+    
+    def __init__(self, max_checkpoint_mb: Optional[float] = None, max_scenarios: Optional[int] = None):
+        """
+        Inizializza il motore.
+        
+        Args:
+            max_checkpoint_mb: Memoria massima per i checkpoint in MB (LRU oltre il limite).
+            max_scenarios: Numero massimo di scenari registrati (LRU oltre il limite).
+        """
+        self.max_checkpoint_bytes = int((max_checkpoint_mb or float(os.getenv("TIMELINE_CHECKPOINT_MB", "256"))) * 1024 * 1024)
+        self.max_scenarios = max(max_scenarios or int(os.getenv("TIMELINE_MAX_SCENARIOS", "1024")), 1)
+        self._checkpoints: "OrderedDict[Tuple[str, int], State]" = OrderedDict()
+        self._checkpoint_bytes = 0
+        self._scenarios: "OrderedDict[str, Scenario]" = OrderedDict()
+        self._lock = threading.Lock()
+        logger.info(f"TimeSteppedEngine inizializzato con {self.max_checkpoint_bytes // (1024 * 1024)} MB per i checkpoint")
+    
+    def simulate(self, spec, input_data: Dict[str, Any], horizon_years: int, steps_per_year: int = 1,
+                 params: Optional[Dict[str, float]] = None, parent_id: Optional[str] = None,
+                 branch_year: Optional[float] = None) -> Dict[str, Any]:
+        """
+        Simula uno scenario fino all'orizzonte richiesto, riusando i checkpoint disponibili.
+        
+        Args:
+            spec: Specifica del modulo (ModuleSpec) che definisce la dinamica.
+            input_data: Dati di input della simulazione (proposte e vincoli).
+            horizon_years: Orizzonte della simulazione in anni.
+            steps_per_year: Numero di passi per anno.
+            params: Parametri della dinamica (sovrascrivono quelli predefiniti o del padre).
+            parent_id: Scenario da cui diramare.
+            branch_year: Anno da cui il nuovo scenario diverge dal padre.
+        
+        Returns:
+            Dict[str, Any]: Identificativo dello scenario, anni e traiettorie per variabile.
+        """
+        module = spec.module
+        if module is None or not callable(getattr(module, "step", None)) or not callable(getattr(module, "init_state", None)):
+            return {
+                "status": "error",
+                "message": f"Il modulo {spec.name} non supporta la simulazione temporale"
+            }
+        
+        scenario = self._scenario(spec, input_data, steps_per_year, params or {}, parent_id, branch_year)
+        if isinstance(scenario, dict):
+            return scenario
+        
+        total_steps = int(round(horizon_years * steps_per_year))
+        dt = 1.0 / steps_per_year
+        
+        # Recupera gli stati già calcolati (anche dagli scenari padre) e riparte dall'ultimo
+        trajectory = self._cached_prefix(scenario, total_steps)
+        cached_steps = len(trajectory)
+        
+        if not trajectory:
+            module_result = as_result(spec.run(input_data))
+            state = to_state(module.init_state(input_data, module_result))
+            self._store(self._owner(scenario, 0).id, 0, state)
+            trajectory.append(state)
+        
+        state = trajectory[-1]
+        for step in range(len(trajectory), total_steps + 1):
+            # I passi condivisi con il padre usano i parametri (e i checkpoint) del padre
+            owner = self._owner(scenario, step)
+            updates = module.step(state, (step - 1) * dt, dt, owner.params)
+            next_state = dict(state)
+            next_state.update(to_state(updates))
+            self._store(owner.id, step, next_state)
+            trajectory.append(next_state)
+            state = next_state
+        
+        logger.info(f"Scenario {scenario.id[:12]} simulato per {total_steps} passi ({cached_steps} passi da checkpoint)")
+        
+        return {
+            "scenario_id": scenario.id,
+            "parent_id": scenario.parent_id,
+            "module": spec.name,
+            "module_version": spec.version,
+            "steps_per_year": steps_per_year,
+            "params": scenario.params,
+            "cached_steps": cached_steps,
+            "times": [step * dt for step in range(total_steps + 1)],
+            "trajectory": trajectory
+        }
+    
+    def _scenario(self, spec, input_data: Dict[str, Any], steps_per_year: int, params: Dict[str, float],
+                  parent_id: Optional[str], branch_year: Optional[float]):
+        """
+        Costruisce (o recupera) lo scenario corrispondente alla richiesta.
+        
+        Args:
+            spec: Specifica del modulo.
+            input_data: Dati di input della simulazione.
+            steps_per_year: Numero di passi per anno.
+            params: Parametri richiesti.
+            parent_id: Scenario da cui diramare.
+            branch_year: Anno da cui il nuovo scenario diverge dal padre.
+        
+        Returns:
+            Scenario o Dict[str, Any]: Scenario, oppure un risultato di errore.
+        """
+        defaults = ((getattr(spec.module, "MODULE_INFO", {}) or {}).get("dynamics", {}) or {}).get("params", {})
+        branch_step = 0
+        parent = None
+        
+        # I passi condivisi con il padre valgono solo per lo stesso modulo e gli stessi input
+        inputs = hashlib.sha256(json.dumps({
+            "module": spec.name,
+            "version": spec.version,
+            "proposals": input_data.get("proposals", []),
+            "constraints": input_data.get("constraints", []),
+            "country": input_data.get("country", "")
+        }, sort_keys=True, ensure_ascii=False).encode("utf-8")).hexdigest()
+        
+        if parent_id is not None:
+            with self._lock:
+                parent = self._scenarios.get(parent_id)
+                if parent is not None:
+                    self._scenarios.move_to_end(parent_id)
+            if parent is None:
+                return {"status": "error", "message": f"Scenario {parent_id} non trovato"}
+            if parent.inputs != inputs:
+                return {
+                    "status": "error",
+                    "message": f"Lo scenario diramato deve usare modulo, proposte, vincoli e paese dello scenario {parent_id}"
+                }
+            if parent.steps_per_year != steps_per_year:
+                return {"status": "error", "message": "Lo scenario diramato deve usare la stessa risoluzione temporale del padre"}
+            defaults = parent.params
+            branch_step = int(round((branch_year or 0) * steps_per_year))
+        
+        merged = dict(defaults)
+        merged.update(params)
+        
+        key = json.dumps({
+            "inputs": inputs,
+            "steps_per_year": steps_per_year,
+            "params": merged,
+            "parent": parent_id,
+            "branch_step": branch_step
+        }, sort_keys=True, ensure_ascii=False)
+        scenario_id = hashlib.sha256(key.encode("utf-8")).hexdigest()
+        
+        with self._lock:
+            scenario = self._scenarios.get(scenario_id)
+            if scenario is None:
+                scenario = Scenario(scenario_id, spec.name, steps_per_year, merged, inputs, parent, branch_step)
+                self._scenarios[scenario_id] = scenario
+                while len(self._scenarios) > self.max_scenarios:
+                    self._scenarios.popitem(last=False)
+            else:
+                self._scenarios.move_to_end(scenario_id)
+        return scenario
+    
+    def _owner(self, scenario: Scenario, step: int) -> Scenario:
+        """
+        Individua lo scenario che possiede un passo: i passi fino al punto di diramazione
+        appartengono al padre e sono condivisi da tutti i suoi rami.
+        
+        Args:
+            scenario: Scenario di partenza.
+            step: Passo richiesto.
+        
+        Returns:
+            Scenario: Scenario proprietario del passo.
+        """
+        while scenario.parent is not None and step <= scenario.branch_step:
+            scenario = scenario.parent
+        return scenario
+    
+    def _lookup(self, scenario: Scenario, step: int) -> Optional[State]:
+        """
+        Cerca il checkpoint di un passo, risalendo allo scenario padre per i passi condivisi.
+        
+        Args:
+            scenario: Scenario di cui cercare il checkpoint.
+            step: Passo richiesto.
+        
+        Returns:
+            Optional[State]: Stato al passo richiesto o None se non disponibile.
+        """
+        key = (self._owner(scenario, step).id, step)
+        with self._lock:
+            state = self._checkpoints.get(key)
+            if state is not None:
+                self._checkpoints.move_to_end(key)
+        return state
+    
+    def _cached_prefix(self, scenario: Scenario, total_steps: int) -> List[State]:
+        """
+        Raccoglie la sequenza contigua di stati già calcolati a partire dal passo 0.
+        
+        Args:
+            scenario: Scenario da riprendere.
+            total_steps: Numero totale di passi richiesti.
+        
+        Returns:
+            List[State]: Stati dal passo 0 fino all'ultimo checkpoint contiguo.
+        """
+        prefix: List[State] = []
+        for step in range(total_steps + 1):
+            state = self._lookup(scenario, step)
+            if state is None:
+                break
+            prefix.append(state)
+        return prefix
+    
+    def _store(self, scenario_id: str, step: int, state: State) -> None:
+        """
+        Memorizza il checkpoint di un passo, liberando i più vecchi oltre il limite di memoria.
+        
+        Args:
+            scenario_id: Scenario a cui appartiene il checkpoint.
+            step: Passo del checkpoint.
+            state: Stato da memorizzare (le colonne non vengono più modificate dopo il passo).
+        """
+        nbytes = state_nbytes(state)
+        with self._lock:
+            previous = self._checkpoints.pop((scenario_id, step), None)
+            if previous is not None:
+                self._checkpoint_bytes -= state_nbytes(previous)
+            self._checkpoints[(scenario_id, step)] = state
+            self._checkpoint_bytes += nbytes
+            
+            while self._checkpoint_bytes > self.max_checkpoint_bytes and len(self._checkpoints) > 1:
+                _, evicted = self._checkpoints.popitem(last=False)
+                self._checkpoint_bytes -= state_nbytes(evicted)
+
+# Istanza singleton del motore temporale
+timeline_engine = TimeSteppedEngine()
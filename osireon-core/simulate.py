@@ -2,15 +2,24 @@
 Implementazione dell'endpoint /simulate per Osireon.
 Questo file contiene la logica completa dell'endpoint di simulazione.
 """
+import asyncio
+import json
 import logging
-from fastapi import APIRouter, HTTPException, Depends, BackgroundTasks
-from typing import Dict, Any, List
+from fastapi import APIRouter, HTTPException, Depends, BackgroundTasks, Query, WebSocket, WebSocketDisconnect
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import StreamingResponse
+from pydantic import ValidationError
+from typing import AsyncIterator, Callable, Dict, Any, List, Optional
 
-from src.utils.models import SimulationRequest, SimulationResponse, ModuleResult, AgentAnalysis, EthicsCheck
+from src.utils.models import SimulationRequest, SimulationResponse, ModuleResult, AgentAnalysis, EthicsCheck, FanOutRequest, SimulationTarget, TimelineRequest, SweepRequest, IncrementalRequest, PortfolioRequest
 from src.modules.loader import module_loader
-from src.agents import run_agent_analysis
-from src.ethics.validator import ethics_validator
+from src.modules.incremental import CONSTRAINTS_COLUMN
+from src.modules.results import drop_metrics, expand_result
+from src.agents import run_agent_analysis_async, agent_manager
+from src.ethics.validator import ethics_validator, VALIDATED
+from src.ethics.registry import country_code
 from src.db.database import db_manager
+from src.utils.detail import DetailSelection, OMITTED_KEY, RULE_CHECKS, CONSTRAINT_DETAILS
 
 # Configurazione del logging
 logger = logging.getLogger("osireon.simulate")
@@ -23,6 +32,9 @@ async def simulate(request: SimulationRequest, background_tasks: BackgroundTasks
     """
     Endpoint principale per eseguire una simulazione di policy.
     
+    Le sezioni di dettaglio non richieste (detail/fields) non vengono calcolate né salvate;
+    possono essere ottenute in seguito da GET /simulate/{simulation_id}.
+    
     Args:
         request: Richiesta di simulazione contenente paese, dominio, proposte e vincoli.
         background_tasks: Gestore delle attività in background.
@@ -32,6 +44,156 @@ async def simulate(request: SimulationRequest, background_tasks: BackgroundTasks
     """
     logger.info(f"Ricevuta richiesta di simulazione: {request.dict()}")
     
+    selection = _detail_selection(request.detail, request.fields)
+    
+    try:
+        return await _run_simulation(request, selection)
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Errore durante la simulazione: {str(e)}")
+
+@router.post("/simulate/stream")
+async def simulate_stream(request: SimulationRequest) -> StreamingResponse:
+    """
+    Esegue una simulazione inviando gli eventi man mano che avvengono (Server-Sent Events).
+    
+    Gli eventi sono, nell'ordine: "started" (simulation_id), "module" (risultato del modulo),
+    "partial" (frammenti delle analisi narrative degli agenti LLM), "completion" (fine di una
+    risposta LLM), "agent" (analisi di un agente conclusa), "ethics" (controllo etico) e infine
+    "completed", con la stessa risposta di POST /simulate, oppure "error". Le analisi e i testi
+    completi delle risposte LLM vengono salvati come in POST /simulate.
+    
+    Args:
+        request: Richiesta di simulazione contenente paese, dominio, proposte e vincoli.
+        
+    Returns:
+        StreamingResponse: Flusso text/event-stream degli eventi.
+    """
+    logger.info(f"Ricevuta richiesta di simulazione in streaming: {request.dict()}")
+    
+    selection = _detail_selection(request.detail, request.fields)
+    
+    async def events() -> AsyncIterator[str]:
+        async for event in _simulation_events(request, selection):
+            yield f"event: {event['type']}\ndata: {json.dumps(jsonable_encoder(event), ensure_ascii=False)}\n\n"
+    
+    # Le intestazioni evitano che proxy e client trattengano gli eventi in un buffer
+    return StreamingResponse(events(), media_type="text/event-stream",
+                             headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
+@router.websocket("/simulate/ws")
+async def simulate_websocket(websocket: WebSocket) -> None:
+    """
+    Esegue simulazioni su una connessione WebSocket.
+    
+    Il client invia una richiesta di simulazione in JSON (come per POST /simulate) e riceve gli
+    stessi eventi di POST /simulate/stream come messaggi JSON con il campo "type"; la connessione
+    resta aperta per altre richieste. Se il client si disconnette, la simulazione in corso viene annullata.
+    
+    Args:
+        websocket: Connessione WebSocket.
+    """
+    await websocket.accept()
+    try:
+        while True:
+            payload = await websocket.receive_json()
+            try:
+                request = SimulationRequest(**payload)
+                selection = _detail_selection(request.detail, request.fields)
+            except ValidationError as e:
+                await websocket.send_json({"type": "error", "status_code": 422, "detail": e.errors()})
+                continue
+            except HTTPException as e:
+                await websocket.send_json({"type": "error", "status_code": e.status_code, "detail": e.detail})
+                continue
+            
+            logger.info(f"Ricevuta richiesta di simulazione via WebSocket: {request.dict()}")
+            async for event in _simulation_events(request, selection):
+                await websocket.send_json(jsonable_encoder(event))
+    except WebSocketDisconnect:
+        logger.info("Connessione WebSocket di simulazione chiusa dal client")
+
+async def _simulation_events(request: SimulationRequest, selection: DetailSelection) -> AsyncIterator[Dict[str, Any]]:
+    """
+    Esegue una simulazione restituendo i suoi eventi man mano che vengono pubblicati.
+    
+    Se il consumatore smette di leggere (es. client disconnesso), la simulazione viene annullata
+    e il suo stato nel database diventa "cancelled".
+    
+    Args:
+        request: Richiesta di simulazione.
+        selection: Sezioni di dettaglio richieste.
+        
+    Yields:
+        Dict[str, Any]: Eventi della simulazione; l'ultimo è "completed" oppure "error".
+    """
+    events: asyncio.Queue = asyncio.Queue()
+    started: Dict[str, Any] = {}
+    
+    def publish(event: Dict[str, Any]) -> None:
+        if event["type"] == "started":
+            started.update(event)
+        if event["type"] == "completion":
+            # Prompt e testo completo restano nel server (log LLM): il client ha già ricevuto i frammenti
+            event = {key: value for key, value in event.items() if key not in ("prompt_text", "text")}
+        events.put_nowait(event)
+    
+    async def produce() -> None:
+        try:
+            response = await _run_simulation(request, selection, publish)
+            events.put_nowait({"type": "completed", "response": response})
+        except asyncio.CancelledError:
+            raise
+        except HTTPException as e:
+            events.put_nowait({"type": "error", "status_code": e.status_code, "detail": e.detail})
+        except Exception as e:
+            events.put_nowait({"type": "error", "status_code": 500, "detail": f"Errore durante la simulazione: {str(e)}"})
+        finally:
+            events.put_nowait(None)
+    
+    task = asyncio.ensure_future(produce())
+    try:
+        while True:
+            event = await events.get()
+            if event is None:
+                break
+            yield event
+    finally:
+        if not task.done():
+            task.cancel()
+            # Lo stato viene aggiornato prima di attendere: il consumatore può essere già in annullamento
+            if started.get("simulation_id"):
+                logger.warning(f"Simulazione {started['simulation_id']} annullata: il client ha interrotto lo streaming")
+                db_manager.update_simulation_status(started["simulation_id"], "cancelled")
+            await asyncio.gather(task, return_exceptions=True)
+
+async def _run_simulation(request: SimulationRequest, selection: DetailSelection,
+                          publish: Optional[Callable[[Dict[str, Any]], None]] = None) -> Dict[str, Any]:
+    """
+    Esegue una simulazione completa: modulo, agenti e validazione etica, con salvataggio nel database.
+    
+    Le risposte LLM degli agenti vengono salvate nei log LLM della simulazione con il testo completo.
+    
+    Args:
+        request: Richiesta di simulazione.
+        selection: Sezioni di dettaglio richieste.
+        publish: Funzione che riceve gli eventi della simulazione man mano che avvengono, o None.
+        
+    Returns:
+        Dict[str, Any]: Risultato della simulazione, analisi degli agenti e controllo etico.
+        
+    Raises:
+        HTTPException: Se la simulazione non può essere creata nel database.
+    """
+    completions: List[Dict[str, Any]] = []
+    
+    def emit(event: Dict[str, Any]) -> None:
+        if event["type"] == "completion":
+            completions.append(event)
+        if publish is not None:
+            publish(event)
+    
     try:
         # Inizializza il database se necessario
         if not db_manager.initialized:
@@ -50,6 +212,7 @@ async def simulate(request: SimulationRequest, background_tasks: BackgroundTasks
         
         # Aggiorna lo stato della simulazione
         db_manager.update_simulation_status(simulation_id, "processing")
+        emit({"type": "started", "simulation_id": simulation_id})
         
         # Prepara i dati di input per il modulo
         input_data = {
@@ -61,26 +224,33 @@ async def simulate(request: SimulationRequest, background_tasks: BackgroundTasks
         
         # Esegui il modulo appropriato
         module_name = module_loader.get_module_path(request.country, request.domain)
-        module_result = module_loader.run_module(request.country, request.domain, input_data)
+        module_result = await module_loader.run_module_async(request.country, request.domain, input_data)
         
-        # Salva il risultato del modulo nel database
-        db_manager.save_module_result(simulation_id, module_name, module_result)
+        # Salva il risultato del modulo nel database, senza le sezioni di dettaglio non richieste
+        stored_result = _select_module_sections(module_result, selection)
+        db_manager.save_module_result(simulation_id, module_name, stored_result)
+        emit({"type": "module", "module_name": module_name, "result": stored_result})
         
-        # Esegui l'analisi con gli agenti
-        agent_results = run_agent_analysis(input_data, module_result)
+        # Esegui l'analisi con gli agenti (sul risultato completo del modulo)
+        agent_results = await run_agent_analysis_async(input_data, module_result, selection, emit)
         
-        # Salva le analisi degli agenti nel database
+        # Salva le analisi degli agenti e i testi completi delle risposte LLM nel database
         for agent_name, analysis in agent_results.items():
             db_manager.save_agent_analysis(simulation_id, agent_name, analysis)
+        for completion in completions:
+            db_manager.save_llm_log(simulation_id, completion["provider"], completion["model"],
+                                    completion["prompt_text"], completion["text"])
         
         # Esegui la validazione etica
-        ethics_result = ethics_validator.validate(request.proposals, request.domain)
+        ethics_result = ethics_validator.validate(request.proposals, request.domain, selection.includes(RULE_CHECKS),
+                                                  request.country)
         
         # Salva il risultato del controllo etico nel database
         db_manager.save_ethics_check(
             simulation_id, 
             ethics_result["passed"], 
-            ethics_result.get("violations", [])
+            ethics_result.get("violations", []),
+            ethics_result.get("ruleset")
         )
         
         # Aggiorna lo stato della simulazione
@@ -89,7 +259,7 @@ async def simulate(request: SimulationRequest, background_tasks: BackgroundTasks
         # Prepara la risposta
         module_result_model = ModuleResult(
             module_name=module_name,
-            result=module_result
+            result=stored_result
         )
         
         agent_analyses_models = [
@@ -102,15 +272,19 @@ async def simulate(request: SimulationRequest, background_tasks: BackgroundTasks
         
         ethics_check_model = EthicsCheck(
             passed=ethics_result["passed"],
-            violations=ethics_result.get("violations", None)
+            violations=ethics_result.get("violations", None),
+            ruleset=ethics_result.get("ruleset"),
+            status=ethics_result.get("status", VALIDATED)
         )
+        emit({"type": "ethics", "ethics_check": ethics_check_model.dict()})
         
         # Costruisci la risposta completa
         response = {
             "simulation_id": simulation_id,
             "result": module_result_model.dict(),
             "agent_analyses": [aa.dict() for aa in agent_analyses_models],
-            "ethics_check": ethics_check_model.dict()
+            "ethics_check": ethics_check_model.dict(),
+            "detail": selection.to_dict()
         }
         
         logger.info(f"Simulazione completata con successo: {response}")
@@ -120,25 +294,407 @@ async def simulate(request: SimulationRequest, background_tasks: BackgroundTasks
         logger.error(f"Errore durante la simulazione: {str(e)}")
         
         # Se abbiamo un ID di simulazione, aggiorna lo stato a "error"
-        if 'simulation_id' in locals():
+        if 'simulation_id' in locals() and simulation_id:
             db_manager.update_simulation_status(simulation_id, "error")
         
-        raise HTTPException(status_code=500, detail=f"Errore durante la simulazione: {str(e)}")
+        raise
+
+@router.post("/simulate/fanout")
+async def simulate_fanout(request: FanOutRequest) -> Dict[str, Any]:
+    """
+    Esegue la stessa simulazione su più target (paese, dominio) in parallelo.
+    
+    I target che risolvono allo stesso modulo vengono eseguiti una sola volta, e la
+    validazione etica viene eseguita una sola volta per paese e dominio.
+    
+    Args:
+        request: Richiesta contenente i target, le proposte e i vincoli.
+        
+    Returns:
+        Dict[str, Any]: Risultati per target e matrice di confronto proposte x target.
+    """
+    logger.info(f"Ricevuta richiesta di simulazione multipla: {request.dict()}")
+    
+    try:
+        # Inizializza il database se necessario
+        if not db_manager.initialized:
+            db_manager.initialize()
+        
+        loop = asyncio.get_running_loop()
+        
+        # Raggruppa i target per modulo: target equivalenti condividono modulo e agenti
+        modules: Dict[str, SimulationTarget] = {}
+        for target in request.targets:
+            modules.setdefault(module_loader.get_module_path(target.country, target.domain), target)
+        
+        # Raggruppa i target per paese e dominio: la validazione etica dipende dal ruleset del paese, da proposte e dominio
+        domains: Dict[str, SimulationTarget] = {}
+        for target in request.targets:
+            domains.setdefault(_ethics_key(target.country, target.domain), target)
+        
+        async def run_target(target: SimulationTarget) -> Dict[str, Any]:
+            input_data = {
+                "country": target.country,
+                "domain": target.domain,
+                "proposals": request.proposals,
+                "constraints": request.constraints
+            }
+            module_result = await module_loader.run_module_async(target.country, target.domain, input_data)
+            agent_results = await run_agent_analysis_async(input_data, module_result)
+            return {"module_result": module_result, "agent_results": agent_results}
+        
+        # Esegui tutti i moduli e le validazioni etiche in parallelo
+        module_names = list(modules)
+        domain_keys = list(domains)
+        outputs = await asyncio.gather(
+            *[run_target(modules[name]) for name in module_names],
+            *[loop.run_in_executor(None, ethics_validator.validate, request.proposals, domains[key].domain, True,
+                                   domains[key].country) for key in domain_keys]
+        )
+        module_outputs = dict(zip(module_names, outputs[:len(module_names)]))
+        ethics_results = dict(zip(domain_keys, outputs[len(module_names):]))
+        
+        # Salva e componi i risultati per ogni target richiesto
+        targets = []
+        for target in request.targets:
+            module_name = module_loader.get_module_path(target.country, target.domain)
+            output = module_outputs[module_name]
+            ethics_result = ethics_results[_ethics_key(target.country, target.domain)]
+            
+            simulation_id = _save_target(target, request, module_name, output, ethics_result)
+            
+            targets.append({
+                "country": target.country,
+                "domain": target.domain,
+                "module_name": module_name,
+                "simulation_id": simulation_id,
+                "result": output["module_result"],
+                "agent_analyses": [
+                    AgentAnalysis(
+                        agent_name=agent_name,
+                        analysis=analysis.get("summary", "") + "\n\n" + analysis.get("conclusion", "")
+                    ).dict()
+                    for agent_name, analysis in output["agent_results"].items()
+                ],
+                "ethics_check": EthicsCheck(
+                    passed=ethics_result["passed"],
+                    violations=ethics_result.get("violations", None),
+                    ruleset=ethics_result.get("ruleset"),
+                    status=ethics_result.get("status", VALIDATED)
+                ).dict()
+            })
+        
+        response = {
+            "targets": targets,
+            "comparison": _build_comparison(request.proposals, targets, ethics_results)
+        }
+        
+        logger.info(f"Simulazione multipla completata su {len(targets)} target ({len(module_names)} moduli eseguiti)")
+        return response
+        
+    except Exception as e:
+        logger.error(f"Errore durante la simulazione multipla: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"Errore durante la simulazione multipla: {str(e)}")
+
+def _save_target(target: SimulationTarget, request: FanOutRequest, module_name: str,
+                 output: Dict[str, Any], ethics_result: Dict[str, Any]) -> Any:
+    """
+    Salva nel database la simulazione di un singolo target.
+    
+    Args:
+        target: Target (paese, dominio) della simulazione.
+        request: Richiesta di simulazione multipla.
+        module_name: Nome del modulo eseguito.
+        output: Risultato del modulo e analisi degli agenti.
+        ethics_result: Risultato della validazione etica.
+        
+    Returns:
+        Any: ID della simulazione creata o None in caso di errore.
+    """
+    simulation_id = db_manager.create_simulation(
+        country=target.country,
+        domain=target.domain,
+        proposals=request.proposals,
+        constraints=request.constraints
+    )
+    
+    if not simulation_id:
+        return None
+    
+    db_manager.save_module_result(simulation_id, module_name, output["module_result"])
+    for agent_name, analysis in output["agent_results"].items():
+        db_manager.save_agent_analysis(simulation_id, agent_name, analysis)
+    db_manager.save_ethics_check(
+        simulation_id,
+        ethics_result["passed"],
+        ethics_result.get("violations", []),
+        ethics_result.get("ruleset")
+    )
+    db_manager.update_simulation_status(simulation_id, "completed")
+    
+    return simulation_id
+
+def _ethics_key(country: str, domain: str) -> str:
+    """
+    Costruisce la chiave con cui la simulazione multipla raggruppa le validazioni etiche.
+    
+    Args:
+        country: Paese del target.
+        domain: Dominio del target.
+        
+    Returns:
+        str: Codice paese e dominio normalizzati (es. "it/economia").
+    """
+    return f"{country_code(country) or country.strip().lower()}/{domain.lower()}"
+
+def _build_comparison(proposals: List[str], targets: List[Dict[str, Any]],
+                      ethics_results: Dict[str, Dict[str, Any]]) -> Dict[str, Any]:
+    """
+    Costruisce la matrice di confronto proposte x target.
+    
+    Args:
+        proposals: Lista delle proposte simulate.
+        targets: Risultati per target.
+        ethics_results: Risultati della validazione etica per paese e dominio (vedi _ethics_key).
+        
+    Returns:
+        Dict[str, Any]: Matrici di impatto, fattibilità, vincoli soddisfatti ed esito etico
+            (None per i paesi senza ruleset etico).
+    """
+    comparison = {
+        "columns": [f"{target['country']}/{target['domain']}" for target in targets],
+        "rows": list(proposals),
+        "impact_score": [],
+        "feasibility": [],
+        "constraints_satisfied": [],
+        "ethics_passed": []
+    }
+    
+    for i, _ in enumerate(proposals):
+        proposal_key = f"proposal_{i+1}"
+        impact_row, feasibility_row, constraints_row, ethics_row = [], [], [], []
+        
+        for target in targets:
+            proposal_result = target["result"].get("results", {}).get(proposal_key, {})
+            ethics_result = ethics_results[_ethics_key(target["country"], target["domain"])]
+            
+            # Stesse metriche usate dagli agenti, normalizzate tra i domini
+            impact_row.append(proposal_result.get("impact_score", proposal_result.get("social_impact_score")))
+            feasibility_row.append(proposal_result.get("feasibility", proposal_result.get("acceptance_rate")))
+            constraints_row.append(sum(1 for c in proposal_result.get("constraints_check", []) if c.get("satisfied", False)))
+            ethics_row.append(ethics_result.get("proposal_results", {}).get(proposal_key, {}).get("passed", ethics_result["passed"]))
+        
+        comparison["impact_score"].append(impact_row)
+        comparison["feasibility"].append(feasibility_row)
+        comparison["constraints_satisfied"].append(constraints_row)
+        comparison["ethics_passed"].append(ethics_row)
+    
+    return comparison
+
+@router.post("/simulate/timeline")
+async def simulate_timeline(request: TimelineRequest) -> Dict[str, Any]:
+    """
+    Esegue una simulazione temporale su più anni, riusando i checkpoint degli scenari già calcolati.
+    
+    Args:
+        request: Richiesta con orizzonte, risoluzione, parametri ed eventuale scenario da diramare.
+        
+    Returns:
+        Dict[str, Any]: Identificativo dello scenario e traiettorie per proposta.
+    """
+    logger.info(f"Ricevuta richiesta di simulazione temporale: {request.dict()}")
+    
+    input_data = {
+        "country": request.country,
+        "domain": request.domain,
+        "proposals": request.proposals,
+        "constraints": request.constraints
+    }
+    
+    loop = asyncio.get_running_loop()
+    result = await loop.run_in_executor(
+        None,
+        lambda: module_loader.run_timeline(
+            request.country, request.domain, input_data, request.horizon_years, request.steps_per_year,
+            params=request.params, parent_id=request.parent_scenario_id, branch_year=request.branch_year
+        )
+    )
+    
+    if result.get("status") == "error":
+        raise HTTPException(status_code=400, detail=result["message"])
+    
+    # Espone solo le variabili dinamiche dichiarate dal modulo, per proposta e per passo
+    spec = module_loader.get_module_spec(request.country, request.domain)
+    dynamics = (getattr(spec.module, "MODULE_INFO", {}) or {}).get("dynamics", {})
+    trajectory = result.pop("trajectory")
+    variables = dynamics.get("state") or list(trajectory[0])
+    
+    if any(name not in state or len(state[name]) != len(request.proposals) for state in trajectory for name in variables):
+        raise HTTPException(
+            status_code=500,
+            detail=f"La traiettoria dello scenario {result['scenario_id']} non corrisponde alle proposte richieste"
+        )
+    
+    result["proposals"] = {
+        f"proposal_{i+1}": {
+            "proposal": proposal,
+            **{name: [state[name][i] for state in trajectory] for name in variables}
+        }
+        for i, proposal in enumerate(request.proposals)
+    }
+    
+    logger.info(f"Simulazione temporale completata: scenario {result['scenario_id']}")
+    return result
+
+@router.post("/simulate/sweep")
+async def simulate_sweep(request: SweepRequest) -> Dict[str, Any]:
+    """
+    Esplora le varianti di proposte parametriche su una griglia di valori.
+    
+    Tutte le varianti vengono valutate in un'unica esecuzione batch del modulo, senza
+    salvataggi per variante nel database.
+    
+    Args:
+        request: Richiesta con template, parametri e vincoli.
+        
+    Returns:
+        Dict[str, Any]: Tabella compatta con una riga per punto della griglia.
+    """
+    logger.info(f"Ricevuta richiesta di esplorazione parametrica: {request.dict()}")
+    
+    parameters = {name: spec.dict() for name, spec in request.parameters.items()}
+    for name, spec in parameters.items():
+        if spec["values"] is None and (spec["start"] is None or spec["stop"] is None):
+            raise HTTPException(status_code=422, detail=f"Il parametro {name} richiede 'values' oppure 'start' e 'stop'")
+    
+    loop = asyncio.get_running_loop()
+    result = await loop.run_in_executor(
+        None,
+        module_loader.run_sweep,
+        request.country, request.domain, request.templates, parameters, request.constraints
+    )
+    
+    if result.get("status") == "error":
+        raise HTTPException(status_code=400, detail=result["message"])
+    
+    logger.info(f"Esplorazione parametrica completata: {result['points']} punti")
+    return result
+
+@router.post("/simulate/incremental")
+async def simulate_incremental(request: IncrementalRequest) -> Dict[str, Any]:
+    """
+    Riesegue una simulazione dopo aver aggiunto, rimosso o modificato proposte e vincoli.
+    
+    Vengono ricalcolate solo le proposte e le celle proposta/vincolo cambiate; le altre
+    provengono dalla cache per contenuto o dal risultato della simulazione precedente.
+    
+    Args:
+        request: Richiesta con la simulazione precedente e la modifica da applicare.
+        
+    Returns:
+        Dict[str, Any]: Proposte e vincoli aggiornati e risultato del modulo.
+    """
+    logger.info(f"Ricevuta richiesta di simulazione incrementale: {request.dict()}")
+    
+    proposals = request.proposals
+    constraints = request.constraints
+    prior_result = request.prior_result
+    
+    # Proposte, vincoli e risultato possono essere letti dalla simulazione salvata
+    if request.prior_simulation_id is not None:
+        if not db_manager.initialized:
+            db_manager.initialize()
+        
+        stored = db_manager.get_simulation_results(request.prior_simulation_id)
+        if "error" in stored:
+            raise HTTPException(status_code=404, detail=stored["error"])
+        
+        proposals = proposals or stored["simulation"].get("proposals", [])
+        constraints = constraints or stored["simulation"].get("constraints", [])
+        if prior_result is None:
+            module_name = module_loader.get_module_path(request.country, request.domain)
+            prior_result = next(
+                (mr["result"] for mr in stored["module_results"] if mr["module_name"] == module_name), None
+            )
+    
+    loop = asyncio.get_running_loop()
+    result = await loop.run_in_executor(
+        None,
+        module_loader.run_incremental,
+        request.country, request.domain, proposals, constraints, request.delta.dict(), prior_result
+    )
+    
+    if result.get("status") == "error":
+        raise HTTPException(status_code=400, detail=result["message"])
+    
+    logger.info(f"Simulazione incrementale completata: {result['result'].get('incremental')}")
+    return result
+
+@router.post("/simulate/portfolio")
+async def simulate_portfolio(request: PortfolioRequest) -> Dict[str, Any]:
+    """
+    Calcola la frontiera di Pareto costo/impatto atteso dei portafogli di proposte entro un budget.
+    
+    I candidati vengono valutati in un'unica esecuzione del modulo; la frontiera è calcolata
+    con branch-and-bound, senza enumerare tutti i sottoinsiemi.
+    
+    Args:
+        request: Richiesta con candidati, budget e vincoli del portafoglio.
+        
+    Returns:
+        Dict[str, Any]: Portafogli della frontiera ordinati per costo e metriche dei candidati.
+    """
+    logger.info(f"Ricevuta richiesta di ottimizzazione del portafoglio: {request.dict()}")
+    
+    unknown = [p for p in request.required + request.excluded if p not in request.proposals]
+    if unknown:
+        raise HTTPException(status_code=422, detail=f"Proposte non presenti tra i candidati: {unknown}")
+    
+    options = {
+        "max_proposals": request.max_proposals,
+        "min_feasibility": request.min_feasibility,
+        "required": request.required,
+        "excluded": request.excluded,
+        "require_constraints": request.require_constraints,
+        "max_points": request.max_points
+    }
+    
+    loop = asyncio.get_running_loop()
+    result = await loop.run_in_executor(
+        None,
+        module_loader.run_portfolio,
+        request.country, request.domain, request.proposals, request.constraints, request.budget, options
+    )
+    
+    if result.get("status") == "error":
+        raise HTTPException(status_code=400, detail=result["message"])
+    
+    logger.info(f"Ottimizzazione del portafoglio completata: {len(result['frontier'])} portafogli")
+    return result
 
 # Funzione per ottenere i risultati di una simulazione precedente
 @router.get("/simulate/{simulation_id}")
-async def get_simulation_results(simulation_id: int) -> Dict[str, Any]:
+async def get_simulation_results(simulation_id: int, detail: Optional[str] = None,
+                                 fields: Optional[List[str]] = Query(None)) -> Dict[str, Any]:
     """
     Ottiene i risultati di una simulazione precedente.
     
+    Senza detail e fields restituisce i risultati come sono stati salvati. Altrimenti le sezioni
+    di dettaglio richieste ma non salvate vengono calcolate al momento (senza salvarle) e quelle
+    non richieste vengono rimosse.
+    
     Args:
         simulation_id: ID della simulazione.
+        detail: Livello di dettaglio ("summary" o "full").
+        fields: Sezioni di dettaglio da includere; se indicate, prevalgono su detail.
         
     Returns:
         Dict[str, Any]: Risultati completi della simulazione.
     """
     logger.info(f"Richiesta di risultati per la simulazione {simulation_id}")
     
+    selection = _detail_selection(detail, fields) if detail is not None or fields is not None else None
+    
     try:
         # Inizializza il database se necessario
         if not db_manager.initialized:
@@ -150,6 +706,9 @@ async def get_simulation_results(simulation_id: int) -> Dict[str, Any]:
         if "error" in results:
             raise HTTPException(status_code=404, detail=results["error"])
         
+        if selection is not None:
+            results = await _apply_detail(results, selection)
+        
         logger.info(f"Risultati della simulazione {simulation_id} recuperati con successo")
         return results
         
@@ -158,3 +717,106 @@ async def get_simulation_results(simulation_id: int) -> Dict[str, Any]:
     except Exception as e:
         logger.error(f"Errore durante il recupero dei risultati della simulazione: {str(e)}")
         raise HTTPException(status_code=500, detail=f"Errore durante il recupero dei risultati: {str(e)}")
+
+def _detail_selection(detail: Optional[str], fields: Optional[List[str]]) -> DetailSelection:
+    """
+    Costruisce la selezione delle sezioni di dettaglio di una richiesta.
+    
+    Args:
+        detail: Livello di dettaglio ("summary" o "full").
+        fields: Sezioni di dettaglio da includere.
+        
+    Returns:
+        DetailSelection: Selezione richiesta.
+        
+    Raises:
+        HTTPException: Se il livello o una sezione non sono validi.
+    """
+    try:
+        return DetailSelection.from_request(detail, fields)
+    except ValueError as e:
+        raise HTTPException(status_code=422, detail=str(e))
+
+def _select_module_sections(module_result: Dict[str, Any], selection: DetailSelection) -> Dict[str, Any]:
+    """
+    Rimuove dal risultato di un modulo il dettaglio dei vincoli, se non richiesto.
+    
+    Args:
+        module_result: Risultato del modulo.
+        selection: Sezioni di dettaglio richieste.
+        
+    Returns:
+        Dict[str, Any]: Risultato da salvare e restituire.
+    """
+    if selection.includes(CONSTRAINT_DETAILS):
+        return module_result
+    
+    trimmed = drop_metrics(module_result, (CONSTRAINTS_COLUMN,))
+    if trimmed is not module_result:
+        trimmed[OMITTED_KEY] = [CONSTRAINT_DETAILS]
+    return trimmed
+
+async def _apply_detail(results: Dict[str, Any], selection: DetailSelection) -> Dict[str, Any]:
+    """
+    Adatta i risultati salvati di una simulazione alle sezioni di dettaglio richieste.
+    
+    Le sezioni richieste ma non salvate vengono ricalcolate rieseguendo il modulo (servito dalla
+    cache incrementale) e gli agenti (serviti dalla loro cache); il controllo delle singole regole
+    etiche, che non viene mai salvato, viene ricalcolato se richiesto con la versione del ruleset
+    registrata nel controllo, se è ancora disponibile.
+    
+    Args:
+        results: Risultati salvati (da db_manager.get_simulation_results).
+        selection: Sezioni di dettaglio richieste.
+        
+    Returns:
+        Dict[str, Any]: Risultati con le sole sezioni richieste.
+    """
+    simulation = results["simulation"]
+    input_data = {key: simulation[key] for key in ("country", "domain", "proposals", "constraints")}
+    fresh: Dict[str, Any] = {}
+    
+    async def module_result() -> Dict[str, Any]:
+        # Il modulo viene rieseguito al più una volta per richiesta
+        if "result" not in fresh:
+            fresh["result"] = await module_loader.run_module_async(input_data["country"], input_data["domain"], input_data)
+        return fresh["result"]
+    
+    for entry in results["module_results"]:
+        omitted = entry["result"].get(OMITTED_KEY, [])
+        if selection.includes(CONSTRAINT_DETAILS) and CONSTRAINT_DETAILS in omitted:
+            entry["result"] = expand_result(await module_result())
+        else:
+            entry["result"] = _select_module_sections(entry["result"], selection)
+    
+    # Le analisi prive di sezioni ora richieste vengono ricalcolate con la selezione corrente
+    missing = [
+        entry for entry in results["agent_analyses"]
+        if isinstance(entry["analysis"], dict)
+        and any(selection.includes(section) for section in entry["analysis"].get(OMITTED_KEY, []))
+    ]
+    if missing:
+        analyses = await run_agent_analysis_async(input_data, await module_result(), selection)
+        for entry in missing:
+            entry["analysis"] = analyses.get(entry["agent_name"], entry["analysis"])
+    for entry in results["agent_analyses"]:
+        entry["analysis"] = agent_manager.trim_analysis(entry["agent_name"], entry["analysis"], selection)
+    
+    if selection.includes(RULE_CHECKS) and results["ethics_checks"]:
+        loop = asyncio.get_running_loop()
+        recomputed: Dict[Optional[str], Dict[str, Any]] = {}
+        for entry in results["ethics_checks"]:
+            version = entry.get("ruleset")
+            if version not in recomputed:
+                recomputed[version] = await loop.run_in_executor(
+                    None, ethics_validator.validate, input_data["proposals"], input_data["domain"], True,
+                    input_data["country"], version
+                )
+            ethics_result = recomputed[version]
+            entry["proposal_results"] = ethics_result.get("proposal_results", {})
+            # Versione diversa da quella registrata (non più disponibile, o controllo precedente al registro)
+            if ethics_result.get("ruleset") != version:
+                entry["rule_checks_ruleset"] = ethics_result.get("ruleset")
+    
+    results["detail"] = selection.to_dict()
+    return results
@@ -0,0 +1,147 @@
+"""
+Test della cache delle analisi degli agenti di Osireon.
+Questo script verifica il riuso delle analisi per input identici, l'invalidazione all'aumento di
+versione dell'agente, l'esclusione degli esiti non riusciti e il livello persistente nel database.
+"""
+import os
+import tempfile
+
+import src.agents.cache as cache_module
+from src.agents.base import AgentManager, SyncAgent
+from src.agents.cache import AgentCache, input_fingerprint
+from src.db import models
+from src.db.database import DatabaseManager
+
+INPUT = {"country": "Italy", "domain": "economia", "proposals": ["Flat tax al 20%"], "constraints": []}
+RESULT = {"status": "completed", "results": {"proposal_1": {"impact_score": 0.7}}}
+
+class CountingAgent(SyncAgent):
+    """
+    Agente deterministico che conta le proprie esecuzioni.
+    """
+    
+    cacheable = True
+    
+    def __init__(self, name: str = "counting", version: str = "1.0.0", status: str = None):
+        super().__init__(name)
+        self.version = version
+        self.status = status
+        self.calls = 0
+    
+    def analyze_sync(self, input_data, module_result):
+        self.calls += 1
+        result = {"summary": f"analisi {self.calls}"}
+        if self.status:
+            result["status"] = self.status
+        return result
+
+def make_manager(agent, cache: AgentCache) -> AgentManager:
+    manager = AgentManager(max_workers=2, timeout=5, cache=cache)
+    manager.register_agent(agent)
+    return manager
+
+def test_fingerprint_ignores_volatile_keys():
+    """
+    Le statistiche di calcolo del modulo non cambiano l'impronta; il contenuto del risultato sì.
+    """
+    fingerprint = input_fingerprint(INPUT, RESULT)
+    assert input_fingerprint(dict(reversed(list(INPUT.items()))), RESULT) == fingerprint
+    assert input_fingerprint(INPUT, dict(RESULT, incremental={"reused_proposals": 1})) == fingerprint
+    assert input_fingerprint(INPUT, {"status": "completed", "results": {"proposal_1": {"impact_score": 0.8}}}) != fingerprint
+
+def test_identical_inputs_are_served_from_cache():
+    """
+    La seconda analisi con gli stessi input non esegue l'agente; input diversi sì.
+    """
+    agent = CountingAgent()
+    cache = AgentCache(size=10, persistent=False)
+    manager = make_manager(agent, cache)
+    try:
+        first = manager.run_agents(INPUT, RESULT)["counting"]
+        second = manager.run_agents(INPUT, RESULT)["counting"]
+        assert first == second == {"summary": "analisi 1"} and agent.calls == 1
+        
+        # La copia restituita può essere modificata senza alterare la cache
+        second["summary"] = "modificata"
+        assert manager.run_agents(INPUT, RESULT)["counting"] == {"summary": "analisi 1"}
+        
+        manager.run_agents(dict(INPUT, proposals=["Reddito minimo"]), RESULT)
+        assert agent.calls == 2
+        
+        stats = cache.stats()["agents"]["counting"]
+        assert (stats["memory_hits"], stats["misses"], stats["stores"]) == (2, 2, 2)
+    finally:
+        manager.shutdown()
+
+def test_new_version_invalidates_entries():
+    """
+    Registrare una nuova versione dell'agente rende inutilizzabili le analisi precedenti.
+    """
+    cache = AgentCache(size=10, persistent=False)
+    old = CountingAgent(version="1.0.0")
+    manager = make_manager(old, cache)
+    try:
+        manager.run_agents(INPUT, RESULT)
+        assert cache.stats()["entries"] == 1
+        
+        new = CountingAgent(version="1.1.0")
+        manager.register_agent(new)
+        assert cache.stats()["entries"] == 0
+        assert manager.run_agents(INPUT, RESULT)["counting"] == {"summary": "analisi 1"} and new.calls == 1
+    finally:
+        manager.shutdown()
+
+def test_failed_analyses_are_not_cached():
+    """
+    Gli esiti di errore o parziali vengono ricalcolati ad ogni richiesta.
+    """
+    for status in ("error", "partial"):
+        agent = CountingAgent(status=status)
+        manager = make_manager(agent, AgentCache(size=10, persistent=False))
+        try:
+            manager.run_agents(INPUT, RESULT)
+            manager.run_agents(INPUT, RESULT)
+            assert agent.calls == 2
+        finally:
+            manager.shutdown()
+
+def test_persistent_layer_survives_restart():
+    """
+    Con il database inizializzato, una nuova cache in memoria trova le analisi salvate da quella precedente.
+    """
+    original = (models.DATABASE_URL, cache_module.db_manager)
+    with tempfile.TemporaryDirectory() as directory:
+        models.DATABASE_URL = f"sqlite:///{os.path.join(directory, 'osireon.db')}"
+        db = DatabaseManager()
+        db.initialize()
+        cache_module.db_manager = db
+        try:
+            agent = CountingAgent()
+            manager = make_manager(agent, AgentCache(size=10, persistent=True))
+            manager.run_agents(INPUT, RESULT)
+            manager.shutdown()
+            
+            restarted = CountingAgent()
+            cache = AgentCache(size=10, persistent=True)
+            manager = make_manager(restarted, cache)
+            assert manager.run_agents(INPUT, RESULT)["counting"] == {"summary": "analisi 1"}
+            assert restarted.calls == 0 and cache.stats()["agents"]["counting"]["persistent_hits"] == 1
+            
+            # Una versione successiva rimuove dal database le analisi delle versioni precedenti
+            old_key = cache.key("counting", "1.0.0", input_fingerprint(INPUT, RESULT))
+            assert db.get_cached_analysis(old_key) == {"summary": "analisi 1"}
+            newer = CountingAgent(version="2.0.0")
+            manager.register_agent(newer)
+            manager.run_agents(INPUT, RESULT)
+            assert newer.calls == 1 and db.get_cached_analysis(old_key) is None
+            manager.shutdown()
+        finally:
+            models.DATABASE_URL, cache_module.db_manager = original
+
+if __name__ == "__main__":
+    test_fingerprint_ignores_volatile_keys()
+    test_identical_inputs_are_served_from_cache()
+    test_new_version_invalidates_entries()
+    test_failed_analyses_are_not_cached()
+    test_persistent_layer_survives_restart()
+    print("Test della cache delle analisi degli agenti completati con successo!")
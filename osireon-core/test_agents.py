@@ -0,0 +1,125 @@
+"""
+Test dell'esecuzione concorrente degli agenti di Osireon.
+Questo script verifica che gli agenti vengano eseguiti in parallelo, che ciascuno rispetti la propria
+scadenza, che gli errori restino confinati all'agente che li produce e che l'ordine dei risultati
+sia quello di registrazione.
+"""
+import asyncio
+import time
+
+from src.agents.base import AgentManager, BaseAgent, SyncAgent
+from src.agents.cache import AgentCache
+
+class SleepingAgent(SyncAgent):
+    """
+    Agente sincrono che impiega il tempo indicato.
+    """
+    
+    def __init__(self, name: str, delay: float, timeout: float = None):
+        super().__init__(name, timeout)
+        self.delay = delay
+    
+    def analyze_sync(self, input_data, module_result):
+        time.sleep(self.delay)
+        return {"summary": self.name}
+
+class WaitingAgent(BaseAgent):
+    """
+    Agente asincrono che attende il tempo indicato e registra se è stato annullato.
+    """
+    
+    def __init__(self, name: str, delay: float, timeout: float = None):
+        super().__init__(name, timeout)
+        self.delay = delay
+        self.cancelled = False
+    
+    async def analyze(self, input_data, module_result):
+        try:
+            await asyncio.sleep(self.delay)
+        except asyncio.CancelledError:
+            self.cancelled = True
+            raise
+        return {"summary": self.name}
+
+class FailingAgent(SyncAgent):
+    """
+    Agente sincrono che solleva un'eccezione.
+    """
+    
+    def analyze_sync(self, input_data, module_result):
+        raise ValueError("dati incompleti")
+
+def make_manager(*agents, timeout: float = 2) -> AgentManager:
+    """
+    Crea un gestore senza cache con gli agenti indicati.
+    """
+    manager = AgentManager(max_workers=4, timeout=timeout, cache=AgentCache(size=0, persistent=False))
+    for agent in agents:
+        manager.register_agent(agent)
+    return manager
+
+def statuses(results):
+    return {name: result.get("status", "completed") for name, result in results.items()}
+
+def test_agents_run_concurrently_with_deadlines():
+    """
+    Il tempo totale è quello dell'agente più lento entro la scadenza, non la somma dei tempi.
+    """
+    hanging = WaitingAgent("hanging", 10)
+    manager = make_manager(
+        SleepingAgent("sync", 0.5),
+        WaitingAgent("async", 0.5),
+        SleepingAgent("slow", 2, timeout=0.3),
+        FailingAgent("failing"),
+        hanging,
+        timeout=1
+    )
+    try:
+        start = time.monotonic()
+        results = manager.run_agents({}, {})
+        elapsed = time.monotonic() - start
+        
+        assert elapsed < 1.8
+        assert list(results) == ["sync", "async", "slow", "failing", "hanging"]
+        assert statuses(results) == {
+            "sync": "completed", "async": "completed", "slow": "timeout", "failing": "error", "hanging": "timeout"
+        }
+        assert "0.3s" in results["slow"]["message"] and "dati incompleti" in results["failing"]["message"]
+        # L'analisi asincrona scaduta viene annullata
+        assert hanging.cancelled
+    finally:
+        manager.shutdown()
+
+def test_call_timeout_tightens_agent_deadline():
+    """
+    Il limite passato alla chiamata si aggiunge a quello dell'agente: vale il più stretto.
+    """
+    manager = make_manager(WaitingAgent("own", 0.6, timeout=0.2), WaitingAgent("default", 0.6))
+    try:
+        assert statuses(manager.run_agents({}, {})) == {"own": "timeout", "default": "completed"}
+        assert statuses(manager.run_agents({}, {}, timeout=0.3)) == {"own": "timeout", "default": "timeout"}
+    finally:
+        manager.shutdown()
+
+def test_run_agents_inside_event_loop():
+    """
+    La chiamata sincrona funziona anche da un thread che ha già un ciclo di eventi attivo.
+    """
+    manager = make_manager(SleepingAgent("sync", 0.1), WaitingAgent("async", 0.1))
+    
+    async def main():
+        blocking = manager.run_agents({}, {})
+        awaited = await manager.run_agents_async({}, {})
+        return blocking, awaited
+    
+    try:
+        blocking, awaited = asyncio.run(main())
+        assert statuses(blocking) == statuses(awaited) == {"sync": "completed", "async": "completed"}
+    finally:
+        manager.shutdown()
+
+if __name__ == "__main__":
+    test_agents_run_concurrently_with_deadlines()
+    test_call_timeout_tightens_agent_deadline()
+    test_run_agents_inside_event_loop()
+    print("Test dell'esecuzione concorrente degli agenti completati con successo!")
@@ -0,0 +1,125 @@
+"""
+Test del micro-batcher delle chiamate LLM di Osireon.
+Questo script verifica il raggruppamento delle chiamate concorrenti per chiave, l'invio anticipato dei
+gruppi completi, la propagazione degli errori, l'esclusione delle chiamate annullate e l'uso nel connettore.
+"""
+import asyncio
+import time
+
+from src.llm.batching import MicroBatcher
+from src.llm.cache import LLMCache
+from src.llm.connector import LLMConnector
+
+class RecordingDispatch:
+    """
+    Richiesta raggruppata che registra i gruppi ricevuti e risponde a ogni prompt in maiuscolo.
+    """
+    
+    def __init__(self, delay: float = 0.0, fail: bool = False, short: bool = False):
+        self.delay = delay
+        self.fail = fail
+        self.short = short
+        self.batches = []
+    
+    async def __call__(self, key, prompts):
+        self.batches.append((key, list(prompts)))
+        await asyncio.sleep(self.delay)
+        if self.fail:
+            raise RuntimeError("backend non disponibile")
+        results = [(prompt.upper(), "stop") for prompt in prompts]
+        return results[:-1] if self.short else results
+
+def test_concurrent_calls_are_grouped_by_key():
+    """
+    Le chiamate concorrenti con la stessa chiave partono insieme; chiavi diverse formano gruppi separati.
+    """
+    dispatch = RecordingDispatch()
+    batcher = MicroBatcher(dispatch, window=0.05, max_size=16)
+    
+    async def main():
+        calls = [batcher.submit("gpt-4", f"p{k}") for k in range(5)] + [batcher.submit("gpt-3.5", "q0")]
+        return await asyncio.gather(*calls)
+    
+    results = asyncio.run(main())
+    assert results == [(f"P{k}", "stop") for k in range(5)] + [("Q0", "stop")]
+    assert sorted(dispatch.batches) == [("gpt-3.5", ["q0"]), ("gpt-4", [f"p{k}" for k in range(5)])]
+    
+    stats = batcher.stats()
+    assert (stats["requests"], stats["batches"], stats["largest_batch"], stats["full_batches"]) == (6, 2, 5, 0)
+    assert stats["average_batch"] == 3.0
+
+def test_full_batches_are_sent_before_the_window():
+    """
+    Un gruppo che raggiunge max_size viene inviato subito, senza attendere la finestra.
+    """
+    dispatch = RecordingDispatch()
+    batcher = MicroBatcher(dispatch, window=5, max_size=3)
+    
+    async def main():
+        return await asyncio.gather(*[batcher.submit("gpt-4", f"p{k}") for k in range(6)])
+    
+    start = time.monotonic()
+    results = asyncio.run(main())
+    assert time.monotonic() - start < 1
+    assert [prompts for _, prompts in dispatch.batches] == [["p0", "p1", "p2"], ["p3", "p4", "p5"]]
+    assert results[4] == ("P4", "stop")
+    assert batcher.stats()["full_batches"] == 2
+
+def test_errors_reach_every_caller():
+    """
+    Un errore della richiesta raggruppata, o un numero errato di risposte, arriva a tutti i chiamanti del gruppo.
+    """
+    for dispatch, error in ((RecordingDispatch(fail=True), RuntimeError), (RecordingDispatch(short=True), ValueError)):
+        batcher = MicroBatcher(dispatch, window=0.01, max_size=16)
+        
+        async def main():
+            return await asyncio.gather(*[batcher.submit("gpt-4", f"p{k}") for k in range(3)], return_exceptions=True)
+        
+        results = asyncio.run(main())
+        assert all(isinstance(result, error) for result in results)
+        assert batcher.stats()["errors"] == 1
+
+def test_cancelled_calls_are_left_out():
+    """
+    Le chiamate annullate prima dell'invio non fanno parte della richiesta raggruppata.
+    """
+    dispatch = RecordingDispatch()
+    batcher = MicroBatcher(dispatch, window=0.05, max_size=16)
+    
+    async def main():
+        tasks = [asyncio.ensure_future(batcher.submit("gpt-4", f"p{k}")) for k in range(3)]
+        await asyncio.sleep(0)
+        tasks[1].cancel()
+        return await asyncio.gather(*tasks, return_exceptions=True)
+    
+    results = asyncio.run(main())
+    assert results[0] == ("P0", "stop") and results[2] == ("P2", "stop")
+    assert isinstance(results[1], asyncio.CancelledError)
+    assert dispatch.batches == [("gpt-4", ["p0", "p2"])]
+
+def test_connector_groups_concurrent_calls():
+    """
+    Con il raggruppamento attivo, le chiamate concorrenti del connettore partono in un'unica richiesta
+    e ricevono le stesse risposte delle chiamate singole.
+    """
+    connector = LLMConnector()
+    connector.cache = LLMCache(size=0, persistent=False)
+    connector.mock_latency = 0.05
+    connector.batching = True
+    connector.batcher = MicroBatcher(connector._dispatch_batch, window=0.02, max_size=16)
+    prompts = [f"Analisi economica della proposta {k}" for k in range(8)]
+    
+    async def main():
+        return await asyncio.gather(*[connector.call_llm_async(prompt, "openai", "gpt-4", 0) for prompt in prompts])
+    
+    responses = asyncio.run(main())
+    assert responses == [connector._mock_response("openai", prompt) for prompt in prompts]
+    assert connector.batcher.stats()["batches"] == 1 and connector.batcher.stats()["largest_batch"] == 8
+
+if __name__ == "__main__":
+    test_concurrent_calls_are_grouped_by_key()
+    test_full_batches_are_sent_before_the_window()
+    test_errors_reach_every_caller()
+    test_cancelled_calls_are_left_out()
+    test_connector_groups_concurrent_calls()
+    print("Test del micro-batcher delle chiamate LLM completati con successo!")
@@ -0,0 +1,83 @@
+"""
+Test del compilatore dei vincoli di Osireon.
+Questo script verifica la traduzione dei vincoli in testo libero in predicati (soglie, negazioni,
+congiunzioni) e il ripiego sulla regola del modulo per i vincoli non interpretabili.
+"""
+from src.modules.constraints import ConstraintCompiler
+from src.modules.results import ColumnarResult
+from src.modules import economy_it
+
+def predicates(text: str):
+    """
+    Compila un vincolo con un compilatore nuovo e ne restituisce i predicati come tuple.
+    """
+    compiled = ConstraintCompiler(cache_size=16).compile(text)
+    return [(p.metrics[0], p.operator, p.threshold) for p in compiled.predicates]
+
+def test_thresholds():
+    """
+    Soglie con operatori testuali o simbolici, separatori italiani e unità di misura.
+    """
+    assert predicates("Costo massimo 5 milioni") == [("cost_estimate", "<=", 5e6)]
+    assert predicates("Fattibilità almeno 0,6") == [("feasibility", ">=", 0.6)]
+    assert predicates("accettazione sopra il 60%") == [("acceptance_rate", ">", 0.6)]
+    assert predicates("cost_estimate <= 3e6") == [("cost_estimate", "<=", 3e6)]
+    assert predicates("Spesa non superiore a 1.500.000") == [("cost_estimate", "<=", 1.5e6)]
+    assert predicates("fattibilità almeno 0,6 e costo entro 2 mln") == [
+        ("feasibility", ">=", 0.6), ("cost_estimate", "<=", 2e6)
+    ]
+
+def test_negations():
+    """
+    Le negazioni limitano la metrica a zero: con "aumento" per ogni metrica, senza solo per i costi.
+    """
+    assert predicates("Nessun aumento della spesa") == [("cost_estimate", "<=", 0.0)]
+    assert predicates("Senza oneri") == [("cost_estimate", "<=", 0.0)]
+    assert predicates("Nessun costo") == [("cost_estimate", "<=", 0.0)]
+    assert predicates("Nessuna fattibilità") == []
+
+def test_unparseable_clauses():
+    """
+    I vincoli non interpretabili, anche solo in parte, non vengono compilati.
+    """
+    assert predicates("Nessun aumento del debito pubblico") == []
+    assert predicates("Rispetto dei diritti dei lavoratori") == []
+    # Una parte interpretabile non basta: il vincolo non viene ridotto alla sola parte riconosciuta
+    assert predicates("costo massimo 5 milioni e rispetto dei diritti") == []
+
+def test_unparseable_constraint_falls_back():
+    """
+    Un vincolo non compilato usa la regola del modulo e non ha margine; gli altri vengono valutati.
+    """
+    compiler = ConstraintCompiler(cache_size=16)
+    matrix = compiler.evaluate(
+        ["Nessun aumento del debito pubblico", "costo massimo 5 milioni"],
+        {"cost_estimate": [1e6, 9e6]}, 2,
+        fallback=lambda i, j: i == 0
+    )
+    assert matrix.evaluated == [False, True]
+    assert matrix.satisfied == [True, True, False, False]
+    assert matrix.margin == [None, 4e6, None, -4e6]
+    
+    # Senza regola del modulo il vincolo non compilato risulta soddisfatto
+    matrix = compiler.evaluate(["Nessun aumento del debito pubblico"], {}, 2)
+    assert matrix.satisfied == [True, True] and matrix.margin == [None, None]
+
+def test_module_result_with_fallback():
+    """
+    Nel risultato del modulo il vincolo non compilato ha margine None.
+    """
+    result = ColumnarResult(economy_it.run({
+        "proposals": ["Flat tax al 20%", "Reddito universale"],
+        "constraints": ["Nessun aumento del debito pubblico", "costo massimo 5 miliardi"]
+    }))
+    for checks in result.column("constraints_check"):
+        assert [check["margin"] is None for check in checks] == [True, False]
+
+if __name__ == "__main__":
+    test_thresholds()
+    test_negations()
+    test_unparseable_clauses()
+    test_unparseable_constraint_falls_back()
+    test_module_result_with_fallback()
+    print("Test del compilatore dei vincoli completati con successo!")
@@ -0,0 +1,70 @@
+"""
+Test dell'aggiornamento dello schema del database di Osireon.
+Questo script verifica che un database creato da una versione precedente venga aggiornato
+all'avvio senza perdere dati e che l'aggiornamento possa essere ripetuto.
+"""
+import os
+import tempfile
+
+from sqlalchemy import create_engine, text
+
+from src.db import models
+from src.db.database import DatabaseManager
+
+# Tabelle come create dalle versioni precedenti (passed obbligatorio, nessuna colonna ruleset)
+LEGACY_SCHEMA = [
+    """CREATE TABLE simulations (
+        id INTEGER PRIMARY KEY, country VARCHAR(50) NOT NULL, domain VARCHAR(50) NOT NULL,
+        proposals JSON NOT NULL, constraints JSON, status VARCHAR(20), created_at DATETIME, updated_at DATETIME
+    )""",
+    """CREATE TABLE ethics_checks (
+        id INTEGER PRIMARY KEY, simulation_id INTEGER NOT NULL REFERENCES simulations(id),
+        passed BOOLEAN NOT NULL, violations JSON, created_at DATETIME
+    )""",
+    "INSERT INTO simulations (id, country, domain, proposals, status) VALUES (1, 'Italy', 'economia', '[\"a\"]', 'completed')",
+    "INSERT INTO ethics_checks (id, simulation_id, passed, violations) VALUES (1, 1, 0, '[\"violazione\"]')"
+]
+
+def test_legacy_ethics_checks_are_upgraded():
+    """
+    Il database di una versione precedente accetta controlli non validati e la versione del ruleset.
+    """
+    original_url = models.DATABASE_URL
+    with tempfile.TemporaryDirectory() as directory:
+        models.DATABASE_URL = f"sqlite:///{os.path.join(directory, 'osireon.db')}"
+        try:
+            engine = create_engine(models.DATABASE_URL)
+            with engine.begin() as connection:
+                for statement in LEGACY_SCHEMA:
+                    connection.execute(text(statement))
+            
+            db = DatabaseManager()
+            db.initialize()
+            assert db.save_ethics_check(1, None, [], None) is not None
+            assert db.save_ethics_check(1, True, [], "it@1.0.0+8a354d7e7f25") is not None
+            
+            checks = db.get_simulation_results(1)["ethics_checks"]
+            assert [(c["passed"], c["violations"], c["ruleset"], c["status"]) for c in checks] == [
+                (False, ["violazione"], None, "validated"),
+                (None, [], None, "not_validated"),
+                (True, [], "it@1.0.0+8a354d7e7f25", "validated")
+            ]
+            
+            # Un secondo avvio non ha nulla da aggiornare
+            assert models.upgrade_schema(engine) == []
+        finally:
+            models.DATABASE_URL = original_url
+
+def test_new_database_needs_no_upgrade():
+    """
+    Le tabelle create da create_all sono già aggiornate.
+    """
+    with tempfile.TemporaryDirectory() as directory:
+        engine = create_engine(f"sqlite:///{os.path.join(directory, 'osireon.db')}")
+        models.Base.metadata.create_all(engine)
+        assert models.upgrade_schema(engine) == []
+
+if __name__ == "__main__":
+    test_legacy_ethics_checks_are_upgraded()
+    test_new_database_needs_no_upgrade()
+    print("Test dell'aggiornamento dello schema completati con successo!")
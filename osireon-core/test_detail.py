@@ -0,0 +1,92 @@
+"""
+Test della selezione del livello di dettaglio di Osireon.
+Questo script verifica l'interpretazione di detail e fields, l'omissione delle sezioni non richieste
+nelle simulazioni e il loro calcolo successivo alla lettura dei risultati salvati.
+"""
+import asyncio
+import os
+import tempfile
+
+from fastapi import BackgroundTasks, HTTPException
+
+from src.db import models
+from src.db.database import db_manager
+from src.simulate import simulate, get_simulation_results
+from src.utils.detail import DetailSelection, AGENT_DETAILS, RULE_CHECKS, CONSTRAINT_DETAILS, SECTIONS
+from src.utils.models import SimulationRequest
+
+REQUEST = {
+    "country": "IT",
+    "domain": "economy",
+    "proposals": ["Flat tax al 15%", "Reddito di base"],
+    "constraints": ["costo inferiore a 5 milioni"]
+}
+
+def test_selection_from_request():
+    """
+    Senza parametri si calcola tutto; fields prevale su detail; valori sconosciuti sono rifiutati.
+    """
+    assert DetailSelection.from_request().omitted() == []
+    assert DetailSelection.from_request("summary").omitted() == list(SECTIONS)
+    selection = DetailSelection.from_request("summary", [RULE_CHECKS])
+    assert selection.to_dict() == {"included": [RULE_CHECKS], "omitted": [AGENT_DETAILS, CONSTRAINT_DETAILS]}
+    assert selection.omitted([CONSTRAINT_DETAILS, AGENT_DETAILS]) == [AGENT_DETAILS, CONSTRAINT_DETAILS]
+    
+    for detail, fields in (("compact", None), (None, ["rule_checks", "costs"])):
+        try:
+            DetailSelection.from_request(detail, fields)
+            raise AssertionError(f"selezione accettata: {detail} {fields}")
+        except ValueError:
+            pass
+
+def test_summary_skips_sections_and_full_fills_them_later():
+    """
+    Una simulazione "summary" omette le sezioni di dettaglio, anche nel database; chiederle in lettura
+    le calcola e le rende uguali a quelle di una simulazione completa.
+    """
+    original_url = models.DATABASE_URL
+    with tempfile.TemporaryDirectory() as directory:
+        models.DATABASE_URL = f"sqlite:///{os.path.join(directory, 'osireon.db')}"
+        db_manager.initialized = False
+        try:
+            asyncio.run(_check_summary_and_full())
+        finally:
+            db_manager.initialized = False
+            models.DATABASE_URL = original_url
+
+async def _check_summary_and_full():
+    full = await simulate(SimulationRequest(**REQUEST), BackgroundTasks())
+    summary = await simulate(SimulationRequest(**REQUEST, detail="summary"), BackgroundTasks())
+    
+    assert summary["detail"] == {"included": [], "omitted": list(SECTIONS)}
+    module = summary["result"]["result"]
+    assert "constraints_check" not in module["results"]["proposal_1"]
+    assert module["omitted_sections"] == [CONSTRAINT_DETAILS]
+    assert "constraints_check" in full["result"]["result"]["results"]["proposal_1"]
+    
+    stored = await get_simulation_results(summary["simulation_id"], None, None)
+    for analysis in stored["agent_analyses"]:
+        assert analysis["analysis"]["omitted_sections"] == [AGENT_DETAILS]
+        assert not {"detailed_analysis", "detailed_critique"} & set(analysis["analysis"])
+    
+    stored_full = await get_simulation_results(full["simulation_id"], None, None)
+    filled = await get_simulation_results(summary["simulation_id"], "full", None)
+    assert [a["analysis"] for a in filled["agent_analyses"]] == [a["analysis"] for a in stored_full["agent_analyses"]]
+    assert filled["module_results"][0]["result"]["results"] == stored_full["module_results"][0]["result"]["results"]
+    assert filled["ethics_checks"][0]["proposal_results"]["proposal_1"]["rule_checks"]
+    
+    # Una simulazione completa può essere letta con meno dettaglio
+    trimmed = await get_simulation_results(full["simulation_id"], None, [RULE_CHECKS])
+    assert trimmed["detail"] == {"included": [RULE_CHECKS], "omitted": [AGENT_DETAILS, CONSTRAINT_DETAILS]}
+    assert trimmed["module_results"][0]["result"]["omitted_sections"] == [CONSTRAINT_DETAILS]
+    
+    try:
+        await simulate(SimulationRequest(**REQUEST, fields=["costs"]), BackgroundTasks())
+        raise AssertionError("sezione sconosciuta accettata")
+    except HTTPException as e:
+        assert e.status_code == 422
+
+if __name__ == "__main__":
+    test_selection_from_request()
+    test_summary_skips_sections_and_full_fills_them_later()
+    print("Test della selezione del livello di dettaglio completati con successo!")
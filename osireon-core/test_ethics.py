@@ -0,0 +1,67 @@
+"""
+Test della validazione etica per paese di Osireon.
+Questo script verifica la normalizzazione dei paesi nei codici ISO e l'esito "non validato"
+per i paesi senza ruleset etico.
+"""
+import os
+
+from src.ethics.registry import RulesetRegistry, country_code
+from src.ethics.validator import EthicsValidator, VALIDATED, NOT_VALIDATED
+from src.utils.models import EthicsCheck
+
+# Directory dei ruleset distribuiti con il codice (contiene ruleset_it.json)
+RULESETS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "ethics")
+
+def validator(fallback_country: str = "") -> EthicsValidator:
+    """
+    Crea un validatore con un registro proprio, senza controllo periodico dei file.
+    """
+    return EthicsValidator(RulesetRegistry(RULESETS_DIR, fallback_country=fallback_country, watch_interval=0))
+
+def test_country_code():
+    """
+    Sono accettati i codici ISO e i nomi elencati; gli altri paesi non vengono indovinati.
+    """
+    assert country_code("it") == "it"
+    assert country_code(" IT ") == "it"
+    assert country_code("Italia") == "it"
+    assert country_code("Italy") == "it"
+    assert country_code("Germany") == "de"
+    assert country_code("Spain") == "es"
+    assert country_code("Paesi  Bassi") == "nl"
+    assert country_code("ge") == "ge"
+    assert country_code("Georgia") is None
+    assert country_code("Narnia") is None
+    assert country_code("") is None
+
+def test_country_without_ruleset_is_not_validated():
+    """
+    Un paese senza ruleset non risulta né approvato né respinto.
+    """
+    ethics = validator()
+    proposals = ["Flat tax al 20%", "Reddito universale"]
+    
+    validated = ethics.validate(proposals, "economia", country="Italy")
+    assert validated["status"] == VALIDATED and validated["passed"] is False
+    assert validated["ruleset"].startswith("it@")
+    
+    for country in ("fr", "Germany", "Narnia"):
+        result = ethics.validate(proposals, "economia", country=country)
+        assert result["status"] == NOT_VALIDATED
+        assert result["passed"] is None and result["violations"] == [] and result["ruleset"] is None
+    
+    check = EthicsCheck(passed=result["passed"], violations=result["violations"], status=result["status"])
+    assert check.dict()["status"] == NOT_VALIDATED and check.passed is None
+
+def test_fallback_country():
+    """
+    Con un paese di riserva, i paesi senza ruleset usano le sue regole.
+    """
+    result = validator(fallback_country="it").validate(["Flat tax al 20%"], "economia", country="Germany")
+    assert result["status"] == VALIDATED and result["ruleset"].startswith("it@")
+
+if __name__ == "__main__":
+    test_country_code()
+    test_country_without_ruleset_is_not_validated()
+    test_fallback_country()
+    print("Test della validazione etica completati con successo!")
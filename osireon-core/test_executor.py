@@ -0,0 +1,207 @@
+"""
+Test del pool di processi che esegue i moduli di simulazione di Osireon.
+Questo script verifica timeout e risultati parziali, terminazioni anomale dei worker, pulizia della
+memoria condivisa, limiti di risorse tra un task e l'altro, liberazione dei posti del pool ed
+esecuzione nel processo chiamante.
+"""
+import os
+import threading
+import time
+from array import array
+
+from src.modules.executor import ModuleExecutor, ModuleExecutionError, report_partial
+from src.modules.loader import ModuleLoader
+from src.modules.registry import ModuleSpec
+from src.modules.results import expand_result
+from src.modules import economy_it
+
+try:
+    import resource
+except ImportError:  # Piattaforme senza setrlimit (es. Windows)
+    resource = None
+
+# Directory dei segmenti di memoria condivisa (Linux)
+SHM_DIR = "/dev/shm"
+
+# Funzioni eseguite nei worker: sono importate per riferimento, quindi devono stare a livello di modulo
+
+def sleeping_run(input_data):
+    time.sleep(input_data.get("sleep", 0))
+    return {"status": "completed", "slept": input_data.get("sleep", 0)}
+
+def partial_run(input_data):
+    report_partial({"status": "completed", "proposals_analyzed": 1})
+    time.sleep(30)
+    return {"status": "completed", "proposals_analyzed": 2}
+
+def crashing_run(input_data):
+    os._exit(3)
+
+def failing_run(input_data):
+    raise ValueError(f"input non valido ({len(input_data['values'])} valori)")
+
+def doubling_run(input_data):
+    return {"status": "completed", "values": array("d", (2 * v for v in input_data["values"]))}
+
+def limits_run(input_data):
+    return {"status": "completed", "as": resource.getrlimit(resource.RLIMIT_AS)[0]}
+
+def executor(**options) -> ModuleExecutor:
+    """
+    Crea un pool piccolo per un singolo test.
+    """
+    options.setdefault("max_workers", 1)
+    options.setdefault("default_timeout", 20)
+    return ModuleExecutor(**options)
+
+def shared_segments() -> set:
+    """
+    Elenca i segmenti di memoria condivisa presenti nel sistema.
+    """
+    return set(os.listdir(SHM_DIR)) if os.path.isdir(SHM_DIR) else set()
+
+def test_timeout_returns_partial_and_replaces_worker():
+    """
+    Al timeout il worker viene terminato, si restituisce l'ultimo parziale e il posto viene liberato.
+    """
+    pool = executor()
+    try:
+        result = pool.run(ModuleSpec("partial", partial_run), {}, timeout=2)
+        assert result["status"] == "partial" and result["proposals_analyzed"] == 1
+        assert "Timeout" in result["message"]
+        
+        result = pool.run(ModuleSpec("slow", sleeping_run), {"sleep": 5}, timeout=0.5)
+        assert result["status"] == "error" and result["result"]["timeout"]
+        
+        # Un worker sostitutivo esegue il task successivo
+        assert pool.run(ModuleSpec("slow", sleeping_run), {"sleep": 0})["status"] == "completed"
+        assert pool._workers == 1
+    finally:
+        pool.shutdown()
+
+def test_worker_crash_and_module_error():
+    """
+    Una terminazione anomala e un'eccezione del modulo diventano ModuleExecutionError.
+    """
+    pool = executor()
+    try:
+        try:
+            pool.run(ModuleSpec("crash", crashing_run), {})
+            raise AssertionError("terminazione del worker non segnalata")
+        except ModuleExecutionError as e:
+            assert "codice 3" in str(e)
+        
+        try:
+            pool.run(ModuleSpec("failing", failing_run), {"values": [1, 2]})
+            raise AssertionError("errore del modulo non segnalato")
+        except ModuleExecutionError as e:
+            assert "ValueError" in str(e)
+        
+        assert pool.run(ModuleSpec("slow", sleeping_run), {"sleep": 0})["status"] == "completed"
+    finally:
+        pool.shutdown()
+
+def test_unpicklable_runtime_module():
+    """
+    Una funzione registrata a runtime che non può essere trasferita è un errore del modulo.
+    """
+    pool = executor()
+    try:
+        try:
+            pool.run(ModuleSpec("lambda", lambda input_data: {"status": "completed"}), {})
+            raise AssertionError("funzione non trasferibile accettata")
+        except ModuleExecutionError as e:
+            assert "lambda" in str(e)
+        
+        # Il worker non ha ricevuto il task e resta utilizzabile
+        assert pool.run(ModuleSpec("slow", sleeping_run), {"sleep": 0})["status"] == "completed"
+    finally:
+        pool.shutdown()
+
+def test_shared_memory_is_unlinked():
+    """
+    Gli array grandi passano in memoria condivisa e i segmenti vengono rimossi, anche in caso di errore.
+    """
+    pool = executor(shm_threshold=1024)
+    values = array("d", range(10000))
+    before = shared_segments()
+    try:
+        result = pool.run(ModuleSpec("double", doubling_run), {"values": values})
+        assert result["values"] == array("d", (2 * v for v in values))
+        
+        try:
+            pool.run(ModuleSpec("failing", failing_run), {"values": values})
+            raise AssertionError("errore del modulo non segnalato")
+        except ModuleExecutionError:
+            pass
+        
+        try:
+            pool.run(ModuleSpec("crash", crashing_run), {"values": values})
+            raise AssertionError("terminazione del worker non segnalata")
+        except ModuleExecutionError:
+            pass
+    finally:
+        pool.shutdown()
+    assert shared_segments() - before == set()
+
+def test_limits_are_not_inherited():
+    """
+    Un task senza limite di memoria non eredita quello del task precedente nello stesso worker.
+    """
+    if resource is None:
+        return
+    pool = executor(max_tasks_per_worker=10)
+    initial = resource.getrlimit(resource.RLIMIT_AS)[0]
+    try:
+        limited = pool.run(ModuleSpec("limited", limits_run, limits={"memory_mb": 512}), {})
+        unlimited = pool.run(ModuleSpec("unlimited", limits_run, limits={"memory_mb": 0}), {})
+        assert limited["as"] == 512 * 1024 * 1024
+        assert unlimited["as"] == initial
+    finally:
+        pool.shutdown()
+
+def test_recycled_workers_free_their_slot():
+    """
+    Con un solo posto e un task per worker, i task concorrenti attendono il worker sostitutivo.
+    """
+    pool = executor(max_tasks_per_worker=1)
+    spec = ModuleSpec.from_module("economy_it", economy_it)
+    statuses = []
+    threads = [
+        threading.Thread(target=lambda: statuses.append(pool.run(spec, {"proposals": ["a"], "constraints": []})["status"]))
+        for _ in range(3)
+    ]
+    try:
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join(60)
+        assert statuses == ["completed"] * 3
+        assert pool._workers == 0
+    finally:
+        pool.shutdown()
+
+def test_inline_execution_matches_process_pool():
+    """
+    L'esecuzione nel processo chiamante produce lo stesso risultato del pool.
+    """
+    pool = executor()
+    input_data = {"proposals": ["Flat tax al 20%", "Reddito universale"], "constraints": ["costo massimo 5 miliardi"]}
+    spec = ModuleSpec.from_module("economy_it", economy_it)
+    try:
+        pooled = ModuleLoader(executor=pool, execution_mode="process")._execute_once(spec, input_data)
+        inline = ModuleLoader(executor=pool, execution_mode="inline")._execute_once(spec, input_data)
+        assert expand_result(inline) == expand_result(pooled)
+        assert pool._workers == 1
+    finally:
+        pool.shutdown()
+
+if __name__ == "__main__":
+    test_timeout_returns_partial_and_replaces_worker()
+    test_worker_crash_and_module_error()
+    test_unpicklable_runtime_module()
+    test_shared_memory_is_unlinked()
+    test_limits_are_not_inherited()
+    test_recycled_workers_free_their_slot()
+    test_inline_execution_matches_process_pool()
+    print("Test del pool di esecuzione dei moduli completati con successo!")
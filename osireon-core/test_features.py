@@ -0,0 +1,97 @@
+"""
+Test della vista condivisa delle caratteristiche delle proposte di Osireon.
+Questo script verifica che la vista sia la stessa per risultati colonnari ed estesi, che le metriche
+mancanti abbiano il valore predefinito e che gli agenti producano la stessa analisi con la vista condivisa.
+"""
+from src.agents.analyst_agent import AnalystAgent
+from src.agents.critic_agent import CriticAgent
+from src.agents.features import ProposalFeatures, DEFAULT_SCORE
+from src.modules import economy_it, social_it
+from src.modules.results import as_result, expand_result
+
+INPUT = {
+    "country": "Italia",
+    "domain": "Economia",
+    "proposals": ["Flat tax al 15%", "Reddito di base", "Riduzione IVA"],
+    "constraints": ["costo inferiore a 5 milioni", "impatto superiore a 0.5", "rispetto dei diritti"]
+}
+
+def snapshot(features: ProposalFeatures) -> dict:
+    """
+    Restituisce il contenuto della vista come dizionario confrontabile.
+    """
+    return {
+        "proposals": features.proposals,
+        "module": features.module,
+        "domain_key": features.domain_key,
+        "overall_impact": features.overall_impact,
+        "result_count": features.result_count,
+        "impact": features.impact.tolist(),
+        "feasibility": features.feasibility.tolist(),
+        "constraints_satisfied": features.constraints_satisfied.tolist(),
+        "constraints_total": features.constraints_total.tolist()
+    }
+
+def test_columnar_and_legacy_results_agree():
+    """
+    La vista costruita dalle colonne coincide con quella costruita dal formato esteso.
+    """
+    for module, domain in ((economy_it, "Economia"), (social_it, "sociale")):
+        input_data = dict(INPUT, domain=domain)
+        result = module.run(input_data)
+        columnar = ProposalFeatures.build(input_data, as_result(result))
+        legacy = ProposalFeatures.build(input_data, expand_result(result))
+        assert snapshot(columnar) == snapshot(legacy)
+        assert len(columnar) == 3 and columnar.constraints_total.tolist() == [3, 3, 3]
+    
+    features = ProposalFeatures.build(INPUT, economy_it.run(INPUT))
+    expanded = expand_result(economy_it.run(INPUT))["results"]
+    assert features.impact.tolist() == [expanded[f"proposal_{i+1}"]["impact_score"] for i in range(3)]
+    assert features.domain_key == "economia"
+
+def test_missing_metrics_use_defaults():
+    """
+    Proposte senza risultato, metriche assenti o non numeriche valgono DEFAULT_SCORE e la vista è in sola lettura.
+    """
+    input_data = dict(INPUT, proposals=INPUT["proposals"] + ["Proposta senza risultato"])
+    module_result = {
+        "module": "prova",
+        "results": {
+            "proposal_1": {"impact_score": 0.9, "feasibility": float("nan")},
+            "proposal_2": {"social_impact_score": 0.4, "acceptance_rate": "alta"},
+            "proposal_3": {"constraints_check": [{"satisfied": True}, {"satisfied": False}]}
+        }
+    }
+    features = ProposalFeatures.build(input_data, module_result)
+    assert features.impact.tolist() == [0.9, 0.4, DEFAULT_SCORE, DEFAULT_SCORE]
+    assert features.feasibility.tolist() == [DEFAULT_SCORE] * 4
+    assert features.constraints_satisfied.tolist() == [0, 0, 1, 0]
+    assert features.constraints_total.tolist() == [0, 0, 2, 0]
+    assert features.result_count == 3 and features.overall_impact == DEFAULT_SCORE
+    
+    try:
+        features.impact[0] = 1.0
+        raise AssertionError("vista modificabile")
+    except TypeError:
+        pass
+    
+    empty = ProposalFeatures.build(INPUT, {"status": "error", "message": "modulo non disponibile"})
+    assert empty.result_count == 0 and empty.impact.tolist() == [DEFAULT_SCORE] * 3
+
+def test_agents_agree_with_shared_view():
+    """
+    Gli agenti producono la stessa analisi costruendo la vista da soli o ricevendo quella condivisa.
+    """
+    result = as_result(economy_it.run(INPUT))
+    features = ProposalFeatures.build(INPUT, result)
+    analyst = AnalystAgent()
+    assert analyst.analyze_sync(INPUT, result, features=features) == analyst.analyze_sync(INPUT, expand_result(result))
+    
+    critic = CriticAgent()
+    assert critic.analyze_sync(INPUT, result, features=features) == critic.analyze_sync(INPUT, expand_result(result))
+
+if __name__ == "__main__":
+    test_columnar_and_legacy_results_agree()
+    test_missing_metrics_use_defaults()
+    test_agents_agree_with_shared_view()
+    print("Test della vista delle caratteristiche delle proposte completati con successo!")
@@ -0,0 +1,144 @@
+"""
+Test del grafo delle dipendenze tra moduli di Osireon.
+Questo script verifica la memorizzazione dei risultati dei nodi, la condivisione di un nodo in
+esecuzione tra richieste concorrenti, l'esecuzione parallela dei nodi indipendenti e gli errori
+di dipendenza.
+"""
+import threading
+import time
+from collections import Counter
+
+from src.modules.graph import ModuleGraph, DependencyError
+from src.modules.registry import ModuleRegistry
+
+# Richiesta di base condivisa dai test
+INPUT = {"country": "Italy", "domain": "social", "proposals": ["a", "b"], "constraints": []}
+
+def make_graph(**modules):
+    """
+    Crea un registro con i moduli indicati (nome -> (funzione run, dipendenze)) e il relativo grafo.
+    Le esecuzioni di ogni modulo vengono contate.
+    """
+    registry = ModuleRegistry()
+    calls = Counter()
+    
+    def counted(name, run):
+        def wrapper(input_data):
+            calls[name] += 1
+            return run(input_data)
+        return wrapper
+    
+    for name, (run, depends_on) in modules.items():
+        registry.register(counted(name, run), name, depends_on=depends_on)
+    return registry, ModuleGraph(registry=registry, max_workers=4), calls
+
+def execute(spec, input_data):
+    return spec.run(input_data)
+
+def completed(input_data):
+    return {"status": "completed", "proposals": list(input_data["proposals"])}
+
+def test_node_results_are_memoized():
+    """
+    Una richiesta ripetuta non riesegue nessun nodo; un input o una versione diversa invalidano la cache.
+    """
+    registry, graph, calls = make_graph(
+        base_xx=(completed, []),
+        top_xx=(lambda data: {"status": "completed", "base": data["dependencies"]["base_xx"]["proposals"]}, ["base_xx"])
+    )
+    top = registry.resolve("top_xx")
+    
+    first = graph.run(top, dict(INPUT), execute)
+    assert first["base"] == ["a", "b"]
+    assert first["dependencies"] == {"base_xx": {"version": "0.0.0", "cached": False}}
+    
+    second = graph.run(top, dict(INPUT), execute)
+    assert second["dependencies"]["base_xx"]["cached"] is True
+    assert calls == {"base_xx": 1, "top_xx": 1}
+    assert (graph.hits, graph.misses) == (2, 2)
+    
+    # Il dominio non fa parte della chiave: un'altra richiesta per lo stesso modulo riusa i nodi
+    graph.run(top, dict(INPUT, domain="economy"), execute)
+    assert calls == {"base_xx": 1, "top_xx": 1}
+    
+    graph.run(top, dict(INPUT, proposals=["c"]), execute)
+    assert calls == {"base_xx": 2, "top_xx": 2}
+    
+    # Una nuova versione della dipendenza invalida anche i nodi che ne dipendono
+    registry.register(lambda data: (calls.update(["base_xx"]), completed(data))[1], "base_xx", version="0.0.1")
+    graph.run(top, dict(INPUT), execute)
+    assert calls == {"base_xx": 3, "top_xx": 3}
+    
+    # Il risultato restituito è una copia: modificarlo non altera la cache
+    second["base"].append("modificato")
+    assert graph.run(top, dict(INPUT), execute)["base"] == ["a", "b"]
+
+def test_concurrent_requests_share_running_node():
+    """
+    Un nodo già in esecuzione per un'altra richiesta viene atteso invece di essere ricalcolato.
+    """
+    registry, graph, calls = make_graph(slow_xx=(lambda data: (time.sleep(0.3), completed(data))[1], []))
+    spec = registry.resolve("slow_xx")
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(graph.run(spec, dict(INPUT), execute))) for _ in range(3)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    
+    assert calls["slow_xx"] == 1
+    assert len(results) == 3 and all(result["status"] == "completed" for result in results)
+
+def test_independent_nodes_run_in_parallel():
+    """
+    I nodi dello stesso livello vengono eseguiti in parallelo e il modulo richiesto li riceve tutti.
+    """
+    slow = lambda data: (time.sleep(0.4), {"status": "completed"})[1]
+    registry, graph, calls = make_graph(
+        left_xx=(slow, []),
+        right_xx=(slow, []),
+        top_xx=(lambda data: {"status": "completed", "inputs": sorted(data["dependencies"])}, ["left_xx", "right_xx"])
+    )
+    top = registry.resolve("top_xx")
+    assert [sorted(spec.name for spec in level) for level in graph.plan(top)] == [["left_xx", "right_xx"], ["top_xx"]]
+    
+    start = time.time()
+    result = graph.run(top, dict(INPUT), execute)
+    try:
+        assert time.time() - start < 0.75
+        assert result["inputs"] == ["left_xx", "right_xx"]
+    finally:
+        graph.shutdown()
+
+def test_dependency_errors():
+    """
+    Cicli e dipendenze mancanti sono rifiutati; una dipendenza fallita blocca il nodo e non viene memorizzata.
+    """
+    registry, graph, calls = make_graph(
+        a_xx=(completed, ["b_xx"]),
+        b_xx=(completed, ["a_xx"]),
+        orphan_xx=(completed, ["missing_xx"]),
+        broken_xx=(lambda data: {"status": "error", "message": "dati mancanti"}, []),
+        top_xx=(completed, ["broken_xx"])
+    )
+    for name, message in (("a_xx", "circolare"), ("orphan_xx", "missing_xx")):
+        try:
+            graph.plan(registry.resolve(name))
+            raise AssertionError(f"grafo di {name} accettato")
+        except DependencyError as e:
+            assert message in str(e)
+    
+    for _ in range(2):
+        try:
+            graph.run(registry.resolve("top_xx"), dict(INPUT), execute)
+            raise AssertionError("dipendenza fallita non segnalata")
+        except DependencyError as e:
+            assert "dati mancanti" in str(e)
+    assert calls == {"broken_xx": 2}
+
+if __name__ == "__main__":
+    test_node_results_are_memoized()
+    test_concurrent_requests_share_running_node()
+    test_independent_nodes_run_in_parallel()
+    test_dependency_errors()
+    print("Test del grafo delle dipendenze completati con successo!")
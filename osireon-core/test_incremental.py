@@ -0,0 +1,104 @@
+"""
+Test del calcolo incrementale per proposta di Osireon.
+Questo script verifica che proposte e vincoli già valutati vengano riusati, che il modulo sia eseguito
+solo su ciò che manca e che il risultato coincida con una valutazione completa.
+"""
+from src.modules import economy_it
+from src.modules.incremental import IncrementalEvaluator, apply_delta
+from src.modules.registry import ModuleSpec
+from src.modules.results import as_result
+
+# Proposte e vincoli della simulazione di partenza
+PROPOSALS = ["Flat tax al 20%", "Reddito minimo", "Bonus casa"]
+CONSTRAINTS = ["Bilancio in pareggio", "Regole UE"]
+
+SPEC = ModuleSpec.from_module("economy_it", economy_it)
+
+def counting_execute(calls: list):
+    """
+    Crea una funzione di esecuzione che registra proposte e vincoli ricevuti dal modulo.
+    """
+    def execute(spec, input_data):
+        calls.append((list(input_data["proposals"]), list(input_data["constraints"])))
+        return spec.run(input_data)
+    return execute
+
+def legacy(result) -> dict:
+    """
+    Restituisce il risultato in formato esteso, senza le statistiche del calcolo incrementale.
+    """
+    expanded = as_result(result).to_legacy()
+    expanded.pop("incremental", None)
+    return expanded
+
+def test_reuse_counts():
+    """
+    Le proposte già valutate, anche riordinate, non vengono ricalcolate.
+    """
+    evaluator = IncrementalEvaluator(cache_size=1000)
+    calls = []
+    execute = counting_execute(calls)
+    input_data = {"country": "Italy", "proposals": PROPOSALS, "constraints": CONSTRAINTS}
+    
+    first = evaluator.evaluate(SPEC, input_data, execute)
+    assert first["incremental"] == {"computed_proposals": 3, "reused_proposals": 0, "computed_cells": 6, "reused_cells": 0}
+    assert legacy(first) == legacy(economy_it.run(input_data))
+    
+    calls.clear()
+    reordered = dict(input_data, proposals=["Bonus casa", "Nuova proposta", "Flat tax al 20%", "Reddito minimo"])
+    second = evaluator.evaluate(SPEC, reordered, execute)
+    assert calls == [(["Nuova proposta"], CONSTRAINTS)]
+    assert second["incremental"] == {"computed_proposals": 1, "reused_proposals": 3, "computed_cells": 2, "reused_cells": 6}
+    assert second["results"]["proposal_1"] == first["results"]["proposal_3"]
+    assert legacy(second) == legacy(economy_it.run(reordered))
+    
+    # Un vincolo aggiunto richiede solo le celle nuove, per tutte le proposte in una sola esecuzione
+    calls.clear()
+    extended = dict(input_data, constraints=CONSTRAINTS + ["Tutela del lavoro"])
+    third = evaluator.evaluate(SPEC, extended, execute)
+    assert calls == [(PROPOSALS, ["Tutela del lavoro"])]
+    assert third["incremental"] == {"computed_proposals": 0, "reused_proposals": 3, "computed_cells": 3, "reused_cells": 6}
+    assert legacy(third) == legacy(economy_it.run(extended))
+    
+    # Un contesto diverso (altro paese) non riusa i risultati
+    calls.clear()
+    evaluator.evaluate(SPEC, dict(input_data, country="Francia"), execute)
+    assert calls == [(PROPOSALS, CONSTRAINTS)]
+
+def test_seed_from_prior_result():
+    """
+    Un risultato precedente della stessa versione del modulo popola la cache; una versione diversa viene ignorata.
+    """
+    input_data = {"country": "Italy", "proposals": PROPOSALS, "constraints": CONSTRAINTS}
+    prior = dict(legacy(economy_it.run(input_data)), module_version=SPEC.version)
+    
+    evaluator = IncrementalEvaluator(cache_size=1000)
+    assert evaluator.seed(SPEC, input_data, prior) == 3
+    calls = []
+    result = evaluator.evaluate(SPEC, dict(input_data, proposals=PROPOSALS + ["Altra"]), counting_execute(calls))
+    assert calls == [(["Altra"], CONSTRAINTS)]
+    assert result["incremental"]["reused_proposals"] == 3
+    
+    assert IncrementalEvaluator(cache_size=1000).seed(SPEC, input_data, dict(prior, module_version="0.0.1")) == 0
+
+def test_apply_delta():
+    """
+    Le modifiche a proposte e vincoli mantengono l'ordine e non duplicano gli elementi.
+    """
+    delta = {
+        "added_proposals": ["Nuova", "Flat tax al 20%"],
+        "removed_proposals": ["Reddito minimo"],
+        "edited_proposals": {"Bonus casa": "Bonus casa esteso"},
+        "added_constraints": ["Regole UE", "Tutela del lavoro"],
+        "removed_constraints": ["Bilancio in pareggio"]
+    }
+    assert apply_delta(PROPOSALS, CONSTRAINTS, delta) == (
+        ["Flat tax al 20%", "Bonus casa esteso", "Nuova"],
+        ["Regole UE", "Tutela del lavoro"]
+    )
+
+if __name__ == "__main__":
+    test_reuse_counts()
+    test_seed_from_prior_result()
+    test_apply_delta()
+    print("Test del calcolo incrementale completati con successo!")
@@ -0,0 +1,126 @@
+"""
+Test della classe base degli agenti LLM di Osireon.
+Questo script verifica l'invio parallelo dei prompt con limite di concorrenza, i budget di token e di
+tempo con le risposte parziali, la pubblicazione dei frammenti e l'annullamento da parte del gestore.
+"""
+import asyncio
+import time
+
+from src.agents.base import AgentManager
+from src.agents.cache import AgentCache
+from src.agents.llm_agent import LLMAgent
+
+class ScriptedConnector:
+    """
+    Connettore che restituisce per ogni prompt una risposta fissa, una parola alla volta.
+    """
+    
+    default_provider = "openai"
+    default_model = "gpt-4"
+    default_temperature = 0.0
+    
+    def __init__(self, words: int = 5, delay: float = 0.05):
+        self.words = words
+        self.delay = delay
+        self.active = 0
+        self.max_active = 0
+        self.cancelled = 0
+    
+    async def stream_llm(self, prompt, provider=None, model=None, temperature=None, max_tokens=None,
+                         cache=None, priority="interactive"):
+        self.active += 1
+        self.max_active = max(self.max_active, self.active)
+        try:
+            for k in range(self.words):
+                await asyncio.sleep(self.delay)
+                yield ("" if k == 0 else " ") + f"{prompt}-{k}"
+        except asyncio.CancelledError:
+            self.cancelled += 1
+            raise
+        finally:
+            self.active -= 1
+
+class EchoAgent(LLMAgent):
+    """
+    Agente con un prompt per proposta che restituisce le risposte ricevute.
+    """
+    
+    def build_prompts(self, input_data, module_result):
+        return {f"proposal_{i+1}": f"p{i+1}" for i, _ in enumerate(input_data["proposals"])}
+    
+    def compose(self, input_data, module_result, responses):
+        return {"responses": responses}
+
+INPUT = {"country": "Italy", "domain": "economia", "proposals": ["a", "b", "c", "d", "e", "f"], "constraints": []}
+
+def test_prompts_run_in_parallel_within_concurrency():
+    """
+    I prompt sono inviati in parallelo, mai più di max_concurrency alla volta, e i frammenti vengono pubblicati.
+    """
+    connector = ScriptedConnector(words=4, delay=0.05)
+    agent = EchoAgent("echo", connector=connector, max_concurrency=3, token_budget=10000, latency_budget=10)
+    events = []
+    
+    start = time.monotonic()
+    result = asyncio.run(agent.analyze(INPUT, {}, publish=events.append))
+    elapsed = time.monotonic() - start
+    
+    assert connector.max_active == 3
+    assert elapsed < 6 * 4 * 0.05  # Due turni da tre prompt, non sei prompt in sequenza
+    assert result["responses"]["proposal_2"] == "p2-0 p2-1 p2-2 p2-3"
+    assert "status" not in result
+    assert set(result["llm_usage"]["prompts"].values()) == {"completed"}
+    
+    partial = [event for event in events if event["type"] == "partial"]
+    completions = [event for event in events if event["type"] == "completion"]
+    assert len(partial) == 6 * 4 and len(completions) == 6
+    assert "".join(event["delta"] for event in partial if event["prompt"] == "proposal_1") == result["responses"]["proposal_1"]
+
+def test_token_budget_truncates_and_skips():
+    """
+    Esaurito il budget di token, la risposta in corso viene troncata e i prompt successivi non vengono inviati.
+    """
+    connector = ScriptedConnector(words=10, delay=0.01)
+    agent = EchoAgent("echo", connector=connector, max_concurrency=1, token_budget=20, latency_budget=10)
+    result = asyncio.run(agent.analyze(INPUT, {}))
+    
+    prompts = result["llm_usage"]["prompts"]
+    assert prompts["proposal_1"] == "truncated"
+    assert set(list(prompts.values())[1:]) == {"skipped"}
+    assert result["status"] == "partial"
+    assert result["llm_usage"]["prompt_tokens"] + result["llm_usage"]["completion_tokens"] >= 20
+
+def test_latency_budget_keeps_partial_responses():
+    """
+    Allo scadere del budget di tempo le chiamate vengono annullate e compose riceve le risposte parziali.
+    """
+    connector = ScriptedConnector(words=20, delay=0.05)
+    agent = EchoAgent("echo", connector=connector, max_concurrency=6, token_budget=10000, latency_budget=0.3)
+    result = asyncio.run(agent.analyze(INPUT, {}))
+    
+    assert result["status"] == "partial"
+    assert set(result["llm_usage"]["prompts"].values()) == {"timeout"}
+    assert result["responses"]["proposal_1"].startswith("p1-0")
+    assert connector.cancelled == 6 and connector.active == 0
+
+def test_manager_deadline_cancels_llm_calls():
+    """
+    La scadenza del gestore degli agenti annulla anche le chiamate LLM in corso.
+    """
+    connector = ScriptedConnector(words=100, delay=0.05)
+    manager = AgentManager(timeout=0.3, cache=AgentCache(size=0, persistent=False))
+    manager.register_agent(EchoAgent("echo", connector=connector, latency_budget=30))
+    try:
+        result = manager.run_agents(INPUT, {})
+    finally:
+        manager.shutdown()
+    
+    assert result["echo"]["status"] == "timeout"
+    assert connector.cancelled > 0 and connector.active == 0
+
+if __name__ == "__main__":
+    test_prompts_run_in_parallel_within_concurrency()
+    test_token_budget_truncates_and_skips()
+    test_latency_budget_keeps_partial_responses()
+    test_manager_deadline_cancels_llm_calls()
+    print("Test degli agenti LLM completati con successo!")
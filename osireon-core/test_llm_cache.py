@@ -0,0 +1,142 @@
+"""
+Test della cache delle risposte LLM di Osireon.
+Questo script verifica la normalizzazione dei prompt nella chiave, l'esclusione delle temperature non
+deterministiche, la scadenza delle voci, il livello persistente nel database e l'esclusione delle
+risposte troncate da max_tokens.
+"""
+import asyncio
+import os
+import tempfile
+import time
+
+import src.llm.cache as cache_module
+from src.db import models
+from src.db.database import DatabaseManager
+from src.llm.cache import LLMCache, normalize_prompt
+from src.llm.connector import LLMConnector
+
+PROMPT = "Analizza l'impatto economico della flat tax al 15% in Italia."
+
+def test_equivalent_prompts_share_key():
+    """
+    Prompt che differiscono solo per spazi, fine riga e forma Unicode hanno la stessa chiave.
+    """
+    cache = LLMCache(size=10, persistent=False)
+    assert normalize_prompt("  Analisi\r\n\r\n\r\n\tdella   policy  \r\n") == "Analisi\n\ndella policy"
+    assert normalize_prompt("citta\u0300") == normalize_prompt("citt\u00e0")
+    
+    key = cache.key("openai", "gpt-4", 0, PROMPT)
+    assert cache.key("OpenAI", "gpt-4", 0.0, "  " + PROMPT.replace(" ", "  ") + "\r\n") == key
+    assert cache.key("openai", "gpt-4", 0.2, PROMPT) != key
+    assert cache.key("openai", "gpt-3.5-turbo", 0, PROMPT) != key
+    assert cache.key("deepseek", "gpt-4", 0, PROMPT) != key
+
+def test_temperature_and_override():
+    """
+    Solo le temperature deterministiche usano la cache, salvo scelta esplicita del chiamante.
+    """
+    cache = LLMCache(size=10, persistent=False, max_temperature=0)
+    assert cache.cacheable(0)
+    assert not cache.cacheable(0.7)
+    assert cache.cacheable(0.7, True)
+    assert not cache.cacheable(0, False)
+    assert cache.stats()["bypassed"] == 1
+    assert not LLMCache(size=0, persistent=False).cacheable(0, True)
+
+def test_memory_hits_and_expiry():
+    """
+    Una risposta memorizzata viene riusata fino alla scadenza; la LRU resta entro la dimensione massima.
+    """
+    cache = LLMCache(size=2, ttl=0.2, persistent=False)
+    key = cache.key("openai", "gpt-4", 0, PROMPT)
+    assert cache.lookup(key) is None
+    assert cache.store(key, "openai", "gpt-4", PROMPT, "Risposta completa")
+    assert not cache.store(key, "openai", "gpt-4", PROMPT, "")
+    assert cache.lookup(key) == "Risposta completa"
+    
+    time.sleep(0.3)
+    assert cache.lookup(key) is None
+    stats = cache.stats()
+    assert (stats["memory_hits"], stats["misses"], stats["stores"], stats["entries"]) == (1, 2, 1, 0)
+    assert stats["bytes_saved"] == len("Risposta completa") and stats["hit_ratio"] == round(1 / 3, 4)
+    
+    lru = LLMCache(size=2, ttl=0, persistent=False)
+    for k in range(3):
+        lru.store(f"k{k}", "openai", "gpt-4", f"prompt {k}", f"risposta {k}")
+    assert lru.lookup("k0") is None and lru.lookup("k2") == "risposta 2"
+    assert lru.stats()["entries"] == 2
+
+def test_persistent_layer_survives_restart():
+    """
+    Con il database inizializzato, una nuova cache trova le risposte salvate da quella precedente,
+    ma non quelle scadute.
+    """
+    original = (models.DATABASE_URL, cache_module.db_manager)
+    with tempfile.TemporaryDirectory() as directory:
+        models.DATABASE_URL = f"sqlite:///{os.path.join(directory, 'osireon.db')}"
+        db = DatabaseManager()
+        db.initialize()
+        cache_module.db_manager = db
+        try:
+            cache = LLMCache(size=10, ttl=0, persistent=True)
+            assert cache.persistent_active()
+            key = cache.key("openai", "gpt-4", 0, PROMPT)
+            cache.store(key, "openai", "gpt-4", PROMPT, "Risposta salvata")
+            
+            short = LLMCache(size=10, ttl=0.2, persistent=True)
+            expiring = short.key("openai", "gpt-4", 0, "Prompt in scadenza")
+            short.store(expiring, "openai", "gpt-4", "Prompt in scadenza", "Risposta in scadenza")
+            time.sleep(0.3)
+            
+            restarted = LLMCache(size=10, ttl=0, persistent=True)
+            assert restarted.lookup(key) == "Risposta salvata"
+            assert restarted.lookup(key) == "Risposta salvata"
+            assert restarted.lookup(expiring) is None
+            stats = restarted.stats()
+            assert (stats["persistent_hits"], stats["memory_hits"], stats["misses"]) == (1, 1, 1)
+            
+            assert not LLMCache(size=10, persistent=False).lookup(key)
+        finally:
+            models.DATABASE_URL, cache_module.db_manager = original
+
+def test_truncated_streams_are_not_stored():
+    """
+    Una risposta in streaming troncata da max_tokens non viene memorizzata; una completa sì,
+    e viene poi servita dalla cache anche con un limite di token.
+    """
+    connector = LLMConnector()
+    connector.cache = LLMCache(size=10, ttl=0, persistent=False)
+    
+    async def collect(max_tokens=None):
+        chunks = [chunk async for chunk in connector.stream_llm(PROMPT, "openai", "gpt-4", 0, max_tokens)]
+        return "".join(chunks)
+    
+    truncated = asyncio.run(collect(max_tokens=5))
+    assert truncated and connector.cache.stats()["stores"] == 0
+    
+    complete = asyncio.run(collect())
+    assert complete.startswith(truncated) and len(complete) > len(truncated)
+    assert connector.cache.stats()["stores"] == 1
+    
+    assert asyncio.run(collect()) == complete
+    assert asyncio.run(collect(max_tokens=5)) == truncated
+    assert connector.cache.stats()["memory_hits"] == 2
+    
+    # A temperatura non deterministica la cache non viene consultata né aggiornata
+    async def first_chunk():
+        stream = connector.stream_llm(PROMPT, "openai", "gpt-4", 0.7)
+        try:
+            return await stream.__anext__()
+        finally:
+            await stream.aclose()
+    
+    assert asyncio.run(first_chunk())
+    assert connector.cache.stats()["bypassed"] == 1 and connector.cache.stats()["stores"] == 1
+
+if __name__ == "__main__":
+    test_equivalent_prompts_share_key()
+    test_temperature_and_override()
+    test_memory_hits_and_expiry()
+    test_persistent_layer_survives_restart()
+    test_truncated_streams_are_not_stored()
+    print("Test della cache delle risposte LLM completati con successo!")
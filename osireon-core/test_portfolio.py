@@ -0,0 +1,94 @@
+"""
+Test dell'ottimizzatore dei portafogli di proposte di Osireon.
+Questo script confronta la frontiera di Pareto del branch-and-bound con l'enumerazione di tutti i
+portafogli su istanze piccole e verifica proposte obbligatorie, escluse e limiti di cardinalità.
+"""
+import itertools
+import random
+
+from src.modules.portfolio import PortfolioOptimizer
+
+def random_instance(n: int, seed: int):
+    """
+    Genera proposte con metriche casuali (riproducibili).
+    """
+    rng = random.Random(seed)
+    proposals = [f"Proposta {i}" for i in range(n)]
+    metrics = {
+        "impact_score": [rng.uniform(0.05, 1.0) for _ in range(n)],
+        "feasibility": [rng.uniform(0.1, 1.0) for _ in range(n)],
+        "cost_estimate": [float(rng.randrange(1, 50)) * 1e5 for _ in range(n)]
+    }
+    return proposals, metrics
+
+def brute_force_frontier(metrics, budget: float, max_proposals=None):
+    """
+    Calcola la frontiera costo/impatto atteso enumerando tutti i portafogli ammissibili.
+    """
+    n = len(metrics["cost_estimate"])
+    points = []
+    for size in range(n + 1 if max_proposals is None else max_proposals + 1):
+        for subset in itertools.combinations(range(n), size):
+            cost = sum(metrics["cost_estimate"][i] for i in subset)
+            if cost <= budget:
+                value = sum(metrics["impact_score"][i] * metrics["feasibility"][i] for i in subset)
+                points.append((cost, value))
+    
+    frontier = []
+    for cost, value in sorted(points, key=lambda p: (p[0], -p[1])):
+        if not frontier or value > frontier[-1][1] + 1e-9:
+            frontier.append((cost, value))
+    return frontier
+
+def rounded(points):
+    return [(round(cost), round(value, 9)) for cost, value in points]
+
+def test_frontier_matches_enumeration():
+    """
+    La frontiera coincide con quella ottenuta enumerando i portafogli, con e senza limite di cardinalità,
+    esplorando meno nodi dei portafogli possibili.
+    """
+    optimizer = PortfolioOptimizer(time_limit=30, max_points=1000)
+    for seed in range(5):
+        proposals, metrics = random_instance(12, seed)
+        budget = 6e6
+        for max_proposals in (None, 3):
+            result = optimizer.optimize(proposals, metrics, budget, max_proposals=max_proposals)
+            assert result["complete"]
+            frontier = [(point["cost"], point["expected_impact"]) for point in result["frontier"]]
+            assert rounded(frontier) == rounded(brute_force_frontier(metrics, budget, max_proposals))
+            
+            for point in result["frontier"]:
+                assert point["cost"] <= budget and point["count"] == len(point["proposals"])
+                assert max_proposals is None or point["count"] <= max_proposals
+    
+    proposals, metrics = random_instance(24, 42)
+    result = optimizer.optimize(proposals, metrics, 1e7, max_points=1)
+    assert len(result["frontier"]) == 1 and not result["complete"]
+    assert result["nodes_explored"] < 2 ** 24 // 100
+
+def test_required_and_excluded_proposals():
+    """
+    Le proposte obbligatorie sono in ogni portafoglio, quelle escluse o poco fattibili in nessuno.
+    """
+    proposals = ["A", "B", "C", "D"]
+    metrics = {
+        "impact_score": [0.9, 0.8, 0.5, 0.6],
+        "feasibility": [0.9, 0.2, 0.9, 0.9],
+        "cost_estimate": [3e6, 1e6, 1e6, 2e6]
+    }
+    optimizer = PortfolioOptimizer(time_limit=5)
+    result = optimizer.optimize(proposals, metrics, 4e6, min_feasibility=0.5, required=["D"], excluded=["A"])
+    
+    reasons = {c["proposal"]: c["reason"] for c in result["candidates"]}
+    assert reasons == {"A": "esclusa", "B": "fattibilità insufficiente", "C": None, "D": None}
+    assert [point["proposals"] for point in result["frontier"]] == [["D"], ["C", "D"]]
+    
+    # Le proposte obbligatorie oltre il budget rendono il problema impossibile
+    assert optimizer.optimize(proposals, metrics, 1e6, required=["D"])["status"] == "error"
+    assert optimizer.optimize(proposals, metrics, 1e7, required=["C", "D"], max_proposals=1)["status"] == "error"
+
+if __name__ == "__main__":
+    test_frontier_matches_enumeration()
+    test_required_and_excluded_proposals()
+    print("Test dell'ottimizzatore dei portafogli completati con successo!")
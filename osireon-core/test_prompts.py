@@ -0,0 +1,120 @@
+"""
+Test del costruttore dei prompt LLM di Osireon.
+Questo script verifica il conteggio dei token con cache, il troncamento al budget, la riduzione delle
+sezioni di contesto per priorità, il riuso del prefisso comune tra agenti e la serializzazione dei
+risultati colonnari.
+"""
+from src.agents import LLMAgent
+from src.llm.prompts import PromptBuilder, PromptSection, TokenCounter, SYSTEM_PROMPT
+from src.modules import economy_it
+from src.modules.results import as_result, expand_result
+
+INPUT = {
+    "country": "Italia",
+    "domain": "Economia",
+    "proposals": ["Flat tax al 15%", "Reddito di base"],
+    "constraints": ["costo inferiore a 5 milioni"]
+}
+
+class TaskAgent(LLMAgent):
+    """
+    Agente con una richiesta per proposta, usato solo per costruire i prompt.
+    """
+    
+    def build_prompts(self, input_data, module_result):
+        return {f"proposal_{i+1}": self.prompt(input_data, module_result, f"Analizza la proposta {p} come {self.name}.")
+                for i, p in enumerate(input_data["proposals"])}
+    
+    def compose(self, input_data, module_result, responses):
+        return {"summary": ""}
+
+def test_token_counter():
+    """
+    I frammenti ricompongono il testo, i conteggi ripetuti vengono serviti dalla cache e il troncamento
+    rispetta il numero massimo di token.
+    """
+    counter = TokenCounter(cache_size=2)
+    text = 'Costo stimato: 4.500.000 euro, {"impact_score": 0.725, "feasibility": 0.6} per la proposta.'
+    assert "".join(piece for piece, _ in counter.pieces(text)) == text
+    tokens = counter.count(text)
+    assert tokens > len(text.split()) and counter.count(text) == tokens
+    assert counter.count("") == 0
+    assert TokenCounter(cache_size=0).count(text) == tokens
+    
+    for other in ("primo testo", "secondo testo"):
+        counter.count(other)
+    stats = counter.stats()
+    assert (stats["hits"], stats["misses"], stats["entries"]) == (1, 3, 2)
+    
+    assert counter.truncate(text, tokens) == (text, 0)
+    long_text = "parola " * 200
+    truncated, dropped = counter.truncate(long_text, 50)
+    assert counter.count(truncated) <= 50 and dropped > 0
+    assert truncated.endswith(f"[... {dropped} token omessi per il budget del prompt]")
+
+def test_sections_are_reduced_within_budget():
+    """
+    Le sezioni oltre il budget vengono riassunte o troncate a partire dalla priorità più bassa;
+    quelle non riducibili restano intatte e la richiesta viene troncata al budget residuo.
+    """
+    builder = PromptBuilder(counter=TokenCounter(), budget=400, task_reserve=100)
+    series = [{"t": k, "valore": k / 7, "dettaglio": {"serie": [k / 3] * 20}} for k in range(100)]
+    sections = [
+        PromptSection("Vincoli", "Il costo non deve superare 5 milioni.", priority=5, reducible=False),
+        PromptSection("Simulazione", {"proposte": INPUT["proposals"]}, priority=2),
+        PromptSection("Serie", series, priority=0),
+        PromptSection("Note", "nota " * 300, priority=1)
+    ]
+    prefix = builder.prefix(sections)
+    assert prefix.tokens <= 400 - 100
+    assert prefix.text.startswith(SYSTEM_PROMPT)
+    assert "## Vincoli\nIl costo non deve superare 5 milioni." in prefix.text
+    assert '## Simulazione\n{"proposte":["Flat tax al 15%","Reddito di base"]}' in prefix.text
+    assert prefix.reduced["Serie"] in ("summarized", "truncated") and "Simulazione" not in prefix.reduced
+    assert prefix.dropped_tokens > 0
+    
+    prompt = builder.build(prefix, "domanda " * 500)
+    assert prompt.tokens <= 400 and prompt.prefix_tokens == prefix.tokens
+    assert prompt.text.startswith(prefix.text) and "token omessi" in prompt.text[len(prefix.text):]
+    assert builder.stats()["truncated_tasks"] == 1
+    
+    # Un contesto che rientra nel budget non viene ridotto
+    small = builder.prefix(sections[:2])
+    assert small.reduced == {} and small.dropped_tokens == 0
+
+def test_prefix_is_shared_between_agents():
+    """
+    Agenti diversi con lo stesso contesto producono prompt con un prefisso identico, costruito una sola volta.
+    """
+    builder = PromptBuilder(counter=TokenCounter(), budget=3000, task_reserve=500)
+    analyst = TaskAgent("narrative_analyst", builder=builder)
+    critic = TaskAgent("narrative_critic", builder=builder)
+    result = economy_it.run(INPUT)
+    
+    first = analyst.build_prompts(INPUT, result)
+    second = critic.build_prompts(INPUT, dict(result, incremental={"reused_proposals": 2}))
+    prefix_text = builder.prefix(analyst.context_sections(INPUT, result)).text
+    for prompt in list(first.values()) + list(second.values()):
+        assert prompt.startswith(prefix_text + "\n\n## Richiesta\n")
+    assert first["proposal_1"] != second["proposal_1"]
+    
+    stats = builder.stats()
+    assert stats["prefix_builds"] == 1 and stats["prefix_hits"] == 4 and stats["prompts"] == 4
+
+def test_columnar_results_are_serialized():
+    """
+    I risultati colonnari vengono serializzati come il formato esteso, non come rappresentazione dell'oggetto.
+    """
+    builder = PromptBuilder(counter=TokenCounter(), budget=3000, task_reserve=500)
+    result = economy_it.run(INPUT)
+    columnar = builder.prefix([PromptSection("Risultati del modulo", as_result(result))])
+    expanded = builder.prefix([PromptSection("Risultati del modulo", expand_result(result))])
+    assert columnar.text == expanded.text
+    assert '"proposal_1":{' in columnar.text and "ProposalResults" not in columnar.text
+
+if __name__ == "__main__":
+    test_token_counter()
+    test_sections_are_reduced_within_budget()
+    test_prefix_is_shared_between_agents()
+    test_columnar_results_are_serialized()
+    print("Test del costruttore dei prompt LLM completati con successo!")
@@ -0,0 +1,96 @@
+"""
+Test degli interruttori automatici dei provider LLM di Osireon.
+Questo script verifica il ciclo apertura, attesa, prova fallita e riapertura dell'interruttore,
+sia direttamente sia attraverso le chiamate del connettore LLM.
+"""
+import asyncio
+import time
+
+from src.llm.connector import LLMConnector
+from src.llm.resilience import CircuitBreaker, ResilienceManager, CLOSED, OPEN, HALF_OPEN
+
+# Attesa dopo l'apertura dell'interruttore usata nei test (secondi)
+COOLDOWN = 0.05
+
+class FailingProvider:
+    """
+    Provider che fallisce sempre, per aprire l'interruttore.
+    """
+    
+    def __init__(self):
+        self.calls = 0
+    
+    async def complete(self, prompt, model, temperature, max_tokens, outcome=None):
+        self.calls += 1
+        raise ConnectionError("provider non raggiungibile")
+
+def test_breaker_reopens_after_failed_trial():
+    """
+    Dopo l'attesa una sola chiamata di prova è consentita; se fallisce l'interruttore si riapre.
+    """
+    breaker = CircuitBreaker("openai", failure_threshold=2, cooldown=COOLDOWN)
+    breaker.record_failure()
+    breaker.record_failure()
+    assert breaker.state == OPEN and breaker.trips == 1
+    assert not breaker.allow()
+    
+    time.sleep(COOLDOWN * 2)
+    assert breaker.allow()
+    assert breaker.state == HALF_OPEN
+    assert not breaker.allow(), "a mezzo aperto è consentita una sola prova"
+    
+    breaker.record_failure()
+    assert breaker.state == OPEN and breaker.trips == 2
+    assert not breaker.allow()
+    
+    # Una prova annullata libera il posto per la successiva; una prova riuscita richiude
+    time.sleep(COOLDOWN * 2)
+    assert breaker.allow()
+    breaker.release()
+    assert breaker.allow()
+    breaker.record_success()
+    assert breaker.state == CLOSED and breaker.allow()
+
+def test_connector_trip_cooldown_failed_trial_reopen():
+    """
+    Il connettore prenota le chiamate con allow(): dopo l'apertura il provider viene saltato,
+    dopo l'attesa riceve una sola prova e, se fallisce, viene escluso di nuovo.
+    """
+    connector = LLMConnector()
+    connector.batching = False
+    connector.resilience = ResilienceManager()
+    connector.resilience.fallbacks = [("deepseek", None)]
+    connector.resilience.hedging = False
+    provider = FailingProvider()
+    connector.providers = {"openai": provider}
+    breaker = CircuitBreaker("openai", failure_threshold=2, cooldown=COOLDOWN)
+    connector.resilience._breakers["openai"] = breaker
+    
+    async def call() -> str:
+        return await connector.call_llm_async("prompt di prova", provider="openai", model="gpt-4", cache=False)
+    
+    async def scenario() -> None:
+        # Due errori aprono l'interruttore; la risposta arriva dalla destinazione di riserva
+        for _ in range(2):
+            assert await call()
+        assert breaker.state == OPEN and breaker.trips == 1 and provider.calls == 2
+        
+        # Con l'interruttore aperto il provider non viene chiamato
+        await call()
+        assert provider.calls == 2
+        
+        # Dopo l'attesa: una sola prova per le chiamate concorrenti, che fallisce e riapre l'interruttore
+        await asyncio.sleep(COOLDOWN * 2)
+        await asyncio.gather(*[call() for _ in range(5)])
+        assert provider.calls == 3
+        assert breaker.state == OPEN and breaker.trips == 2
+        
+        await call()
+        assert provider.calls == 3
+    
+    asyncio.run(scenario())
+
+if __name__ == "__main__":
+    test_breaker_reopens_after_failed_trial()
+    test_connector_trip_cooldown_failed_trial_reopen()
+    print("Test degli interruttori completati con successo!")
@@ -0,0 +1,69 @@
+"""
+Test del formato colonnare dei risultati dei moduli di Osireon.
+Questo script verifica che un risultato con valori mancanti (NaN o None) sopravviva al
+salvataggio nel database e alla rilettura nel formato esteso.
+"""
+import json
+import math
+import os
+import tempfile
+
+from src.db import models
+from src.db.database import DatabaseManager
+from src.modules.results import ResultBuilder, ColumnarResult, storable_result, expand_result
+
+def build_result() -> ColumnarResult:
+    """
+    Costruisce un risultato con margini mancanti, come quello di un vincolo non compilabile.
+    """
+    builder = ResultBuilder(2, module="economy_it", status="completed", overall_impact=0.65)
+    builder.column("impact_score", "float", [0.4, math.nan])
+    builder.column("feasibility", "float", [None, 0.8])
+    builder.records_column("constraints_check", [1, 1], {
+        "constraint": ("str", ["Nessun aumento del debito pubblico"] * 2),
+        "satisfied": ("bool", [True, False]),
+        "margin": ("float", [None, -0.25])
+    })
+    return ColumnarResult(builder.build())
+
+def test_missing_values_survive_json():
+    """
+    NaN e None vengono letti come None anche dopo la serializzazione in JSON (dove diventano null).
+    """
+    stored = json.loads(json.dumps(storable_result(build_result())))
+    legacy = expand_result(stored)
+    
+    assert legacy["results"]["proposal_1"]["impact_score"] == 0.4
+    assert legacy["results"]["proposal_2"]["impact_score"] is None
+    assert legacy["results"]["proposal_1"]["feasibility"] is None
+    assert legacy["results"]["proposal_1"]["constraints_check"][0]["margin"] is None
+    assert legacy["results"]["proposal_2"]["constraints_check"][0] == {
+        "constraint": "Nessun aumento del debito pubblico", "satisfied": False, "margin": -0.25
+    }
+    assert ColumnarResult(stored).column("impact_score") == [0.4, None]
+
+def test_database_round_trip():
+    """
+    Salvataggio, rilettura e to_dict di un risultato con valori mancanti.
+    """
+    original_url = models.DATABASE_URL
+    with tempfile.TemporaryDirectory() as directory:
+        models.DATABASE_URL = f"sqlite:///{os.path.join(directory, 'osireon.db')}"
+        try:
+            db = DatabaseManager()
+            db.initialize()
+            simulation_id = db.create_simulation("it", "economia", ["a", "b"], ["Nessun aumento del debito pubblico"])
+            db.save_module_result(simulation_id, "economy_it", build_result())
+            
+            results = db.get_simulation_results(simulation_id)
+            loaded = results["module_results"][0]["result"]
+            assert loaded == build_result().to_legacy()
+            assert loaded["results"]["proposal_2"]["impact_score"] is None
+            assert loaded["results"]["proposal_1"]["constraints_check"][0]["margin"] is None
+        finally:
+            models.DATABASE_URL = original_url
+
+if __name__ == "__main__":
+    test_missing_values_survive_json()
+    test_database_round_trip()
+    print("Test del formato colonnare completati con successo!")
@@ -0,0 +1,121 @@
+"""
+Test del registro dei ruleset etici di Osireon.
+Questo script verifica l'individuazione dei file ruleset_xx.json, il ricaricamento quando la firma
+di un file cambia, la conservazione delle versioni precedenti e la richiesta di una versione specifica.
+"""
+import json
+import os
+import shutil
+import tempfile
+
+from src.ethics.registry import RulesetRegistry
+from src.ethics.validator import EthicsValidator
+
+# Ruleset italiano distribuito con il codice
+RULESET_IT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "ethics", "ruleset_it.json")
+
+def write_ruleset(directory: str, country: str, version: str, keywords: list) -> str:
+    """
+    Scrive un ruleset con una sola regola che vieta le parole chiave indicate.
+    """
+    path = os.path.join(directory, f"ruleset_{country}.json")
+    rule = {
+        "id": f"{country}_001", "name": "Regola di prova", "keywords": keywords, "severity": "high",
+        "violation": {"keywords": keywords, "reason": "Parola vietata"}
+    }
+    with open(path, "w", encoding="utf-8") as file:
+        json.dump({"version": version, "rules": [rule]}, file)
+    return path
+
+def make_registry(directory: str, history: int = 5) -> RulesetRegistry:
+    """
+    Crea un registro sulla directory indicata, con i controlli dei file eseguiti dal test.
+    """
+    return RulesetRegistry(directory, fallback_country="", watch_interval=0, history=history)
+
+def test_discovery():
+    """
+    Vengono indicizzati solo i file ruleset_xx.json; un file aggiunto dopo viene trovato alla prima richiesta.
+    """
+    with tempfile.TemporaryDirectory() as directory:
+        shutil.copy(RULESET_IT, os.path.join(directory, "ruleset_it.json"))
+        write_ruleset(directory, "fr", "0.1", ["religion"])
+        write_ruleset(directory, "xyz", "0.1", ["ignorata"])
+        with open(os.path.join(directory, "notes.json"), "w") as file:
+            file.write("{}")
+        
+        registry = make_registry(directory)
+        assert registry.discover() == ["fr", "it"]
+        assert registry.get("Italia").key.startswith("it@1.0.0+")
+        assert registry.get("fr").key.startswith("fr@0.1+")
+        assert registry.get("de") is None
+        
+        write_ruleset(directory, "de", "1", ["verboten"])
+        assert registry.get("Germany").key.startswith("de@1+")
+
+def test_reload_on_signature_change():
+    """
+    Un file modificato viene ricaricato quando la firma è stabile per due controlli; un file non valido
+    lascia attiva la versione precedente e un file toccato senza modifiche non crea una nuova versione.
+    """
+    with tempfile.TemporaryDirectory() as directory:
+        path = write_ruleset(directory, "fr", "0.1", ["religion"])
+        registry = make_registry(directory)
+        validator = EthicsValidator(registry)
+        first = registry.get("fr")
+        assert validator.validate(["taxe carbone"], "sociale", country="fr")["passed"] is True
+        
+        write_ruleset(directory, "fr", "0.2", ["religion", "carbone"])
+        assert registry.check() == []  # Firma vista una volta: il file potrebbe essere ancora in scrittura
+        assert registry.check() == ["fr"]
+        second = registry.get("fr")
+        assert second.key != first.key and second.version == "0.2"
+        assert validator.validate(["taxe carbone"], "sociale", country="fr")["passed"] is False
+        
+        with open(path, "w") as file:
+            file.write("{rotto")
+        registry.check()
+        registry.check()
+        registry.check()
+        assert registry.get("fr") is second and registry.errors == 1
+        
+        write_ruleset(directory, "fr", "0.2", ["religion", "carbone"])
+        stat = os.stat(path)
+        os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000))
+        registry.check()
+        assert registry.check() == []
+        assert registry.get("fr") is second and registry.reloads == 2
+
+def test_pinned_version():
+    """
+    Le versioni precedenti restano disponibili per chiave, fino al limite della cronologia.
+    """
+    with tempfile.TemporaryDirectory() as directory:
+        write_ruleset(directory, "fr", "0.1", ["religion"])
+        registry = make_registry(directory, history=2)
+        validator = EthicsValidator(registry)
+        first = registry.get("fr")
+        
+        write_ruleset(directory, "fr", "0.2", ["religion", "carbone"])
+        second = registry.reload("fr")
+        assert registry.get("fr") is second
+        assert registry.get("fr", version=first.key) is first
+        
+        # La validazione con la versione registrata usa le sue regole, non quelle attive
+        pinned = validator.validate(["taxe carbone"], "sociale", country="fr", version=first.key)
+        assert pinned["passed"] is True and pinned["ruleset"] == first.key
+        active = validator.validate(["taxe carbone"], "sociale", country="fr")
+        assert active["passed"] is False and active["ruleset"] == second.key
+        
+        # Oltre la cronologia la versione non è più disponibile e si usa quella attiva
+        write_ruleset(directory, "fr", "0.3", ["religion"])
+        third = registry.reload("fr")
+        assert registry.get("fr", version=first.key) is None
+        assert [entry["versions"] for entry in registry.list_rulesets()] == [[second.key, third.key]]
+        assert validator.validate(["taxe carbone"], "sociale", country="fr", version=first.key)["ruleset"] == third.key
+
+if __name__ == "__main__":
+    test_discovery()
+    test_reload_on_signature_change()
+    test_pinned_version()
+    print("Test del registro dei ruleset completati con successo!")
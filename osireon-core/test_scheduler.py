@@ -0,0 +1,137 @@
+"""
+Test del pianificatore delle chiamate LLM di Osireon.
+Questo script verifica i secchielli di gettoni, il rispetto dei limiti di richieste e token al minuto,
+la precedenza delle chiamate interattive su quelle in blocco, l'annullamento delle chiamate in coda
+e la correzione del consumo stimato con quello effettivo.
+"""
+import asyncio
+import time
+
+from src.llm.cache import LLMCache
+from src.llm.connector import LLMConnector
+from src.llm.scheduler import LLMScheduler, RateLimiter, TokenBucket
+
+def test_token_bucket():
+    """
+    Il secchiello parte pieno, si riempie alla velocità configurata e non supera la capacità.
+    """
+    bucket = TokenBucket(per_minute=60)
+    now = bucket.updated
+    assert bucket.delay(60, now) == 0.0
+    bucket.consume(60, now)
+    assert bucket.delay(1, now) == 1.0
+    assert abs(bucket.delay(10, now + 4) - 6.0) < 1e-9
+    assert bucket.delay(1000, now) == 60.0  # Richiesta limitata alla capacità
+    
+    bucket.adjust(-10)
+    assert abs(bucket.available(now + 4) - 14) < 1e-9
+    assert bucket.available(now + 1000) == 60
+
+def test_requests_per_minute_are_respected():
+    """
+    Con il secchiello vuoto, le chiamate vengono ammesse una alla volta alla velocità del limite.
+    """
+    limiter = RateLimiter("openai", requests_per_minute=1200)  # 20 richieste al secondo
+    limiter.requests.level = 0
+    
+    async def main():
+        admitted = []
+        
+        async def call(k):
+            await limiter.acquire(10)
+            admitted.append((k, time.monotonic()))
+        
+        start = time.monotonic()
+        await asyncio.gather(*[call(k) for k in range(5)])
+        return start, admitted
+    
+    start, admitted = asyncio.run(main())
+    assert [k for k, _ in admitted] == list(range(5))
+    assert admitted[-1][1] - start >= 5 / 20 * 0.9
+    
+    stats = limiter.stats()
+    assert stats["admitted"] == 5 and stats["queued"] == {"interactive": 0, "batch": 0}
+    assert stats["wait_ms"]["max"] >= 200 and stats["requests_per_minute"] == 1200
+
+def test_interactive_calls_go_first_and_cancelled_calls_leave_the_queue():
+    """
+    Le chiamate interattive arrivate dopo superano quelle in blocco in coda; una chiamata annullata
+    non blocca le successive.
+    """
+    limiter = RateLimiter("openai", requests_per_minute=1200)
+    limiter.requests.level = 0
+    order = []
+    
+    async def call(tag, priority):
+        await limiter.acquire(10, priority)
+        order.append(tag)
+    
+    async def main():
+        tasks = [asyncio.ensure_future(call(f"b{k}", "batch")) for k in range(4)]
+        await asyncio.sleep(0.01)
+        victim = asyncio.ensure_future(call("x", "interactive"))
+        tasks += [asyncio.ensure_future(call(f"i{k}", "interactive")) for k in range(2)]
+        await asyncio.sleep(0.01)
+        assert limiter.stats()["queued"] == {"interactive": 3, "batch": 4}
+        victim.cancel()
+        await asyncio.gather(*tasks)
+    
+    asyncio.run(main())
+    assert order == ["i0", "i1", "b0", "b1", "b2", "b3"]
+    assert limiter.stats()["admitted"] == 6
+
+def test_token_limit_and_settle():
+    """
+    Il limite di token ritarda le chiamate costose; un consumo effettivo inferiore alla stima
+    restituisce i gettoni in eccesso.
+    """
+    limiter = RateLimiter("deepseek", tokens_per_minute=6000)  # 100 token al secondo
+    limiter.tokens.level = 0
+    
+    async def main():
+        start = time.monotonic()
+        await limiter.acquire(50)
+        waited = time.monotonic() - start
+        limiter.settle(50, 10)
+        start = time.monotonic()
+        await limiter.acquire(40)
+        return waited, time.monotonic() - start
+    
+    waited, refunded = asyncio.run(main())
+    assert waited >= 0.45
+    assert refunded < 0.1
+    stats = limiter.stats()
+    assert (stats["estimated_tokens"], stats["actual_tokens"]) == (50, 10)
+
+def test_connector_uses_provider_limits():
+    """
+    Il connettore passa dal limitatore del provider e ne registra il consumo stimato ed effettivo.
+    """
+    connector = LLMConnector()
+    connector.cache = LLMCache(size=0, persistent=False)
+    connector.scheduler = LLMScheduler(completion_estimate=100)
+    assert connector.scheduler.limiter("openai") is None
+    limiter = connector.scheduler.configure("openai", requests_per_minute=600)  # 10 richieste al secondo
+    limiter.requests.level = 0
+    prompts = [f"Analisi economica della proposta {k}" for k in range(3)]
+    
+    async def main():
+        return await asyncio.gather(*[connector.call_llm_async(prompt, "openai", "gpt-4", 0) for prompt in prompts])
+    
+    start = time.monotonic()
+    responses = asyncio.run(main())
+    assert time.monotonic() - start >= 3 / 10 * 0.9
+    assert responses == [connector._mock_response("openai", prompt) for prompt in prompts]
+    
+    stats = connector.scheduler.stats()
+    assert list(stats) == ["openai"] and stats["openai"]["admitted"] == 3
+    assert stats["openai"]["estimated_tokens"] > 3 * 100 and stats["openai"]["actual_tokens"] > 0
+    assert connector.scheduler.estimate(20, None) == 120 and connector.scheduler.estimate(20, 30) == 50
+
+if __name__ == "__main__":
+    test_token_bucket()
+    test_requests_per_minute_are_respected()
+    test_interactive_calls_go_first_and_cancelled_calls_leave_the_queue()
+    test_token_limit_and_settle()
+    test_connector_uses_provider_limits()
+    print("Test del pianificatore delle chiamate LLM completati con successo!")
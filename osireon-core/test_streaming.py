@@ -0,0 +1,220 @@
+"""
+Test dello streaming delle simulazioni di Osireon.
+Questo script verifica gli eventi di POST /simulate/stream (Server-Sent Events) e di /simulate/ws
+(WebSocket): ordine degli eventi, frammenti delle risposte LLM, salvataggio dei testi completi,
+errori di validazione e annullamento della simulazione quando il client si disconnette.
+"""
+import asyncio
+import json
+import os
+import tempfile
+
+from fastapi import FastAPI
+
+from src.agents import agent_manager, LLMAgent
+from src.db import models
+from src.db.database import db_manager
+from src.simulate import router
+
+REQUEST = {
+    "country": "IT",
+    "domain": "economy",
+    "proposals": ["Flat tax al 15%", "Reddito di base"],
+    "constraints": ["costo inferiore a 5 milioni"]
+}
+
+class WordConnector:
+    """
+    Connettore che restituisce per ogni prompt una risposta fissa, una parola alla volta.
+    """
+    
+    default_provider = "openai"
+    default_model = "gpt-4"
+    default_temperature = 0.7
+    
+    def __init__(self, words: int = 4, delay: float = 0.01):
+        self.words = words
+        self.delay = delay
+        self.cancelled = 0
+    
+    async def stream_llm(self, prompt, provider=None, model=None, temperature=None, max_tokens=None,
+                         cache=None, priority="interactive"):
+        try:
+            for k in range(self.words):
+                await asyncio.sleep(self.delay)
+                yield ("" if k == 0 else " ") + f"parola{k}"
+        except asyncio.CancelledError:
+            self.cancelled += 1
+            raise
+
+class NarrativeAgent(LLMAgent):
+    """
+    Agente narrativo con un prompt per proposta.
+    """
+    
+    def build_prompts(self, input_data, module_result):
+        return {f"proposal_{i+1}": f"Analisi economica di {p}" for i, p in enumerate(input_data["proposals"])}
+    
+    def compose(self, input_data, module_result, responses):
+        return {"summary": " | ".join(responses.values())}
+
+def with_app(check, connector: WordConnector):
+    """
+    Esegue un test asincrono sull'applicazione, con un database temporaneo e l'agente narrativo registrato.
+    """
+    original_url = models.DATABASE_URL
+    with tempfile.TemporaryDirectory() as directory:
+        models.DATABASE_URL = f"sqlite:///{os.path.join(directory, 'osireon.db')}"
+        db_manager.initialized = False
+        agent_manager.register_agent(NarrativeAgent("narrative", connector=connector, temperature=0.7))
+        app = FastAPI()
+        app.include_router(router)
+        try:
+            return asyncio.run(check(app))
+        finally:
+            agent_manager.agents.pop("narrative", None)
+            db_manager.initialized = False
+            models.DATABASE_URL = original_url
+
+async def post_stream(app, body: dict, disconnect_after: int = None):
+    """
+    Invia una richiesta a POST /simulate/stream e restituisce i messaggi ASGI inviati dal server.
+    Con disconnect_after, il client si disconnette dopo aver ricevuto quel numero di messaggi.
+    """
+    sent = []
+    inbox: asyncio.Queue = asyncio.Queue()
+    inbox.put_nowait({"type": "http.request", "body": json.dumps(body).encode(), "more_body": False})
+    
+    async def send(message):
+        sent.append(message)
+        if len(sent) == disconnect_after:
+            inbox.put_nowait({"type": "http.disconnect"})
+    
+    scope = {"type": "http", "method": "POST", "path": "/simulate/stream", "query_string": b"", "root_path": "",
+             "headers": [(b"content-type", b"application/json")], "http_version": "1.1", "scheme": "http",
+             "server": ("test", 80), "client": ("test", 1)}
+    await app(scope, inbox.get, send)
+    return sent
+
+def parse_events(messages) -> list:
+    """
+    Ricostruisce gli eventi Server-Sent Events dal corpo della risposta.
+    """
+    text = b"".join(message.get("body", b"") for message in messages[1:]).decode()
+    events = []
+    for block in text.strip().split("\n\n"):
+        name, data = block.split("\n", 1)
+        event = json.loads(data[len("data: "):])
+        assert name == f"event: {event['type']}"
+        events.append(event)
+    return events
+
+def test_sse_events_and_saved_llm_logs():
+    """
+    Gli eventi arrivano nell'ordine documentato, i frammenti ricompongono le risposte e i testi completi
+    vengono salvati nei log LLM senza essere inviati al client.
+    """
+    async def check(app):
+        messages = await post_stream(app, REQUEST)
+        assert messages[0]["status"] == 200
+        assert dict(messages[0]["headers"])[b"content-type"].startswith(b"text/event-stream")
+        events = parse_events(messages)
+        
+        types = [event["type"] for event in events if event["type"] not in ("partial", "completion", "agent")]
+        assert types == ["started", "module", "ethics", "completed"]
+        assert events[0]["type"] == "started" and events[-1]["type"] == "completed"
+        assert {event["agent"] for event in events if event["type"] == "agent"} == set(agent_manager.agents)
+        
+        deltas = "".join(event["delta"] for event in events if event["type"] == "partial" and event["prompt"] == "proposal_1")
+        assert deltas == "parola0 parola1 parola2 parola3"
+        completions = [event for event in events if event["type"] == "completion"]
+        assert len(completions) == 2
+        assert not {"prompt_text", "text"} & set(completions[0])
+        
+        response = events[-1]["response"]
+        narrative = [a for a in response["agent_analyses"] if a["agent_name"] == "narrative"][0]
+        assert narrative["analysis"].startswith(f"{deltas} | {deltas}")
+        
+        session = models.get_db_session()
+        try:
+            logs = session.query(models.LLMLog).filter(models.LLMLog.simulation_id == events[0]["simulation_id"]).all()
+            assert sorted(log.prompt for log in logs) == ["Analisi economica di Flat tax al 15%", "Analisi economica di Reddito di base"]
+            assert {log.response for log in logs} == {deltas}
+        finally:
+            session.close()
+        assert db_manager.get_simulation(events[0]["simulation_id"])["status"] == "completed"
+    
+    with_app(check, WordConnector())
+
+def test_sse_disconnect_cancels_simulation():
+    """
+    Se il client si disconnette a metà, le chiamate LLM vengono annullate e la simulazione risulta annullata.
+    """
+    connector = WordConnector(words=200, delay=0.02)
+    
+    async def check(app):
+        messages = await post_stream(app, REQUEST, disconnect_after=4)
+        started = parse_events(messages[:2])[0]
+        return db_manager.get_simulation(started["simulation_id"])["status"]
+    
+    assert with_app(check, connector) == "cancelled"
+    assert connector.cancelled > 0
+
+def test_websocket_errors_and_events():
+    """
+    Sulla WebSocket una richiesta non valida riceve un evento di errore e la connessione resta aperta
+    per la richiesta successiva, che riceve gli stessi eventi dello streaming SSE.
+    """
+    async def check(app):
+        inbox: asyncio.Queue = asyncio.Queue()
+        for message in ({"type": "websocket.connect"},
+                        {"type": "websocket.receive", "text": json.dumps({"country": "IT"})},
+                        {"type": "websocket.receive", "text": json.dumps(dict(REQUEST, fields=["costs"]))},
+                        {"type": "websocket.receive", "text": json.dumps(REQUEST)}):
+            inbox.put_nowait(message)
+        sent = []
+        
+        async def receive():
+            if inbox.empty():
+                return {"type": "websocket.disconnect", "code": 1000}
+            return await inbox.get()
+        
+        async def send(message):
+            if message["type"] == "websocket.send":
+                sent.append(json.loads(message["text"]))
+            elif message["type"] == "websocket.accept":
+                sent.append({"type": "accepted"})
+        
+        scope = {"type": "websocket", "path": "/simulate/ws", "query_string": b"", "root_path": "", "headers": [],
+                 "scheme": "ws", "server": ("test", 80), "client": ("test", 1), "subprotocols": []}
+        await app(scope, receive, send)
+        return sent
+    
+    sent = with_app(check, WordConnector())
+    assert sent[0] == {"type": "accepted"}
+    assert sent[1]["type"] == "error" and sent[1]["status_code"] == 422
+    assert sent[2]["type"] == "error" and sent[2]["status_code"] == 422
+    types = [event["type"] for event in sent[3:]]
+    assert types[0] == "started" and types[-1] == "completed"
+    assert types.count("partial") == 2 * 4 and types.count("completion") == 2
+
+def test_llm_agent_stream():
+    """
+    LLMAgent.stream restituisce i frammenti man mano che arrivano e, per ultimo, il risultato completo.
+    """
+    agent = NarrativeAgent("narrative", connector=WordConnector(words=3), temperature=0.7)
+    
+    async def collect():
+        return [event async for event in agent.stream(REQUEST, {})]
+    
+    events = asyncio.run(collect())
+    assert [event["type"] for event in events].count("partial") == 2 * 3
+    assert events[-1]["type"] == "result" and events[-1]["agent"] == "narrative"
+    assert events[-1]["result"]["summary"] == "parola0 parola1 parola2 | parola0 parola1 parola2"
+
+if __name__ == "__main__":
+    test_sse_events_and_saved_llm_logs()
+    test_sse_disconnect_cancels_simulation()
+    test_websocket_errors_and_events()
+    test_llm_agent_stream()
+    print("Test dello streaming delle simulazioni completati con successo!")
@@ -0,0 +1,87 @@
+"""
+Test dell'esplorazione parametrica delle proposte di Osireon.
+Questo script verifica la generazione della griglia di varianti, il limite sul numero di punti e il
+riuso dei punti già valutati tra griglie sovrapposte.
+"""
+from src.modules import economy_it
+from src.modules.registry import ModuleSpec
+from src.modules.sweep import ParameterSweep, parameter_values
+
+SPEC = ModuleSpec.from_module("economy_it", economy_it)
+
+def test_parameter_values():
+    """
+    Gli intervalli includono l'estremo superiore e non accumulano errori di arrotondamento.
+    """
+    assert parameter_values({"start": 0.1, "stop": 0.5, "step": 0.1}) == [0.1, 0.2, 0.3, 0.4, 0.5]
+    assert parameter_values({"start": 10, "stop": 12}) == [10.0, 11.0, 12.0]
+    assert parameter_values({"values": [3, 1]}) == [3.0, 1.0]
+    for invalid in ({"start": 0, "stop": 1, "step": -1}, {"start": 0, "stop": float("inf")}):
+        try:
+            parameter_values(invalid)
+            raise AssertionError(f"intervallo accettato: {invalid}")
+        except ValueError:
+            pass
+
+def test_grid_expansion():
+    """
+    La griglia è il prodotto cartesiano dei parametri (in ordine di nome), ripetuto per ogni template.
+    """
+    grid = ParameterSweep(max_points=100).expand(
+        ["Flat tax al {rate}% sopra {soglia} euro", "Aliquota {rate}%"],
+        {"soglia": {"values": [15000, 30000]}, "rate": {"start": 15, "stop": 25, "step": 5}}
+    )
+    assert len(grid["proposals"]) == 2 * 3 * 2
+    assert grid["proposals"][:3] == [
+        "Flat tax al 15% sopra 15000 euro", "Flat tax al 15% sopra 30000 euro", "Flat tax al 20% sopra 15000 euro"
+    ]
+    assert list(grid["template_index"]) == [0] * 6 + [1] * 6
+    assert list(grid["parameters"]["rate"][:6]) == [15.0, 15.0, 20.0, 20.0, 25.0, 25.0]
+    assert grid["proposals"][6:8] == ["Aliquota 15%", "Aliquota 15%"]
+
+def test_grid_limits_and_templates():
+    """
+    Una griglia oltre il limite viene rifiutata prima di generare i valori; un template incompleto è un errore.
+    """
+    sweep = ParameterSweep(max_points=1000)
+    for templates, parameters, message in (
+        (["Aliquota {rate}%"], {"rate": {"start": 0, "stop": 1e9}}, "oltre il limite"),
+        (["Aliquota {rate}% per {anni} anni"], {"rate": {"values": [10]}}, "anni")
+    ):
+        try:
+            sweep.expand(templates, parameters)
+            raise AssertionError(f"griglia accettata: {templates}")
+        except ValueError as e:
+            assert message in str(e)
+
+def test_overlapping_grids_reuse_points():
+    """
+    Le varianti già valutate vengono prese dalla cache e il modulo riceve solo quelle nuove, in un'unica esecuzione.
+    """
+    sweep = ParameterSweep(max_points=1000, cache_size=1000)
+    batches = []
+    
+    def evaluate(batch_input):
+        batches.append(list(batch_input["proposals"]))
+        return economy_it.run_batch(batch_input)
+    
+    input_data = {"country": "Italy", "domain": "economia", "constraints": ["costo massimo 3 milioni"]}
+    first = sweep.run(SPEC, evaluate, input_data, ["Aliquota {rate}%"], {"rate": {"start": 10, "stop": 20, "step": 5}})
+    assert (first["points"], first["evaluated_points"], first["cached_points"]) == (3, 3, 0)
+    assert first["columns"] == ["template", "rate", "impact_score", "feasibility", "cost_estimate", "constraints_satisfied"]
+    
+    second = sweep.run(SPEC, evaluate, input_data, ["Aliquota {rate}%"], {"rate": {"start": 15, "stop": 30, "step": 5}})
+    assert (second["points"], second["evaluated_points"], second["cached_points"]) == (4, 2, 2)
+    assert batches == [["Aliquota 10%", "Aliquota 15%", "Aliquota 20%"], ["Aliquota 25%", "Aliquota 30%"]]
+    assert second["rows"][:2] == first["rows"][1:]
+    
+    # Vincoli diversi cambiano il contesto: nessun punto viene riusato
+    third = sweep.run(SPEC, evaluate, dict(input_data, constraints=[]), ["Aliquota {rate}%"], {"rate": {"values": [10]}})
+    assert third["cached_points"] == 0 and len(batches) == 3
+
+if __name__ == "__main__":
+    test_parameter_values()
+    test_grid_expansion()
+    test_grid_limits_and_templates()
+    test_overlapping_grids_reuse_points()
+    print("Test dell'esplorazione parametrica completati con successo!")
@@ -0,0 +1,60 @@
+"""
+Test delle simulazioni temporali di Osireon.
+Questo script verifica la validazione delle richieste di traiettoria e la diramazione di uno scenario
+da un altro già calcolato.
+"""
+import asyncio
+
+from fastapi import HTTPException
+from pydantic import ValidationError
+
+from src.simulate import simulate_timeline
+from src.utils.models import TimelineRequest
+
+# Richiesta di base per il modulo economico italiano
+BASE_REQUEST = {
+    "country": "Italy",
+    "domain": "economy",
+    "proposals": ["Flat tax al 20%", "Reddito universale"],
+    "constraints": ["costo massimo 5 miliardi"],
+    "horizon_years": 3
+}
+
+def test_simulate_options_are_rejected():
+    """
+    Le opzioni di /simulate sul dettaglio della risposta non sono accettate per le traiettorie.
+    """
+    for option in ({"detail": "summary"}, {"fields": ["ethics"]}):
+        try:
+            TimelineRequest(**BASE_REQUEST, **option)
+            raise AssertionError(f"opzione accettata: {option}")
+        except ValidationError as e:
+            assert list(option) == [error["loc"][0] for error in e.errors()]
+    
+    assert "detail" not in TimelineRequest.schema()["properties"]
+
+def test_branch_reuses_parent_and_checks_input():
+    """
+    Un ramo riusa i passi del padre fino all'anno di diramazione; proposte diverse sono un errore.
+    """
+    parent = asyncio.run(simulate_timeline(TimelineRequest(**BASE_REQUEST)))
+    branch = asyncio.run(simulate_timeline(TimelineRequest(
+        **BASE_REQUEST, parent_scenario_id=parent["scenario_id"], branch_year=1, params={}
+    )))
+    assert branch["scenario_id"] != parent["scenario_id"]
+    assert branch["cached_steps"] > 0
+    assert list(branch["proposals"]) == ["proposal_1", "proposal_2"]
+    
+    changed = dict(BASE_REQUEST, proposals=["Flat tax al 20%"])
+    try:
+        asyncio.run(simulate_timeline(TimelineRequest(
+            **changed, parent_scenario_id=parent["scenario_id"], branch_year=1
+        )))
+        raise AssertionError("ramo con proposte diverse accettato")
+    except HTTPException as e:
+        assert e.status_code == 400
+
+if __name__ == "__main__":
+    test_simulate_options_are_rejected()
+    test_branch_reuses_parent_and_checks_input()
+    print("Test delle simulazioni temporali completati con successo!")
@@ -0,0 +1,189 @@
+"""
+Test del client HTTP asincrono usato dai provider LLM di Osireon.
+Questo script verifica il riuso delle connessioni keep-alive, la ripetizione di una richiesta su una
+connessione inattiva chiusa dal server, il limite di connessioni per host e la lettura in streaming.
+"""
+import asyncio
+
+from src.llm.transport import AsyncHTTPClient, HTTPError
+
+class ScriptedServer:
+    """
+    Server HTTP/1.1 minimo che risponde secondo il comportamento indicato:
+    "keep-alive" risponde sempre; "stale" chiude senza rispondere alla seconda richiesta di una
+    connessione (come un server che ha chiuso la connessione inattiva); "drop" chiude sempre senza
+    rispondere; "chunked" risponde con un corpo a frammenti.
+    """
+    
+    def __init__(self, behaviour: str = "keep-alive", delay: float = 0.0, chunks: int = 3):
+        self.behaviour = behaviour
+        self.delay = delay
+        self.chunks = chunks
+        self.connections = 0
+        self.requests = 0
+        self.active = 0
+        self.max_active = 0
+        self.server = None
+    
+    async def start(self) -> str:
+        self.server = await asyncio.start_server(self.handle, "127.0.0.1", 0)
+        return f"http://127.0.0.1:{self.server.sockets[0].getsockname()[1]}"
+    
+    async def stop(self) -> None:
+        self.server.close()
+        await self.server.wait_closed()
+    
+    async def handle(self, reader, writer):
+        self.connections += 1
+        self.active += 1
+        self.max_active = max(self.max_active, self.active)
+        served = 0
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line:
+                    break
+                length = 0
+                while True:
+                    header = await reader.readline()
+                    if header in (b"\r\n", b"\n", b""):
+                        break
+                    name, _, value = header.decode("latin-1").partition(":")
+                    if name.strip().lower() == "content-length":
+                        length = int(value)
+                if length:
+                    await reader.readexactly(length)
+                
+                self.requests += 1
+                served += 1
+                if self.behaviour == "drop" or (self.behaviour == "stale" and served > 1):
+                    break
+                if self.delay:
+                    await asyncio.sleep(self.delay)
+                
+                if self.behaviour == "chunked":
+                    writer.write(b"HTTP/1.1 200 OK\r\nTransfer-Encoding: chunked\r\n\r\n")
+                    for k in range(self.chunks):
+                        data = f"data: {k}\n".encode()
+                        writer.write(f"{len(data):x}\r\n".encode() + data + b"\r\n")
+                        await writer.drain()
+                        await asyncio.sleep(0.01)
+                    writer.write(b"0\r\n\r\n")
+                else:
+                    body = f'{{"request": {served}}}'.encode()
+                    writer.write(b"HTTP/1.1 200 OK\r\nContent-Type: application/json\r\n"
+                                 + f"Content-Length: {len(body)}\r\n\r\n".encode() + body)
+                await writer.drain()
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            self.active -= 1
+            writer.close()
+
+def run(test, server: ScriptedServer, client: AsyncHTTPClient):
+    """
+    Esegue un test asincrono con il server avviato nello stesso ciclo di eventi.
+    """
+    async def main():
+        url = await server.start()
+        try:
+            return await test(url)
+        finally:
+            await client.aclose()
+            await server.stop()
+    return asyncio.run(main())
+
+def test_keep_alive_connections_are_reused():
+    """
+    Richieste successive verso lo stesso host usano la stessa connessione.
+    """
+    server = ScriptedServer()
+    client = AsyncHTTPClient(max_connections=4)
+    
+    async def test(url):
+        bodies = []
+        for _ in range(5):
+            response, body = await client.request("POST", f"{url}/v1/chat/completions", json_body={"prompt": "ciao"})
+            assert response.status == 200
+            bodies.append(body)
+        return bodies, client.stats()[url[len("http://"):]]
+    
+    bodies, stats = run(test, server, client)
+    assert bodies == [f'{{"request": {k}}}'.encode() for k in range(1, 6)]
+    assert (stats["created"], stats["reused"], stats["in_use"], stats["idle"]) == (1, 4, 0, 1)
+    assert server.connections == 1
+
+def test_stale_connection_is_retried_once():
+    """
+    Se il server ha chiuso una connessione riusata, la richiesta viene ripetuta su una nuova connessione.
+    """
+    server = ScriptedServer("stale")
+    client = AsyncHTTPClient(max_connections=4)
+    
+    async def test(url):
+        first, _ = await client.request("GET", f"{url}/v1/models")
+        second, body = await client.request("GET", f"{url}/v1/models")
+        return first.status, second.status, body
+    
+    assert run(test, server, client) == (200, 200, b'{"request": 1}')
+    assert server.connections == 2 and server.requests == 3
+
+def test_fresh_connection_failure_is_not_retried():
+    """
+    Un errore su una connessione appena aperta non viene ripetuto: il chiamante riceve HTTPError.
+    """
+    server = ScriptedServer("drop")
+    client = AsyncHTTPClient(max_connections=4)
+    
+    async def test(url):
+        try:
+            await client.request("GET", f"{url}/v1/models")
+            raise AssertionError("connessione interrotta non segnalata")
+        except HTTPError as e:
+            assert e.status is None and e.retryable
+            return client.stats()[url[len("http://"):]]
+    
+    stats = run(test, server, client)
+    assert server.connections == 1
+    assert stats["in_use"] == 0 and stats["idle"] == 0
+
+def test_connections_per_host_are_limited():
+    """
+    Le richieste oltre il limite di connessioni attendono che una connessione si liberi.
+    """
+    server = ScriptedServer(delay=0.1)
+    client = AsyncHTTPClient(max_connections=2)
+    
+    async def test(url):
+        results = await asyncio.gather(*[client.request("GET", f"{url}/v1/models") for _ in range(6)])
+        return [response.status for response, _ in results]
+    
+    assert run(test, server, client) == [200] * 6
+    assert server.connections == 2 and server.max_active == 2
+
+def test_streamed_body_and_early_close():
+    """
+    Il corpo chunked arriva a righe; una risposta non letta per intero non lascia la connessione nel pool.
+    """
+    server = ScriptedServer("chunked", chunks=3)
+    client = AsyncHTTPClient(max_connections=2)
+    
+    async def test(url):
+        async with client.stream("POST", f"{url}/v1/chat/completions", json_body={"stream": True}) as response:
+            lines = [line async for line in response.iter_lines()]
+        async with client.stream("POST", f"{url}/v1/chat/completions", json_body={"stream": True}) as response:
+            async for line in response.iter_lines():
+                break
+        return lines, client.stats()[url[len("http://"):]]
+    
+    lines, stats = run(test, server, client)
+    assert [line for line in lines if line] == ["data: 0", "data: 1", "data: 2"]
+    assert (stats["created"], stats["reused"], stats["idle"]) == (1, 1, 0)
+
+if __name__ == "__main__":
+    test_keep_alive_connections_are_reused()
+    test_stale_connection_is_retried_once()
+    test_fresh_connection_failure_is_not_retried()
+    test_connections_per_host_are_limited()
+    test_streamed_body_and_early_close()
+    print("Test del client HTTP asincrono completati con successo!")
@@ -0,0 +1,100 @@
+"""
+Selezione del livello di dettaglio per Osireon.
+Questo file contiene le sezioni di dettaglio facoltative dei risultati (analisi per proposta degli agenti,
+controlli delle singole regole etiche, dettaglio dei vincoli) e la selezione richiesta dal client.
+"""
+from typing import Dict, Iterable, List, Optional
+
+# Sezioni di dettaglio facoltative
+AGENT_DETAILS = "agent_details"  # Analisi e critiche per proposta degli agenti
+RULE_CHECKS = "rule_checks"  # Esito di ogni regola etica per proposta
+CONSTRAINT_DETAILS = "constraint_details"  # Verifica di ogni vincolo per proposta (constraints_check)
+
+SECTIONS = (AGENT_DETAILS, RULE_CHECKS, CONSTRAINT_DETAILS)
+
+# Livelli di dettaglio: "summary" esclude tutte le sezioni facoltative, "full" le include tutte
+DETAIL_LEVELS = ("summary", "full")
+
+# Chiave con cui i risultati salvati indicano le sezioni non calcolate
+OMITTED_KEY = "omitted_sections"
+
+class DetailSelection:
+    """
+    Sezioni di dettaglio richieste per una simulazione.
+    """
+    
+    def __init__(self, sections: Iterable[str]):
+        """
+        Inizializza la selezione.
+        
+        Args:
+            sections: Sezioni da includere.
+        """
+        self.sections = frozenset(sections)
+    
+    @classmethod
+    def from_request(cls, detail: Optional[str] = None, fields: Optional[List[str]] = None) -> "DetailSelection":
+        """
+        Costruisce la selezione a partire dai parametri di una richiesta.
+        
+        Args:
+            detail: Livello di dettaglio ("summary" o "full"). Se None, "full".
+            fields: Sezioni da includere; se indicate, prevalgono sul livello di dettaglio.
+        
+        Returns:
+            DetailSelection: Selezione richiesta.
+        
+        Raises:
+            ValueError: Se il livello o una sezione non sono validi.
+        """
+        if detail is not None and detail not in DETAIL_LEVELS:
+            raise ValueError(f"Livello di dettaglio {detail} non valido (ammessi: {', '.join(DETAIL_LEVELS)})")
+        if fields is not None:
+            unknown = [field for field in fields if field not in SECTIONS]
+            if unknown:
+                raise ValueError(f"Sezioni non valide: {', '.join(unknown)} (ammesse: {', '.join(SECTIONS)})")
+            return cls(fields)
+        return cls(() if detail == "summary" else SECTIONS)
+    
+    def includes(self, section: str) -> bool:
+        """
+        Indica se una sezione è richiesta.
+        
+        Args:
+            section: Nome della sezione.
+        
+        Returns:
+            bool: True se la sezione va calcolata.
+        """
+        return section in self.sections
+    
+    def omitted(self, sections: Iterable[str] = SECTIONS) -> List[str]:
+        """
+        Restituisce le sezioni non richieste tra quelle indicate, in ordine canonico.
+        
+        Args:
+            sections: Sezioni da considerare.
+        
+        Returns:
+            List[str]: Sezioni da non calcolare.
+        """
+        sections = set(sections)
+        return [section for section in SECTIONS if section in sections and section not in self.sections]
+    
+    def to_dict(self) -> Dict[str, List[str]]:
+        """
+        Converte la selezione in un dizionario.
+        
+        Returns:
+            Dict[str, List[str]]: Sezioni incluse ed escluse.
+        """
+        return {
+            "included": [section for section in SECTIONS if section in self.sections],
+            "omitted": self.omitted()
+        }
+    
+    def __repr__(self) -> str:
+        return f"DetailSelection({sorted(self.sections)})"
+
+# Selezione completa, usata quando la richiesta non indica un livello di dettaglio
+FULL_DETAIL = DetailSelection(SECTIONS)
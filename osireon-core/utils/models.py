@@ -14,11 +14,176 @@ class SimulationRequest(BaseModel):
         domain: Il dominio di policy (es. economia, sociale).
         proposals: Lista di proposte di policy da simulare.
         constraints: Lista di vincoli da considerare nella simulazione.
+        detail: Livello di dettaglio dei risultati ("summary" o "full").
+        fields: Sezioni di dettaglio da calcolare; se indicate, prevalgono su detail.
     """
     country: str = Field(..., description="Paese per cui eseguire la simulazione")
     domain: str = Field(..., description="Dominio di policy (es. economia, sociale)")
     proposals: List[str] = Field(..., description="Lista di proposte di policy da simulare")
     constraints: List[str] = Field(..., description="Lista di vincoli da considerare nella simulazione")
+    detail: str = Field("full", regex="^(summary|full)$", description="Livello di dettaglio dei risultati: 'summary' (solo esito complessivo) o 'full'")
+    fields: Optional[List[str]] = Field(None, description="Sezioni di dettaglio da calcolare (agent_details, rule_checks, constraint_details)")
+
+class SimulationTarget(BaseModel):
+    """
+    Modello per un target (paese, dominio) di una simulazione multipla.
+    
+    Attributes:
+        country: Il paese per cui eseguire la simulazione.
+        domain: Il dominio di policy (es. economia, sociale).
+    """
+    country: str = Field(..., description="Paese per cui eseguire la simulazione")
+    domain: str = Field(..., description="Dominio di policy (es. economia, sociale)")
+
+class FanOutRequest(BaseModel):
+    """
+    Modello per la richiesta di simulazione su più paesi e domini.
+    
+    Attributes:
+        targets: Lista dei target (paese, dominio) da simulare.
+        proposals: Lista di proposte di policy da simulare.
+        constraints: Lista di vincoli da considerare nella simulazione.
+    """
+    targets: List[SimulationTarget] = Field(..., min_items=1, description="Lista dei target (paese, dominio) da simulare")
+    proposals: List[str] = Field(..., description="Lista di proposte di policy da simulare")
+    constraints: List[str] = Field(..., description="Lista di vincoli da considerare nella simulazione")
+
+class TimelineRequest(BaseModel):
+    """
+    Modello per la richiesta di simulazione temporale su più anni.
+    
+    Attributes:
+        country: Il paese per cui eseguire la simulazione.
+        domain: Il dominio di policy (es. economia, sociale).
+        proposals: Lista di proposte di policy da simulare.
+        constraints: Lista di vincoli da considerare nella simulazione.
+        horizon_years: Orizzonte della simulazione in anni.
+        steps_per_year: Numero di passi per anno (1 annuale, 4 trimestrale).
+        params: Parametri della dinamica del modulo.
+        parent_scenario_id: Scenario da cui diramare la simulazione.
+        branch_year: Anno da cui la simulazione diverge dallo scenario padre.
+    """
+    country: str = Field(..., description="Paese per cui eseguire la simulazione")
+    domain: str = Field(..., description="Dominio di policy (es. economia, sociale)")
+    proposals: List[str] = Field(..., description="Lista di proposte di policy da simulare")
+    constraints: List[str] = Field(..., description="Lista di vincoli da considerare nella simulazione")
+    horizon_years: int = Field(10, ge=1, le=100, description="Orizzonte della simulazione in anni")
+    steps_per_year: int = Field(1, ge=1, le=12, description="Numero di passi per anno")
+    params: Dict[str, float] = Field(default_factory=dict, description="Parametri della dinamica del modulo")
+    parent_scenario_id: Optional[str] = Field(None, description="Scenario da cui diramare la simulazione")
+    branch_year: Optional[float] = Field(None, ge=0, description="Anno da cui la simulazione diverge dallo scenario padre")
+    
+    class Config:
+        # Le opzioni di /simulate (detail, fields) non valgono per le traiettorie: vengono rifiutate
+        extra = "forbid"
+
+class ParameterRange(BaseModel):
+    """
+    Modello per i valori di un parametro di una proposta parametrica.
+    
+    Attributes:
+        values: Lista esplicita di valori. Se presente, ha la precedenza sull'intervallo.
+        start: Primo valore dell'intervallo.
+        stop: Ultimo valore dell'intervallo (incluso).
+        step: Passo dell'intervallo.
+    """
+    values: Optional[List[float]] = None
+    start: Optional[float] = None
+    stop: Optional[float] = None
+    step: Optional[float] = Field(None, gt=0)
+
+class SweepRequest(BaseModel):
+    """
+    Modello per la richiesta di esplorazione parametrica delle proposte.
+    
+    Attributes:
+        country: Il paese per cui eseguire la simulazione.
+        domain: Il dominio di policy (es. economia, sociale).
+        templates: Proposte parametriche con segnaposto, es. "Flat tax al {rate}%".
+        parameters: Valori o intervalli di ogni parametro.
+        constraints: Lista di vincoli comuni a tutte le varianti.
+    """
+    country: str = Field(..., description="Paese per cui eseguire la simulazione")
+    domain: str = Field(..., description="Dominio di policy (es. economia, sociale)")
+    templates: List[str] = Field(..., min_items=1, description="Proposte parametriche, es. 'Flat tax al {rate}%'")
+    parameters: Dict[str, ParameterRange] = Field(..., description="Valori o intervalli di ogni parametro")
+    constraints: List[str] = Field(default_factory=list, description="Lista di vincoli comuni a tutte le varianti")
+
+class ProposalDelta(BaseModel):
+    """
+    Modello per la modifica di proposte e vincoli rispetto a una simulazione precedente.
+    
+    Attributes:
+        added_proposals: Proposte da aggiungere.
+        removed_proposals: Proposte da rimuovere.
+        edited_proposals: Proposte modificate (testo precedente -> nuovo testo).
+        added_constraints: Vincoli da aggiungere.
+        removed_constraints: Vincoli da rimuovere.
+    """
+    added_proposals: List[str] = Field(default_factory=list, description="Proposte da aggiungere")
+    removed_proposals: List[str] = Field(default_factory=list, description="Proposte da rimuovere")
+    edited_proposals: Dict[str, str] = Field(default_factory=dict, description="Proposte modificate (testo precedente -> nuovo testo)")
+    added_constraints: List[str] = Field(default_factory=list, description="Vincoli da aggiungere")
+    removed_constraints: List[str] = Field(default_factory=list, description="Vincoli da rimuovere")
+
+class IncrementalRequest(BaseModel):
+    """
+    Modello per la richiesta di simulazione incrementale.
+    
+    Attributes:
+        country: Il paese per cui eseguire la simulazione.
+        domain: Il dominio di policy (es. economia, sociale).
+        proposals: Proposte della simulazione precedente.
+        constraints: Vincoli della simulazione precedente.
+        delta: Modifica da applicare a proposte e vincoli.
+        prior_simulation_id: Simulazione precedente da cui leggere proposte, vincoli e risultato.
+        prior_result: Risultato del modulo della simulazione precedente.
+    """
+    country: str = Field(..., description="Paese per cui eseguire la simulazione")
+    domain: str = Field(..., description="Dominio di policy (es. economia, sociale)")
+    proposals: List[str] = Field(default_factory=list, description="Proposte della simulazione precedente")
+    constraints: List[str] = Field(default_factory=list, description="Vincoli della simulazione precedente")
+    delta: ProposalDelta = Field(default_factory=ProposalDelta, description="Modifica da applicare a proposte e vincoli")
+    prior_simulation_id: Optional[int] = Field(None, description="Simulazione precedente da cui leggere proposte, vincoli e risultato")
+    prior_result: Optional[Dict[str, Any]] = Field(None, description="Risultato del modulo della simulazione precedente")
+
+class PortfolioRequest(BaseModel):
+    """
+    Modello per la richiesta di ottimizzazione dei portafogli di proposte.
+    
+    Attributes:
+        country: Il paese per cui eseguire la simulazione.
+        domain: Il dominio di policy (es. economia, sociale).
+        proposals: Proposte candidate.
+        constraints: Lista di vincoli comuni a tutte le proposte.
+        budget: Costo totale massimo di un portafoglio.
+        max_proposals: Numero massimo di proposte in un portafoglio.
+        min_feasibility: Fattibilità minima di una proposta per essere ammessa.
+        required: Proposte che devono far parte di ogni portafoglio.
+        excluded: Proposte da escludere.
+        require_constraints: Se ammettere solo le proposte che soddisfano tutti i vincoli.
+        max_points: Numero massimo di portafogli della frontiera.
+    """
+    country: str = Field(..., description="Paese per cui eseguire la simulazione")
+    domain: str = Field(..., description="Dominio di policy (es. economia, sociale)")
+    proposals: List[str] = Field(..., min_items=1, description="Proposte candidate")
+    constraints: List[str] = Field(default_factory=list, description="Lista di vincoli comuni a tutte le proposte")
+    budget: float = Field(..., ge=0, description="Costo totale massimo di un portafoglio")
+    max_proposals: Optional[int] = Field(None, ge=1, description="Numero massimo di proposte in un portafoglio")
+    min_feasibility: float = Field(0.0, ge=0, le=1, description="Fattibilità minima di una proposta per essere ammessa")
+    required: List[str] = Field(default_factory=list, description="Proposte che devono far parte di ogni portafoglio")
+    excluded: List[str] = Field(default_factory=list, description="Proposte da escludere")
+    require_constraints: bool = Field(False, description="Ammette solo le proposte che soddisfano tutti i vincoli")
+    max_points: Optional[int] = Field(None, ge=1, le=1000, description="Numero massimo di portafogli della frontiera")
+
+class ConstraintCompileRequest(BaseModel):
+    """
+    Modello per la richiesta di compilazione dei vincoli.
+    
+    Attributes:
+        constraints: Vincoli in testo libero da tradurre in predicati sulle metriche.
+    """
+    constraints: List[str] = Field(..., min_items=1, description="Vincoli in testo libero da tradurre in predicati")
 
 class ModuleResult(BaseModel):
     """
@@ -47,11 +212,15 @@ class EthicsCheck(BaseModel):
     Modello per il risultato del controllo etico.
     
     Attributes:
-        passed: Indica se il controllo etico è stato superato.
+        passed: Indica se il controllo etico è stato superato (None se le proposte non sono state validate).
         violations: Lista di eventuali violazioni etiche riscontrate.
+        ruleset: Versione del ruleset etico che ha prodotto il risultato (es. it@1.0.0+3fa9c2d1e0b4).
+        status: "validated", oppure "not_validated" se il paese non ha un ruleset etico.
     """
-    passed: bool
+    passed: Optional[bool]
     violations: Optional[List[str]] = None
+    ruleset: Optional[str] = None
+    status: str = "validated"
 
 class SimulationResponse(BaseModel):
     """